@@ -0,0 +1,217 @@
+""" Concurrent discovery of the nodes of the cluster under test.
+
+TestInputs.parse_topo needs, for every node of the topology, its hostname,
+fqdn, running containers, ip addresses, os and a few files. Instead of a
+separate ssh command per fact and per node, ClusterDiscovery probes all
+the nodes concurrently, running one combined script per node, and saves
+the facts in an on-disk cache keyed by the hash of the topology file so
+that the subsequent test processes skip the probe altogether.
+
+    discovery = ClusterDiscovery(topology_file, logger=logger)
+    facts = discovery.discover({host_ip: {'username': 'root',
+                                          'password': 'c0ntrail123',
+                                          'nics': ['vhost0'],
+                                          'files': ['/root/.kube/config']}})
+    facts[host_ip]['hostname'], facts[host_ip]['nic_ips']['vhost0']
+
+Nodes which could not be probed are not in the returned facts, the caller
+falls back to querying them individually. The facts of the nodes which
+were probed are cached all the same, each node with its own timestamp, so
+that the next process probes only the nodes missing in the cache.
+"""
+import os
+import json
+import time
+import errno
+import pipes
+import hashlib
+import tempfile
+
+from netaddr import IPNetwork
+
+from common import log_orig as contrail_logging
+from tcutils.fabutils import build_batch_script, parse_batch_output
+from tcutils.threadpool_lib import map_in_parallel
+from tcutils.util import exec_cmd_on_server
+
+DISCOVERY_CACHE_DIR = os.getenv('DISCOVERY_CACHE_DIR') or \
+    os.path.join(tempfile.gettempdir(), 'contrail-test-discovery')
+# Secs for which the cached facts are valid, 0 disables the cache
+DISCOVERY_CACHE_TTL = int(os.getenv('DISCOVERY_CACHE_TTL') or 3600)
+DISCOVERY_WORKERS = int(os.getenv('DISCOVERY_WORKERS') or 32)
+DISCOVERY_TIMEOUT = 60
+
+CONTAINERS_CMD = 'docker ps 2>/dev/null | grep -v "/pause\|/usr/bin/pod" | ' \
+                 'awk \'{print $NF}\''
+IPS_CMD = "ip addr show %s2>/dev/null | grep 'inet .*/.* brd ' | " \
+          "awk '{print $2}'"
+
+
+def _to_str(obj):
+    # json loads strings as unicode, keep the facts as str like fab output
+    if isinstance(obj, dict):
+        return dict((_to_str(k), _to_str(v)) for k, v in obj.iteritems())
+    if isinstance(obj, list):
+        return [_to_str(v) for v in obj]
+    if isinstance(obj, unicode):
+        return obj.encode('utf-8')
+    return obj
+
+
+def parse_ips(output):
+    cidrs = [cidr.strip() for cidr in (output or '').split('\n')]
+    return [str(IPNetwork(cidr).ip) for cidr in cidrs if cidr]
+
+
+class ClusterDiscovery(object):
+
+    def __init__(self, topology_file, logger=None,
+                 cache_dir=DISCOVERY_CACHE_DIR, ttl=DISCOVERY_CACHE_TTL,
+                 workers=DISCOVERY_WORKERS):
+        self.topology_file = topology_file
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.workers = workers
+
+    @property
+    def cache_file(self):
+        with open(self.topology_file) as fd:
+            digest = hashlib.sha1(fd.read()).hexdigest()
+        return os.path.join(self.cache_dir, '%s.json' % digest)
+
+    def _read_cache(self):
+        ''' Returns (facts, timestamps) dicts keyed by host of the hosts
+            whose cached facts are not expired
+        '''
+        try:
+            with open(self.cache_file) as fd:
+                cache = json.load(fd)
+        except (IOError, OSError, ValueError):
+            return (dict(), dict())
+        now = time.time()
+        timestamps = dict((host_ip, timestamp) for host_ip, timestamp in
+                          (cache.get('timestamps') or dict()).iteritems()
+                          if now - timestamp <= self.ttl)
+        hosts = dict((host_ip, facts) for host_ip, facts in
+                     (cache.get('hosts') or dict()).iteritems()
+                     if host_ip in timestamps)
+        return (_to_str(hosts), _to_str(timestamps))
+
+    def load_cache(self):
+        ''' Returns the cached facts of the hosts, leaving out the ones
+            which are expired, {} if the cache is absent
+        '''
+        if not self.ttl:
+            return dict()
+        return self._read_cache()[0]
+
+    def save_cache(self, hosts):
+        ''' Add the facts of hosts, just probed, to the cache '''
+        if not self.ttl:
+            return
+        try:
+            os.makedirs(self.cache_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                self.logger.debug('Unable to create %s: %s' % (
+                    self.cache_dir, e))
+                return
+        # Write and rename so that parallel runners never read a partial file
+        (cached, timestamps) = self._read_cache()
+        cached.update(hosts)
+        now = time.time()
+        timestamps.update((host_ip, now) for host_ip in hosts)
+        try:
+            (fd, tmp_file) = tempfile.mkstemp(dir=self.cache_dir)
+            with os.fdopen(fd, 'w') as fp:
+                json.dump({'timestamps': timestamps, 'hosts': cached}, fp)
+            os.rename(tmp_file, self.cache_file)
+        except (IOError, OSError) as e:
+            self.logger.debug('Unable to save discovery cache: %s' % e)
+
+    def clear_cache(self):
+        try:
+            os.remove(self.cache_file)
+        except OSError:
+            pass
+
+    @staticmethod
+    def get_cmds(nics=None, files=None):
+        ''' Returns list of (fact, cmd) to be run on a host '''
+        cmds = [('hostname', 'hostname'),
+                ('fqname', 'hostname -f'),
+                ('containers', CONTAINERS_CMD),
+                ('ips', IPS_CMD % ''),
+                ('uname', 'uname -a')]
+        for nic in nics or []:
+            cmds.append(('nic:%s' % nic, IPS_CMD % ('dev %s ' % nic)))
+        for path in files or []:
+            cmds.append(('file:%s' % path, 'test -e %s' % pipes.quote(path)))
+        return cmds
+
+    @staticmethod
+    def parse_facts(cmds, output):
+        ''' Parse the output of the discovery script into facts dict '''
+        facts = {'nic_ips': dict(), 'files': dict()}
+        results = parse_batch_output([cmd for _, cmd in cmds], output,
+                                     raw=True)
+        for (fact, _), result in zip(cmds, results):
+            value = (result['output'] or '').strip()
+            if fact.startswith('nic:'):
+                facts['nic_ips'][fact[4:]] = parse_ips(value)
+            elif fact.startswith('file:'):
+                facts['files'][fact[5:]] = result['exit_code'] == 0
+            elif fact == 'ips':
+                facts['ips'] = parse_ips(value)
+            else:
+                facts[fact] = value
+        return facts
+
+    def probe_host(self, host_ip, username, password, nics=None, files=None):
+        ''' Run the discovery script on host_ip and return its facts '''
+        cmds = self.get_cmds(nics, files)
+        script = build_batch_script([cmd for _, cmd in cmds])
+        (_, output) = exec_cmd_on_server(script, host_ip, username, password,
+                                         as_sudo=True,
+                                         timeout=DISCOVERY_TIMEOUT)
+        facts = self.parse_facts(cmds, output)
+        if not facts.get('hostname'):
+            raise RuntimeError('Discovery of %s returned no output' % host_ip)
+        return facts
+
+    def _probe(self, host_ip, hosts):
+        host = hosts[host_ip]
+        try:
+            return self.probe_host(host_ip, host['username'],
+                                   host['password'], host.get('nics'),
+                                   host.get('files'))
+        except Exception as e:
+            self.logger.debug('Discovery of %s failed: %s' % (host_ip, e))
+            return None
+
+    def discover(self, hosts, refresh=False):
+        '''
+            hosts: dict of host_ip: {'username', 'password', 'nics', 'files'}
+            Returns dict of host_ip: facts of the hosts discovered
+        '''
+        cached = dict() if refresh else self.load_cache()
+        facts = dict((host_ip, cached[host_ip]) for host_ip in hosts
+                     if host_ip in cached)
+        pending = [host_ip for host_ip in hosts if host_ip not in facts]
+        if not pending:
+            self.logger.debug('Using cached discovery of %s hosts' % (
+                len(facts)))
+            return facts
+        start = time.time()
+        results = map_in_parallel(self._probe, pending,
+                                  max_workers=self.workers, args=(hosts,))
+        probed = dict((host_ip, result) for host_ip, result in
+                      results.iteritems() if result)
+        self.logger.debug('Discovered %s of %s hosts in %.1f secs' % (
+            len(probed), len(pending), time.time() - start))
+        if probed:
+            self.save_cache(probed)
+        facts.update(probed)
+        return facts
+# end ClusterDiscovery
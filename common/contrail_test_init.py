@@ -26,6 +26,8 @@ from tempfile import NamedTemporaryFile
 import re
 from common import log_orig as contrail_logging
 from common.contrail_services import *
+from common.cluster_discovery import ClusterDiscovery
+from tcutils.threadpool_lib import map_in_parallel
 
 import subprocess
 from collections import namedtuple
@@ -48,6 +50,9 @@ DEFAULT_CI_SVC_IMAGE = os.getenv('DEFAULT_CI_SVC_IMAGE', 'cirros_in_net')
 CI_IMAGES = [DEFAULT_CI_IMAGE, DEFAULT_CI_SVC_IMAGE]
 OPENSHIFT_CONFIG_FILE = '/root/.kube/config'
 K8S_CONFIG_FILE = '/etc/kubernetes/admin.conf'
+# Number of hosts on which a container action is taken at a time,
+# before waiting for the services to stabilize
+CONTAINER_ACTION_BATCH_SIZE = int(os.getenv('CONTAINER_ACTION_BATCH_SIZE', '1'))
 
 # License: PSF License 2.0
 # Copyright (c) 2003-2005 by Peter Astrand <astrand@lysator.liu.se>
@@ -187,6 +192,8 @@ class TestInputs(object):
     def get_ips_of_host(self, host, nic=None):
         if self.host_data[host].get('ips') and not nic:
             return self.host_data[host]['ips']
+        if nic and nic in self.host_data[host].get('nic_ips', {}):
+            return self.host_data[host]['nic_ips'][nic]
         username = self.host_data[host]['username']
         password = self.host_data[host]['password']
         ips = get_ips_of_host(host, nic=nic,
@@ -288,7 +295,9 @@ class TestInputs(object):
         provider_configs = (self.config.get('provider_config') or {}).get('bms') or {}
         username = provider_configs.get('ssh_user') or 'root'
         password = provider_configs.get('ssh_pwd') or 'c0ntrail123'
-        for host, values  in (self.config.get('instances') or {}).iteritems():
+        instances = self.config.get('instances') or {}
+        discovered = self._discover_hosts(instances, username, password)
+        for host, values  in instances.iteritems():
             roles = values.get('roles') or {}
             host_data = dict()
             host_data['host_ip'] = values['ip']
@@ -298,14 +307,24 @@ class TestInputs(object):
             host_data['username'] = username
             host_data['password'] = password
             self.host_data[host_data['host_ip']] = host_data
-            hostname = self.run_cmd_on_server(host_data['host_ip'], 'hostname')
-            host_fqname = self.run_cmd_on_server(host_data['host_ip'], 'hostname -f')
+            facts = discovered.get(host_data['host_ip'])
+            if facts:
+                hostname = facts['hostname']
+                host_fqname = facts['fqname']
+                host_data['ips'] = facts['ips']
+                host_data['nic_ips'] = facts['nic_ips']
+                host_data['files'] = facts['files']
+                host_data['uname'] = facts['uname']
+            else:
+                hostname = self.run_cmd_on_server(host_data['host_ip'], 'hostname')
+                host_fqname = self.run_cmd_on_server(host_data['host_ip'], 'hostname -f')
             self.host_names.append(hostname)
             self.host_ips.append(host_data['host_ip'])
             host_data['name'] = hostname
             host_data['fqname'] = host_fqname
             self.host_data[host_fqname] = self.host_data[hostname] = host_data
-            self._check_containers(host_data)
+            self._check_containers(host_data,
+                output=facts['containers'] if facts else None)
             host_data_ip = host_control_ip = host_data['host_ip']
             control_data_ip = self.get_ctrl_data_ip(host_data['host_ip'])
             if control_data_ip:
@@ -374,12 +393,16 @@ class TestInputs(object):
                 self.kube_manager_ips.append(host_data['host_ip'])
                 self.kube_manager_control_ips.append(service_ip)
             if 'k8s_master' in roles:
-                with hide('everything'):
-                    with settings(
-                        host_string='%s@%s' % (username, host_data['host_ip']),
-                        password=password, warn_only=True, abort_on_prompts=False):
-                        if exists(self.kube_config_file):
-                            self.k8s_master_ip = host_data['host_ip'] #K8s Currently only supports 1 master
+                if self.kube_config_file in host_data.get('files', {}):
+                    kube_config_exists = host_data['files'][self.kube_config_file]
+                else:
+                    with hide('everything'):
+                        with settings(
+                            host_string='%s@%s' % (username, host_data['host_ip']),
+                            password=password, warn_only=True, abort_on_prompts=False):
+                            kube_config_exists = exists(self.kube_config_file)
+                if kube_config_exists:
+                    self.k8s_master_ip = host_data['host_ip'] #K8s Currently only supports 1 master
             if 'k8s_node' in roles:
                 self.k8s_slave_ips.append(host_data['host_ip'])
             if 'contrail_command' in roles:
@@ -389,6 +412,40 @@ class TestInputs(object):
             self.host_data[host_data_ip] = self.host_data[host_control_ip] = host_data
         # end for
 
+    def _discover_hosts(self, instances, username, password):
+        '''
+        Probe all the hosts in the topology concurrently, one remote
+        script per host, reusing the facts cached by an earlier run
+        on the same topology (see common.cluster_discovery)
+        Returns dict of host_ip: facts, hosts missing in it are
+        queried individually by parse_topo
+        '''
+        hosts = dict()
+        for values in instances.itervalues():
+            roles = values.get('roles') or {}
+            nics = list()
+            files = list()
+            if 'vrouter' in roles:
+                nics.append('vhost0')
+            if 'openstack' in roles or 'openstack_control' in roles:
+                nic = (roles.get('openstack') or {}).get('network_interface') \
+                      or self.orchestrator_configs.get('network_interface')
+                if nic:
+                    nics.append(nic)
+            if 'k8s_master' in roles:
+                files.append(self.kube_config_file)
+            hosts[values['ip']] = {'username': username,
+                                   'password': password,
+                                   'nics': nics,
+                                   'files': files}
+        try:
+            return ClusterDiscovery(self.input_file,
+                                    logger=self.logger).discover(hosts)
+        except Exception as e:
+            self.logger.debug('Cluster discovery failed: %s' % e)
+            return dict()
+    # end _discover_hosts
+
     def get_roles(self, host):
         roles = list()
         host_ip = self.get_host_ip(host)
@@ -639,7 +696,8 @@ class TestInputs(object):
             return self.os_type[host_ip]
         username = self.host_data[host_ip]['username']
         password = self.host_data[host_ip]['password']
-        output = self.run_cmd_on_server(host_ip,'uname -a', username, password) 
+        output = self.host_data[host_ip].get('uname') or \
+            self.run_cmd_on_server(host_ip,'uname -a', username, password)
         if 'el6' in output:
             self.os_type[host_ip] = 'centos_el6'
         elif 'fc17' in output:
@@ -673,16 +731,18 @@ class TestInputs(object):
             return True
         return False
 
-    def _check_containers(self, host_dict):
+    def _check_containers(self, host_dict, output=None):
         '''
         Find out which components have containers and set
         corresponding attributes in host_dict to True if present
+        output : output of docker ps, if already discovered
         '''
         host_dict['containers'] = {}
         if  host_dict.get('type', None) == 'esxi':
             return
-        cmd = 'docker ps 2>/dev/null | grep -v "/pause\|/usr/bin/pod" | awk \'{print $NF}\''
-        output = self.run_cmd_on_server(host_dict['host_ip'], cmd, as_sudo=True)
+        if output is None:
+            cmd = 'docker ps 2>/dev/null | grep -v "/pause\|/usr/bin/pod" | awk \'{print $NF}\''
+            output = self.run_cmd_on_server(host_dict['host_ip'], cmd, as_sudo=True)
         # If not a docker cluster, return
         if not output:
             return
@@ -1195,44 +1255,108 @@ class ContrailTestInit(object):
             self.logger.info('Running %s on %s' %(up_cmd, host))
             self.run_cmd_on_server(host, up_cmd, pty=True, as_sudo=True)
 
-    def _action_on_container(self, hosts, event, container, services=None, verify_service=True, timeout=60):
+    def _run_container_action(self, host, event, container):
+        '''
+        Run docker event on the container of host, over a dedicated ssh
+        session so that it can be called from multiple threads
+        Returns (True if the docker command succeeded, time taken in secs)
+        '''
+        start = time.time()
+        username = self.host_data[host]['username']
+        password = self.host_data[host]['password']
+        cntr = self.get_container_name(host, container)
+        if not cntr:
+            self.logger.info('Unable to find %s container on %s'%(container, host))
+            return (True, 0)
+        timeout = '' if event == 'start' else '-t 60'
+        issue_cmd = 'docker %s %s %s' % (event, cntr, timeout)
+        self.logger.info('Running %s on %s' %
+                         (issue_cmd, self.host_data[host]['name']))
+        (status, output) = exec_cmd_on_server(issue_cmd, host, username,
+                                              password, as_sudo=True)
+        if status:
+            self.logger.error('%s on %s failed with exit status %s: %s' % (
+                issue_cmd, self.host_data[host]['name'], status, output))
+        return (not status, time.time() - start)
+    # end _run_container_action
+
+    def _verify_container_action(self, hosts, event, container):
+        if 'stop' not in event:
+            return self.verify_service_state(hosts, container)[0]
+        # wait_till_service_down returns once any service is down,
+        # hence check each of the hosts
+        results = map_in_parallel(
+            lambda host: self.verify_service_down(host, container)[0], hosts)
+        return all(results.values())
+
+    def _action_on_container(self, hosts, event, container, services=None,
+                             verify_service=True, timeout=60, batch_size=None):
+        '''
+        Take the action on batch_size hosts at a time(rolling), followed by
+        one wait for the services of the whole batch to be stable
+        batch_size : defaults to CONTAINER_ACTION_BATCH_SIZE
+        Returns dict of host: {'action': secs, 'verify': secs,
+                               'failed': containers whose action failed}
+        With verify_service, fails as soon as the action fails on a host
+        '''
         containers = set()
         for service in services or []:
             cntr = self.get_container_for_service(service)
             if cntr:
                 containers.add(cntr)
         containers.add(container)
-        for host in hosts or self.host_ips:
-            username = self.host_data[host]['username']
-            password = self.host_data[host]['password']
+        hosts = [hosts] if isinstance(hosts, str) else list(hosts or self.host_ips)
+        batch_size = batch_size or CONTAINER_ACTION_BATCH_SIZE
+        timings = dict((host, {'action': 0, 'verify': 0, 'failed': []})
+                       for host in hosts)
+        for index in range(0, len(hosts), batch_size):
+            batch = hosts[index:index + batch_size]
             for container in containers:
-                cntr = self.get_container_name(host, container)
-                if not cntr:
-                    self.logger.info('Unable to find %s container on %s'%(container, host))
-                    continue
-                timeout = '' if event == 'start' else '-t 60'
-                issue_cmd = 'docker %s %s %s' % (event, cntr, timeout)
-                self.logger.info('Running %s on %s' %
-                                 (issue_cmd, self.host_data[host]['name']))
-                self.run_cmd_on_server(host, issue_cmd, username, password, pty=True, as_sudo=True)
+                if len(batch) == 1:
+                    results = {batch[0]: self._run_container_action(
+                        batch[0], event, container)}
+                else:
+                    results = map_in_parallel(self._run_container_action,
+                        batch, args=(event, container))
+                for host, (status, action_time) in results.iteritems():
+                    timings[host]['action'] += action_time
+                    if not status:
+                        timings[host]['failed'].append(container)
                 if verify_service:
-                    if 'stop' in event:
-                        service_status = self.verify_service_down(host, container)[0]
-                    else:
-                        service_status = self.verify_service_state(host, container)[0]
-                    assert service_status
+                    failed = [host for host in batch
+                              if container in timings[host]['failed']]
+                    assert not failed, '%s of %s failed on %s' % (
+                        event, container, failed)
+                    start = time.time()
+                    service_status = self._verify_container_action(
+                        batch, event, container)
+                    for host in batch:
+                        timings[host]['verify'] += time.time() - start
+                    assert service_status, '%s of %s failed on %s' % (
+                        event, container, batch)
+        for host in hosts:
+            self.logger.info('%s of %s on %s took %.1fs, services stable '
+                'after %.1fs' % (event, list(containers), host,
+                timings[host]['action'], timings[host]['verify']))
+        return timings
     #end _action_on_container
 
-    def restart_container(self, host_ips=None, container=None, verify_service=True):
-        self._action_on_container(host_ips, 'restart', container, verify_service=verify_service)
+    def restart_container(self, host_ips=None, container=None, verify_service=True,
+                          batch_size=None):
+        return self._action_on_container(host_ips, 'restart', container,
+            verify_service=verify_service, batch_size=batch_size)
     # end restart_service
 
-    def stop_container(self, host_ips=None, container=None, verify_service=True):
-        self._action_on_container(host_ips, 'stop', container, verify_service=verify_service)
+    def stop_container(self, host_ips=None, container=None, verify_service=True,
+                       batch_size=None):
+        return self._action_on_container(host_ips, 'stop', container,
+            verify_service=verify_service, batch_size=batch_size)
     # end stop_service
 
-    def start_container(self, host_ips=None, container=None, verify_service=True):
-        self._action_on_container(host_ips, 'start', container, verify_service=verify_service)
+    def start_container(self, host_ips=None, container=None, verify_service=True,
+                        batch_size=None):
+        return self._action_on_container(host_ips, 'start', container,
+            verify_service=verify_service, batch_size=batch_size)
     # end start_service
 
     def get_contrail_services(self, role=None, service_name=None):
@@ -1256,11 +1380,12 @@ class ContrailTestInit(object):
         return [service_name] if service_name else []
 
     def _action_on_service(self, service_name, event, host_ips=None, container=None,
-            verify_service=True):
+            verify_service=True, batch_size=None):
         services = self.get_contrail_services(service_name=service_name)
         if self.is_microservices_env and container:
             return self._action_on_container(host_ips, event, container, services=services,
-                                             verify_service=verify_service)
+                                             verify_service=verify_service,
+                                             batch_size=batch_size)
         _container = container
         for service in services:
             for host in host_ips or self.host_ips:
@@ -1278,19 +1403,21 @@ class ContrailTestInit(object):
     #end _action_on_service
 
     def restart_service(self, service_name, host_ips=None,
-                        container=None, verify_service=True):
-        self._action_on_service(service_name, 'restart', host_ips, container,
-            verify_service=verify_service)
+                        container=None, verify_service=True, batch_size=None):
+        return self._action_on_service(service_name, 'restart', host_ips,
+            container, verify_service=verify_service, batch_size=batch_size)
     # end restart_service
 
     def stop_service(self, service_name, host_ips=None,
-                     container=None):
-        self._action_on_service(service_name, 'stop', host_ips, container)
+                     container=None, batch_size=None):
+        return self._action_on_service(service_name, 'stop', host_ips,
+            container, batch_size=batch_size)
     # end stop_service
 
     def start_service(self, service_name, host_ips=None,
-                      container=None):
-        self._action_on_service(service_name, 'start', host_ips, container)
+                      container=None, batch_size=None):
+        return self._action_on_service(service_name, 'start', host_ips,
+            container, batch_size=batch_size)
     # end start_service
 
     def run_provision_control(
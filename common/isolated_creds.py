@@ -11,7 +11,8 @@ from tcutils.util import get_random_name
 class IsolatedCreds(fixtures.Fixture):
 
     def __init__(self, inputs, project_name=None, input_file=None, logger=None,
-                 username=None, password=None, domain_name=None):
+                 username=None, password=None, domain_name=None,
+                 random_name=True):
 
         self.username = None
         self.password = None
@@ -21,8 +22,10 @@ class IsolatedCreds(fixtures.Fixture):
         else :
             self.domain_name = domain_name
 
-        if inputs.tenant_isolation:
+        if inputs.tenant_isolation and random_name:
             self.project_name = get_random_name(project_name)
+        elif inputs.tenant_isolation:
+            self.project_name = project_name
         else :
             self.project_name = project_name or inputs.stack_tenant
         if inputs.tenant_isolation and inputs.user_isolation:
@@ -0,0 +1,159 @@
+''' Canonical hashable form of the ACEs of policy rules.
+
+Policy verification compares the rules expected, translated from the user
+rules, with the ACEs of the agent or control node. The rules are dicts with
+dict and list values, so comparing them meant scanning the rule list for
+each rule. ace_key() turns a rule into a hashable tuple, so that duplicates,
+matches and differences are found with sets and dicts in linear time.
+
+    missing, extra and reordered = diff_rules(expected_rules, system_rules)
+'''
+from collections import namedtuple, defaultdict, deque
+
+# 5-tuple of a rule
+FIVE_TUPLE_KEYS = ('proto_l', 'src', 'dst', 'src_port_l', 'dst_port_l')
+PROTO_NAMES = {'1': 'icmp', '6': 'tcp', '17': 'udp'}
+# Ports of these protocols are not compared
+ICMP_PROTOS = ('icmp', '58')
+
+# Canonical ACE, ports are None for icmp and action is the simple action
+Ace = namedtuple('Ace', ['proto', 'src', 'dst', 'src_ports', 'dst_ports',
+                         'action', 'others'])
+
+
+def freeze(value):
+    ''' Returns hashable form of value, of its dicts and lists as well '''
+    if isinstance(value, dict):
+        return tuple(sorted((k, freeze(v)) for k, v in value.iteritems()))
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def _proto_name(proto):
+    if isinstance(proto, dict):
+        return (PROTO_NAMES.get(proto.get('min'), proto.get('min')),
+                PROTO_NAMES.get(proto.get('max'), proto.get('max')))
+    proto = PROTO_NAMES.get(proto, proto)
+    return (proto, proto)
+
+
+def _simple_action(action_l):
+    ''' Simple action of the user, list of dicts, or system action list '''
+    if not action_l:
+        return None
+    action = action_l[0]
+    if isinstance(action, dict):
+        return action.get('simple_action')
+    return action
+
+
+def make_ace(rule):
+    ''' Returns the canonical Ace of rule, protocol numbers are replaced by
+        names, ports of icmp and ace_id are ignored
+    '''
+    proto = _proto_name(rule.get('proto_l'))
+    is_icmp = proto[0] == proto[1] and proto[0] in ICMP_PROTOS
+    others = freeze(dict((k, v) for k, v in rule.iteritems()
+                         if k not in FIVE_TUPLE_KEYS and
+                         k not in ('ace_id', 'action_l')))
+    return Ace(proto, rule.get('src'), rule.get('dst'),
+               None if is_icmp else freeze(rule.get('src_port_l')),
+               None if is_icmp else freeze(rule.get('dst_port_l')),
+               _simple_action(rule.get('action_l')), others)
+
+
+def ace_key(rule, keys=None):
+    ''' Returns hashable form of the values of keys of rule, by default of
+        all the keys but ace_id
+    '''
+    if keys is None:
+        keys = sorted(k for k in rule if k != 'ace_id')
+    return tuple((k, freeze(rule.get(k))) for k in keys)
+
+
+def dedup_rules(rules, keys=None):
+    ''' Returns rules without the duplicates, the first one is retained '''
+    seen = set()
+    unique = list()
+    for rule in rules:
+        key = ace_key(rule, keys)
+        if key not in seen:
+            seen.add(key)
+            unique.append(rule)
+    return unique
+
+
+def find_rule(rule, rules, keys=FIVE_TUPLE_KEYS):
+    ''' Returns index of the first of rules matching rule, None if none '''
+    key = ace_key(rule, keys)
+    for idx, other in enumerate(rules):
+        if ace_key(other, keys) == key:
+            return idx
+    return None
+
+
+class RuleIndex(object):
+
+    ''' Index of rules to check for many rules if they are present
+        Rules added are looked up by the first one added with the same keys
+    '''
+
+    def __init__(self, rules=None, keys=FIVE_TUPLE_KEYS):
+        self.keys = keys
+        # key: index of the first rule with it
+        self.index = dict()
+        self.count = 0
+        for rule in rules or []:
+            self.add(rule)
+
+    def add(self, rule):
+        self.index.setdefault(ace_key(rule, self.keys), self.count)
+        self.count += 1
+
+    def find(self, rule):
+        ''' Returns index of the first rule added matching rule, None if
+            none, same as find_rule
+        '''
+        return self.index.get(ace_key(rule, self.keys))
+
+    def __contains__(self, rule):
+        return ace_key(rule, self.keys) in self.index
+# end RuleIndex
+
+
+def diff_rules(expected, actual):
+    '''
+        Returns (missing, extra, reordered)
+        missing: list of expected rules not in actual
+        extra: list of actual rules not expected
+        reordered: list of (rule, expected index, actual index) of the rules
+                   in both, whose order relative to the others differ
+        Rules are compared by their canonical Ace
+    '''
+    positions = defaultdict(deque)
+    for idx, rule in enumerate(expected):
+        positions[make_ace(rule)].append(idx)
+    # expected index: actual index
+    matched = dict()
+    extra = list()
+    for idx, rule in enumerate(actual):
+        indices = positions.get(make_ace(rule))
+        if indices:
+            matched[indices.popleft()] = idx
+        else:
+            extra.append(rule)
+    missing = [rule for idx, rule in enumerate(expected) if idx not in matched]
+    expected_rank = dict()
+    for idx in xrange(len(expected)):
+        if idx in matched:
+            expected_rank[idx] = len(expected_rank)
+    actual_rank = dict()
+    by_actual = dict((act, exp) for exp, act in matched.iteritems())
+    for idx in xrange(len(actual)):
+        if idx in by_actual:
+            actual_rank[by_actual[idx]] = len(actual_rank)
+    reordered = [(expected[idx], idx, matched[idx])
+                 for idx in xrange(len(expected))
+                 if idx in matched and expected_rank[idx] != actual_rank[idx]]
+    return (missing, extra, reordered)
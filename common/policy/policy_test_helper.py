@@ -8,6 +8,7 @@ from nova_test import *
 from policy_test import *
 from vn_test import *
 import string
+from common.policy.ace import find_rule, RuleIndex
 
 
 def comp_rules_from_policy_to_system(self):
@@ -468,13 +469,11 @@ def tx_quntum_def_aces_to_system(test_vn, user_rules_tx, uni_rule):
 
     # Skip adding rules if they already exist...
     # print json.dumps(system_added_rules, sort_keys=True)
-    if not policy_test_utils.check_rule_in_rules(
-            test_vn_allow_all_rule,
-            user_rules_tx):
-        user_rules_tx.append(test_vn_allow_all_rule)
-    for rule in system_added_rules:
-        if not policy_test_utils.check_rule_in_rules(rule, user_rules_tx):
+    rule_index = RuleIndex(user_rules_tx)
+    for rule in [test_vn_allow_all_rule] + system_added_rules:
+        if rule not in rule_index:
             user_rules_tx.append(rule)
+            rule_index.add(rule)
 
     # step 3: check & add permit-all rule for same  VN  but not for 'any'
     # network
@@ -519,10 +518,10 @@ def tx_quntum_def_aces_to_system(test_vn, user_rules_tx, uni_rule):
             'max': 'icmp', 'min': 'icmp'}, 'src': 'any', 'dst': 'any', 'src_port_l': {
             'max': '65535', 'min': '0'}, 'dst_port_l': {
                 'max': '65535', 'min': '0'}}
-    icmp_match, index_icmp = check_5tuple_in_rules(
-        icmp_any_rule, user_rules_tx)
-    tcp_match, index_tcp = check_5tuple_in_rules(tcp_any_rule, user_rules_tx)
-    udp_match, index_udp = check_5tuple_in_rules(udp_any_rule, user_rules_tx)
+    rule_index = RuleIndex(user_rules_tx)
+    icmp_match, index_icmp = check_5tuple_in_rules(icmp_any_rule, rule_index)
+    tcp_match, index_tcp = check_5tuple_in_rules(tcp_any_rule, rule_index)
+    udp_match, index_udp = check_5tuple_in_rules(udp_any_rule, rule_index)
     if icmp_match:
         for rule in user_rules_tx[index_icmp + 1:len(user_rules_tx)]:
             if rule['proto_l'] == {'max': 'icmp', 'min': 'icmp'}:
@@ -547,8 +546,8 @@ def tx_quntum_def_aces_to_system(test_vn, user_rules_tx, uni_rule):
     else:
         pass
     # step 4: add ace_id, type, src to all rules
-    for rule in user_rules_tx:
-        rule['ace_id'] = str(user_rules_tx.index(rule) + 1)
+    for idx, rule in enumerate(user_rules_tx):
+        rule['ace_id'] = str(idx + 1)
         rule['rule_type'] = 'Terminal'  # currently checking policy aces only
         # if rule['src'] != 'any' :
         #    m = re.match(r"(\S+):(\S+):(\S+)", rule['src'])
@@ -610,19 +609,12 @@ def get_any_rule_if_src_dst_same_ntw_exist(
 
 
 def check_5tuple_in_rules(rule, rules):
-    '''check if 5-tuple of given rule exists in given rule-set..Return True if rule exists; else False'''
-    #print ("check rule %s in rules" %(json.dumps(rule, sort_keys=True)))
-    match_keys = ['proto_l', 'src', 'dst', 'src_port_l', 'dst_port_l']
-    for r in rules:
-        match = True
-        for k in match_keys:
-            if r[k] != rule[k]:
-                # print ("current rule not matching due to key %s, move on.." %k)
-                match = False
-                break
-        if match:
-            break
-    return (match, rules.index(r))
+    '''check if 5-tuple of given rule exists in given rule-set, a list or RuleIndex..Return True if rule exists; else False'''
+    if isinstance(rules, RuleIndex):
+        idx = rules.find(rule)
+    else:
+        idx = find_rule(rule, rules)
+    return (idx is not None, idx)
 # end check_5tuple_in_rules
 
 def _create_n_policy_n_rules(self, number_of_policy, valid_rules, number_of_dummy_rules, option='quantum', verify=True):
@@ -10,14 +10,15 @@ import re
 
 
 from common import log_orig as contrail_logging
+from common.policy.ace import dedup_rules, find_rule, diff_rules
 
 def update_rule_ace_id(rules_list):
     ''' After combining multiple policies, renumber ace_id of the rules by
     index of rules in the combined list
     Return updated rules_list.
     '''
-    for rule in rules_list:
-        rule['ace_id'] = str(rules_list.index(rule) + 1)
+    for idx, rule in enumerate(rules_list):
+        rule['ace_id'] = str(idx + 1)
     return rules_list
 
 
@@ -29,20 +30,7 @@ def remove_dup_rules(rules_list):
     TODO: handle duplicate rules within a policy and duplicate rules
     across policies, in case of both policies attached to a VN.
     '''
-    new_list = []
-    while len(rules_list) > 0:
-        match = None
-        ref_rule = rules_list.pop(0)
-        new_list.append(ref_rule)
-        match = compare_dict(ref_rule, rules_list)
-        if match:
-            for i in reversed(match):
-                rules_list.pop(i)
-            # end for
-        # end if
-    # end for
-    # print "length of list after removing dup is ", len(new_list)
-    return new_list
+    return dedup_rules(rules_list)
 
 
 def compare_dict(ref_dict, test_dict_l):
@@ -76,17 +64,7 @@ def move_matching_rule_to_bottom(rules_list, rule={}, vn=None):
 
 def check_rule_in_rules(rule, rules):
     '''check if 5-tuple of given rule exists in given rule-set..Return True if rule exists; else False'''
-    match_keys = ['src', 'proto_l', 'dst', 'src_port_l', 'dst_port_l']
-    for r in rules:
-        match = True
-        for k in match_keys:
-            if r[k] != rule[k]:
-                # print ("current rule not matching due to key %s, move on.." %k)
-                match = False
-                break
-        if match == True:
-            break
-    return match
+    return find_rule(rule, rules) is not None
 
 
 def check_if_rule_present(rules_list, rule={}, vn=None):
@@ -134,8 +112,9 @@ def compare_rules_list(user_rules_tx, system_rules, exp_name='user_rules_tx', ac
             return ret
     # For non-zero rule policies, continue checking num rules
     if len(system_rules) != len(user_rules_tx):
-        msg = "No of rules in system: %s is not same as expected: %s " % (
-            len(system_rules), len(user_rules_tx))
+        msg = "No of rules in system: %s is not same as expected: %s, %s" % (
+            len(system_rules), len(user_rules_tx),
+            describe_rules_diff(user_rules_tx, system_rules))
         logger.debug("Expected: ")
         for r in user_rules_tx:
             logger.debug(json.dumps(r, sort_keys=True))
@@ -198,6 +177,7 @@ def compare_rules_list(user_rules_tx, system_rules, exp_name='user_rules_tx', ac
                             (k, user_rules_tx[i][k], system_rules[i][k]))
     if msg != []:
         result = False
+        msg.append(describe_rules_diff(user_rules_tx, system_rules))
         logger.debug( "-" * 40)
         logger.debug("Compare failed..!, msg is: ", msg)
 
@@ -209,6 +189,14 @@ def compare_rules_list(user_rules_tx, system_rules, exp_name='user_rules_tx', ac
 # end compare_rules_list
 
 
+def describe_rules_diff(expected_rules, system_rules):
+    ''' Returns the missing, extra and reordered rules as a string '''
+    (missing, extra, reordered) = diff_rules(expected_rules, system_rules)
+    return "Missing rules: %s, Extra rules: %s, Reordered rules " \
+        "[rule, expected index, actual index]: %s" % (
+            missing, extra, reordered)
+
+
 def compare_args(key, a, b, exp_name='expected', act_name='actual',
                  logger=None):
     ''' For a given key, compare values a, b got from 2 different databases.
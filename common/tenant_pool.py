@@ -0,0 +1,407 @@
+'''
+Pool of pre-provisioned isolated tenants, leased to test classes
+
+With tenant isolation each test class creates a random project and user,
+and a ContrailTestInit and ContrailConnections for them, and deletes them
+after. TenantPool instead keeps TENANT_POOL_SIZE tenants, named
+<TENANT_POOL_PREFIX>-<index>, which are provisioned once and not deleted.
+A test class leases a free tenant and on release the VMs and contrail
+objects left in it are scrubbed with tools/tenant_cleaner.py, after which
+the tenant is free to be leased again. The objects of the fresh project,
+eg. its default security group, and the project itself are not deleted,
+their properties and refs, eg. the rules of the default security group
+and the quotas, are snapshotted when provisioned and restored on scrub.
+A tenant is deleted, and created afresh on a later lease, only if it could
+not be scrubbed.
+
+Leases are held with an flock on a file per tenant in TENANT_POOL_DIR, so
+the processes of testr --parallel share the pool and the lease of a
+process which died is freed with it. The tenant is then scrubbed on the
+next lease. Each process keeps the creds, inputs and connections of the
+tenants it leased, so a tenant leased again needs none of them set up.
+
+    pool = get_tenant_pool(inputs, input_file, logger)
+    lease = pool.lease() if pool else None
+    ... lease.connections ...
+    pool.release(lease)
+'''
+import os
+import json
+import errno
+import fcntl
+import tempfile
+import threading
+
+from common import log_orig as contrail_logging
+from common.isolated_creds import IsolatedCreds, AdminIsolatedCreds
+from tcutils.threadpool_lib import map_in_parallel
+from tools.tenant_cleaner import Tenant
+
+# 0 disables the pool
+TENANT_POOL_SIZE = int(os.getenv('TENANT_POOL_SIZE') or 0)
+TENANT_POOL_PREFIX = os.getenv('TENANT_POOL_PREFIX') or 'ctest-pool'
+TENANT_POOL_DIR = os.getenv('TENANT_POOL_DIR') or os.path.join(
+    tempfile.gettempdir(), 'contrail-test-tenant-pool')
+# Fields of contrail objects which are not snapshotted nor restored
+READ_ONLY_FIELDS = ('uuid', 'fq_name', 'href', 'name', 'parent_type',
+                    'parent_uuid', 'parent_href', 'id_perms', 'perms2')
+
+
+def _restorable(fields):
+    ''' Returns the properties and refs of fields, of a contrail object,
+        without its back refs and children
+    '''
+    def is_children(key, value):
+        return isinstance(value, list) and not key.endswith('_refs') and \
+            bool(value) and all(isinstance(child, dict) and 'to' in child and
+                                'href' in child for child in value)
+    return dict((key, value) for key, value in fields.iteritems()
+                if key not in READ_ONLY_FIELDS and
+                not key.endswith('_back_refs') and
+                not is_children(key, value))
+
+
+class TenantLease(object):
+
+    '''
+        A tenant of the pool with the creds and connections of its user
+        and of the admin user in it, set up by TenantPool
+        baseline: urls of the contrail objects of the fresh project, which
+                  are not deleted on scrub
+        snapshot: dict of url: (type, properties and refs) of the project
+                  and of the baseline objects in it, restored on scrub
+        saved_inputs: attributes of inputs and admin_inputs when leased,
+                      restored on release as test classes change them
+    '''
+
+    def __init__(self, index, project_name):
+        self.index = index
+        self.project_name = project_name
+        self.lock_file = None
+        self.isolated_creds = None
+        self.admin_isolated_creds = None
+        self.project = None
+        self.inputs = None
+        self.connections = None
+        self.admin_inputs = None
+        self.admin_connections = None
+        self.baseline = None
+        self.snapshot = None
+        self.saved_inputs = None
+
+    @property
+    def warm(self):
+        return self.connections is not None
+
+    def __repr__(self):
+        return 'TenantLease(%s)' % self.project_name
+# end TenantLease
+
+
+class TenantPool(object):
+
+    def __init__(self, inputs, input_file=None, logger=None,
+                 size=TENANT_POOL_SIZE, prefix=TENANT_POOL_PREFIX,
+                 pool_dir=TENANT_POOL_DIR):
+        self.inputs = inputs
+        self.input_file = input_file
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        self.pool_dir = pool_dir
+        if 'v3' in self.inputs.auth_url:
+            self.domain_name = self.inputs.stack_domain
+        else:
+            self.domain_name = None
+        self.tenants = [TenantLease(index, '%s-%s' % (prefix, index))
+                        for index in range(size)]
+        self.lock = threading.Lock()
+        try:
+            os.makedirs(self.pool_dir)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+    def _path(self, tenant, suffix):
+        return os.path.join(self.pool_dir, tenant.project_name + suffix)
+
+    def _try_lock(self, tenant):
+        lock_file = open(self._path(tenant, '.lock'), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except IOError:
+            lock_file.close()
+            return False
+        tenant.lock_file = lock_file
+        return True
+
+    def _unlock(self, tenant):
+        fcntl.flock(tenant.lock_file, fcntl.LOCK_UN)
+        tenant.lock_file.close()
+        tenant.lock_file = None
+
+    def _get_state(self, tenant):
+        ''' Returns {'baseline': [urls], 'snapshot': {url: [type, fields]},
+            'clean': bool} of tenant, None if it is yet to be provisioned
+        '''
+        try:
+            with open(self._path(tenant, '.json')) as state_file:
+                return json.load(state_file)
+        except (IOError, ValueError):
+            return None
+
+    def _set_state(self, tenant, clean):
+        path = self._path(tenant, '.json')
+        with open(path + '.tmp', 'w') as state_file:
+            json.dump({'baseline': tenant.baseline,
+                       'snapshot': tenant.snapshot, 'clean': clean},
+                      state_file)
+        os.rename(path + '.tmp', path)
+
+    def _clear_state(self, tenant):
+        try:
+            os.remove(self._path(tenant, '.json'))
+        except OSError:
+            pass
+
+    def _acquire(self):
+        ''' Returns a free tenant locked, preferring the ones this process
+            already has the connections of, None if none is free
+        '''
+        with self.lock:
+            for tenant in sorted(self.tenants, key=lambda t: not t.warm):
+                if tenant.lock_file is None and self._try_lock(tenant):
+                    return tenant
+        return None
+
+    def _get_cleaner(self, tenant):
+        return Tenant(token=tenant.admin_connections.auth.get_token(),
+                      server_ip=self.inputs.cfgm_ip,
+                      port=self.inputs.api_server_port,
+                      username=self.inputs.admin_username,
+                      password=self.inputs.admin_password,
+                      auth_url=self.inputs.auth_url,
+                      auth_tenant=self.inputs.admin_tenant)
+
+    def _setup(self, tenant):
+        ''' Create the project and user of tenant, if not present, and
+            their inputs and connections, same as BaseTestCase_v1
+        '''
+        isolated_creds = IsolatedCreds(self.inputs,
+                                       domain_name=self.domain_name,
+                                       project_name=tenant.project_name,
+                                       input_file=self.input_file,
+                                       logger=self.logger,
+                                       random_name=False)
+        admin_isolated_creds = AdminIsolatedCreds(
+            self.inputs,
+            domain_name=self.inputs.admin_domain,
+            input_file=self.input_file,
+            logger=self.logger)
+        admin_isolated_creds.setUp()
+        project = admin_isolated_creds.create_tenant(
+            isolated_creds.project_name, isolated_creds.domain_name)
+        if not project:
+            raise Exception('Unable to create project %s of tenant pool' % (
+                tenant.project_name))
+        # Project is not deleted on cleanUp of the fixture
+        project.already_present = True
+        tenant.admin_inputs = admin_isolated_creds.get_inputs(project)
+        admin_isolated_creds.create_and_attach_user_to_tenant(
+            project, isolated_creds.username, isolated_creds.password)
+        tenant.admin_connections = admin_isolated_creds.get_connections(
+            tenant.admin_inputs)
+        isolated_creds.setUp()
+        tenant.inputs = isolated_creds.get_inputs(project)
+        tenant.isolated_creds = isolated_creds
+        tenant.admin_isolated_creds = admin_isolated_creds
+        tenant.project = project
+        tenant.connections = isolated_creds.get_connections(tenant.inputs)
+
+    def _teardown(self, tenant):
+        ''' Delete the project and user of tenant, same as BaseTestCase_v1 '''
+        self._clear_state(tenant)
+        try:
+            tenant.project.already_present = False
+            tenant.admin_isolated_creds.delete_tenant(tenant.project)
+            tenant.admin_isolated_creds.delete_user(
+                tenant.isolated_creds.username)
+        finally:
+            tenant.connections = None
+
+    def _snapshot(self, tenant, cleaner):
+        ''' Returns snapshot of the project of tenant and of the baseline
+            objects in it
+        '''
+        project_url = cleaner.get_project_url(tenant.project_name)
+        (project_type, project) = cleaner.get_contrail_object(project_url)
+        snapshot = {project_url: (project_type, _restorable(project))}
+        for url in tenant.baseline:
+            obj = cleaner.get_contrail_object(url)
+            # Objects of other projects referred to are left alone
+            if obj and obj[1].get('parent_uuid') == project['uuid']:
+                snapshot[url] = (obj[0], _restorable(obj[1]))
+        return snapshot
+
+    def _restore(self, tenant, cleaner):
+        ''' Restore the project of tenant and the baseline objects in it to
+            their snapshot. Returns True if all of them are restored
+        '''
+        result = True
+        for url, (obj_type, fields) in tenant.snapshot.iteritems():
+            obj = cleaner.get_contrail_object(url)
+            if not obj:
+                self.logger.warn('%s of tenant %s is deleted' % (
+                    url, tenant.project_name))
+                result = False
+                continue
+            current = _restorable(obj[1])
+            if current == fields:
+                continue
+            changed = dict((key, value) for key, value in fields.iteritems()
+                           if current.get(key) != value)
+            # Fields set after the snapshot are cleared
+            for key in set(current) - set(fields):
+                changed[key] = [] if key.endswith('_refs') else None
+            self.logger.debug('Restoring %s of %s of tenant %s' % (
+                sorted(changed), url, tenant.project_name))
+            if not cleaner.update_contrail_object(url, obj_type, changed):
+                result = False
+        return result
+
+    def scrub(self, tenant):
+        ''' Delete the VMs and the contrail objects, other than the ones of
+            the fresh project, left in tenant and restore the ones of the
+            fresh project to their snapshot. Returns True if tenant is as
+            fresh
+        '''
+        try:
+            cleaner = self._get_cleaner(tenant)
+            # Refs added to objects of other projects, eg. a shared
+            # floating ip pool, are cleared first, only the objects of the
+            # project are deleted
+            restored = self._restore(tenant, cleaner)
+            (result, failed) = cleaner.cleanup([tenant.project_name],
+                                               keep=tenant.baseline,
+                                               owned_only=True)
+            return restored and result
+        except Exception as e:
+            self.logger.warn('Scrub of tenant %s failed: %s' % (
+                tenant.project_name, e))
+            return False
+
+    def _prepare(self, tenant):
+        ''' Set up tenant, locked, and scrub it if its last lease was not
+            released. Returns True if tenant is ready to be used
+        '''
+        state = self._get_state(tenant)
+        if not tenant.warm:
+            self._setup(tenant)
+        if state is None:
+            cleaner = self._get_cleaner(tenant)
+            tenant.baseline = cleaner.get_contrail_objects(
+                tenant.project_name) or []
+            tenant.snapshot = self._snapshot(tenant, cleaner)
+        else:
+            tenant.baseline = state['baseline']
+            tenant.snapshot = state.get('snapshot')
+            # Tenants provisioned without a snapshot can not be restored
+            if tenant.snapshot is None or (not state['clean'] and
+                                           not self.scrub(tenant)):
+                self._teardown(tenant)
+                return False
+        return True
+
+    def lease(self):
+        ''' Returns TenantLease of a free tenant set up and clean, None if
+            none is free
+        '''
+        while True:
+            tenant = self._acquire()
+            if not tenant:
+                self.logger.debug('No free tenant in the tenant pool')
+                return None
+            try:
+                if self._prepare(tenant):
+                    break
+            except Exception:
+                self.logger.exception('Unable to set up tenant %s' % (
+                    tenant.project_name))
+                tenant.connections = None
+                self._unlock(tenant)
+                return None
+            self._unlock(tenant)
+        self._set_state(tenant, clean=False)
+        tenant.saved_inputs = [(inputs, dict(inputs.__dict__))
+                               for inputs in (tenant.inputs,
+                                              tenant.admin_inputs)]
+        self.logger.info('Leased tenant %s' % tenant.project_name)
+        return tenant
+
+    def release(self, tenant):
+        ''' Scrub tenant and free it, the tenant is deleted if its scrub
+            fails. Attributes of its inputs set by the lease holder, eg. by
+            set_af, are reverted
+        '''
+        for inputs, attrs in tenant.saved_inputs or []:
+            inputs.__dict__.clear()
+            inputs.__dict__.update(attrs)
+        tenant.saved_inputs = None
+        try:
+            if self.scrub(tenant):
+                self._set_state(tenant, clean=True)
+            else:
+                self.logger.warn('Deleting tenant %s which could not be '
+                                 'scrubbed' % tenant.project_name)
+                self._teardown(tenant)
+        finally:
+            self._unlock(tenant)
+
+    def provision(self):
+        ''' Provision concurrently the tenants yet to be, which are then set
+            up in this process. Other processes wait till it is done
+        '''
+        with open(os.path.join(self.pool_dir, 'provision.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                tenants = list()
+                with self.lock:
+                    for tenant in self.tenants:
+                        if self._get_state(tenant) is None and \
+                                tenant.lock_file is None and \
+                                self._try_lock(tenant):
+                            tenants.append(tenant)
+                map_in_parallel(self._provision, tenants,
+                                raise_exception=False)
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _provision(self, tenant):
+        try:
+            self._prepare(tenant)
+            self._set_state(tenant, clean=True)
+        except Exception as e:
+            self.logger.warn('Unable to provision tenant %s: %s' % (
+                tenant.project_name, e))
+            tenant.connections = None
+        finally:
+            self._unlock(tenant)
+# end TenantPool
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_tenant_pool(inputs, input_file=None, logger=None):
+    ''' Returns the TenantPool of this process, provisioned, None if the
+        pool is disabled or can not be used with the tenant isolation
+        options of inputs
+    '''
+    global _pool
+    if not TENANT_POOL_SIZE or not inputs.tenant_isolation or \
+            inputs.domain_isolation or inputs.orchestrator == 'vcenter' or \
+            inputs.vcenter_gw_setup:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = TenantPool(inputs, input_file=input_file, logger=logger)
+            _pool.provision()
+        return _pool
@@ -13,6 +13,8 @@ from security_group import get_secgrp_id_from_name, SecurityGroupFixture
 from tcutils.agent.vrouter_lib import *
 from policy_test import PolicyFixture
 from vn_policy_test import VN_Policy_Fixture
+from vm_test import VMFixture
+from vm_bringup import VMBringup
 
 class BaseVrouterTest(BaseNeutronTest):
 
@@ -152,6 +154,12 @@ class BaseVrouterTest(BaseNeutronTest):
             assert vn_fixture.verify_on_setup()
 
     def create_vms(self, vn_fixture, count=1, image_name='ubuntu', *args, **kwargs):
+        if kwargs.pop('pipelined', False):
+            if args:
+                raise TypeError('create_vms with pipelined set takes only '
+                                'keyword arguments, got %s' % (args,))
+            return self.bring_up_vms(vn_fixture, count=count,
+                                     image_name=image_name, **kwargs)
         vm_fixtures = []
         for i in xrange(count):
             vm_fixtures.append(self.create_vm(
@@ -162,6 +170,25 @@ class BaseVrouterTest(BaseNeutronTest):
 
         return vm_fixtures
 
+    def bring_up_vms(self, vn_fixture, count=1, image_name='ubuntu',
+                     **kwargs):
+        ''' Create count VMs booting them together and wait till they are
+            up, refer VMBringup. Returns list of VMFixture of the VMs booted
+        '''
+        connections = kwargs.pop('connections', None) or self.connections
+        kwargs.setdefault('project_name', connections.project_name)
+        kwargs.setdefault('flavor', 'contrail_flavor_small')
+        bringup = VMBringup([VMFixture(connections=connections,
+                                       vn_obj=vn_fixture.obj,
+                                       image_name=image_name, **kwargs)
+                             for i in xrange(count)], logger=self.logger)
+        vm_fixtures = bringup.boot()
+        for vm_fixture in vm_fixtures:
+            self.addCleanup(vm_fixture.cleanUp)
+        if not bringup.wait_till_up():
+            self.logger.warn('Not all the VMs are up, %s' % bringup.summary())
+        return vm_fixtures
+
     def _remove_fixture_from_cleanup(self, fixture):
         for cleanup in self._cleanups:
             if hasattr(cleanup[0],'__self__') and fixture == cleanup[0].__self__:
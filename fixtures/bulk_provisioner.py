@@ -0,0 +1,308 @@
+""" Bulk creation and deletion of config objects through the vnc api.
+
+Scale tests creating thousands of VNs, ports and policies through their
+fixtures spend most of their time on the serial create and read round trips
+of each object. BulkProvisioner queues the vnc objects instead and creates
+them concurrently, atmost max_inflight at a time, each object only after
+the queued objects it refers to (parent, refs) are created. The uuids are
+assigned upfront, so no read back is needed. Deletion is concurrent too, in
+the reverse order of the dependencies.
+
+BulkFixture builds the objects the way VNFixture, PortFixture and
+PolicyFixture do with option/api_type contrail, and hands back the
+fixtures populated with the created objects.
+
+    bulk = self.useFixture(BulkFixture(self.connections))
+    vn = bulk.add_vn(subnets=['10.1.1.0/24'])
+    port = bulk.add_port(vn)
+    bulk.create()
+    vn_fixtures = bulk.get_vn_fixtures()
+"""
+import os
+import time
+import uuid
+
+import fixtures
+from vnc_api.vnc_api import *
+from cfgm_common.exceptions import NoIdError, RefsExistError
+
+from common import log_orig as contrail_logging
+from tcutils.util import get_random_name
+from tcutils.threadpool_lib import exec_dag, map_in_parallel
+from vn_test import VNFixture
+from port_fixture import PortFixture
+from policy_test import PolicyFixture
+
+BULK_MAX_INFLIGHT = int(os.getenv('BULK_MAX_INFLIGHT') or 16)
+DELETE_TRIES = 5
+DELETE_DELAY = 2
+
+
+def _fq_name_str(fq_name):
+    return ':'.join(fq_name or [])
+
+
+class BulkProvisioner(object):
+
+    '''
+        Creates the queued vnc objects concurrently, in the order of their
+        dependencies, and deletes the created ones in the reverse order
+    '''
+
+    def __init__(self, vnc_api_h, logger=None, max_inflight=None):
+        self.vnc_api_h = vnc_api_h
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        self.max_inflight = max_inflight or BULK_MAX_INFLIGHT
+        # uuid: (obj, uuids of the explicit dependencies)
+        self.queued = dict()
+        self.order = list()
+        self.created = list()
+
+    def add(self, obj, depends_on=None):
+        ''' Queue obj to be created, after the objects in depends_on
+            Returns obj, whose uuid is assigned if not already
+        '''
+        if not obj.uuid:
+            obj.uuid = str(uuid.uuid4())
+        self.queued[obj.uuid] = (obj, set(
+            dep.uuid for dep in depends_on or []))
+        self.order.append(obj.uuid)
+        return obj
+
+    def get_dependencies(self, objs):
+        ''' Returns dict of uuid: uuids of the objects among objs, which
+            the object refers to as parent or in its refs
+        '''
+        by_fq_name = dict((_fq_name_str(obj.get_fq_name()), obj.uuid)
+                          for obj in objs.itervalues())
+        deps = dict()
+        for obj_uuid, obj in objs.iteritems():
+            refs = set()
+            parent = _fq_name_str(obj.get_fq_name()[:-1])
+            if parent in by_fq_name:
+                refs.add(by_fq_name[parent])
+            for field in getattr(obj, 'ref_fields', None) or []:
+                for ref in getattr(obj, field, None) or []:
+                    if ref.get('uuid') in objs:
+                        refs.add(ref['uuid'])
+                    elif _fq_name_str(ref.get('to')) in by_fq_name:
+                        refs.add(by_fq_name[_fq_name_str(ref.get('to'))])
+            refs.discard(obj_uuid)
+            deps[obj_uuid] = refs
+        return deps
+
+    @staticmethod
+    def _method(obj, operation):
+        return '%s_%s' % (obj.get_type().replace('-', '_'), operation)
+
+    def _create(self, obj_uuid, objs):
+        obj = objs[obj_uuid]
+        getattr(self.vnc_api_h, self._method(obj, 'create'))(obj)
+        return obj
+
+    def create_all(self):
+        ''' Create all the queued objects
+            Returns (list of objects created, dict of uuid: exception)
+        '''
+        objs = dict((obj_uuid, obj) for obj_uuid, (obj, _) in
+                    self.queued.iteritems())
+        deps = self.get_dependencies(objs)
+        for obj_uuid, (_, depends_on) in self.queued.iteritems():
+            deps[obj_uuid] |= depends_on
+        start = time.time()
+        (results, failures) = exec_dag(self._create, deps,
+                                       max_workers=self.max_inflight,
+                                       args=(objs,))
+        created = [objs[obj_uuid] for obj_uuid in self.order
+                   if obj_uuid in results]
+        self.created.extend(created)
+        self.queued = dict()
+        self.order = list()
+        self.logger.info('Created %s objects in %.1f secs, %s failed' % (
+            len(created), time.time() - start, len(failures)))
+        for obj_uuid, error in failures.iteritems():
+            self.logger.debug('Creation of %s %s failed: %s' % (
+                objs[obj_uuid].get_type(), objs[obj_uuid].get_fq_name(),
+                error))
+        return (created, failures)
+
+    def _delete(self, obj_uuid, objs):
+        obj = objs[obj_uuid]
+        delete = getattr(self.vnc_api_h, self._method(obj, 'delete'))
+        for i in range(DELETE_TRIES):
+            try:
+                return delete(id=obj_uuid)
+            except NoIdError:
+                return
+            except RefsExistError:
+                # Refs of objects not created here, eg by the agent
+                if i == DELETE_TRIES - 1:
+                    raise
+                time.sleep(DELETE_DELAY)
+
+    def delete_all(self):
+        ''' Delete all the created objects
+            Returns dict of uuid: exception of the objects not deleted
+        '''
+        objs = dict((obj.uuid, obj) for obj in self.created)
+        # An object is deleted after the objects which depend on it
+        deps = dict((obj_uuid, set()) for obj_uuid in objs)
+        for obj_uuid, refs in self.get_dependencies(objs).iteritems():
+            for ref in refs:
+                deps[ref].add(obj_uuid)
+        start = time.time()
+        (results, failures) = exec_dag(self._delete, deps,
+                                       max_workers=self.max_inflight,
+                                       args=(objs,))
+        self.created = [obj for obj in self.created if obj.uuid in failures]
+        self.logger.info('Deleted %s objects in %.1f secs, %s failed' % (
+            len(results), time.time() - start, len(failures)))
+        return failures
+# end BulkProvisioner
+
+
+class BulkFixture(fixtures.Fixture):
+
+    '''
+        Fixture to create VNs, ports and policies in bulk
+        The objects added before setUp are created in setUp, those added
+        later by create(). All of them are deleted in bulk on cleanUp
+    '''
+
+    def __init__(self, connections, max_inflight=None):
+        self.connections = connections
+        self.inputs = connections.inputs
+        self.logger = connections.logger
+        self.vnc_lib = connections.get_vnc_lib_h()
+        self.provisioner = BulkProvisioner(self.vnc_lib, logger=self.logger,
+                                           max_inflight=max_inflight)
+        self.vns = list()
+        self.ports = list()
+        self.policies = list()
+        self._project_obj = None
+        self._ipams = dict()
+        self._default_sg = None
+
+    @property
+    def project_obj(self):
+        if not self._project_obj:
+            self._project_obj = \
+                self.connections.vnc_lib_fixture.get_project_obj()
+        return self._project_obj
+
+    def _get_ipam(self, ipam_fq_name):
+        key = _fq_name_str(ipam_fq_name)
+        if key not in self._ipams:
+            self._ipams[key] = self.vnc_lib.network_ipam_read(
+                fq_name=ipam_fq_name)
+        return self._ipams[key]
+
+    def add_vn(self, vn_name=None, subnets=None, ipam_fq_name=None,
+               policy_objs=None, shared=False):
+        ''' Queue a VN, subnets is list of cidrs
+            policy_objs is list of NetworkPolicy to be attached, in order
+        '''
+        vn_name = vn_name or get_random_name(self.inputs.project_name)
+        vn_obj = VirtualNetwork(name=vn_name, parent_obj=self.project_obj)
+        if shared:
+            vn_obj.is_shared = shared
+        if subnets:
+            ipam = self._get_ipam(ipam_fq_name or NetworkIpam().get_fq_name())
+            ipam_subnets = list()
+            for subnet in subnets:
+                (network, prefix) = subnet.split('/')
+                ipam_subnets.append(IpamSubnetType(
+                    subnet=SubnetType(network, int(prefix))))
+            vn_obj.add_network_ipam(ipam, VnSubnetsType(ipam_subnets))
+        for seq, policy_obj in enumerate(policy_objs or []):
+            vn_obj.add_network_policy(policy_obj, VirtualNetworkPolicyType(
+                sequence=SequenceType(major=seq, minor=0)))
+        self.vns.append(self.provisioner.add(vn_obj))
+        return vn_obj
+
+    def add_port(self, vn_obj, name=None, fixed_ips=None,
+                 security_groups=None):
+        ''' Queue a port on vn_obj with an instance ip for each of
+            fixed_ips, list of ip addresses, or one allocated ip
+            security_groups is list of SecurityGroup, default SG if not set
+        '''
+        vmi_obj = VirtualMachineInterface(name=name or get_random_name('vmi'),
+                                          parent_obj=self.project_obj)
+        vmi_obj.add_virtual_network(vn_obj)
+        if not security_groups:
+            if not self._default_sg:
+                self._default_sg = self.vnc_lib.security_group_read(
+                    fq_name=self.project_obj.fq_name + ['default'])
+            security_groups = [self._default_sg]
+        for sg_obj in security_groups:
+            vmi_obj.add_security_group(sg_obj)
+        vmi_obj.set_virtual_machine_interface_properties(
+            VirtualMachineInterfacePropertiesType())
+        self.ports.append(self.provisioner.add(vmi_obj))
+        for ip in fixed_ips or [None]:
+            iip_id = str(uuid.uuid4())
+            iip_obj = InstanceIp(name=iip_id)
+            iip_obj.uuid = iip_id
+            iip_obj.add_virtual_machine_interface(vmi_obj)
+            iip_obj.add_virtual_network(vn_obj)
+            if ip:
+                iip_obj.set_instance_ip_address(ip)
+            self.provisioner.add(iip_obj)
+        return vmi_obj
+
+    def add_policy(self, policy_name, rules_list):
+        ''' Queue a policy, rules_list is in the format of PolicyFixture '''
+        policy_fixture = PolicyFixture(policy_name, rules_list, self.inputs,
+                                       self.connections, api=True)
+        entries = policy_fixture.get_policy_entries(
+            policy_name, policy_fixture.rules_list)
+        if entries is None:
+            raise ValueError('Invalid rules of policy %s' % policy_name)
+        policy_obj = NetworkPolicy(policy_name, network_policy_entries=entries,
+                                   parent_obj=self.project_obj)
+        self.policies.append(self.provisioner.add(policy_obj))
+        return policy_obj
+
+    def setUp(self):
+        super(BulkFixture, self).setUp()
+        self.create()
+
+    def create(self):
+        ''' Create all the objects queued so far '''
+        (created, failures) = self.provisioner.create_all()
+        if failures:
+            raise Exception('Bulk creation of %s objects failed: %s' % (
+                len(failures), failures.values()[0]))
+        return created
+
+    def _setup_fixtures(self, fixture_list):
+        # Fixtures only read the created objects and dont delete them
+        map_in_parallel(lambda fixture: fixture.setUp(), fixture_list,
+                        max_workers=self.provisioner.max_inflight)
+        return fixture_list
+
+    def get_vn_fixtures(self):
+        ''' Returns list of VNFixture of the VNs created '''
+        return self._setup_fixtures([VNFixture(
+            self.connections, vn_name=vn_obj.name, uuid=vn_obj.uuid,
+            option='contrail', clean_up=False) for vn_obj in self.vns])
+
+    def get_port_fixtures(self):
+        ''' Returns list of PortFixture of the ports created '''
+        return self._setup_fixtures([PortFixture(
+            connections=self.connections, uuid=vmi_obj.uuid,
+            api_type='contrail') for vmi_obj in self.ports])
+
+    def get_policy_fixtures(self):
+        ''' Returns list of PolicyFixture of the policies created '''
+        return self._setup_fixtures([PolicyFixture(
+            policy_obj.name, [], self.inputs, self.connections, api=True)
+            for policy_obj in self.policies])
+
+    def cleanUp(self):
+        failures = self.provisioner.delete_all()
+        if failures:
+            self.logger.warn('Bulk deletion of %s objects failed: %s' % (
+                len(failures), failures.values()[0]))
+        super(BulkFixture, self).cleanUp()
+# end BulkFixture
@@ -856,6 +856,20 @@ class NovaHelper(object):
         return self.wait_till_vm_status(vm_obj, 'ACTIVE')
     # end wait_till_vm_is_active
 
+    def get_vms_status(self, vm_ids):
+        ''' Returns dict of vm id: status of the VMs, VMs not found are
+            not included. Unlike vm_obj.get() per VM, it is one list call
+        '''
+        try:
+            vm_list = self.obj.servers.list(search_opts={"all_tenants": True})
+        except novaException.Forbidden:
+            vm_list = self.admin_obj.obj.servers.list(
+                search_opts={"all_tenants": True})
+        vm_ids = set(vm_ids)
+        return dict((vm_obj.id, vm_obj.status) for vm_obj in vm_list
+                    if vm_obj.id in vm_ids)
+    # end get_vms_status
+
     @retry(tries=60, delay=5)
     def wait_till_vm_status(self, vm_obj, status='ACTIVE'):
         try:
@@ -147,6 +147,9 @@ class OpenstackOrchestrator(Orchestrator):
    def wait_till_vm_status(self, vm_obj, status, **kwargs):
        return self.nova_h.wait_till_vm_status(vm_obj, status)
 
+   def get_vms_status(self, vm_ids, **kwargs):
+       return self.nova_h.get_vms_status(vm_ids)
+
    def get_console_output(self, vm_obj, **kwargs):
        return self.nova_h.get_vm_console_output(vm_obj)
 
@@ -8,6 +8,8 @@ from contrail_fixtures import *
 import copy
 from tcutils.agent.vna_introspect_utils import *
 from common.policy import policy_test_utils
+from common.policy.ace import find_rule, RuleIndex
+from tcutils.threadpool_lib import map_in_parallel
 import inspect
 try:
     from webui_test import *
@@ -359,6 +361,25 @@ class PolicyFixture(fixtures.Fixture):
              }
                 ]
         '''              
+        pol_entries = self.get_policy_entries(policy_name, rules_list)
+        if pol_entries is None:
+            return None
+        if policy_obj:
+            policy_obj.network_policy_entries = pol_entries
+            self.vnc_lib.network_policy_update(policy_obj)
+        else:
+            proj = self.vnc_lib.project_read(self.project_fq_name)
+            self.policy_obj = NetworkPolicy(
+                policy_name, network_policy_entries=pol_entries, parent_obj=proj)
+            uid = self.vnc_lib.network_policy_create(self.policy_obj)
+        self._populate_attr()
+        return self.policy_fq_name
+    # end  _set_policy_api
+
+    def get_policy_entries(self, policy_name, rules_list):
+        ''' Returns PolicyEntriesType of the rules_list, in the format
+            described in _set_policy_api
+        '''
         np_rules = []
         for rule_dict in rules_list:
             source_vn = None
@@ -551,19 +572,8 @@ class PolicyFixture(fixtures.Fixture):
 
         # end for
         self.logger.debug("Policy np_rules : %s" % (np_rules))
-        
-        pol_entries = PolicyEntriesType(np_rules)
-        if policy_obj:
-            policy_obj.network_policy_entries = pol_entries
-            self.vnc_lib.network_policy_update(policy_obj)
-        else:
-            proj = self.vnc_lib.project_read(self.project_fq_name)
-            self.policy_obj = NetworkPolicy(
-                policy_name, network_policy_entries=pol_entries, parent_obj=proj)
-            uid = self.vnc_lib.network_policy_create(self.policy_obj)
-        self._populate_attr()
-        return self.policy_fq_name
-    # end  _set_policy_api
+        return PolicyEntriesType(np_rules)
+    # end get_policy_entries
 
     def create_policy_api(self, name, rules_list):
         return self._set_policy_api(name, policy_obj=None,
@@ -826,11 +836,11 @@ class PolicyFixture(fixtures.Fixture):
 
         # Skip adding rules if they already exist...
         self.logger.debug( json.dumps(system_added_rules, sort_keys=True))
-        if not policy_test_utils.check_rule_in_rules(test_vn_allow_all_rule, user_rules_tx):
-            user_rules_tx.append(test_vn_allow_all_rule)
-        for rule in system_added_rules:
-            if not policy_test_utils.check_rule_in_rules(rule, user_rules_tx):
+        rule_index = RuleIndex(user_rules_tx)
+        for rule in [test_vn_allow_all_rule] + system_added_rules:
+            if rule not in rule_index:
                 user_rules_tx.append(rule)
+                rule_index.add(rule)
 
         # step 3: check & add permit-all rule for same  VN  but not for 'any'
         # network
@@ -863,12 +873,13 @@ class PolicyFixture(fixtures.Fixture):
         icmp_any_rule = {
             'proto_l': {'max': 'icmp', 'min': 'icmp'}, 'src': 'any', 'dst': 'any',
             'src_port_l': {'max': '65535', 'min': '0'}, 'dst_port_l': {'max': '65535', 'min': '0'}}
+        rule_index = RuleIndex(user_rules_tx)
         icmp_match, index_icmp = self.check_5tuple_in_rules(
-            icmp_any_rule, user_rules_tx)
+            icmp_any_rule, rule_index)
         tcp_match, index_tcp = self.check_5tuple_in_rules(
-            tcp_any_rule, user_rules_tx)
+            tcp_any_rule, rule_index)
         udp_match, index_udp = self.check_5tuple_in_rules(
-            udp_any_rule, user_rules_tx)
+            udp_any_rule, rule_index)
         if icmp_match:
             for rule in user_rules_tx[index_icmp + 1:len(user_rules_tx)]:
                 if rule['proto_l'] == {'max': 'icmp', 'min': 'icmp'}:
@@ -893,8 +904,8 @@ class PolicyFixture(fixtures.Fixture):
         else:
             pass
         # step 4: add ace_id, type, src to all rules
-        for rule in user_rules_tx:
-            rule['ace_id'] = str(user_rules_tx.index(rule) + 1)
+        for idx, rule in enumerate(user_rules_tx):
+            rule['ace_id'] = str(idx + 1)
             # currently checking policy aces only
             rule['rule_type'] = 'Terminal'
             if rule['src'] != 'any':
@@ -949,17 +960,12 @@ class PolicyFixture(fixtures.Fixture):
     # end get_any_rule_if_src_dst_same_ntw_exist
 
     def check_5tuple_in_rules(self, rule, rules):
-        '''check if 5-tuple of given rule exists in given rule-set..Return True if rule exists; else False'''
-        match_keys = ['proto_l', 'src', 'dst', 'src_port_l', 'dst_port_l']
-        for r in rules:
-            match = True
-            for k in match_keys:
-                if r[k] != rule[k]:
-                    match = False
-                    break
-            if match == True:
-                break
-        return (match, rules.index(r))
+        '''check if 5-tuple of given rule exists in given rule-set, a list or RuleIndex..Return True if rule exists; else False'''
+        if isinstance(rules, RuleIndex):
+            idx = rules.find(rule)
+        else:
+            idx = find_rule(rule, rules)
+        return (idx is not None, idx)
     # end check_5tuple_in_rules
 
     def verify_policy_in_vna(self, scn, policy_attch_to_vn=None):
@@ -1026,22 +1032,35 @@ class PolicyFixture(fixtures.Fixture):
         # end building VN ACE's from user rules
 
         # Get actual from vna in compute nodes [referred as cn]
+        # The vns and acls of all the computes are fetched concurrently, one
+        # snapshot per compute, and compared with the expected rules here
         vn_of_cn = scn.vn_of_cn  # {'cn1': ['vn1', 'vn2'], 'cn2': 'vn2'}
-        cn_vna_rules_by_vn = {}  # {'vn1':[{...}, {..}], 'vn2': [{..}]}
         err_msg = {}  # To capture error {compute: {vn: error_msg}}
+        inspect_handles = dict((compNode, self.agent_inspect[compNode])
+                               for compNode in self.inputs.compute_ips)
+        acls_by_cn = map_in_parallel(
+            lambda compNode: inspect_handles[compNode].get_vna_acls_by_vn(),
+            self.inputs.compute_ips)
         for compNode in self.inputs.compute_ips:
             self.logger.debug("Compute node: %s, Check for expected data" % (
                 compNode))
-            inspect_h = self.agent_inspect[compNode]
-            vnCn = (vn for vn in vn_of_cn[compNode] if vn_of_cn[compNode])
-            for vn in vnCn:
+            acls_by_vn = acls_by_cn[compNode]
+            cn_vna_rules_by_vn = {}  # {'vn1':[{...}, {..}], 'vn2': [{..}]}
+            for vn in vn_of_cn[compNode] or []:
                 self.logger.debug("Checking for VN %s in Compute %s" % (
                     vn, compNode))
-                vn_fq_name = inspect_h.get_vna_vn('default-domain', self.project_name, vn)['name']
-                vna_acl = inspect_h.get_vna_acl_by_vn(vn_fq_name)
+                vn_fq_name = ':'.join(('default-domain', self.project_name, vn))
+                if vn_fq_name not in acls_by_vn:
+                    result = False
+                    msg = "Compute node: %s, VN: %s not found in VNA" % (
+                        compNode, vn)
+                    err_msg.setdefault(compNode, {})[vn] = msg
+                    self.logger.error(msg)
+                    continue
+                vna_acl = acls_by_vn[vn_fq_name]
                 if vna_acl:
                     # system_rules
-                    cn_vna_rules_by_vn[vn] = vna_acl['entries']
+                    cn_vna_rules_by_vn[vn] = vna_acl.get('entries', [])
                 else:
                     cn_vna_rules_by_vn[vn] = []
                 # compare with test input & assert on failure
@@ -1051,7 +1070,7 @@ class PolicyFixture(fixtures.Fixture):
                 if ret:
                     result = ret['state']
                     msg = ret['msg']
-                    err_msg[compNode] = {vn: msg}
+                    err_msg.setdefault(compNode, {})[vn] = msg
                     self.logger.error("Compute node: %s, VN: %s, test result not expected, \
                         msg: %s" % (compNode, vn, msg))
                     self.logger.debug("Expected rules: ")
@@ -1065,26 +1084,20 @@ class PolicyFixture(fixtures.Fixture):
                         "expected rules check passed" % (compNode, vn))
             self.logger.debug("Compute node: %s, Check for unexpected data" % (
                 compNode))
-            vn_not_of_cn = []
-            skip_vn_not_of_cn = 0
-            vn_not_of_cn = list(set(scn.vnet_list) - set(vn_of_cn[compNode]))
-            if vn_not_of_cn == []:
-                skip_vn_not_of_cn = 1
+            vn_not_of_cn = set(scn.vnet_list) - set(vn_of_cn[compNode] or [])
             for vn in vn_not_of_cn:
-                if skip_vn_not_of_cn == 1:
-                    break
                 # VN & its rules should not be present in this Compute
-                vn_exists = inspect_h.get_vna_vn('default-domain', self.project_name, vn)
-                if vn_exists:
-                    vn_fq_name = vn_exists['name']
-                    vna_acl = inspect_h.get_vna_acl_by_vn(vn_fq_name)
+                vn_fq_name = ':'.join(('default-domain', self.project_name, vn))
+                if vn_fq_name in acls_by_vn:
+                    vna_acl = acls_by_vn[vn_fq_name]
                     # system_rules
-                    cn_vna_rules_by_vn[vn] = vna_acl['entries']
+                    cn_vna_rules_by_vn[vn] = vna_acl.get('entries') \
+                        if vna_acl else None
                     result = False
                     msg = "Compute node: " + str(compNode) + ", VN: " + str(vn) + \
                         " seeing unexpected rules in VNA" + \
                         str(cn_vna_rules_by_vn[vn])
-                    err_msg[compNode] = {vn: msg}
+                    err_msg.setdefault(compNode, {})[vn] = msg
                 else:
                     self.logger.info("Compute node: %s, VN: %s, validated that "\
                         "no extra rules are present" % (compNode, vn))
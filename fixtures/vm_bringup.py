@@ -0,0 +1,224 @@
+""" Pipelined bring up of multiple VMs.
+
+Bringing up VMs one after the other with VMFixture.wait_till_vm_is_up polls
+nova for every VM and waits for each VM to be reachable before even
+checking the next one. VMBringup instead
+    * submits the nova boot of all the VMs together
+    * polls the status of all of them with one nova list call per interval
+    * as soon as a VM turns ACTIVE, waits for it to be seen in the agent
+      and for it to be ready for ssh, concurrently with the other VMs
+and records how long each VM took in each of these stages.
+
+    bringup = VMBringup([VMFixture(...), VMFixture(...)], logger=logger)
+    vm_fixtures = bringup.boot()
+    assert bringup.wait_till_up(), bringup.summary()
+"""
+import os
+import time
+from collections import OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from common import log_orig as contrail_logging
+from tcutils.util import retry
+from tcutils.threadpool_lib import map_in_parallel, MAX_WORKERS
+
+VM_POLL_INTERVAL = int(os.getenv('VM_POLL_INTERVAL') or 5)
+VM_ACTIVE_TIMEOUT = int(os.getenv('VM_ACTIVE_TIMEOUT') or 300)
+# boot: nova create, active: till ACTIVE, agent: till the VMIs are active
+# in the agent, ssh: till the VM accepts ssh connections
+STAGES = ('boot', 'active', 'agent', 'ssh')
+
+
+@retry(delay=5, tries=15)
+def _wait_till_seen_in_agent(vm_fixture):
+    if not vm_fixture.verify_vm_launched():
+        return False
+    return vm_fixture._gather_details()
+
+
+class VMBringup(object):
+
+    '''
+        vm_fixtures: list of VMFixture, yet to be setUp
+        The fixtures booted are not cleaned up here, it is for the caller
+        to add their cleanUp. A fixture whose setUp fails is cleaned up
+        right away
+    '''
+
+    def __init__(self, vm_fixtures, max_workers=None,
+                 poll_interval=VM_POLL_INTERVAL,
+                 active_timeout=VM_ACTIVE_TIMEOUT, logger=None):
+        self.vm_fixtures = list(vm_fixtures)
+        self.max_workers = max_workers or MAX_WORKERS
+        self.poll_interval = poll_interval
+        self.active_timeout = active_timeout
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        self.booted = list()
+        # vm_name: {stage: secs taken}
+        self.timings = OrderedDict()
+        self.results = dict()
+        self._started = dict()
+        self.sleep = time.sleep
+
+    def _mark(self, vm_fixture, stage):
+        now = time.time()
+        self.timings[vm_fixture.vm_name][stage] = \
+            now - self._started[vm_fixture]
+        self._started[vm_fixture] = now
+
+    def _boot(self, vm_fixture):
+        self.timings.setdefault(vm_fixture.vm_name, OrderedDict())
+        self._started[vm_fixture] = time.time()
+        try:
+            vm_fixture.setUp()
+        except Exception as e:
+            self.logger.error('Boot of VM %s failed: %s' % (
+                vm_fixture.vm_name, e))
+            # The VM may have been created before the failure, it is not
+            # in booted for the caller to clean it up
+            try:
+                vm_fixture.cleanUp()
+            except Exception as e:
+                self.logger.error('Cleanup of VM %s failed: %s' % (
+                    vm_fixture.vm_name, e))
+            return False
+        self._mark(vm_fixture, 'boot')
+        return True
+
+    def boot(self):
+        ''' Submit the nova boot of all the VMs together
+            Returns list of VMFixture of the VMs booted
+        '''
+        for vm_fixture in self.vm_fixtures:
+            self.timings[vm_fixture.vm_name] = OrderedDict()
+        booted = map_in_parallel(self._boot, self.vm_fixtures,
+                                 max_workers=self.max_workers)
+        self.booted = [vm_fixture for vm_fixture in self.vm_fixtures
+                       if booted[vm_fixture]]
+        return self.booted
+
+    def boot_vm(self, vm_fixture):
+        ''' Submit the nova boot of vm_fixture, which is then waited for
+            along with the other VMs booted. Returns True if booted
+        '''
+        if not self._boot(vm_fixture):
+            return False
+        self.booted.append(vm_fixture)
+        return True
+
+    def get_status(self, vm_fixtures):
+        ''' Returns dict of VMFixture: nova status of the VMs, the status of
+            a fixture with multiple VMs is ACTIVE only if all of them are
+        '''
+        orch = vm_fixtures[0].orch
+        vm_ids = [vm_obj.id for vm_fixture in vm_fixtures
+                  for vm_obj in vm_fixture.vm_objs]
+        status = orch.get_vms_status(vm_ids)
+        fixture_status = dict()
+        for vm_fixture in vm_fixtures:
+            states = set(status.get(vm_obj.id, 'BUILD')
+                         for vm_obj in vm_fixture.vm_objs)
+            if 'ERROR' in states:
+                fixture_status[vm_fixture] = 'ERROR'
+            elif states == set(['ACTIVE']):
+                fixture_status[vm_fixture] = 'ACTIVE'
+            else:
+                fixture_status[vm_fixture] = 'BUILD'
+        return fixture_status
+
+    def _wait_till_ready(self, vm_fixture):
+        if not _wait_till_seen_in_agent(vm_fixture):
+            self.logger.warn('VM %s is not seen active in the agent' % (
+                vm_fixture.vm_name))
+            return False
+        self._mark(vm_fixture, 'agent')
+        vnc_lib_fixture = vm_fixture.vnc_lib_fixture
+        if any(vnc_lib_fixture.get_active_forwarding_mode(vn_fq_name) != 'l2'
+               for vn_fq_name in vm_fixture.vn_fq_names):
+            if not vm_fixture.wait_for_ssh_on_vm():
+                self.logger.warn('VM %s is not ready for ssh' % (
+                    vm_fixture.vm_name))
+                return False
+        self._mark(vm_fixture, 'ssh')
+        return True
+
+    def _ready(self, vm_fixture):
+        try:
+            result = self._wait_till_ready(vm_fixture)
+        except Exception as e:
+            self.logger.error('VM %s did not come up: %s' % (
+                vm_fixture.vm_name, e))
+            result = False
+        if not result:
+            self.logger.debug(vm_fixture.get_console_output())
+        return result
+
+    def wait_till_up(self, vm_fixtures=None):
+        ''' Wait till the booted VMs are ACTIVE, seen in the agent and ready
+            for ssh, the latter two concurrently for each VM once ACTIVE
+            Returns True if all the VMs are up
+        '''
+        vm_fixtures = list(vm_fixtures or self.booted)
+        if not vm_fixtures:
+            return False
+        if not hasattr(vm_fixtures[0].orch, 'get_vms_status'):
+            # Orchestrators other than openstack, wait for each of them
+            self.results.update(map_in_parallel(
+                lambda vm_fixture: vm_fixture.wait_till_vm_is_up(),
+                vm_fixtures, max_workers=self.max_workers,
+                raise_exception=False))
+            return all(self.results[vm_fixture] for vm_fixture in vm_fixtures)
+        pool = ThreadPool(min(self.max_workers, len(vm_fixtures)))
+        pending = list(vm_fixtures)
+        ready = dict()
+        deadline = time.time() + self.active_timeout
+        try:
+            while pending:
+                try:
+                    states = self.get_status(pending)
+                except Exception as e:
+                    self.logger.warn('Unable to get status of VMs: %s' % e)
+                    states = dict()
+                for vm_fixture, status in states.iteritems():
+                    if status == 'BUILD':
+                        continue
+                    pending.remove(vm_fixture)
+                    if status == 'ERROR':
+                        self.logger.error('VM %s is in ERROR state' % (
+                            vm_fixture.vm_name))
+                        self.results[vm_fixture] = False
+                        continue
+                    self._mark(vm_fixture, 'active')
+                    ready[vm_fixture] = pool.apply_async(self._ready,
+                                                         (vm_fixture,))
+                if not pending or time.time() > deadline:
+                    break
+                self.sleep(self.poll_interval)
+            for vm_fixture in pending:
+                self.logger.error('VM %s is not ACTIVE in %s secs' % (
+                    vm_fixture.vm_name, self.active_timeout))
+                self.results[vm_fixture] = False
+            for vm_fixture, result in ready.iteritems():
+                self.results[vm_fixture] = result.get()
+        finally:
+            pool.close()
+        self.logger.info(self.summary())
+        return all(self.results[vm_fixture] for vm_fixture in vm_fixtures)
+
+    def summary(self):
+        ''' Returns min/avg/max secs taken by the VMs in each stage '''
+        lines = list()
+        for stage in STAGES:
+            values = [timing[stage] for timing in self.timings.itervalues()
+                      if stage in timing]
+            if not values:
+                continue
+            lines.append('%s: min %.1f avg %.1f max %.1f secs of %s VMs' % (
+                stage, min(values), sum(values) / len(values), max(values),
+                len(values)))
+        failed = [vm_fixture.vm_name for vm_fixture, result
+                  in self.results.iteritems() if not result]
+        if failed:
+            lines.append('VMs not up: %s' % failed)
+        return 'VM bring up timings\n' + '\n'.join(lines)
+# end VMBringup
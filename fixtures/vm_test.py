@@ -28,8 +28,11 @@ from tcutils.tcpdump_utils import start_tcpdump_for_intf,\
     stop_tcpdump_for_intf
 from tcutils.agent.vrouter_lib import *
 from tcutils.fabutils import *
+from tcutils.ssh_pool import ssh_pool
+from tcutils.threadpool_lib import map_in_parallel
 from tcutils.test_lib.contrail_utils import get_interested_computes
 from interface_route_table_fixture import InterfaceRouteTableFixture
+from vm_bringup import VMBringup
 env.disable_known_hosts = True
 try:
     from webui_test import *
@@ -122,6 +125,7 @@ class VMFixture(fixtures.Fixture):
         self.agent_label = {}
         self.agent_l2_label = {}
         self.agent_vxlan_id = {}
+        self.agent_verification_results = {}
         self.local_ips = {}
         self.cs_vmi_obj = {}
         self.vm_launch_flag = True
@@ -539,15 +543,21 @@ class VMFixture(fixtures.Fixture):
                 # No need to check route if vrf is not in that compute
                 if not vrf_id:
                     continue
+                vrouter_route_table = \
+                    inspect_h.get_vrouter_route_table_snapshot(vrf_id)
+                # nh details are needed only for the routes of the VM
+                vrouter_route_table.add_nhs(inspect_h.get_vrouter_nhs(
+                    [route['nh_id'] for prefix in prefixes
+                     for route in vrouter_route_table.get_routes(
+                         prefix=prefix, prefix_len='32')
+                     if 'nh_id' in route]))
                 for prefix in prefixes:
                     # Skip validattion of v6 route on kernel till 1632511 is fixed
                     if get_af_type(prefix) == 'v6':
                         continue
-                    route_table = inspect_h.get_vrouter_route_table(
-                        vrf_id,
+                    route_table = vrouter_route_table.get_routes(
                         prefix=prefix,
-                        prefix_len='32',
-                        get_nh_details=True)
+                        prefix_len='32')
                     # Do WA for bug 1614847
                     if len(route_table) == 2 and \
                         route_table[0] == route_table[1]:
@@ -1148,91 +1158,106 @@ class VMFixture(fixtures.Fixture):
     def verify_in_all_agents(self, vn_fq_name):
         ''' Verify if the corresponding VN for a VM is present in all compute nodes.
             Also verifies that a route is present in all compute nodes for the VM IP
+            The computes are verified concurrently and the result of each
+            compute is saved in self.agent_verification_results
         '''
-        if self.inputs.many_computes:
-            self.logger.warn('Skipping verification on all agents since '
-                             'there are more than 10 computes in the box, '
-                             'until the subroutine supports gevent/mp')
-            return True
+        fwd_mode = self.vnc_lib_fixture.get_active_forwarding_mode(vn_fq_name)
+        mac = None
+        if 'l2' in fwd_mode:
+            mac = self.get_mac_addr_from_config()[vn_fq_name]
+        inspect_handles = dict((compute_ip, self.agent_inspect[compute_ip])
+                               for compute_ip in self.inputs.compute_ips)
+        results = map_in_parallel(self._verify_in_agent,
+                                  self.inputs.compute_ips,
+                                  args=(inspect_handles, vn_fq_name,
+                                        fwd_mode, mac))
+        self.agent_verification_results[vn_fq_name] = results
+        failed_nodes = [node for node, result in results.items() if not result]
+        if failed_nodes:
+            self.logger.warn('VN %s verification for VM %s failed in agents '
+                             '%s' % (vn_fq_name, self.vm_name, failed_nodes))
+            return False
+        return True
+    # end verify_in_all_agents
+
+    def _verify_in_agent(self, compute_ip, inspect_handles, vn_fq_name,
+                         fwd_mode, mac=None):
         (domain, project, vn_name) = vn_fq_name.split(':')
-        for compute_ip in self.inputs.compute_ips:
-            inspect_h = self.agent_inspect[compute_ip]
-            vn = inspect_h.get_vna_vn(domain, project, vn_name)
-            # The VN for the VM under test may or may not be present on other agent
-            # nodes. Proceed to check only if VN is present
-            if vn is None:
-                continue
+        inspect_h = inspect_handles[compute_ip]
+        vn = inspect_h.get_vna_vn(domain, project, vn_name)
+        # The VN for the VM under test may or may not be present on other agent
+        # nodes. Proceed to check only if VN is present
+        if vn is None:
+            return True
 
-            if vn['name'] != vn_fq_name:
-                self.logger.warn(
-                    'VN %s in agent is not the same as expected : %s ' %
-                    (vn['name'], vn_fq_name))
-                return False
-            else:
-                self.logger.debug('VN %s is found in Agent of node %s' %
-                                  (vn['name'], compute_ip))
-            if not vn['uuid'] in self.vn_ids:
-                self.logger.warn(
-                    'VN ID %s from agent is in VN IDs list %s of the VM in '
-                    'Agent node %s' % (vn['uuid'], self.vn_ids, compute_ip))
-                return False
+        if vn['name'] != vn_fq_name:
+            self.logger.warn(
+                'VN %s in agent is not the same as expected : %s ' %
+                (vn['name'], vn_fq_name))
+            return False
+        else:
+            self.logger.debug('VN %s is found in Agent of node %s' %
+                              (vn['name'], compute_ip))
+        if not vn['uuid'] in self.vn_ids:
+            self.logger.warn(
+                'VN ID %s from agent is in VN IDs list %s of the VM in '
+                'Agent node %s' % (vn['uuid'], self.vn_ids, compute_ip))
+            return False
 # TODO : To be uncommented once the sandesh query with service-chaining works
-#            if vn['vrf_name'] != self.agent_vrf_name :
-#                self.logger.warn('VN VRF of %s in agent is not the same as expected VRF of %s' %( vn['vrf_name'], self.agent_vrf_name ))
-#                return False
-            agent_vrf_objs = inspect_h.get_vna_vrf_objs(
-                domain, project, vn_name)
-            agent_vrf_obj = self.get_matching_vrf(
-                agent_vrf_objs['vrf_list'],
-                self.agent_vrf_name[vn_fq_name])
-            agent_vrf_id = agent_vrf_obj['ucindex']
-            if self.vnc_lib_fixture.get_active_forwarding_mode(vn_fq_name) != 'l2':
-                for vm_ip in self.vm_ip_dict[vn_fq_name]:
-                    agent_path = inspect_h.get_vna_active_route(
-                        vrf_id=agent_vrf_id, ip=vm_ip)
-                    for path in agent_path['path_list']:
-                        if not path['nh'].get('mc_list', None):
-                            agent_label = path['label']
-                            self.agent_label[vn_fq_name].append(agent_label)
-                            break
-                        if agent_label not in self.agent_label[vn_fq_name]:
-                            self.logger.warn(
-                                'The route for VM IP %s in Node %s is having '
-                                'incorrect label. Expected: %s, Seen : %s' % (
-                                    vm_ip, compute_ip,
-                                    self.agent_label[vn_fq_name], agent_label))
-                            return False
+#        if vn['vrf_name'] != self.agent_vrf_name :
+#            self.logger.warn('VN VRF of %s in agent is not the same as expected VRF of %s' %( vn['vrf_name'], self.agent_vrf_name ))
+#            return False
+        agent_vrf_objs = inspect_h.get_vna_vrf_objs(
+            domain, project, vn_name)
+        agent_vrf_obj = self.get_matching_vrf(
+            agent_vrf_objs['vrf_list'],
+            self.agent_vrf_name[vn_fq_name])
+        agent_vrf_id = agent_vrf_obj['ucindex']
+        if fwd_mode != 'l2':
+            for vm_ip in self.vm_ip_dict[vn_fq_name]:
+                agent_path = inspect_h.get_vna_active_route(
+                    vrf_id=agent_vrf_id, ip=vm_ip)
+                for path in agent_path['path_list']:
+                    if not path['nh'].get('mc_list', None):
+                        agent_label = path['label']
+                        self.agent_label[vn_fq_name].append(agent_label)
+                        break
+                    if agent_label not in self.agent_label[vn_fq_name]:
+                        self.logger.warn(
+                            'The route for VM IP %s in Node %s is having '
+                            'incorrect label. Expected: %s, Seen : %s' % (
+                                vm_ip, compute_ip,
+                                self.agent_label[vn_fq_name], agent_label))
+                        return False
 
+        self.logger.debug(
+            'VRF IDs of VN %s is consistent in agent %s' %
+            (vn_fq_name, compute_ip))
+        self.logger.debug(
+            'Route for VM IP %s is consistent in agent %s ' %
+            (self.vm_ip_dict[vn_fq_name], compute_ip))
+        self.logger.debug(
+            'VN %s verification for VM %s  in Agent %s passed ' %
+            (vn_fq_name, self.vm_name, compute_ip))
+
+        if 'l2' in fwd_mode:
             self.logger.debug(
-                'VRF IDs of VN %s is consistent in agent %s' %
-                (vn_fq_name, compute_ip))
-            self.logger.debug(
-                'Route for VM IP %s is consistent in agent %s ' %
-                (self.vm_ip_dict[vn_fq_name], compute_ip))
+                'Starting all layer 2 verification in agent %s' % (compute_ip))
+            agent_l2_path = inspect_h.get_vna_layer2_route(
+                vrf_id=agent_vrf_id, mac=mac)
+            agent_l2_label = agent_l2_path[
+                'routes'][0]['path_list'][0]['label']
+            if agent_l2_label != self.agent_l2_label[vn_fq_name]:
+                self.logger.warn('The route for VM MAC %s in Node %s '
+                                 'is having incorrect label. Expected: %s, Seen: %s'
+                                 % (self.mac_addr[vn_fq_name], compute_ip,
+                                    self.agent_l2_label[vn_fq_name], agent_l2_label))
+                return False
             self.logger.debug(
-                'VN %s verification for VM %s  in Agent %s passed ' %
-                (vn_fq_name, self.vm_name, compute_ip))
-
-            if 'l2' in self.vnc_lib_fixture.get_active_forwarding_mode(vn_fq_name):
-                self.logger.debug(
-                    'Starting all layer 2 verification in agent %s' % (compute_ip))
-                agent_l2_path = inspect_h.get_vna_layer2_route(
-                    vrf_id=agent_vrf_id,
-                    mac=self.get_mac_addr_from_config()[vn_fq_name])
-                agent_l2_label = agent_l2_path[
-                    'routes'][0]['path_list'][0]['label']
-                if agent_l2_label != self.agent_l2_label[vn_fq_name]:
-                    self.logger.warn('The route for VM MAC %s in Node %s '
-                                     'is having incorrect label. Expected: %s, Seen: %s'
-                                     % (self.mac_addr[vn_fq_name], compute_ip,
-                                        self.agent_l2_label[vn_fq_name], agent_l2_label))
-                    return False
-                self.logger.debug(
-                    'Route for VM MAC %s is consistent in agent %s ' %
-                    (self.mac_addr[vn_fq_name], compute_ip))
-        # end for
+                'Route for VM MAC %s is consistent in agent %s ' %
+                (self.mac_addr[vn_fq_name], compute_ip))
         return True
-    # end verify_in_all_agents
+    # end _verify_in_agent
 
     def ping_to_vn(self, dst_vm_fixture, vn_fq_name=None, af=None, expectation=True, *args, **kwargs):
         '''
@@ -1259,7 +1284,6 @@ class VMFixture(fixtures.Fixture):
         """
         host = self.inputs.host_data[self.vm_node_ip]
         output = ''
-        fab_connections.clear()
         af = get_af_type(ip)
         try:
             vm_host_string = '%s@%s' % (self.vm_username, self.local_ip)
@@ -1465,12 +1489,12 @@ class VMFixture(fixtures.Fixture):
                     return True
                 prefixes = self.vm_ip_dict[vn_fq_name]
                 discard_nh_ids = inspect_h.get_nh_ids(nh_type='discard')
+                vrouter_route_table = \
+                    inspect_h.get_vrouter_route_table_snapshot(curr_vrf_id)
                 for prefix in prefixes:
-                    route_table = inspect_h.get_vrouter_route_table(
-                        curr_vrf_id,
+                    route_table = vrouter_route_table.get_routes(
                         prefix=prefix,
-                        prefix_len='32',
-                        get_nh_details=True)
+                        prefix_len='32')
                     if len(route_table):
                         # If the route exists, it should be a discard route
                         # A change is pending in agent for label to be marked
@@ -1992,6 +2016,9 @@ class VMFixture(fixtures.Fixture):
                 else:
                     self.orch.delete_vm(vm_obj)
                     self.vm_objs.remove(vm_obj)
+            if getattr(self, '_local_ip', None):
+                # The local ip can get reused by another VM on the compute
+                ssh_pool.evict('%s@%s' % (self.vm_username, self._local_ip))
             self.verify_cleared_from_setup(verify=verify)
         else:
             self.logger.info('Skipping the deletion of VM %s' %
@@ -2008,32 +2035,40 @@ class VMFixture(fixtures.Fixture):
                     'seen in orchestrator' % (self.vm_name))
              if self.instance_type == "baremetal":
                  return True
-             assert self.verify_vm_not_in_agent(), ('VM %s is still seen in '
-                'one or more agents' % (self.vm_name))
-             assert self.verify_vm_not_in_control_nodes(), ('VM %s is still '
-                'seen in Control nodes' % (self.vm_name))
-
-             assert self.verify_vm_flows_removed(), ('One or more flows of VM'
-                ' %s is still seen in Compute node %s' %(self.vm_name,
-                                                         self.vm_node_ip))
-             for vn_fq_name in self.vn_fq_names:
-                 try:
-                     self.analytics_obj.verify_vm_not_in_opserver(
-                         self.vm_id,
-                         self.get_host_of_vm(),
-                         vn_fq_name)
-                 except PermissionDenied:
-                     if not self.admin_connections:
-                         raise
-                     admin_analytics_obj = self.admin_connections.analytics_obj
-                     admin_analytics_obj.verify_vm_not_in_opserver(
-                         self.vm_id,
-                         self.get_host_of_vm(),
-                         vn_fq_name)
+             self.verify_cleared_from_nodes()
              # Trying a workaround for Bug 452
         # end if
         return True
 
+    def verify_cleared_from_nodes(self):
+        ''' Verify that the VM, once removed from API server, is removed
+            from the agents, control nodes and analytics too
+        '''
+        assert self.verify_vm_not_in_agent(), ('VM %s is still seen in '
+            'one or more agents' % (self.vm_name))
+        assert self.verify_vm_not_in_control_nodes(), ('VM %s is still '
+            'seen in Control nodes' % (self.vm_name))
+
+        assert self.verify_vm_flows_removed(), ('One or more flows of VM'
+            ' %s is still seen in Compute node %s' %(self.vm_name,
+                                                     self.vm_node_ip))
+        for vn_fq_name in self.vn_fq_names:
+            try:
+                self.analytics_obj.verify_vm_not_in_opserver(
+                    self.vm_id,
+                    self.get_host_of_vm(),
+                    vn_fq_name)
+            except PermissionDenied:
+                if not self.admin_connections:
+                    raise
+                admin_analytics_obj = self.admin_connections.analytics_obj
+                admin_analytics_obj.verify_vm_not_in_opserver(
+                    self.vm_id,
+                    self.get_host_of_vm(),
+                    vn_fq_name)
+        return True
+    # end verify_cleared_from_nodes
+
     def tftp_file_to_vm(self, file, vm_ip):
         '''Do a tftp of the specified file to the specified VM
 
@@ -2138,7 +2173,8 @@ class VMFixture(fixtures.Fixture):
             absolute_filename = '/var/lib/tftpboot/' + filename
             dest_vm_fixture.run_cmd_on_vm(
                 cmds=['touch %s' % (absolute_filename),
-                      'chmod 777 %s' % (absolute_filename)], as_sudo=True)
+                      'chmod 777 %s' % (absolute_filename)], as_sudo=True,
+                batch=True)
         else:
             self.logger.error('No transfer mode specified!!')
             return False
@@ -2167,7 +2203,7 @@ class VMFixture(fixtures.Fixture):
                     dest_vm_fixture.run_cmd_on_vm(
                         cmds=['touch %s' % (absolute_filename),
                               'chmod 777 %s' % (absolute_filename)],
-                        as_sudo=True)
+                        as_sudo=True, batch=True)
                 if expectation:
                     return False
         return True
@@ -2202,32 +2238,49 @@ class VMFixture(fixtures.Fixture):
     # end get_rsa_to_vm
 
     def run_cmd_on_vm(self, cmds=[], as_sudo=False, timeout=30,
-                      as_daemon=False, raw=False, warn_only=True, pidfile=None, local_ip=None):
+                      as_daemon=False, raw=False, warn_only=True, pidfile=None,
+                      local_ip=None, batch=False):
         '''run cmds on VM
 
+        With batch set, all the cmds are run over a single ssh channel and
+        self.return_output_cmd_details has the output, exit_code and
+        duration of each cmd. batch is ignored with as_daemon.
         '''
         self.return_output_cmd_dict = {}
         self.return_output_values_list = []
+        self.return_output_cmd_details = {}
         cmdList = cmds
         host = self.inputs.host_data[self.vm_node_ip]
         output = ''
         try:
-            fab_connections.clear()
             if not local_ip:
                 local_ip = self.local_ip
             vm_host_string = '%s@%s' % (
                 self.vm_username, local_ip)
-            for cmd in cmdList:
-                output = remote_cmd(
-                    vm_host_string, cmd, gateway_password=host['password'],
+            if batch and not as_daemon and len(cmdList) > 1:
+                results = remote_cmd_batch(
+                    vm_host_string, cmdList, gateway_password=host['password'],
                     gateway='%s@%s' % (host['username'], self.vm_node_ip),
-                    with_sudo=as_sudo, timeout=timeout, as_daemon=as_daemon,
+                    with_sudo=as_sudo, timeout=timeout * len(cmdList),
                     raw=raw, warn_only=warn_only, password=self.vm_password,
-                    pidfile=pidfile,
                     logger=self.logger
                 )
-                self.logger.debug(output)
-                self.return_output_values_list.append(output)
+                for result in results:
+                    self.logger.debug(result)
+                    self.return_output_values_list.append(result['output'])
+                    self.return_output_cmd_details[result['cmd']] = result
+            else:
+                for cmd in cmdList:
+                    output = remote_cmd(
+                        vm_host_string, cmd, gateway_password=host['password'],
+                        gateway='%s@%s' % (host['username'], self.vm_node_ip),
+                        with_sudo=as_sudo, timeout=timeout,
+                        as_daemon=as_daemon, raw=raw, warn_only=warn_only,
+                        password=self.vm_password, pidfile=pidfile,
+                        logger=self.logger
+                    )
+                    self.logger.debug(output)
+                    self.return_output_values_list.append(output)
             self.return_output_cmd_dict = dict(
                 zip(cmdList, self.return_output_values_list)
             )
@@ -2606,7 +2659,6 @@ class VMFixture(fixtures.Fixture):
         '''
         self.wait_till_vm_is_up()
         host = self.inputs.host_data[self.vm_node_ip]
-        fab_connections.clear()
         try:
             vm_host_string = '%s@%s' % (self.vm_username, self.local_ip)
             cmd = 'echo %s >& index.html' % (content or self.vm_name)
@@ -2634,7 +2686,6 @@ class VMFixture(fixtures.Fixture):
         ''' Stop Web Server on the specified port.
         '''
         host = self.inputs.host_data[self.vm_node_ip]
-        fab_connections.clear()
         #listen_port = "\"Server "+listen_port+"$\""
         try:
             vm_host_string = '%s@%s' % (self.vm_username, self.local_ip)
@@ -3070,11 +3121,9 @@ class VMFixture(fixtures.Fixture):
         else:
             intf_conf_cmd = "ifconfig %s:0 %s" % (interface,
                                        ip)
-        vm_cmds = (intf_conf_cmd, 'ifconfig -a')
-        for cmd in vm_cmds:
-            cmd_to_output = [cmd]
-            self.run_cmd_on_vm(cmds=cmd_to_output, as_sudo=True)
-            output = self.return_output_cmd_dict[cmd]
+        vm_cmds = [intf_conf_cmd, 'ifconfig -a']
+        self.run_cmd_on_vm(cmds=vm_cmds, as_sudo=True, batch=True)
+        output = self.return_output_cmd_dict['ifconfig -a']
         if ip not in output:
             self.logger.error(
                 "IP %s not assigned to any interface" % (ip))
@@ -3139,12 +3188,15 @@ class MultipleVMFixture(fixtures.Fixture):
     """
 
     def __init__(self, connections, vms=[], vn_objs=[], image_name='ubuntu',
-                 vm_count_per_vn=2, flavor=None, project_name=None):
+                 vm_count_per_vn=2, flavor=None, project_name=None,
+                 pipelined=False):
         """
         vms     : List of dictionaries of VMData objects.
         or
         vn_objs : List of tuples of VN name and VNfixture.obj returned by the
                   get_all_fixture method of MultipleVNFixture.
+        pipelined : Boot all the VMs together and wait for them to be up
+                    concurrently, refer VMBringup
 
         """
 
@@ -3160,11 +3212,19 @@ class MultipleVMFixture(fixtures.Fixture):
         self.image_name = image_name
         self.inputs = self.connections.inputs
         self.logger = self.inputs.logger
+        self.pipelined = pipelined
+        self.bringup = None
     # end __init__
 
     def create_vms_in_vn(self, name, image, flavor, project, vn_obj):
         for c in range(self.vm_count):
             vm_name = '%s_vm_%s' % (name, c)
+            if self.pipelined:
+                self._vm_fixtures.append((vm_name, VMFixture(
+                    image_name=image, project_name=project, flavor=flavor,
+                    connections=self.connections, vn_obj=vn_obj,
+                    vm_name=vm_name)))
+                continue
             try:
                 vm_fixture = self.useFixture(VMFixture(image_name=image,
                                                        project_name=project, flavor=flavor, connections=self.connections,
@@ -3180,7 +3240,7 @@ class MultipleVMFixture(fixtures.Fixture):
         super(MultipleVMFixture, self).setUp()
         self._vm_fixtures = []
         if self.vms:
-            for vm in vms:
+            for vm in self.vms:
                 self.create_vms_in_vn(vm.name, vm.image, vm.flavor, vm.project,
                                       vm.vn_obj)
         elif self.vn_objs:
@@ -3189,6 +3249,15 @@ class MultipleVMFixture(fixtures.Fixture):
                                       self.project_name, vn_obj)
         else:
             self.logger.error("One of vms, vn_objs is  required.")
+        if self.pipelined:
+            self.bringup = VMBringup([vm_fixture for (vm_name, vm_fixture)
+                                      in self._vm_fixtures],
+                                     logger=self.logger)
+            booted = self.bringup.boot()
+            self._vm_fixtures = [(vm_name, vm_fixture) for (vm_name, vm_fixture)
+                                 in self._vm_fixtures if vm_fixture in booted]
+            for vm_name, vm_fixture in self._vm_fixtures:
+                self.addCleanup(vm_fixture.cleanUp)
 
     def verify_on_setup(self):
         # TODO
@@ -3221,6 +3290,8 @@ class MultipleVMFixture(fixtures.Fixture):
 
     def wait_till_vm_is_up(self):
 
+        if self.bringup:
+            return self.bringup.wait_till_up()
         result = True
         for vm_name, vm_fixture in self._vm_fixtures:
             result &= vm_fixture.wait_till_vm_is_up()
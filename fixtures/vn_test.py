@@ -1431,21 +1431,34 @@ class VNFixture(fixtures.Fixture):
             else:
                 self._delete_vn()
 
-            if self.verify_is_run or verify:
-                assert self.verify_vn_not_in_api_server(), ('VN %s is still'
-                    ' seen in API Server' % (self.vn_name))
-                assert self.verify_vn_not_in_agent(), ('VN %s is still '
-                    'seen in one or more agents' %(self.vn_name))
-                if self.vrf_ids:
-                    assert self.verify_vn_not_in_vrouter(),('VRF cleanup'
-                        ' verification failed')
-                assert self.verify_vn_not_in_control_nodes(), ('VN %s: '
-                    'is still seen in Control nodes' % (self.vn_name))
+            self.verify_cleared_from_setup(verify=verify)
         else:
             self.logger.info('Skipping deletion of the VN %s ' %
                              (self.vn_name))
     # end cleanUp
 
+    def verify_cleared_from_setup(self, verify=False):
+        if self.verify_is_run or verify:
+            assert self.verify_vn_not_in_api_server(), ('VN %s is still'
+                ' seen in API Server' % (self.vn_name))
+            self.verify_cleared_from_nodes()
+        return True
+    # end verify_cleared_from_setup
+
+    def verify_cleared_from_nodes(self):
+        ''' Verify that the VN, once removed from API server, is removed
+            from the agents, vrouters and control nodes too
+        '''
+        assert self.verify_vn_not_in_agent(), ('VN %s is still '
+            'seen in one or more agents' %(self.vn_name))
+        if self.vrf_ids:
+            assert self.verify_vn_not_in_vrouter(),('VRF cleanup'
+                ' verification failed')
+        assert self.verify_vn_not_in_control_nodes(), ('VN %s: '
+            'is still seen in Control nodes' % (self.vn_name))
+        return True
+    # end verify_cleared_from_nodes
+
     def get_obj(self):
         return self.vn_obj
     # end get_obj
@@ -6,11 +6,15 @@ import logging as LOG
 from tcutils.verification_util import *
 from vna_results import *
 import re
+import os
 from netaddr import *
 from tcutils.util import is_v6
 
 LOG.basicConfig(format='%(levelname)s: %(message)s', level=LOG.DEBUG)
 
+# Max age in secs of the vrf index after which it is rebuilt on access
+VRF_INDEX_MAX_AGE = float(os.getenv('VRF_INDEX_MAX_AGE', '2'))
+
 
 class AgentInspect (VerificationUtilBase):
 
@@ -18,6 +22,7 @@ class AgentInspect (VerificationUtilBase):
         port = int(port)
         super(AgentInspect, self).__init__(ip, port, XmlDrv, logger=logger,
             args=inputs)
+        self._vrf_index = None
 
     def get_vna_domain(self, domain='default-domain'):
         pass
@@ -37,24 +42,55 @@ class AgentInspect (VerificationUtilBase):
             returns None if not found, a dict w/ attrib. eg:
 
         '''
-        vrfl = self.dict_get('Snh_VrfListReq?name=')
-        avrf = vrfl.xpath('./VrfListResp/vrf_list/list/VrfSandeshData') or \
-            vrfl.xpath('./vrf_list/list/VrfSandeshData')
-        l = []
-        for v in avrf:
-            p = {}
-            for e in v:
-                p[e.tag] = e.text
-            l.append(p)
-        return VnaVrfListResult({'VRFs': l})
+        vrf_index = self.get_vna_vrf_index(refresh=True)
+        return VnaVrfListResult({'VRFs': [dict(v) for v in vrf_index.vrfs]})
+
+    def get_vna_vrf_index(self, refresh=False, max_age=None):
+        '''
+            Returns VnaVrfIndex of all the vrfs in agent, built from a single
+            query of the whole vrf table, which unlike Snh_VrfListReq is not
+            paginated, and reused until it is older than
+            max_age(default VRF_INDEX_MAX_AGE) secs, refresh is set or
+            force refresh is set on this handle
+        '''
+        max_age = VRF_INDEX_MAX_AGE if max_age is None else max_age
+        vrf_index = self._vrf_index
+        if refresh or self.get_force_refresh() or vrf_index is None or \
+                vrf_index.age() > max_age:
+            vrfl = self.dict_get(
+                'Snh_PageReq?x=begin:-1,end:-1,table:db.vrf.0,')
+            avrf = vrfl.xpath('./VrfListResp/vrf_list/list/VrfSandeshData') or \
+                vrfl.xpath('./vrf_list/list/VrfSandeshData')
+            l = []
+            for v in avrf:
+                p = {}
+                for e in v:
+                    p[e.tag] = e.text
+                l.append(p)
+            vrf_index = VnaVrfIndex(l)
+            self._vrf_index = vrf_index
+        return vrf_index
+    # end get_vna_vrf_index
+
+    def _lookup_vrf_index(self, lookup, refresh=False):
+        ''' Run lookup on the vrf index, rebuilding the index once on a
+            miss if it was not just built
+        '''
+        vrf_index = self.get_vna_vrf_index(refresh=refresh)
+        result = lookup(vrf_index)
+        if not result and vrf_index.age() > 0.1:
+            result = lookup(self.get_vna_vrf_index(refresh=True))
+        return result
 
     def get_vna_vn_list(self, domain='default-domain', project='admin'):
         '''
             method: get_vna_vn_list returns a list
             returns None if not found, a dict w/ attrib. eg:
+            All the vns are fetched with one query of the whole vn table,
+            Snh_VnListReq is paginated
 
         '''
-        vnl = self.dict_get('Snh_VnListReq?name=')
+        vnl = self.dict_get('Snh_PageReq?x=begin:-1,end:-1,table:db.vn.0,')
         avn = vnl.xpath('./VnListResp/vn_list/list/VnSandeshData') or \
                 vnl.xpath('./vn_list/list/VnSandeshData')
         l = []
@@ -131,34 +167,72 @@ class AgentInspect (VerificationUtilBase):
             vnl = dict_resp.xpath('./AclResp/acl_list/list/AclSandeshData') or \
                     dict_resp.xpath('./acl_list/list/AclSandeshData')
             if 1 == len(vnl):
-                p = VnaACLResult()
-                for e in vnl[0]:
-                    if e.tag == 'entries':
-                        p[e.tag] = []
-                        for ae in e.xpath('./list/AclEntrySandeshData'):
-                            ace = {}
-                            p[e.tag].append(ace)
-                            for c in ae:
-                                if c.tag in ('src_port_l', 'dst_port_l', 'proto_l'):
-                                    ace[c.tag] = {}
-                                    # Validate data before looking for list
-                                    # elements as port_list is Not Available if
-                                    # protocol is ICMP
-                                    cdata = c.xpath('./list/SandeshRange')
-                                    if cdata == []:
-                                        ace[c.tag] = 'NA'
-                                    else:
-                                        for pl in cdata[0]:
-                                            ace[c.tag][pl.tag] = pl.text
-                                elif c.tag in ('action_l', ):
-                                    ace[c.tag] = map(lambda x: x.text,
-                                                     c.xpath('./list/ActionStr/action'))
-                                else:
-                                    ace[c.tag] = c.text
-                    else:
-                        p[e.tag] = e.text
+                p = self._parse_vna_acl(vnl[0])
+        return p
+
+    def _parse_vna_acl(self, acl):
+        ''' Returns VnaACLResult of the AclSandeshData element acl '''
+        p = VnaACLResult()
+        for e in acl:
+            if e.tag == 'entries':
+                p[e.tag] = []
+                for ae in e.xpath('./list/AclEntrySandeshData'):
+                    ace = {}
+                    p[e.tag].append(ace)
+                    for c in ae:
+                        if c.tag in ('src_port_l', 'dst_port_l', 'proto_l'):
+                            ace[c.tag] = {}
+                            # Validate data before looking for list
+                            # elements as port_list is Not Available if
+                            # protocol is ICMP
+                            cdata = c.xpath('./list/SandeshRange')
+                            if cdata == []:
+                                ace[c.tag] = 'NA'
+                            else:
+                                for pl in cdata[0]:
+                                    ace[c.tag][pl.tag] = pl.text
+                        elif c.tag in ('action_l', ):
+                            ace[c.tag] = map(lambda x: x.text,
+                                             c.xpath('./list/ActionStr/action'))
+                        else:
+                            ace[c.tag] = c.text
+            else:
+                p[e.tag] = e.text
         return p
 
+    def get_vna_acls_by_vn(self):
+        '''
+            Returns dict of vn fq name: VnaACLResult of the acl of the vn,
+            None if the vn has no acl, for all the vns in agent.
+            All the vns are fetched with one query of the whole vn table and
+            the acls with one Snh_AclReq query, acls missing in the latter,
+            as it is paginated, are fetched one by one
+        '''
+        vns = self.get_vna_vn_list()['VNs']
+        acl_resp = self.dict_get('Snh_AclReq?name=')
+        acls = {}
+        if acl_resp is not None:
+            aacl = acl_resp.xpath('./AclResp/acl_list/list/AclSandeshData') or \
+                acl_resp.xpath('./acl_list/list/AclSandeshData')
+            for a in aacl:
+                acl = self._parse_vna_acl(a)
+                acls[acl.get('uuid')] = acl
+        acls_by_vn = {}
+        for vn in vns:
+            acl_uuid = vn.get('acl_uuid')
+            if acl_uuid and acl_uuid not in acls:
+                acls[acl_uuid] = None
+                dict_resp = self.dict_get('Snh_AclReq?x=' + acl_uuid)
+                if dict_resp is not None:
+                    vnl = dict_resp.xpath(
+                        './AclResp/acl_list/list/AclSandeshData') or \
+                        dict_resp.xpath('./acl_list/list/AclSandeshData')
+                    if 1 == len(vnl):
+                        acls[acl_uuid] = self._parse_vna_acl(vnl[0])
+            acls_by_vn[vn['name']] = acls.get(acl_uuid) if acl_uuid else None
+        return acls_by_vn
+    # end get_vna_acls_by_vn
+
     def get_vna_flow_by_vn(self,
                            fq_vn_name='default-domain:admin:default-virtual-network'):
         '''
@@ -318,28 +392,112 @@ l[0]={'protocol': '1', 'stats_bytes': '222180', 'stats_packets': '2645', 'setup_
         introspect has 3 different return values - record_list, record and []
 
         By default, will return non-evicted flows
+        For large flow tables, use iter_vna_kflows instead
         '''
-        if not index:
-            index = ''
-        record_list = self.dict_get('Snh_KFlowReq?flow_idx=%s' % (index))
-        l = []
-        if ('KFlowResp' in record_list.getchildren()[0].tag):
-            for record in record_list:
-                l = l + self._get_vna_kflowresp(record, show_evicted)
-            return l
-        elif ('flow_list' in record_list.getchildren()[0].tag):
-            if 'flow_handle' in record_list.getchildren()[1].tag:
-                l += self._get_vna_kflowresp(record_list, show_evicted)
-                next_index = record_list.getchildren()[1].text
-                while next_index != '0':
-                    (records_set, next_index) = self.get_vna_next_kflowresp(
-                                                    next_index, show_evicted)
-                    l.extend(records_set)
-                return l
-        else:
-            self.log.debug("Introspect output match failure, got as follows: ")
-            self.log.debug(etree.tostring(record_list, pretty_print=True))
+        state = dict()
+        l = list(self._iter_vna_kflows(state, index=index,
+                                       show_evicted=show_evicted))
+        if not state.get('valid'):
             return None
+        return l
+
+    def iter_vna_kflows(self, index=None, show_evicted=False, flags=None,
+                        proto=None, sip=None, dip=None, record='dict'):
+        '''Generator over kernel flows, pages through
+        Snh_KFlowReq?flow_idx= and Snh_NextKFlowReq?x=
+        Each page is parsed incrementally and discarded as it is consumed
+
+        By default, will yield non-evicted flows
+        flags : list of flags, all of which should be set on the flow
+        proto, sip, dip : filter flows on protocol number, source and dest ip
+        record : dict - dict of all the fields of the flow
+                 tuple - KFlowTuple of KFLOW_FIELDS
+                 slots - KFlowRecord of KFLOW_FIELDS
+        '''
+        return self._iter_vna_kflows(dict(), index=index,
+                                     show_evicted=show_evicted, flags=flags,
+                                     proto=proto, sip=sip, dip=dip,
+                                     record=record)
+
+    def _iter_vna_kflows(self, state, index=None, show_evicted=False,
+                         flags=None, proto=None, sip=None, dip=None,
+                         record='dict'):
+        match = self._kflow_filter(show_evicted, flags, proto, sip, dip)
+        convert = {'dict': lambda flow: flow,
+                   'tuple': lambda flow: KFlowTuple(
+                       *[flow.get(field) for field in KFLOW_FIELDS]),
+                   'slots': lambda flow: KFlowRecord(**flow)}[record]
+        path = 'Snh_KFlowReq?flow_idx=%s' % (index or '')
+        while path:
+            stream = self.stream_get(path)
+            if stream is None:
+                return
+            page = dict()
+            # the response is closed also when the consumer stops early
+            try:
+                for flow in self._parse_kflow_page(stream, page):
+                    if match(flow):
+                        yield convert(flow)
+            finally:
+                stream.close()
+            if 'error' in page:
+                self.log.error("Error while getting the url: %s, error: %s" % (
+                    path, page['error']))
+                state['valid'] = False
+                return
+            root = page.get('root')
+            if root is None or 'KFlowResp' not in root:
+                self.log.debug("Introspect output match failure, "
+                               "got root element %s" % (root))
+                return
+            state['valid'] = True
+            path = None
+            # A list of KFlowResp is not paginated
+            if root == 'KFlowResp' and page.get('next_index') not in (
+                    None, '0'):
+                path = 'Snh_NextKFlowReq?x=%s' % (page['next_index'])
+    # end _iter_vna_kflows
+
+    @staticmethod
+    def _kflow_filter(show_evicted=False, flags=None, proto=None, sip=None,
+                      dip=None):
+        def match(flow):
+            flow_flags = flow.get('flags') or ''
+            if not show_evicted and ('EVICTED' in flow_flags or
+                                     'DEAD' in flow_flags):
+                return False
+            if flags and not all(flag in flow_flags for flag in flags):
+                return False
+            if proto is not None and flow.get('proto') != str(proto):
+                return False
+            if sip and flow.get('sip') != sip:
+                return False
+            if dip and flow.get('dip') != dip:
+                return False
+            return True
+        return match
+
+    def _parse_kflow_page(self, stream, page):
+        '''Yields a dict per KFlowInfo in a kflow introspect page
+        Elements are freed as soon as they are parsed
+        page dict is updated with the root tag and the next_index, and with
+        the error if the page could not be read or parsed
+        '''
+        context = etree.iterparse(stream, events=('end',),
+                                  tag=('KFlowInfo', 'flow_handle'))
+        try:
+            for (event, elem) in context:
+                if elem.tag == 'flow_handle':
+                    page['next_index'] = elem.text
+                else:
+                    yield dict((e.tag, e.text) for e in elem)
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+            page['root'] = context.root.tag
+        except Exception as e:
+            page['error'] = e
+    # end _parse_kflow_page
 
     def get_vna_next_kflowresp(self, x='', show_evicted=False):
         ''' nodek1:8085/Snh_NextKFlowReq?x=<optional number>
@@ -402,13 +560,9 @@ l[0]={'protocol': '1', 'stats_bytes': '222180', 'stats_packets': '2645', 'setup_
 
         If not found, returns empty dict
         '''
-        vrf_dict = {}
-        vrf_list = self.dict_get('Snh_VrfListReq?name=').xpath('./VrfListResp')[0]
-        for entry in vrf_list.xpath('./vrf_list/list/VrfSandeshData'):
-            got_vrf_id = entry.xpath('./ucindex')[0].text
-            if got_vrf_id == vrf_id:
-                vrf_dict = elem2dict(entry)
-        return vrf_dict
+        vrf_dict = self._lookup_vrf_index(
+            lambda vrf_index: vrf_index.get_by_id(vrf_id))
+        return dict(vrf_dict or {})
     # end get_vna_vrf_by_id
 
     def get_vna_vrf_objs(self, domain='default-domain', project='admin', vn_name='default-virtual-network'):
@@ -417,22 +571,14 @@ l[0]={'protocol': '1', 'stats_bytes': '222180', 'stats_packets': '2645', 'setup_
         Returns VRF objects list from VRF name in agent using : http://172.27.58.57:8085/Snh_VrfListReq?x=default-domain:admin:net10:net10
         Sample : List of {'mcindex': '1', 'name': 'default-domain:admin:vn222:vn222', 'ucindex': '1'}
         '''
-        p = None
-        vrflist = self.dict_get('Snh_VrfListReq?name=%s:%s:%s:%s' % (domain,
-                                                                 project, vn_name, vn_name))
-        if len(vrflist.xpath('./VrfListResp')):
-            vrf = vrflist.xpath('./VrfListResp')[0]
-        else:
-            vrf = vrflist
-        avn = filter(lambda x:  ':'.join((domain, project,
-                                          vn_name)) in x.xpath('./name')[0].text, vrf.xpath(
-            './vrf_list/list/VrfSandeshData'))
+        vn_fq_name = ':'.join((domain, project, vn_name))
+        vrf_name = '%s:%s' % (vn_fq_name, vn_name)
+        avn = self._lookup_vrf_index(
+            lambda vrf_index: [v for v in vrf_index.get_by_vn(vn_fq_name)
+                               if vrf_name in v['name']])
         p = VnaVrfListResult({'vrf_list': []})
         for v in avn:
-            pp = VnaVrfRouteResult()
-            for e in v:
-                pp[e.tag] = e.text
-            p['vrf_list'].append(pp)
+            p['vrf_list'].append(VnaVrfRouteResult(dict(v)))
         return p
     # end get_vna_vrf_objs
 
@@ -442,10 +588,10 @@ l[0]={'protocol': '1', 'stats_bytes': '222180', 'stats_packets': '2645', 'setup_
         vn = str(vn_fq_name.split(':')[2])
         vrf = '%s:%s:%s:%s' % (domain,
                                 project, vn, vn)
-        agent_vrf_objs = self.get_vna_vrf_objs(domain,project,vn)
-        vrf_id = [x['ucindex'] for x in agent_vrf_objs['vrf_list'] if x['name'] == vrf]
-        if len(vrf_id):
-            return vrf_id[0]
+        vrf_dict = self._lookup_vrf_index(
+            lambda vrf_index: vrf_index.get_by_name(vrf))
+        if vrf_dict:
+            return vrf_dict['ucindex']
         else:
             return None
 
@@ -1087,6 +1233,8 @@ l[0]={'protocol': '1', 'stats_bytes': '222180', 'stats_packets': '2645', 'setup_
         # TODO
         # Once bug 1614824 is fixed , add filter options
         # since this table can be very big
+        # For many lookups in the same vrf, use
+        # get_vrouter_route_table_snapshot instead
         '''
             Queries http://nodek1:8085/Snh_KRouteReq?vrf_id=4
             get_nh_details: If True, Include nh details also in the route dict
@@ -1137,31 +1285,71 @@ l[0]={'protocol': '1', 'stats_bytes': '222180', 'stats_packets': '2645', 'setup_
               'rid': '0',
               'vrf_id': '4'}]
         '''
-        filter_dict = dict((k,v) for k,v in  kwargs.iteritems() if v is not None)
-        filter_set = set(filter_dict.items())
+        route_table = self.get_vrouter_route_table_snapshot(vrf_id)
+        routes = route_table.get_routes(**kwargs)
+        if get_nh_details:
+            nhs = self.get_vrouter_nhs([route['nh_id'] for route in routes
+                                        if 'nh_id' in route])
+            for route in routes:
+                route['nh'] = nhs.get(route.get('nh_id'))
+        return routes
+    # end get_vrouter_route_table
+
+    def get_vrouter_route_table_snapshot(self, vrf_id, get_nh_details=False):
+        '''
+            Queries http://nodek1:8085/Snh_KRouteReq?x=<vrf_id> once
+            and returns a VrouterRouteTable indexed on prefix and nh_id
+            get_nh_details: If True, fetch the nh details of all the routes
+                            in bulk, available through route_table.get_nh()
+        '''
+        routes = []
         xml_obj = self.dict_get('Snh_KRouteReq?x=%s' % (vrf_id))
-        xpath_str = './KRouteResp'
-        xml_obj = xml_obj.xpath(xpath_str)
+        xml_obj = xml_obj.xpath('./KRouteResp') if xml_obj is not None \
+            else None
         if not xml_obj:
             self.log.debug('Unable to fetch route details in vrouter for '
                 ' vrf index %s, Got :%s' % (vrf_id, xml_obj))
-            return []
-        routes = []
-        for obj in xml_obj:
-            xpath_str = './rt_list/list/KRouteInfo'
-            routes_elem = obj.xpath(xpath_str)
-            for route in routes_elem:
+        for obj in xml_obj or []:
+            for route in obj.xpath('./rt_list/list/KRouteInfo'):
                 p = elem2dict(route)
-
                 # Remove any unhashable values in p
                 p = dict((k,v) for k,v in p.iteritems() if v)
-
-                if filter_set.issubset(set(p.items())):
-                    if get_nh_details:
-                        p['nh'] = self.get_vrouter_nh(p['nh_id'])
-                    routes.append(p)
-        return routes
-    # end get_vrouter_route_table
+                routes.append(p)
+        nhs = None
+        if get_nh_details:
+            nhs = self.get_vrouter_nhs([route['nh_id'] for route in routes
+                                        if 'nh_id' in route])
+        return VrouterRouteTable(vrf_id, routes, nhs)
+    # end get_vrouter_route_table_snapshot
+
+    def get_vrouter_nh_list(self):
+        ''' http://nodek1:8085/Snh_KNHReq?x=
+            Returns dict of nh id: nh details of all the nhs in vrouter
+        '''
+        nhs = {}
+        xml_obj = self.dict_get('Snh_KNHReq?x=')
+        if xml_obj is None:
+            return nhs
+        for nh in xml_obj.xpath('.//nh_list/list/KNHInfo'):
+            p = elem2dict(nh)
+            nhs[p.get('id')] = p
+        return nhs
+    # end get_vrouter_nh_list
+
+    def get_vrouter_nhs(self, nh_ids, bulk_threshold=8):
+        ''' Returns dict of nh id: nh details for the given nh ids
+            Each nh is fetched once, and all of them in one request if
+            there are more than bulk_threshold of them
+        '''
+        nh_ids = set(nh_ids)
+        nhs = {}
+        if len(nh_ids) > bulk_threshold:
+            nhs = dict((k, v) for k, v in self.get_vrouter_nh_list().iteritems()
+                       if k in nh_ids)
+        for nh_id in nh_ids - set(nhs.keys()):
+            nhs[nh_id] = self.get_vrouter_nh(nh_id)
+        return nhs
+    # end get_vrouter_nhs
 
     def get_nh_for_route_in_vrouter(self, prefix, route_table=[], **kwargs):
         '''
@@ -1190,6 +1378,12 @@ l[0]={'protocol': '1', 'stats_bytes': '222180', 'stats_packets': '2645', 'setup_
             route_table = self.get_vrouter_route_table(vrf_id, prefix=prefix_ip,
                                                prefix_len=prefix_len,
                                                get_nh_details=True)
+        elif isinstance(route_table, VrouterRouteTable):
+            route = route_table.get_route(prefix_ip, prefix_len)
+            if not route:
+                return None
+            return route_table.get_nh(route.get('nh_id')) or \
+                self.get_vrouter_nh(route.get('nh_id'))
 
         for route in route_table:
             if route['prefix'] == prefix_ip and \
@@ -1,5 +1,39 @@
+import time
+from collections import namedtuple, defaultdict
+from netaddr import IPAddress, IPNetwork
 from tcutils.verification_util import *
 
+KFLOW_FIELDS = ('index', 'rflow', 'sip', 'sport', 'dip', 'dport', 'proto',
+                'vrf_id', 'd_vrf_id', 'action', 'flags', 'tcp_flags', 'bytes',
+                'pkts', 'insight', 'nhid', 'underlay_udp_port', 'drop_reason')
+
+# Compact form of a kernel flow entry, fields not in KFLOW_FIELDS are dropped
+KFlowTuple = namedtuple('KFlowTuple', KFLOW_FIELDS)
+
+
+class KFlowRecord (object):
+
+    '''
+        Compact form of a kernel flow entry as got from
+        vna_introspect_utils.iter_vna_kflows(record='slots')
+        fields not in KFLOW_FIELDS are dropped
+    '''
+    __slots__ = KFLOW_FIELDS
+
+    def __init__(self, **kwargs):
+        for field in KFLOW_FIELDS:
+            setattr(self, field, kwargs.get(field))
+
+    def get(self, field, default=None):
+        return getattr(self, field, default)
+
+    def __getitem__(self, field):
+        return getattr(self, field)
+
+    def __repr__(self):
+        return 'KFlowRecord(%s)' % ', '.join(
+            '%s=%s' % (field, getattr(self, field)) for field in KFLOW_FIELDS)
+
 
 class VnaVrfListResult (Result):
 
@@ -264,3 +298,126 @@ class VnaBGPaaSResult(Result):
         prop = self.properties()
         return prop and prop['vmi_uuid']
 
+
+
+class VrouterRouteTable (object):
+
+    '''
+        Snapshot of a vrf route table in vrouter as got from
+        vna_introspect_utils.get_vrouter_route_table_snapshot
+        routes is the list of route dicts, indexed on (prefix, prefix_len)
+        and nh_id. nhs is an optional dict of nh_id: nh details dict,
+        which is joined into the routes under key 'nh'
+    '''
+
+    def __init__(self, vrf_id, routes, nhs=None):
+        self.vrf_id = vrf_id
+        self.routes = routes
+        self.nhs = {}
+        self.by_prefix = defaultdict(list)
+        self.by_nh_id = defaultdict(list)
+        self.prefix_lens = set()
+        for route in routes:
+            prefix_len = route.get('prefix_len')
+            self.by_prefix[(route.get('prefix'), prefix_len)].append(route)
+            self.by_nh_id[route.get('nh_id')].append(route)
+            if prefix_len is not None:
+                self.prefix_lens.add(int(prefix_len))
+        self.prefix_lens = sorted(self.prefix_lens, reverse=True)
+        self.add_nhs(nhs or {})
+
+    def add_nhs(self, nhs):
+        ''' Join nhs, dict of nh_id: nh details dict, into the routes '''
+        self.nhs.update(nhs)
+        for nh_id, nh in nhs.iteritems():
+            for route in self.by_nh_id.get(nh_id, []):
+                route['nh'] = nh
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __iter__(self):
+        return iter(self.routes)
+
+    def get_nh(self, nh_id):
+        return self.nhs.get(str(nh_id))
+
+    def get_routes(self, prefix=None, prefix_len=None, nh_id=None, **kwargs):
+        ''' Returns list of routes matching all of the given fields
+            Lookups on (prefix, prefix_len) or nh_id are O(1)
+        '''
+        if prefix is not None and prefix_len is not None:
+            routes = self.by_prefix.get((prefix, str(prefix_len)), [])
+        elif nh_id is not None:
+            routes = self.by_nh_id.get(str(nh_id), [])
+        else:
+            routes = self.routes
+        filter_dict = dict((k, str(v)) for k, v in kwargs.iteritems()
+                           if v is not None)
+        if nh_id is not None and prefix is not None and \
+                prefix_len is not None:
+            filter_dict['nh_id'] = str(nh_id)
+        elif prefix is not None or prefix_len is not None:
+            filter_dict.update(dict((k, str(v)) for k, v in (
+                ('prefix', prefix), ('prefix_len', prefix_len))
+                if v is not None))
+        return [route for route in routes
+                if all(route.get(k) == v for k, v in filter_dict.iteritems())]
+
+    def get_route(self, prefix, prefix_len):
+        routes = self.get_routes(prefix=prefix, prefix_len=prefix_len)
+        return routes[0] if routes else None
+
+    def longest_prefix_match(self, ip):
+        ''' Returns the route with the longest prefix covering ip, or None
+        '''
+        ip = IPAddress(ip)
+        width = 32 if ip.version == 4 else 128
+        for prefix_len in self.prefix_lens:
+            if prefix_len > width:
+                continue
+            prefix = str(IPNetwork('%s/%s' % (ip, prefix_len)).network)
+            routes = self.by_prefix.get((prefix, str(prefix_len)))
+            if routes:
+                for route in routes:
+                    if route.get('family', 'AF_INET') == \
+                            ('AF_INET6' if ip.version == 6 else 'AF_INET'):
+                        return route
+        return None
+
+
+class VnaVrfIndex (object):
+
+    '''
+        Index of the vrfs in an agent, built from one query of the whole
+        vrf table by vna_introspect_utils.get_vna_vrf_index
+        vrfs is the list of VrfSandeshData dicts, indexed on name, ucindex
+        and the fq name of the VN (first three parts of the vrf name)
+    '''
+
+    def __init__(self, vrfs):
+        self.vrfs = vrfs
+        self.timestamp = time.time()
+        self.by_name = dict()
+        self.by_ucindex = dict()
+        self.by_vn = defaultdict(list)
+        for vrf in vrfs:
+            name = vrf.get('name') or ''
+            self.by_name[name] = vrf
+            self.by_ucindex[vrf.get('ucindex')] = vrf
+            self.by_vn[':'.join(name.split(':')[:3])].append(vrf)
+
+    def __len__(self):
+        return len(self.vrfs)
+
+    def age(self):
+        return time.time() - self.timestamp
+
+    def get_by_name(self, name):
+        return self.by_name.get(name)
+
+    def get_by_id(self, vrf_id):
+        return self.by_ucindex.get(str(vrf_id))
+
+    def get_by_vn(self, vn_fq_name):
+        return self.by_vn.get(vn_fq_name, [])
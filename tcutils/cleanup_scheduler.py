@@ -0,0 +1,183 @@
+""" Concurrent cleanup of the fixtures of a test.
+
+The cleanups registered by a test, testtools TestCase._cleanups, are run as
+a dependency graph instead of one at a time in LIFO order. The cleanUp of
+the fixtures in CLEANUP_ORDER are ordered by their type, VMs before ports
+before VNs before IPAMs, policies and security groups, and the independent
+ones are run concurrently. Any other cleanup is a barrier, run after all
+the cleanups registered after it and before those registered before it,
+same as in LIFO order.
+
+The wait for an object to be removed from API server and the orchestrator
+is kept in its cleanup, since the deletion of the objects it refers to, eg.
+of the VN of a VM, fails till then. The rest of the cleanup verification,
+verify_on_cleanup or verify_cleared_from_nodes of the ordered fixtures,
+which polls the agents, control nodes and analytics, is deferred till all
+the deletions are done and then run concurrently, so that it does not hold
+up the deletion of the other objects.
+
+    for (error, trace) in run_cleanups(self._cleanups, logger=log):
+        ...
+"""
+import sys
+import time
+import traceback
+
+from tcutils.util import get_os_env
+from tcutils.threadpool_lib import exec_dag, map_in_parallel
+
+# Atmost these many cleanups run at a time, 1 runs them in LIFO order
+CLEANUP_WORKERS = int(get_os_env('CLEANUP_WORKERS') or 16)
+# Fixture class names, a fixture is cleaned up before those of later ranks
+CLEANUP_ORDER = (
+    ('VMFixture',),
+    ('PortFixture',),
+    ('VNFixture',),
+    ('IPAMFixture', 'PolicyFixture', 'SecurityGroupFixture'),
+)
+# Verification methods deferred, with the value returned when deferred
+DEFERRED_VERIFICATIONS = (('verify_on_cleanup', (True, None)),
+                          ('verify_cleared_from_nodes', True))
+
+
+def _format_error():
+    (cet, cei, ctb) = sys.exc_info()
+    return (cei, '\n{0}\n{1}:\n{2}'.format(''.join(traceback.format_tb(ctb)),
+                                           cet.__name__,
+                                           getattr(cei, 'message', cei)))
+
+
+def cleanup_rank(cleanup):
+    ''' Returns the rank in CLEANUP_ORDER of the fixture whose cleanUp is
+        cleanup, None if cleanup is not one such
+    '''
+    if getattr(cleanup, '__name__', None) != 'cleanUp':
+        return None
+    fixture = getattr(cleanup, '__self__', None)
+    for klass in type(fixture).__mro__:
+        for rank, names in enumerate(CLEANUP_ORDER):
+            if klass.__name__ in names:
+                return rank
+    return None
+
+
+def build_cleanup_dag(cleanups):
+    ''' Returns dict of index in cleanups: indices of the cleanups to be run
+        before it
+    '''
+    deps = dict((i, set()) for i in range(len(cleanups)))
+    # Closest barrier registered later and the fixtures registered between
+    (barrier, segment) = (None, list())
+    for i in reversed(range(len(cleanups))):
+        cleanup = cleanups[i][0]
+        if getattr(cleanup, '__name__', None) == 'gather_details':
+            # Registered by useFixture along with the cleanUp, independent
+            continue
+        rank = cleanup_rank(cleanup)
+        if barrier is not None:
+            deps[i].add(barrier)
+        if rank is None:
+            deps[i].update(index for (_, index) in segment)
+            (barrier, segment) = (i, list())
+            continue
+        for (other_rank, index) in segment:
+            if other_rank < rank:
+                deps[i].add(index)
+            elif other_rank > rank:
+                deps[index].add(i)
+        segment.append((rank, i))
+    return deps
+
+
+class _DeferredVerification(object):
+
+    ''' Records the calls to the verification methods of a fixture '''
+
+    def __init__(self, fixture):
+        self.fixture = fixture
+        self.calls = list()
+
+    def _recorder(self, name, value):
+        def record(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+            return value
+        return record
+
+    def run_cleanup(self, cleanup, args, kwargs):
+        shadowed = [(name, value) for (name, value) in DEFERRED_VERIFICATIONS
+                    if callable(getattr(self.fixture, name, None))]
+        for (name, value) in shadowed:
+            setattr(self.fixture, name, self._recorder(name, value))
+        try:
+            cleanup(*args, **kwargs)
+        finally:
+            for (name, _) in shadowed:
+                delattr(self.fixture, name)
+
+    def verify(self):
+        for (name, args, kwargs) in self.calls:
+            result = getattr(self.fixture, name)(*args, **kwargs)
+            msg = None
+            if isinstance(result, tuple):
+                (result, msg) = result
+            assert result, msg or '%s of %s failed' % (name, self.fixture)
+# end _DeferredVerification
+
+
+def _run(index, cleanups, deferred, errors, logger):
+    (cleanup, args, kwargs) = cleanups[index]
+    start = time.time()
+    try:
+        if cleanup_rank(cleanup) is None:
+            cleanup(*args, **kwargs)
+        else:
+            deferred[index] = _DeferredVerification(cleanup.__self__)
+            deferred[index].run_cleanup(cleanup, args, kwargs)
+    except Exception:
+        errors[index] = _format_error()
+    if logger:
+        logger.debug('Cleanup %s took %.1f secs' % (
+            getattr(cleanup, '__name__', cleanup), time.time() - start))
+
+
+def _verify(index, deferred, errors):
+    try:
+        deferred[index].verify()
+    except Exception:
+        errors[index] = _format_error()
+
+
+def run_cleanups(cleanups, max_workers=None, logger=None):
+    ''' Run and remove all the cleanups, list of (fn, args, kwargs)
+        Returns list of (exception, formatted traceback) of the failed
+        cleanups, in the order they would have run in LIFO order
+    '''
+    max_workers = max_workers or CLEANUP_WORKERS
+    errors = dict()
+    if max_workers <= 1:
+        index = len(cleanups)
+        while cleanups:
+            (cleanup, args, kwargs) = cleanups.pop(-1)
+            index -= 1
+            try:
+                cleanup(*args, **kwargs)
+            except Exception:
+                errors[index] = _format_error()
+        return [errors[i] for i in sorted(errors, reverse=True)]
+    entries = list(cleanups)
+    del cleanups[:]
+    deferred = dict()
+    start = time.time()
+    (_, failures) = exec_dag(_run, build_cleanup_dag(entries),
+                             max_workers=max_workers,
+                             args=(entries, deferred, errors, logger))
+    # _run does not raise, any failure here is of the scheduling itself
+    for index, error in failures.iteritems():
+        errors[index] = (error, '\n%s: %s' % (type(error).__name__, error))
+    map_in_parallel(_verify, [index for index in deferred
+                              if index not in errors],
+                    max_workers=max_workers, args=(deferred, errors))
+    if logger:
+        logger.info('Ran %s cleanups in %.1f secs, %s failed' % (
+            len(entries), time.time() - start, len(errors)))
+    return [errors[i] for i in sorted(errors, reverse=True)]
@@ -23,6 +23,9 @@ import threading
 from subprocess import Popen, PIPE
 import shlex
 from netaddr import *
+from tcutils.collector.query_benchmark import QueryBenchmark, \
+    compare_with_baseline, load_results, QUERY_BENCHMARK_RESULTS, \
+    QUERY_BENCHMARK_BASELINE
 
 
 class AnalyticsTestPerformance(testtools.TestCase, ConfigSvcChain, VerifySvcChain):
@@ -397,6 +400,27 @@ class AnalyticsTestPerformance(testtools.TestCase, ConfigSvcChain, VerifySvcChai
         for th in traffic_threads:
             th.join()
         return True
+
+    @preposttest_wrapper
+    def test_analytics_query_benchmark(self):
+        ''' Benchmark the query engine, fail on regression wrt the
+            results in QUERY_BENCHMARK_BASELINE, if set
+        '''
+        ip = self.inputs.collector_ips[0]
+        benchmark = QueryBenchmark(self.analytics_obj.ops_inspect[ip],
+                                   logger=self.logger)
+        results = benchmark.run()
+        benchmark.save(results, QUERY_BENCHMARK_RESULTS)
+        self.logger.info("Query benchmark results saved in %s" % (
+            QUERY_BENCHMARK_RESULTS))
+        if QUERY_BENCHMARK_BASELINE:
+            baseline = load_results(QUERY_BENCHMARK_BASELINE)
+            assert baseline, "Unable to load baseline %s" % (
+                QUERY_BENCHMARK_BASELINE)
+            regressions = compare_with_baseline(results, baseline)
+            assert not regressions, "Query engine regressions:\n%s" % (
+                '\n'.join(regressions))
+        return True
 # end AnalyticsTestPerformance
 
 
@@ -21,7 +21,8 @@ import shlex
 import pprint
 from netaddr import *
 import random
-from tcutils.collector.opserver_introspect_utils import VerificationOpsSrvIntrospect
+from tcutils.collector.opserver_introspect_utils import VerificationOpsSrvIntrospect,\
+    UvePoller
 from physical_router_fixture import PhysicalRouterFixture
 from tcutils.contrail_status_check import ContrailStatusChecker
 from tcutils.collector.opserver_util import OpServerUtils
@@ -118,6 +119,8 @@ class AnalyticsVerification(fixtures.Fixture):
         self.agent_inspect = agent_inspect
         self.cn_inspect = cn_inspect
         self.logger = logger
+        self.uve_poller = UvePoller(ops_inspect, inputs.collector_ips,
+                                    logger=logger)
         self.get_all_generators()
         self.uve_verification_flags = []
         
@@ -818,44 +821,56 @@ class AnalyticsVerification(fixtures.Fixture):
         return self.vrouter_ops_obj.get_attr('Agent', 'interface_list')
 
 # end vrouter uve functions
+# bulk uve functions
+# ------------------------#
+    def get_uve_snapshot(self, uve_type, keys=None, cfilt=None):
+        '''Returns UveSnapshot of the uves of keys of uve_type, fetched in bulk
+           from all the collectors concurrently'''
+        return self.uve_poller.fetch(uve_type, keys, cfilt=cfilt)
+
+    def verify_uve_tiers(self, uve_type, keys, expected_tiers, tries=1,
+                         delay=3):
+        '''Verify that the uves of keys show all the expected tiers in all
+           the collectors, polling the pending keys upto tries times'''
+        expected_tiers = set(expected_tiers)
+        check = lambda uve: bool(uve) and expected_tiers <= set(uve.keys())
+        result, snapshot = self.uve_poller.wait_for(uve_type, keys,
+                                                    check=check, tries=tries,
+                                                    delay=delay)
+        for key in keys:
+            for ip in self.inputs.collector_ips:
+                uve = snapshot.get(key, ip)
+                if not uve:
+                    self.logger.error("%s uve did not return any output "
+                                      "in collector %s" % (key, ip))
+                    continue
+                missing_tier = expected_tiers - set(uve.keys())
+                if missing_tier:
+                    self.logger.error(
+                        "uve message did not come from %s for %s in "
+                        "collector %s" % (list(missing_tier), key, ip))
+                else:
+                    self.logger.info(
+                        "Tiers correctly shown in %s uve for %s in "
+                        "collector %s" % (uve_type, key, ip))
+        return result
+
+# end bulk uve functions
 # virtual-network uve functions
 # ------------------------#
     def get_vn_uve(self, vn_fq_name):
         '''This function returns entire vn uve.Need this to verify that vn uve does not exists if the vn is deleted'''
-        for ip in self.inputs.collector_ips:
-            self.opsobj = self.ops_inspect[ip]
-            ops_vn = self.opsobj.get_ops_vn(vn_fq_name=vn_fq_name)
-            if ops_vn:
-                return ops_vn
-        return None
+        return self.get_uve_snapshot('virtual-network',
+                                     [vn_fq_name]).get(vn_fq_name)
 
     def verify_vn_uve_tiers(self, vn_fq_name=None):
         '''Verify that when vn is created , vn uve should show info from UveVirtualNetworkConfig and UveVirtualNetworkAgent'''
-        result = False
         if not vn_fq_name:
             vn_fq_name='default-domain:%s:default-virtual-network'%self.inputs.stack_tenant
-        for ip in self.inputs.collector_ips:
-            self.logger.debug("Verifying through opserver in  %s" % (ip))
-            self.opsobj = self.ops_inspect[ip]
-            self.ops_vnoutput = self.opsobj.get_ops_vn(vn_fq_name=vn_fq_name)
-            if not self.ops_vnoutput:
-                self.logger.error("%s uve did not return any output " %
-                                  vn_fq_name)
-                return False
-            expected_tiers = ['UveVirtualNetworkAgent',
-                              'UveVirtualNetworkConfig']
-            tiers = self.ops_vnoutput.keys()
-            missing_tier = set(expected_tiers) - set(tiers)
-            if not missing_tier:
-                self.logger.info(
-                    "Tiers correctly shown in vn vue for %s in collector %s" % (vn_fq_name, ip))
-                result = True
-            else:
-                self.logger.error(
-                    "uve message did not come from %s for %s in collector %s" %
-                    (missing_tier, vn_fq_name, ip))
-                return False
-        return result
+        expected_tiers = ['UveVirtualNetworkAgent',
+                          'UveVirtualNetworkConfig']
+        return self.verify_uve_tiers('virtual-network', [vn_fq_name],
+                                     expected_tiers)
 
     @retry(delay=5, tries=6)
     def verify_vn_uve_ri(self, vn_fq_name=None, ri_name=None):
@@ -1399,24 +1414,9 @@ class AnalyticsVerification(fixtures.Fixture):
     def verify_vm_uve_tiers(self, uuid=None):
         '''Verify vm uve tiers as UveVirtualMachineConfig and UveVirtualMachineAgent '''
 
-        result = True
-        for ip in self.inputs.collector_ips:
-            self.logger.debug("Verifying through opserver in %s" % (ip))
-            self.ops_vm_output = self.ops_inspect[ip].get_ops_vm(vm=uuid)
-            key_list = self.ops_vm_output.keys()
-            # expect_lst=['UveVirtualMachineConfig','UveVirtualMachineAgent']
-            expect_lst = ['UveVirtualMachineAgent']
-            diff_key = set(expect_lst) ^ set(key_list)
-            for uve in expect_lst:
-                if uve not in key_list:
-                    self.logger.error("%s uve not shown in vm uve %s" %
-                                  (uve, uuid))
-                    result = result and False
-                else:
-                    self.logger.debug("%s uve correctly shown in vm uve %s" %
-                                 (uve, uuid))
-                    result = result and True
-        return result
+        # expect_lst=['UveVirtualMachineConfig','UveVirtualMachineAgent']
+        expect_lst = ['UveVirtualMachineAgent']
+        return self.verify_uve_tiers('virtual-machine', [uuid], expect_lst)
 
     @retry(delay=4, tries=10)
     def verify_vm_link(self, vm):
@@ -2,19 +2,33 @@ import sys
 vizdtestdir = sys.path[0]
 sys.path.insert(1, vizdtestdir + '/../../')
 
+import os
+import urllib
 import urllib2
 import xmltodict
 import json
 import requests
 import socket
 import time
+from collections import OrderedDict
 from lxml import etree
 from tcutils.verification_util import *
 from opserver_results import *
-from opserver_util import OpServerUtils
+from opserver_util import OpServerUtils, iter_json_array, READ_SIZE
 from tcutils.util import *
+from multiprocessing.pool import ThreadPool
+from tcutils.threadpool_lib import exec_in_parallel, get_results
 from cfgm_common.exceptions import PermissionDenied
 
+# Max number of uve keys requested in one bulk uve request
+UVE_CHUNK_SIZE = int(os.getenv('UVE_CHUNK_SIZE') or 50)
+# Secs to wait for an analytics query to complete
+QUERY_TIMEOUT = int(os.getenv('ANALYTICS_QUERY_TIMEOUT') or 600)
+# Max number of result chunks of a query downloaded concurrently
+QUERY_WORKERS = int(os.getenv('ANALYTICS_QUERY_WORKERS') or 4)
+QUERY_POLL_MIN = 0.1
+QUERY_POLL_MAX = 5
+
 class VerificationOpsSrv (VerificationUtilBase):
 
     def __init__(self, ip, port=8081, insecure=False, protocol='http',
@@ -314,57 +328,39 @@ class VerificationOpsSrv (VerificationUtilBase):
             return res
 
     def get_query_result(self, qid):
-        max_retries = 60
-        retry = 0
-        while True:
-            status = self.dict_get('/analytics/query/%s'%qid)
-            if not status:
-                yield {}
-                return
-            if status['progress'] != 100:
-                if retry < max_retries:
-                    retry = retry + 1
-                    time.sleep(5)
-                    continue
-                yield {}
-                return
-            else:
-                for chunk in status['chunks']:
-                    resp = self.dict_get(chunk['href'])
-                    if resp:
-                        yield {}
-                    else:
-                        for result in OpServerUtils.parse_query_result(resp):
-                            yield result
-                return
+        result = QueryClient(self, logger=self.log).get_result(qid)
+        return iter(result if result is not None else [])
     # end get_query_result
 
+    def query(self, table, start_time=None, end_time=None,
+              select_fields=None, where_clause='', sort_fields=None,
+              sort=None, limit=None, filter=None, dir=None,
+              session_type=None, timeout=None):
+        '''
+            Run the query asynchronously, Returns QueryResult, a lazy
+            iterator over the result rows, or None if the query failed
+        '''
+        query_dict = OpServerUtils.get_query_dict(
+            table, start_time, end_time,
+            select_fields,
+            where_clause,
+            sort_fields, sort, limit, filter, dir,
+            session_type)
+        return QueryClient(self, logger=self.log).run(query_dict,
+                                                      timeout=timeout)
+
     def post_query(self, table, start_time=None, end_time=None,
                    select_fields=None,
                    where_clause='',
                    sort_fields=None, sort=None, limit=None, filter=None, dir=None,
                    session_type=None):
-        res = None
+        res = []
         try:
-            query_dict = OpServerUtils.get_query_dict(
-                table, start_time, end_time,
-                select_fields,
-                where_clause,
-                sort_fields, sort, limit, filter, dir,
-                session_type)
-
-            res = []
-            resp = self.post(path='analytics/query', payload=query_dict)
-            if resp is not None:
-                try:
-                    qid = resp['href'].rsplit('/', 1)[1]
-                    result = self.get_query_result(qid)
-                    for item in result:
-                        res.append(item)
-                except Exception as e:
-                    if 'value' in resp:
-                        for item in resp['value']:
-                            res.append(item)
+            result = self.query(table, start_time, end_time,
+                                select_fields, where_clause,
+                                sort_fields, sort, limit, filter, dir,
+                                session_type)
+            res = list(result or [])
         except Exception as e:
             self.log.debug("Got exception %s"%e)
         finally:
@@ -383,6 +379,254 @@ class VerificationOpsSrv (VerificationUtilBase):
         finally:
             return res
 
+    def get_ops_uves(self, uve_type, keys=None, cfilt=None):
+        '''Bulk fetch of the uves of a uve type in one request
+            http://nodea29:8081/analytics/uves/virtual-network/*?flat\
+            &kfilt=default-domain:admin:vn1,default-domain:admin:vn2
+            Returns dict of uve name: Op*Result, None on failure'''
+        path = 'analytics/uves/%s/*?flat' % uve_type
+        if keys:
+            path += '&kfilt=' + ','.join(
+                [urllib.quote(key, safe=':*') for key in keys])
+        if cfilt:
+            path += '&cfilt=' + ','.join(cfilt)
+        res = None
+        try:
+            uves_dict = self.dict_get(path)
+            result_cls = UVE_RESULTS.get(uve_type, Result)
+            res = dict()
+            for uve in (uves_dict or {}).get('value', []):
+                res[uve['name']] = result_cls(uve['value'])
+        except PermissionDenied:
+            raise
+        except Exception as e:
+            self.log.debug('Error fetching %s uves: %s' % (uve_type, e))
+        return res
+
+
+class UvePoller (object):
+
+    '''
+        Fetches uves from all the collectors concurrently, through the bulk
+        uve api of each opserver in chunks of UVE_CHUNK_SIZE keys.
+        ops_inspect is the dict of collector: VerificationOpsSrv handle,
+        collectors sharing a handle are fetched once
+    '''
+
+    def __init__(self, ops_inspect, collectors, logger=LOG,
+                 chunk_size=None):
+        self.ops_inspect = ops_inspect
+        self.collectors = list(collectors)
+        self.logger = logger
+        self.chunk_size = chunk_size or UVE_CHUNK_SIZE
+
+    def _get_handles(self):
+        handles = list()
+        for collector in self.collectors:
+            handle = self.ops_inspect[collector]
+            for h, collectors in handles:
+                if h is handle:
+                    collectors.append(collector)
+                    break
+            else:
+                handles.append((handle, [collector]))
+        return handles
+
+    def fetch(self, uve_type, keys=None, cfilt=None):
+        '''
+            Returns UveSnapshot of the uves of keys(all uves of the type
+            if not specified) from all the collectors
+        '''
+        keys = list(keys or [])
+        chunks = [keys[i:i + self.chunk_size]
+                  for i in range(0, len(keys), self.chunk_size)] or [None]
+        jobs = list()
+        owners = list()
+        for handle, collectors in self._get_handles():
+            for chunk in chunks:
+                jobs.append((handle.get_ops_uves, (uve_type, chunk, cfilt)))
+                owners.append(collectors)
+        results = get_results(exec_in_parallel(jobs), raise_exception=False)
+        uves = OrderedDict((collector, dict()) for collector in self.collectors)
+        for collectors, result in zip(owners, results):
+            if result is None:
+                self.logger.debug('Bulk %s uve fetch failed on %s' % (
+                    uve_type, collectors))
+                continue
+            for collector in collectors:
+                uves[collector].update(result)
+        return UveSnapshot(uve_type, uves)
+
+    def wait_for(self, uve_type, keys, check=None, cfilt=None, tries=10,
+                 delay=3):
+        '''
+            Polls till check(uve) is True for the uve of each of keys in
+            all the collectors, refetching only the keys still pending.
+            check defaults to the uve being present
+            Returns (result, UveSnapshot)
+        '''
+        check = check or bool
+        snapshot = UveSnapshot(uve_type, OrderedDict(
+            (collector, dict()) for collector in self.collectors))
+        pending = list(keys)
+        for i in range(tries):
+            for uves in snapshot.uves.values():
+                for key in pending:
+                    uves.pop(key, None)
+            snapshot.update(self.fetch(uve_type, pending, cfilt=cfilt))
+            pending = [key for key in pending
+                       if not all(check(snapshot.get(key, collector))
+                                  for collector in self.collectors)]
+            if not pending:
+                return True, snapshot
+            if i < tries - 1:
+                time.sleep(delay)
+        self.logger.debug('%s uves %s not as expected after %s tries' % (
+            uve_type, pending, tries))
+        return False, snapshot
+# end UvePoller
+
+
+class QueryResult (object):
+
+    '''
+        Lazy iterator over the rows of a query result. The result chunks
+        are downloaded QUERY_WORKERS at a time, rows of a chunk are parsed
+        as the chunk is streamed
+    '''
+
+    def __init__(self, client, chunks=None, rows=None):
+        self.client = client
+        self.chunks = chunks or list()
+        self.rows = rows
+
+    def __iter__(self):
+        if self.rows is not None:
+            return iter(self.rows)
+        return self.client.iter_chunks(self.chunks)
+
+    def columns(self, fields=None):
+        ''' Returns dict of field: list of the values of the field in
+            each row, None where the row does not have the field
+        '''
+        columns = OrderedDict((field, list()) for field in fields or [])
+        count = 0
+        for row in self:
+            for field in row:
+                if fields is None and field not in columns:
+                    columns[field] = [None] * count
+            for field, values in columns.iteritems():
+                values.append(row.get(field))
+            count += 1
+        return columns
+# end QueryResult
+
+
+class QueryClient (object):
+
+    '''
+        Client of the asynchronous query api of the analytics
+        The query is posted with Expect: 202-accepted, its progress is
+        polled with a backoff adapted to the progress reported and the
+        result chunks are streamed concurrently
+    '''
+
+    def __init__(self, ops_inspect, logger=LOG, timeout=None, workers=None):
+        self.ops_inspect = ops_inspect
+        self.logger = logger
+        self.timeout = timeout or QUERY_TIMEOUT
+        self.workers = workers or QUERY_WORKERS
+        self.sleep = time.sleep
+
+    def submit(self, query_dict):
+        ''' Returns the response of the query post, which has either the
+            href of the query status or the rows as value
+        '''
+        return self.ops_inspect.post(path='analytics/query',
+                                     payload=query_dict,
+                                     headers=OpServerUtils.POST_HEADERS)
+
+    def wait(self, qid, timeout=None):
+        ''' Returns the status of the query once it completes, None if
+            it failed or did not complete within timeout secs
+        '''
+        timeout = timeout or self.timeout
+        start = time.time()
+        delay = QUERY_POLL_MIN
+        while True:
+            status = self.ops_inspect.dict_get('analytics/query/%s' % qid)
+            if not status:
+                self.logger.debug('Unable to get status of query %s' % qid)
+                return None
+            progress = status.get('progress', 0)
+            if progress >= 100:
+                return status
+            if progress < 0:
+                self.logger.debug('Query %s failed: %s' % (qid, status))
+                return None
+            elapsed = time.time() - start
+            if elapsed > timeout:
+                self.logger.debug('Query %s not complete in %s secs, '
+                                  'progress %s' % (qid, timeout, progress))
+                return None
+            # Expected time to completion at the current rate, if known
+            delay = min(delay * 2, QUERY_POLL_MAX)
+            if progress:
+                delay = min(delay, elapsed * (100 - progress) / progress)
+            self.sleep(max(QUERY_POLL_MIN, min(delay, timeout - elapsed)))
+
+    def stream_chunk(self, chunk):
+        ''' Yields the rows of a result chunk as they are downloaded '''
+        stream = self.ops_inspect.stream_get(chunk['href'].lstrip('/'))
+        if stream is None:
+            raise RuntimeError('Unable to get query result %s' % (
+                chunk['href']))
+        try:
+            for row in iter_json_array(
+                    iter(lambda: stream.read(READ_SIZE), '')):
+                yield row
+        finally:
+            stream.close()
+
+    def fetch_chunk(self, chunk):
+        return list(self.stream_chunk(chunk))
+
+    def iter_chunks(self, chunks):
+        ''' Yields the rows of all the chunks, in order '''
+        if len(chunks) <= 1 or self.workers <= 1:
+            for chunk in chunks:
+                for row in self.stream_chunk(chunk):
+                    yield row
+            return
+        pool = ThreadPool(min(self.workers, len(chunks)))
+        try:
+            # At most workers chunks are held in memory
+            for i in range(0, len(chunks), self.workers):
+                for rows in pool.imap(self.fetch_chunk,
+                                      chunks[i:i + self.workers]):
+                    for row in rows:
+                        yield row
+        finally:
+            pool.terminate()
+
+    def get_result(self, qid, timeout=None):
+        ''' Returns QueryResult of the query qid, None if it failed '''
+        status = self.wait(qid, timeout=timeout)
+        if status is None:
+            return None
+        return QueryResult(self, chunks=status.get('chunks') or list())
+
+    def run(self, query_dict, timeout=None):
+        ''' Returns QueryResult of the query, None if it failed '''
+        resp = self.submit(query_dict)
+        if resp is None:
+            return None
+        if 'href' not in resp:
+            return QueryResult(self, rows=resp.get('value', list()))
+        qid = resp['href'].rsplit('/', 1)[1]
+        return self.get_result(qid, timeout=timeout)
+# end QueryClient
+
 class VerificationOpsSrvIntrospect (VerificationUtilBase):
 
     def __init__(self, ip, port, logger=LOG, inputs=None):
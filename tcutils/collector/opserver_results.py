@@ -1,4 +1,5 @@
 import re
+import time
 from tcutils.verification_util import *
 from common import log_orig as contrail_logging
 
@@ -474,6 +475,65 @@ class OpVmIntfResult(Result):
         return _OpResultGet(self, typ, attr, match)
 
 
+# uve type: result class used to wrap the flat UVEs of the type
+UVE_RESULTS = {
+    'generator': OpGeneratorResult,
+    'vrouter': OpVRouterResult,
+    'control-node': OpBGPRouterResult,
+    'virtual-network': OpVNResult,
+    'virtual-machine': OpVMResult,
+    'virtual-machine-interface': OpVmIntfResult,
+    'loadbalancer': OpLBResult,
+    'service-instance': OpSIResult,
+    'service-chain': OpSTResult,
+    'bgp-peer': OpBGPPeerResult,
+    'xmpp-peer': OpBGPXmppPeerResult,
+    'analytics-node': OpCollectorResult,
+    'config-node': OpConfigResult,
+    'dns-node': OpConfigResult,
+    'database-node': OpDbResult,
+}
+
+
+class UveSnapshot (object):
+
+    '''
+        UVEs of one uve type as fetched from each of the collectors
+        uves is a dict of collector: {uve name: Op*Result}
+    '''
+
+    def __init__(self, uve_type, uves):
+        self.uve_type = uve_type
+        self.uves = uves
+        self.timestamp = time.time()
+
+    @property
+    def collectors(self):
+        return self.uves.keys()
+
+    def get(self, key, collector=None):
+        '''
+            Returns the uve of key from collector, or from the first
+            collector which has it if collector is not specified
+        '''
+        if collector:
+            return self.uves.get(collector, {}).get(key)
+        for uves in self.uves.values():
+            if key in uves:
+                return uves[key]
+        return None
+
+    def missing(self, key):
+        ''' Returns the collectors which did not return the uve of key '''
+        return [collector for collector, uves in self.uves.items()
+                if key not in uves]
+
+    def update(self, snapshot):
+        for collector, uves in snapshot.uves.items():
+            self.uves.setdefault(collector, {}).update(uves)
+        self.timestamp = snapshot.timestamp
+
+
 if __name__ == '__main__':
     ret = [{u'process_name': u'contrail-topology', u'start_count': 2, u'process_state': u'PROCESS_STATE_RUNNING', u'last_stop_time': u'1459335478187353', u'core_file_list': [], u'last_start_time': u'1459335485479907', u'stop_count': 1, u'last_exit_time': None, u'exit_count': 0}, {u'process_name': u'contrail-snmp-collector', u'start_count': 5, u'process_state': u'PROCESS_STATE_RUNNING', u'last_stop_time': u'1459335460085416', u'core_file_list': [], u'last_start_time': u'1459354997793674', u'stop_count': 1, u'last_exit_time': u'1459354992338304', u'exit_count': 3}, {u'process_name': u'contrail-query-engine', u'start_count': 2, u'process_state': u'PROCESS_STATE_RUNNING', u'last_stop_time': None, u'core_file_list': [u'/var/crashes/core.contrail-query-.28570.nodea18.1459354650'], u'last_start_time': u'1459354657348157', u'stop_count': 0, u'last_exit_time': u'1459354651334948', u'exit_count': 1}, {u'process_name': u'contrail-analytics-nodemgr', u'start_count': 1, u'process_state': u'PROCESS_STATE_RUNNING', u'last_stop_time': u'1459335448983065', u'core_file_list': [], u'last_start_time': u'1459335448985432', u'stop_count': 1, u'last_exit_time': None, u'exit_count': 0}, {u'process_name': u'contrail-analytics-api', u'start_count': 2, u'process_state': u'PROCESS_STATE_RUNNING', u'last_stop_time': None, u'core_file_list': [u'/var/crashes/core.contrail-analyt.28571.nodea18.1459354619'], u'last_start_time': u'1459354626974772', u'stop_count': 0, u'last_exit_time': u'1459354620439921', u'exit_count': 1}, {u'process_name': u'contrail-collector', u'start_count': 3, u'process_state': u'PROCESS_STATE_RUNNING', u'last_stop_time': u'1459336769593271', u'core_file_list': [u'/var/crashes/core.contrail-collec.20835.nodea18.1459354660'], u'last_start_time': u'1459354669133185', u'stop_count': 1, u'last_exit_time': u'1459354663017154', u'exit_count': 1}]
 
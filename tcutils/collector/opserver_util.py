@@ -23,6 +23,59 @@ except:
         TRACE = 4
 
 
+_json_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+READ_SIZE = 64 * 1024
+
+
+def iter_json_array(chunks, key='value'):
+    '''
+        Incrementally parse {"<key>": [item, item, ...]} out of an iterable
+        of string chunks of any size, each item is yielded as soon as it is
+        complete, without holding the whole document in memory
+    '''
+    buf = ''
+    pos = 0
+    in_array = False
+    chunks = iter(chunks)
+    eof = False
+    while True:
+        if not in_array:
+            start = buf.find('[', buf.find('"%s"' % key) + 1) \
+                if '"%s"' % key in buf else -1
+            if start >= 0:
+                (buf, pos, in_array) = (buf[start + 1:], 0, True)
+                continue
+        else:
+            while pos < len(buf) and buf[pos] in _WHITESPACE + ',':
+                pos += 1
+            if pos < len(buf) and buf[pos] == ']':
+                return
+            if pos < len(buf):
+                try:
+                    (item, end) = _json_decoder.raw_decode(buf, pos)
+                except ValueError:
+                    if eof:
+                        raise
+                else:
+                    # a number at the end of buf may be yet to be completed
+                    if eof or (end < len(buf) and
+                               buf[end] in _WHITESPACE + ',]'):
+                        yield item
+                        pos = end
+                        continue
+            # drop the consumed items before reading more
+            (buf, pos) = (buf[pos:], 0)
+        if eof:
+            if in_array:
+                raise ValueError('Unterminated %s array' % key)
+            return
+        try:
+            buf += next(chunks)
+        except StopIteration:
+            eof = True
+
+
 def enum(**enums):
     return type('Enum', (), enums)
 # end enum
@@ -100,27 +153,11 @@ class OpServerUtils(object):
 
     @staticmethod
     def parse_query_result(result):
-        done = False
-        resit = result.iter_lines()
-        while not done:
-            try:
-                ln = resit.next()
-                if ln == '{"value": [':
-                    continue
-                if ln == ']}':
-                    done = True
-                    continue
-                if ln[0] == ',':
-                    out_line = '[ {} ' + ln + ' ]'
-                else:
-                    out_line = '[ {} , ' + ln + ' ]'
-
-                out_list = json.loads(out_line)
-                out_list.pop(0)
-                for i in out_list:
-                    yield i
-            except Exception as e:
-                print "Error parsing %s results: %s" % (ln, str(e))
+        try:
+            for item in iter_json_array(result.iter_content(READ_SIZE)):
+                yield item
+        except Exception as e:
+            print "Error parsing results: %s" % str(e)
         return
     # end parse_query_result
 
@@ -0,0 +1,217 @@
+""" Latency and throughput benchmark of the analytics query engine.
+
+Runs a matrix of queries, tables x time windows x where clauses, at each
+of the concurrency levels against an opserver and records for each of them
+the p50/p95/p99 latency, rows/s and error rate. The results are saved as
+json and compared with a baseline, results of an earlier run, so that a
+query engine regression fails the run.
+
+    benchmark = QueryBenchmark(ops_inspect, logger=logger)
+    results = benchmark.run()
+    benchmark.save(results, 'query_benchmark.json')
+    regressions = compare_with_baseline(results,
+                                        load_results('baseline.json'))
+"""
+import os
+import json
+import math
+import time
+import socket
+import tempfile
+from collections import namedtuple, OrderedDict
+from multiprocessing.pool import ThreadPool
+
+from common import log_orig as contrail_logging
+
+QUERY_BENCHMARK_RESULTS = os.getenv('QUERY_BENCHMARK_RESULTS') or \
+    'query_benchmark.json'
+QUERY_BENCHMARK_BASELINE = os.getenv('QUERY_BENCHMARK_BASELINE')
+# Relative increase of latency or decrease of rows/s treated as regression
+QUERY_BENCHMARK_TOLERANCE = float(os.getenv('QUERY_BENCHMARK_TOLERANCE')
+                                  or 0.25)
+QUERY_BENCHMARK_ITERATIONS = int(os.getenv('QUERY_BENCHMARK_ITERATIONS')
+                                 or 10)
+CONCURRENCY_LEVELS = (1, 4, 8)
+PERCENTILES = (50, 95, 99)
+
+QueryCase = namedtuple('QueryCase', ['name', 'table', 'select_fields',
+                                     'where_clause', 'window', 'sort_fields',
+                                     'limit'])
+
+_TABLES = (
+    ('flow_series', 'FlowSeriesTable',
+     ['sourcevn', 'destvn', 'SUM(packets)', 'SUM(bytes)'],
+     ['(sourcevn=*)', '(protocol=17)'], ['SUM(packets)']),
+    ('message', 'MessageTable',
+     ['MessageTS', 'Source', 'ModuleId', 'Messagetype', 'Xmlmessage'],
+     ['', '(ModuleId=contrail-collector)'], None),
+    ('vn_stats', 'StatTable.UveVirtualNetworkAgent.vn_stats',
+     ['T=60', 'name', 'SUM(vn_stats.in_bytes)'], ['(name=*)'], None),
+    ('cpu_info', 'StatTable.AnalyticsCpuState.cpu_info',
+     ['T', 'name', 'cpu_info.cpu_share', 'cpu_info.mem_res'],
+     ['(name=*)'], None),
+)
+_WINDOWS = (('10m', 600), ('1h', 3600))
+
+
+def default_cases():
+    ''' Returns the default list of QueryCase '''
+    cases = list()
+    for (name, table, select_fields, where_clauses, sort_fields) in _TABLES:
+        for (window_name, window) in _WINDOWS:
+            for i, where_clause in enumerate(where_clauses):
+                cases.append(QueryCase('%s.%s.w%s' % (name, window_name, i),
+                                       table, select_fields, where_clause,
+                                       window, sort_fields,
+                                       1000 if sort_fields else None))
+    return cases
+
+
+def percentile(values, pct):
+    ''' Returns the nearest rank pct percentile of values, None if empty '''
+    if not values:
+        return None
+    values = sorted(values)
+    rank = int(math.ceil(pct / 100.0 * len(values))) - 1
+    return values[min(max(rank, 0), len(values) - 1)]
+
+
+def summarize(latencies, rows, errors, elapsed):
+    '''
+        latencies: secs taken by each successful query
+        rows: number of rows returned by the successful queries
+        errors: number of failed queries
+        elapsed: wall clock secs taken by all the queries
+    '''
+    total = len(latencies) + errors
+    summary = OrderedDict()
+    for pct in PERCENTILES:
+        summary['p%s' % pct] = percentile(latencies, pct)
+    summary['mean'] = sum(latencies) / len(latencies) if latencies else None
+    summary['queries'] = total
+    summary['errors'] = errors
+    summary['error_rate'] = float(errors) / total if total else 0.0
+    summary['rows'] = rows
+    summary['rows_per_sec'] = rows / elapsed if elapsed else 0.0
+    summary['queries_per_sec'] = total / elapsed if elapsed else 0.0
+    return summary
+
+
+class QueryBenchmark(object):
+
+    '''
+        ops_inspect: VerificationOpsSrv handle of the opserver to query
+        cases: list of QueryCase, default_cases() if not specified
+        iterations: number of times each case is queried at each
+                    concurrency level
+    '''
+
+    def __init__(self, ops_inspect, cases=None,
+                 concurrency_levels=CONCURRENCY_LEVELS,
+                 iterations=QUERY_BENCHMARK_ITERATIONS, logger=None):
+        self.ops_inspect = ops_inspect
+        self.cases = cases or default_cases()
+        self.concurrency_levels = concurrency_levels
+        self.iterations = iterations
+        self.logger = logger or contrail_logging.getLogger(__name__)
+
+    def run_query(self, case):
+        ''' Returns (secs taken, rows) of the query, (secs, None) on error '''
+        start = time.time()
+        try:
+            result = self.ops_inspect.query(
+                case.table, start_time='now-%ss' % case.window,
+                end_time='now', select_fields=case.select_fields,
+                where_clause=case.where_clause,
+                sort_fields=case.sort_fields, sort=2 if case.sort_fields
+                else None, limit=case.limit)
+            rows = None if result is None else sum(1 for _ in result)
+        except Exception as e:
+            self.logger.debug('Query %s failed: %s' % (case.name, e))
+            rows = None
+        return (time.time() - start, rows)
+
+    def run_case(self, case, concurrency):
+        ''' Returns summary of iterations runs of case '''
+        pool = ThreadPool(concurrency)
+        start = time.time()
+        try:
+            samples = pool.map(self.run_query, [case] * self.iterations)
+        finally:
+            pool.terminate()
+        elapsed = time.time() - start
+        succeeded = [(secs, rows) for (secs, rows) in samples
+                     if rows is not None]
+        return summarize([secs for (secs, _) in succeeded],
+                         sum(rows for (_, rows) in succeeded),
+                         len(samples) - len(succeeded), elapsed)
+
+    def run(self):
+        '''
+            Returns dict of run metadata and results, dict of
+            "<case name>@<concurrency>": summary
+        '''
+        results = OrderedDict()
+        for case in self.cases:
+            for concurrency in self.concurrency_levels:
+                key = '%s@%s' % (case.name, concurrency)
+                results[key] = self.run_case(case, concurrency)
+                self.logger.info('Query %s: p50 %s p95 %s p99 %s secs, '
+                                 '%.1f rows/s, %.0f%% errors' % (
+                                     key, results[key]['p50'],
+                                     results[key]['p95'],
+                                     results[key]['p99'],
+                                     results[key]['rows_per_sec'],
+                                     results[key]['error_rate'] * 100))
+        return OrderedDict([('timestamp', time.time()),
+                            ('host', socket.gethostname()),
+                            ('iterations', self.iterations),
+                            ('results', results)])
+
+    @staticmethod
+    def save(results, path=QUERY_BENCHMARK_RESULTS):
+        ''' Save the results as json, atomically '''
+        (fd, tmp_file) = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(path)))
+        with os.fdopen(fd, 'w') as fp:
+            json.dump(results, fp, indent=2)
+        os.rename(tmp_file, path)
+# end QueryBenchmark
+
+
+def load_results(path):
+    ''' Returns results saved by QueryBenchmark.save, None if absent '''
+    try:
+        with open(path) as fd:
+            return json.load(fd)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def compare_with_baseline(results, baseline,
+                          tolerance=QUERY_BENCHMARK_TOLERANCE):
+    '''
+        Returns list of regressions of results wrt baseline, a regression
+        is p95/p99 latency or error rate higher, or rows/s lower, than in
+        the baseline by more than tolerance
+        Cases absent in either of them are not compared
+    '''
+    regressions = list()
+    baseline = (baseline or dict()).get('results', dict())
+    for key, summary in results['results'].iteritems():
+        base = baseline.get(key)
+        if not base:
+            continue
+        for metric in ('p95', 'p99'):
+            if summary[metric] is None or base[metric] is None:
+                continue
+            if summary[metric] > base[metric] * (1 + tolerance):
+                regressions.append('%s: %s %.3fs, baseline %.3fs' % (
+                    key, metric, summary[metric], base[metric]))
+        if summary['rows_per_sec'] < base['rows_per_sec'] * (1 - tolerance):
+            regressions.append('%s: %.1f rows/s, baseline %.1f rows/s' % (
+                key, summary['rows_per_sec'], base['rows_per_sec']))
+        if summary['error_rate'] > base['error_rate'] + tolerance / 10:
+            regressions.append('%s: error rate %.2f, baseline %.2f' % (
+                key, summary['error_rate'], base['error_rate']))
+    return regressions
@@ -19,6 +19,17 @@ warnings.filterwarnings('ignore', ".*InsecurePlatformWarning.*")
 warnings.filterwarnings('ignore', ".*SubjectAltNameWarning.*")
 from common.contrail_services import BackupImplementedServices, \
     ServiceHttpPortMap, CONTRAIL_PODS_SERVICES_MAP
+from tcutils.verification_util import HttpSessionPool
+from tcutils.threadpool_lib import map_in_parallel
+from tcutils.util import exec_cmd_on_server
+
+# Max number of nodes/services probed concurrently
+STATUS_WORKERS = int(os.environ.get('CONTRAIL_STATUS_WORKERS') or 32)
+# Keep-alive sessions to the introspect ports, without retries since a
+# connection error is itself the status of the service
+status_sessions = HttpSessionPool(max_retries=0)
+# (ip, port) of the introspects which are reachable only over https
+_secure_introspects = set()
 
 class IntrospectUtil(object):
     def __init__(self, ip, port, debug, timeout, keyfile, certfile, cacert):
@@ -40,11 +51,14 @@ class IntrospectUtil(object):
     def _load(self, path):
         url = self._mk_url_str(path)
         try:
-            resp = requests.get(url, timeout=self._timeout)
+            if (self._ip, self._port) in _secure_introspects:
+                raise requests.ConnectionError()
+            resp = status_sessions.get(url).get(url, timeout=self._timeout)
         except requests.ConnectionError:
             url = self._mk_url_str(path, True)
-            resp = requests.get(url, timeout=self._timeout, verify=\
-                    self._cacert, cert=(self._certfile, self._keyfile))
+            resp = status_sessions.get(url).get(url, timeout=self._timeout,
+                    verify=self._cacert, cert=(self._certfile, self._keyfile))
+            _secure_introspects.add((self._ip, self._port))
         if resp.status_code == requests.codes.ok:
             return etree.fromstring(resp.text)
         else:
@@ -217,9 +231,32 @@ def get_container_status(container, containers):
     found = container in containers
     return 'active' if found else 'inactive'
 
+def get_active_containers(node, inputs):
+    ''' Thread safe equivalent of inputs.get_active_containers '''
+    cmd = "docker ps -f status=running --format {{.Names}} 2>/dev/null"
+    try:
+        (_, output) = exec_cmd_on_server(cmd, node,
+                                         inputs.host_data[node]['username'],
+                                         inputs.host_data[node]['password'],
+                                         as_sudo=True)
+    except Exception as e:
+        inputs.logger.debug('Unable to get containers of %s: %s' % (node, e))
+        return []
+    return [x.strip('\r') for x in output.split('\n')]
+
+def _probe_svc(probe, *args):
+    (node, svc) = probe
+    return get_svc_uve_info(node, svc, *args)
+
 def contrail_status(inputs=None, host=None, role=None, service=None,
                     debug=False, detail=False, timeout=30,
-                    keyfile=None, certfile=None, cacert=None):
+                    keyfile=None, certfile=None, cacert=None,
+                    probes=None, workers=None):
+    '''
+    All the nodes, and then all the services in the nodes, are probed
+    concurrently, atmost workers(default STATUS_WORKERS) at a time
+    probes : dict of node: list of services, to probe only these services
+    '''
     status_dict = dict()
     if not inputs:
         from common import contrail_test_init
@@ -229,6 +266,7 @@ def contrail_status(inputs=None, host=None, role=None, service=None,
     certfile = certfile or inputs.introspect_certfile
     keyfile = keyfile or inputs.introspect_keyfile
     cacert = cacert or inputs.introspect_cafile
+    workers = workers or STATUS_WORKERS
 
     if host:
         host = [host] if isinstance(host, str) else host
@@ -237,37 +275,52 @@ def contrail_status(inputs=None, host=None, role=None, service=None,
     if service:
         service = [service] if isinstance(service, str) else service
 
-    for node in host or inputs.host_ips:
-        containers = inputs.get_active_containers(node)
+    # list of (node, [(role, services)]), role is None if
+    # the services are specified
+    layout = list()
+    for node in (probes.keys() if probes else host or inputs.host_ips):
+        if probes or service:
+            layout.append((node, [(None, probes[node] if probes
+                                   else service)]))
+            continue
+        groups = list()
+        for r in role or inputs.get_roles(node):
+            if r not in CONTRAIL_PODS_SERVICES_MAP:
+                groups.append((r, None))
+                continue
+            groups.append((r, [svc for svc in CONTRAIL_PODS_SERVICES_MAP[r]
+                if not (inputs.deployer == 'helm' and
+                        svc == 'config-rabbitmq')]))
+        layout.append((node, groups))
+
+    containers = map_in_parallel(get_active_containers,
+                                 [node for node, _ in layout],
+                                 max_workers=workers, args=(inputs,))
+    container_status = dict()
+    for node, groups in layout:
+        for r, svcs in groups:
+            for svc in svcs or []:
+                container_status[(node, svc)] = get_container_status(
+                    inputs.get_container_name(node, svc), containers[node])
+    uve_info = map_in_parallel(_probe_svc,
+        [probe for probe, status in container_status.items()
+         if status == 'active'], max_workers=workers,
+        args=(debug, detail, timeout, keyfile, certfile, cacert))
+
+    for node, groups in layout:
         print node
         status_dict[node] = dict()
-        if service:
-            for svc in service:
-                desc = None
-                status = get_container_status(
-                    inputs.get_container_name(node, svc), containers)
-                if status == 'active':
-                    status, desc = get_svc_uve_info(node, svc, debug, detail,
-                                   timeout, keyfile, certfile, cacert)
+        for r, svcs in groups:
+            if r:
+                print '  '+r
+            if svcs is None:
+                print 'role '+r+' is not yet supported'
+                continue
+            for svc in svcs:
+                status, desc = uve_info.get((node, svc),
+                    (container_status[(node, svc)], None))
                 status_dict[node][svc] = {'status': status, 'description': desc}
                 print '    %s:%s%s'%(svc, status, ' (%s)'%desc if desc else '')
-        else:
-            for r in role or inputs.get_roles(node):
-                print '  '+r
-                if r not in CONTRAIL_PODS_SERVICES_MAP:
-                    print 'role '+r+' is not yet supported'
-                    continue
-                for svc in CONTRAIL_PODS_SERVICES_MAP[r]:
-                    desc = None
-                    if inputs.deployer == 'helm' and svc == 'config-rabbitmq':
-                        continue
-                    status = get_container_status(
-                        inputs.get_container_name(node, svc), containers)
-                    if status == 'active':
-                        status, desc = get_svc_uve_info(node, svc,
-                            debug, detail, timeout, keyfile, certfile, cacert)
-                    status_dict[node][svc] = {'status': status, 'description': desc}
-                    print '    %s:%s%s'%(svc, status, ' (%s)'%desc if desc else '')
     return status_dict
 
 def main():
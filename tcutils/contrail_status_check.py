@@ -44,6 +44,29 @@ class ContrailStatusChecker(object):
                     return False
         return True
 
+    def _get_pending_services(self, status_dict, expected_state=None):
+        '''Returns dict of host: services not yet up or in expected_state'''
+        pending = defaultdict(list)
+        failed_services = self._get_failed_services(status_dict)
+        for host in status_dict:
+            for service in status_dict[host]:
+                status = status_dict[host][service]['status']
+                if service in failed_services.get(host, {}) or (
+                   expected_state is not None and status != expected_state):
+                    pending[host].append(service)
+        return dict(pending)
+
+    def _get_status(self, status_dict, pending, nodes, roles, services,
+                    keyfile=None, certfile=None, cacert=None):
+        if not pending:
+            return contrail_status(self.inputs, nodes, roles, services,
+                keyfile=keyfile, certfile=certfile, cacert=cacert)
+        status = contrail_status(self.inputs, probes=pending,
+            keyfile=keyfile, certfile=certfile, cacert=cacert)
+        for host in status:
+            status_dict[host].update(status[host])
+        return status_dict
+
     def wait_till_service_down(self, *args, **kwargs):
         return self.wait_till_contrail_cluster_stable(*args, expectation=False, **kwargs)
 
@@ -51,14 +74,26 @@ class ContrailStatusChecker(object):
             services=None, delay=10, tries=30, expectation=True,
             expected_state=None, keyfile=None, certfile=None, cacert=None):
         exp = 'up' if expectation else 'down'
+        status_dict = pending = None
         for i in range(0, tries):
-            status_dict = contrail_status(self.inputs, nodes, roles, services,
-                keyfile=keyfile, certfile=certfile, cacert=cacert)
+            # While waiting for the services to come up, only the services
+            # which were not yet up in the previous iteration are probed
+            status_dict = self._get_status(status_dict, pending, nodes,
+                roles, services, keyfile, certfile, cacert)
+            if pending and not self._get_pending_services(status_dict,
+                                                          expected_state):
+                # Confirm that the rest did not go down meanwhile
+                pending = None
+                status_dict = self._get_status(status_dict, pending, nodes,
+                    roles, services, keyfile, certfile, cacert)
             failed_services = self._get_failed_services(status_dict)
             if (failed_services and expectation) or (not expectation and not failed_services):
                 self.inputs.logger.debug('%s'%failed_services)
                 self.inputs.logger.debug('Not all services up. '
                    'Sleeping for %s seconds. iteration: %s' %(delay, i))
+                if expectation:
+                    pending = self._get_pending_services(status_dict,
+                                                         expected_state)
                 time.sleep(delay)
                 continue
             elif (expected_state is not None) and (
@@ -67,6 +102,9 @@ class ContrailStatusChecker(object):
                     'expected state %s'
                    'Sleeping for %s seconds. iteration: %s' %(
                     expected_state, delay, i))
+                if expectation:
+                    pending = self._get_pending_services(status_dict,
+                                                         expected_state)
                 time.sleep(delay)
                 continue
             else:
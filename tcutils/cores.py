@@ -12,9 +12,13 @@ from fabric.contrib.files import exists
 from fabric.context_managers import settings, hide
 from paramiko.ssh_exception import ChannelException
 
-from tcutils.util import retry
+from tcutils.util import retry, get_os_env, exec_cmd_on_server
+from tcutils.threadpool_lib import map_in_parallel
 
 CORE_DIR = '/var/crashes'
+SWEEP_MARKER = '==CONTRAIL-TEST-SWEEP=='
+SWEEP_WORKERS = int(get_os_env('HEALTH_SWEEP_WORKERS') or 32)
+SWEEP_TIMEOUT = 60
 
 
 class TestFailed(Exception):
@@ -96,14 +100,21 @@ def get_service_crashes_node(node_ip, user, password):
     """Get the list of services crashed in one of the nodes in the test setup.
     """
     crash = None
-    services = []
     with hide('everything'):
         with settings(
             host_string='%s@%s' % (user, node_ip), password=password,
                 warn_only=True, abort_on_prompts=False):
             (ret_val, crash) = _run("contrail-status")
-    if crash and "Failed service list" in crash:
-        for line in crash.split("\n"):
+    return parse_service_crashes(crash)
+# end get_service_crashes_node
+
+
+def parse_service_crashes(output):
+    """Get the list of inactive/failed services from contrail-status output.
+    """
+    services = []
+    if output and "Failed service list" in output:
+        for line in output.split("\n"):
             if "Failed service list" in line:
                 # dont iterate beyond this to look for service: status
                 break
@@ -117,4 +128,85 @@ def get_service_crashes_node(node_ip, user, password):
                 services.append(service)
 
     return services
-# end get_service_crashes_node
+# end parse_service_crashes
+
+
+class HealthSweep(object):
+    """Collect cores and service crashes of all the nodes in the test setup.
+
+    Every node is queried concurrently, atmost `workers` at a time, with
+    one remote command which lists the cores and runs contrail-status.
+    With incremental set, the core list of a node is sent back only if
+    the checksum of the listing has changed since the previous sweep.
+    """
+
+    def __init__(self, inputs, workers=SWEEP_WORKERS, incremental=True):
+        self.inputs = inputs
+        self.logger = inputs.logger
+        self.workers = workers
+        self.incremental = incremental
+        self.checksums = {}
+        self.cores = {}
+        self.crashes = {}
+
+    def _get_cmd(self, node_ip):
+        checksum = self.checksums.get(node_ip) if self.incremental else None
+        cmd = 'if cd %s 2>/dev/null; then ' % CORE_DIR
+        cmd += 'c=$(ls core.* 2>/dev/null | cksum | tr " " :); echo "$c"; '
+        cmd += 'if [ "$c" != "%s" ]; then ls core.* 2>/dev/null; fi; ' % (
+            checksum or '')
+        cmd += 'fi; echo %s; contrail-status 2>/dev/null' % SWEEP_MARKER
+        return cmd
+
+    @retry(tries=10, delay=3)
+    def _exec(self, node_ip):
+        username = self.inputs.host_data[node_ip]['username']
+        password = self.inputs.host_data[node_ip]['password']
+        try:
+            (status, output) = exec_cmd_on_server(self._get_cmd(node_ip),
+                                                  node_ip, username, password,
+                                                  timeout=SWEEP_TIMEOUT)
+        except ChannelException, e:
+            # Handle too many concurrent sessions
+            if 'Administratively prohibited' in str(e):
+                sleep(random.randint(1,5))
+                return (False, None)
+            raise
+        return (True, output)
+
+    def _sweep_node(self, node_ip):
+        try:
+            (ret_val, output) = self._exec(node_ip)
+        except Exception as e:
+            self.logger.exception(e)
+            raise
+        (core_output, _, status) = (output or '').partition(SWEEP_MARKER)
+        lines = core_output.split()
+        checksum = lines[0] if lines else None
+        if checksum and checksum == self.checksums.get(node_ip) and \
+                self.incremental:
+            cores = self.cores.get(node_ip, [])
+        else:
+            cores = lines[1:]
+        return (checksum, cores, parse_service_crashes(status))
+
+    def run(self):
+        """Returns a tuple of cores and crashed services dicts keyed by node.
+        """
+        results = map_in_parallel(self._sweep_node, self.inputs.host_ips,
+                                  max_workers=self.workers)
+        cores = {}
+        crashes = {}
+        for node_ip, result in results.items():
+            if not result:
+                continue
+            (checksum, core, crash) = result
+            self.checksums[node_ip] = checksum
+            self.cores[node_ip] = core
+            if core:
+                cores[node_ip] = core
+            if crash:
+                crashes[node_ip] = crash
+        self.crashes = crashes
+        return (cores, crashes)
+# end HealthSweep
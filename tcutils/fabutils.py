@@ -1,4 +1,5 @@
 from fabric.operations import get, put, sudo, local
+from fabric.utils import abort
 from fabric.api import run, env
 from fabric.exceptions import CommandTimeout, NetworkError
 from fabric.contrib.files import exists
@@ -6,7 +7,9 @@ from fabric.state import connections as fab_connections
 from fabric.context_managers import settings, hide, cd
 
 import re
+import pipes
 from common import log_orig as contrail_logging
+from tcutils.ssh_pool import ssh_pool
 import time
 import os
 import tempfile
@@ -68,7 +71,6 @@ def remote_cmd(host_string, cmd, password=None, gateway=None,
     logger.debug('Running remote_cmd, Cmd : %s, host_string: %s, password: %s'
         'gateway: %s, gateway password: %s' %(cmd, host_string, password,
             gateway, gateway_password))
-    fab_connections.clear()
     if as_daemon:
         cmd = 'nohup ' + cmd + ' & '
         if pidfile:
@@ -95,7 +97,7 @@ def remote_cmd(host_string, cmd, password=None, gateway=None,
 
     # with hide('everything'), settings(host_string=host_string,
     #with hide('everything'), settings(
-    with settings(
+    with ssh_pool.session(host_string, gateway=gateway), settings(
             host_string=host_string,
             gateway=gateway,
             warn_only=warn_only,
@@ -130,6 +132,104 @@ def remote_cmd(host_string, cmd, password=None, gateway=None,
         return real_output
 
 
+BATCH_BEGIN = '<<<CT-BATCH-BEGIN %d>>>'
+BATCH_END = '<<<CT-BATCH-END %d'
+BATCH_END_RE = re.compile(r'<<<CT-BATCH-END (\d+) (\d*) (\S*) (\S*)>>>')
+
+
+def build_batch_script(cmds, stop_on_error=False):
+    """ Build a shell script which runs each of the cmds in its own subshell
+        and frames their output with markers carrying the index, exit code
+        and start/end timestamps of the cmd
+        With stop_on_error set, the script exits with the exit code of the
+        first cmd which fails, without running the subsequent ones
+    """
+    script = list()
+    for index, cmd in enumerate(cmds):
+        line = ("echo '%s'; t0=$(date +%%s.%%N); ( %s ); rc=$?; "
+                "t1=$(date +%%s.%%N); echo; echo \"%s $rc $t0 $t1>>>\""
+                % (BATCH_BEGIN % index, cmd, BATCH_END % index))
+        if stop_on_error:
+            line += '; [ $rc -eq 0 ] || exit $rc'
+        script.append(line)
+    return '\n'.join(script)
+
+
+def _batch_timestamp(value):
+    # busybox date doesnt support %N
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return float(value.split('.')[0])
+        except ValueError:
+            return None
+
+
+def parse_batch_output(cmds, output, raw=False):
+    """ Split the output of a script built by build_batch_script
+        Returns a list, one dict per cmd, with keys
+        cmd, output, exit_code and duration(secs)
+    """
+    results = [{'cmd': cmd, 'output': None, 'exit_code': None,
+                'duration': None} for cmd in cmds]
+    output = (output or '').replace('\r\n', '\n')
+    for index in range(len(cmds)):
+        begin = output.find(BATCH_BEGIN % index)
+        if begin < 0:
+            continue
+        begin += len(BATCH_BEGIN % index) + 1
+        end = output.find(BATCH_END % index, begin)
+        cmd_output = output[begin:] if end < 0 else output[begin:end]
+        # fab strips the trailing newlines of the output of a command
+        cmd_output = cmd_output.rstrip('\n')
+        if end >= 0:
+            match = BATCH_END_RE.match(output, end)
+            if match:
+                if match.group(2):
+                    results[index]['exit_code'] = int(match.group(2))
+                (t0, t1) = (_batch_timestamp(match.group(3)),
+                            _batch_timestamp(match.group(4)))
+                if t0 is not None and t1 is not None:
+                    results[index]['duration'] = t1 - t0
+        results[index]['output'] = cmd_output if raw else \
+            remove_unwanted_output(cmd_output)
+    return results
+
+
+def remote_cmd_batch(host_string, cmds, raw=False, warn_only=True,
+                     **kwargs):
+    """ Run a list of commands on a remote node over a single ssh channel.
+    Accepts the same arguments as remote_cmd except as_daemon and pidfile.
+    Each command is run in its own subshell. With warn_only set a failing
+    command doesnt stop the subsequent ones, else the subsequent ones are
+    not run and fab abort is called with the command and its exit code,
+    same as a failing command run with remote_cmd.
+
+    Returns a list, one dict per cmd, with keys
+        cmd, output, exit_code and duration(secs)
+    exit_code is None if the command did not complete (eg. on timeout)
+    """
+    if not cmds:
+        return list()
+    script = build_batch_script(cmds, stop_on_error=not warn_only)
+    # remote_cmd runs sudo without a shell on tiny images, only the first
+    # line of the script would be run as root
+    if host_string.split('@')[0] == 'tc' and kwargs.get('with_sudo'):
+        script = 'sh -c %s' % pipes.quote(script)
+    # the exit code of each cmd is checked here, so that the outputs of
+    # the cmds run before a failing one are not lost
+    output = remote_cmd(host_string, script, raw=True, warn_only=True,
+                        **kwargs)
+    results = parse_batch_output(cmds, output, raw=raw)
+    if not warn_only:
+        for result in results:
+            if result['exit_code'] != 0:
+                abort('Command %s on %s failed with exit code %s' % (
+                    result['cmd'], host_string, result['exit_code']))
+    return results
+
+
 def remove_unwanted_output(text):
     """ Fab output usually has content like [ x.x.x.x ] out : <content>
     Args:
@@ -0,0 +1,357 @@
+""" Index of the packets of a pcap file, built in a single pass.
+
+Each packet is decoded once, with struct, into a compact PcapRecord
+holding its L2/L3/L4 tuple, the vlan/pcp, dscp, tunnel encapsulation,
+mpls label/exp and the inner ips of tunneled packets. Counts, searches
+and qos checks are then answered from the records instead of running
+tcpdump on the capture again.
+
+A capture still being written on a remote node is pulled incrementally:
+RemotePcap fetches only the bytes appended since its previous refresh,
+gzip compressed, and feeds them to the index as they stream in.
+
+    index = get_pcap_index(session, '/tmp/tap1234_ab.pcap')
+    index.count(mac='02:cd:aa:bb:cc:dd')
+    index.values('dscp')
+"""
+import socket
+import struct
+import weakref
+import zlib
+import threading
+from collections import namedtuple
+
+from common import log_orig as contrail_logging
+
+PCAP_FIELDS = ('ts', 'length', 'src_mac', 'dst_mac', 'vlan', 'pcp',
+               'ethertype', 'src_ip', 'dst_ip', 'proto', 'sport', 'dport',
+               'dscp', 'encap', 'mpls_label', 'mpls_exp', 'vni',
+               'inner_src_ip', 'inner_dst_ip')
+PcapRecord = namedtuple('PcapRecord', PCAP_FIELDS)
+
+PCAP_MAGIC = {'\xd4\xc3\xb2\xa1': ('<', 1e-6), '\xa1\xb2\xc3\xd4': ('>', 1e-6),
+              '\x4d\x3c\xb2\xa1': ('<', 1e-9), '\xa1\xb2\x3c\x4d': ('>', 1e-9)}
+DLT_EN10MB = 1
+DLT_LINUX_SLL = 113
+
+ETH_P_IP = 0x0800
+ETH_P_ARP = 0x0806
+ETH_P_IPV6 = 0x86dd
+ETH_P_MPLS = 0x8847
+VLAN_TPIDS = (0x8100, 0x88a8, 0x9100)
+VXLAN_PORT = 4789
+MPLS_UDP_PORTS = (6635, 51234)
+IPPROTO_TCP = 6
+IPPROTO_UDP = 17
+IPPROTO_GRE = 47
+READ_SIZE = 64 * 1024
+
+
+def _mac(data):
+    return ':'.join('%02x' % ord(c) for c in data)
+
+
+def _ip(data):
+    if len(data) == 4:
+        return socket.inet_ntoa(data)
+    return socket.inet_ntop(socket.AF_INET6, data)
+
+
+def _parse_ip(pkt, offset):
+    ''' Returns (src_ip, dst_ip, proto, dscp, l4 offset or None) '''
+    version = ord(pkt[offset]) >> 4
+    if version == 4 and len(pkt) >= offset + 20:
+        ihl = (ord(pkt[offset]) & 0xf) * 4
+        (tos, frag, proto) = struct.unpack_from('!xB4xHxB', pkt, offset)
+        l4 = offset + ihl if not frag & 0x1fff else None
+        return (_ip(pkt[offset + 12:offset + 16]),
+                _ip(pkt[offset + 16:offset + 20]), proto, tos >> 2, l4)
+    if version == 6 and len(pkt) >= offset + 40:
+        (vtc, proto) = struct.unpack_from('!H4xB', pkt, offset)
+        return (_ip(pkt[offset + 8:offset + 24]),
+                _ip(pkt[offset + 24:offset + 40]), proto,
+                ((vtc >> 4) & 0xff) >> 2, offset + 40)
+    return (None, None, None, None, None)
+
+
+def _parse_inner(pkt, offset, ethernet=False):
+    ''' Returns (src_ip, dst_ip) of the packet carried in a tunnel '''
+    if ethernet:
+        if len(pkt) < offset + 14:
+            return (None, None)
+        ethertype = struct.unpack_from('!H', pkt, offset + 12)[0]
+        if ethertype not in (ETH_P_IP, ETH_P_IPV6):
+            return (None, None)
+        offset += 14
+    if len(pkt) <= offset:
+        return (None, None)
+    return _parse_ip(pkt, offset)[:2]
+
+
+def _parse_mpls(pkt, offset):
+    ''' Returns (label, exp, inner src ip, inner dst ip) of the top label '''
+    if len(pkt) < offset + 4:
+        return (None, None, None, None)
+    entry = struct.unpack_from('!I', pkt, offset)[0]
+    (label, exp) = (entry >> 12, (entry >> 9) & 0x7)
+    while not entry & 0x100 and len(pkt) >= offset + 8:
+        offset += 4
+        entry = struct.unpack_from('!I', pkt, offset)[0]
+    offset += 4
+    # L3 payload starts with the ip version, else it is an L2 frame
+    ethernet = len(pkt) > offset and ord(pkt[offset]) >> 4 not in (4, 6)
+    return (label, exp) + _parse_inner(pkt, offset, ethernet=ethernet)
+
+
+def _is_mpls(pkt, offset, max_labels=3):
+    ''' Returns True if pkt at offset looks like an mpls label stack
+        followed by an ip packet or an ethernet frame
+    '''
+    for _ in range(max_labels):
+        if len(pkt) < offset + 5:
+            return False
+        entry = struct.unpack_from('!I', pkt, offset)[0]
+        offset += 4
+        if entry & 0x100:
+            break
+    else:
+        return False
+    first = ord(pkt[offset])
+    if first >> 4 == 6 or (first >> 4 == 4 and first & 0xf >= 5):
+        return True
+    return len(pkt) >= offset + 14 and struct.unpack_from(
+        '!H', pkt, offset + 12)[0] in (ETH_P_IP, ETH_P_IPV6, ETH_P_ARP) + \
+        VLAN_TPIDS
+
+
+def parse_packet(ts, length, pkt, linktype=DLT_EN10MB):
+    ''' Decode a captured frame into a PcapRecord '''
+    fields = dict.fromkeys(PCAP_FIELDS)
+    fields['ts'] = ts
+    fields['length'] = length
+    if linktype == DLT_LINUX_SLL:
+        if len(pkt) < 16:
+            return PcapRecord(**fields)
+        fields['src_mac'] = _mac(pkt[6:12])
+        ethertype = struct.unpack_from('!H', pkt, 14)[0]
+        offset = 16
+    else:
+        if len(pkt) < 14:
+            return PcapRecord(**fields)
+        fields['dst_mac'] = _mac(pkt[0:6])
+        fields['src_mac'] = _mac(pkt[6:12])
+        ethertype = struct.unpack_from('!H', pkt, 12)[0]
+        offset = 14
+        while ethertype in VLAN_TPIDS and len(pkt) >= offset + 4:
+            (tci, ethertype) = struct.unpack_from('!HH', pkt, offset)
+            if fields['vlan'] is None:
+                (fields['pcp'], fields['vlan']) = (tci >> 13, tci & 0xfff)
+            offset += 4
+    fields['ethertype'] = ethertype
+    if ethertype == ETH_P_ARP and len(pkt) >= offset + 28:
+        fields['proto'] = 'arp'
+        fields['src_ip'] = _ip(pkt[offset + 14:offset + 18])
+        fields['dst_ip'] = _ip(pkt[offset + 24:offset + 28])
+    elif ethertype == ETH_P_MPLS:
+        (fields['mpls_label'], fields['mpls_exp'], fields['inner_src_ip'],
+         fields['inner_dst_ip']) = _parse_mpls(pkt, offset)
+    elif ethertype in (ETH_P_IP, ETH_P_IPV6) and len(pkt) > offset:
+        (fields['src_ip'], fields['dst_ip'], fields['proto'], fields['dscp'],
+         l4) = _parse_ip(pkt, offset)
+        proto = fields['proto']
+        if l4 is not None and proto in (IPPROTO_TCP, IPPROTO_UDP) and \
+                len(pkt) >= l4 + 4:
+            (fields['sport'], fields['dport']) = struct.unpack_from(
+                '!HH', pkt, l4)
+        if l4 is not None and proto == IPPROTO_UDP and len(pkt) >= l4 + 16:
+            payload = l4 + 8
+            if fields['dport'] == VXLAN_PORT or \
+                    pkt[payload:payload + 4] == '\x08\x00\x00\x00':
+                fields['encap'] = 'VxLAN'
+                fields['vni'] = struct.unpack_from(
+                    '!I', pkt, payload + 4)[0] >> 8
+                (fields['inner_src_ip'], fields['inner_dst_ip']) = \
+                    _parse_inner(pkt, payload + 8, ethernet=True)
+            # MPLSoUDP may be on a port other than the default ones
+            elif fields['dport'] in MPLS_UDP_PORTS or \
+                    _is_mpls(pkt, payload):
+                fields['encap'] = 'MPLSoUDP'
+                (fields['mpls_label'], fields['mpls_exp'],
+                 fields['inner_src_ip'], fields['inner_dst_ip']) = \
+                    _parse_mpls(pkt, payload)
+        elif l4 is not None and proto == IPPROTO_GRE and len(pkt) >= l4 + 4:
+            (flags, gre_proto) = struct.unpack_from('!HH', pkt, l4)
+            if gre_proto == ETH_P_MPLS:
+                fields['encap'] = 'MPLSoGRE'
+                # checksum, key and sequence number are 4 bytes each
+                gre_len = 4 + 4 * bin(flags & 0xb000).count('1')
+                (fields['mpls_label'], fields['mpls_exp'],
+                 fields['inner_src_ip'], fields['inner_dst_ip']) = \
+                    _parse_mpls(pkt, l4 + gre_len)
+    return PcapRecord(**fields)
+
+
+class PcapIndex(object):
+
+    '''
+        Records of the packets of a pcap, the content of the pcap is fed
+        in chunks of any size through feed()
+    '''
+
+    def __init__(self):
+        self.records = list()
+        self._buffer = ''
+        self._header = None
+
+    @classmethod
+    def from_file(cls, path):
+        index = cls()
+        with open(path, 'rb') as fd:
+            for data in iter(lambda: fd.read(READ_SIZE), ''):
+                index.feed(data)
+        return index
+
+    def feed(self, data):
+        ''' Index the complete packets in data, the partial packet at the
+            end is kept back till the rest of it is fed
+        '''
+        buf = self._buffer + data
+        offset = 0
+        if self._header is None:
+            if len(buf) < 24:
+                self._buffer = buf
+                return
+            if buf[:4] not in PCAP_MAGIC:
+                raise ValueError('Not a pcap file')
+            (endian, resolution) = PCAP_MAGIC[buf[:4]]
+            linktype = struct.unpack_from(endian + 'I', buf, 20)[0]
+            self._header = (endian + 'IIII', resolution, linktype)
+            offset = 24
+        (fmt, resolution, linktype) = self._header
+        append = self.records.append
+        while len(buf) >= offset + 16:
+            (sec, frac, caplen, length) = struct.unpack_from(fmt, buf, offset)
+            end = offset + 16 + caplen
+            if len(buf) < end:
+                break
+            append(parse_packet(sec + frac * resolution, length,
+                                buf[offset + 16:end], linktype))
+            offset = end
+        self._buffer = buf[offset:]
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    @staticmethod
+    def _match(record, filters):
+        for key, value in filters.iteritems():
+            if key == 'mac':
+                if value.lower() not in (record.src_mac, record.dst_mac):
+                    return False
+            elif key == 'ip':
+                if value not in (record.src_ip, record.dst_ip,
+                                 record.inner_src_ip, record.inner_dst_ip):
+                    return False
+            elif key == 'port':
+                if int(value) not in (record.sport, record.dport):
+                    return False
+            elif callable(value):
+                if not value(getattr(record, key)):
+                    return False
+            elif getattr(record, key) != value:
+                return False
+        return True
+
+    def filter(self, **filters):
+        '''
+            Returns records matching all the filters, a filter is a
+            PcapRecord field=value or callable taking the field value, or
+            mac/ip/port to match either the source or the destination
+        '''
+        return [record for record in self.records
+                if self._match(record, filters)]
+
+    def count(self, **filters):
+        return len(self.filter(**filters)) if filters else len(self.records)
+
+    def values(self, field, **filters):
+        ''' Returns set of the values of field of the matching records '''
+        return set(getattr(record, field) for record in self.filter(**filters))
+
+    def search(self, value):
+        ''' Returns True if any packet has value as its mac, ip or port '''
+        value = str(value)
+        for key in ('mac', 'ip', 'port'):
+            if key == 'port' and not value.isdigit():
+                continue
+            if self.filter(**{key: value}):
+                return True
+        return False
+# end PcapIndex
+
+
+def stream_pcap(session, pcap, offset=0):
+    ''' Yields the content of pcap from offset, on the node of the paramiko
+        session, in chunks as it is transferred gzip compressed
+    '''
+    cmd = 'sudo tail -c +%d %s 2>/dev/null | gzip -c' % (offset + 1, pcap)
+    (stdin, stdout, stderr) = session.exec_command(cmd)
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    for data in iter(lambda: stdout.read(READ_SIZE), ''):
+        yield decompressor.decompress(data)
+    yield decompressor.flush()
+
+
+def fetch_pcap(session, pcap):
+    ''' Returns the raw content of pcap on the node of the paramiko session
+    '''
+    return ''.join(stream_pcap(session, pcap))
+
+
+class RemotePcap(object):
+
+    '''
+        PcapIndex of a pcap on a remote node, reachable through a paramiko
+        session, which is refreshed with only the newly captured bytes
+    '''
+
+    def __init__(self, session, pcap, logger=None):
+        self.session = session
+        self.pcap = pcap
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        self.index = PcapIndex()
+        self.offset = 0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        with self.lock:
+            fetched = 0
+            for data in stream_pcap(self.session, self.pcap, self.offset):
+                fetched += len(data)
+                self.index.feed(data)
+            self.offset += fetched
+            self.logger.debug('Fetched %s bytes of %s, %s packets indexed' % (
+                fetched, self.pcap, len(self.index)))
+            return self.index
+# end RemotePcap
+
+# session: {pcap: RemotePcap}
+_remote_pcaps = weakref.WeakKeyDictionary()
+
+
+def get_pcap_index(session, pcap, refresh=True, logger=None):
+    ''' Returns PcapIndex of pcap on the node of the paramiko session '''
+    remote_pcap = _remote_pcaps.setdefault(session, dict()).get(pcap)
+    if remote_pcap is None:
+        remote_pcap = RemotePcap(session, pcap, logger=logger)
+        _remote_pcaps[session][pcap] = remote_pcap
+    elif not refresh:
+        return remote_pcap.index
+    return remote_pcap.refresh()
+
+
+def forget_pcap_index(session, pcap):
+    _remote_pcaps.get(session, dict()).pop(pcap, None)
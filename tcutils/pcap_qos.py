@@ -0,0 +1,196 @@
+""" Batched verification of the qos markings of captured packets.
+
+The 802.1p pcp, dscp, mpls exp and tunnel encapsulation of every packet of
+a pcap are decoded straight from the raw pcap bytes into numpy arrays, the
+expected markings are then checked with vectorized comparisons. Unlike the
+per packet checks, all the packets are verified and a QosReport is returned
+with the mismatch count, the distribution of the values and the first few
+offending packets of each field.
+
+    report = verify_qos_markings(fetch_pcap(session, pcap),
+                                 dscp=10, mpls_exp=5, encap='MPLSoUDP')
+    report.passed, report.mismatches['dscp'], report.offenders['dscp']
+
+Without numpy the same report is built from a PcapIndex of the packets.
+"""
+import struct
+from collections import Counter
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from tcutils.pcap_index import PcapIndex, PCAP_MAGIC, DLT_LINUX_SLL, \
+    ETH_P_IP, ETH_P_IPV6, ETH_P_MPLS, VLAN_TPIDS, VXLAN_PORT, \
+    MPLS_UDP_PORTS, IPPROTO_UDP, IPPROTO_GRE
+
+QOS_FIELDS = ('pcp', 'dscp', 'mpls_exp', 'encap')
+ENCAPS = (None, 'MPLSoUDP', 'MPLSoGRE', 'VxLAN')
+MAX_OFFENDERS = 10
+# Headers decoded are within these many bytes of the start of a packet
+MAX_HEADER_LEN = 256
+
+
+def _packet_offsets(data):
+    ''' Returns (linktype, [start of packet], [captured length]) '''
+    if len(data) < 24 or data[:4] not in PCAP_MAGIC:
+        raise ValueError('Not a pcap file')
+    endian = PCAP_MAGIC[data[:4]][0]
+    linktype = struct.unpack_from(endian + 'I', data, 20)[0]
+    unpack = struct.Struct(endian + '8xI').unpack_from
+    (starts, caplens) = (list(), list())
+    (offset, size) = (24, len(data))
+    while offset + 16 <= size:
+        caplen = unpack(data, offset)[0]
+        if offset + 16 + caplen > size:
+            break
+        starts.append(offset + 16)
+        caplens.append(caplen)
+        offset += 16 + caplen
+    return (linktype, starts, caplens)
+
+
+def decode_qos_headers(data):
+    '''
+        Decode the qos fields of all the packets of the raw pcap data
+        Returns dict of numpy arrays of pcp, dscp and mpls_exp, -1 where
+        the packet does not have the field, and encap, index in ENCAPS
+    '''
+    (linktype, starts, caplens) = _packet_offsets(data)
+    buf = np.frombuffer(data + '\0' * MAX_HEADER_LEN, dtype=np.uint8)
+    start = np.array(starts, dtype=np.int64)
+    caplen = np.array(caplens, dtype=np.int64)
+    # Offsets computed out of garbage headers are kept within the padding
+    at = lambda offset: np.minimum(offset, MAX_HEADER_LEN - 4) + start
+    u8 = lambda offset: buf[at(offset)].astype(np.int64)
+    u16 = lambda offset: u8(offset) << 8 | u8(offset + 1)
+    zeros = np.zeros(len(starts), dtype=np.int64)
+    missing = zeros - 1
+
+    pcp = missing
+    if linktype == DLT_LINUX_SLL:
+        (ethertype, l3) = (u16(zeros + 14), zeros + 16)
+    else:
+        (ethertype, l3) = (u16(zeros + 12), zeros + 14)
+        for _ in range(2):
+            tagged = np.in1d(ethertype, VLAN_TPIDS) & (caplen >= l3 + 4)
+            pcp = np.where(tagged & (pcp < 0), u8(l3) >> 5, pcp)
+            ethertype = np.where(tagged, u16(l3 + 2), ethertype)
+            l3 = l3 + 4 * tagged
+    version = u8(l3) >> 4
+    ipv4 = (ethertype == ETH_P_IP) & (version == 4) & (caplen >= l3 + 20)
+    ipv6 = (ethertype == ETH_P_IPV6) & (version == 6) & (caplen >= l3 + 40)
+    dscp = np.where(ipv4, u8(l3 + 1) >> 2,
+                    np.where(ipv6, (u16(l3) >> 6) & 0x3f, missing))
+    proto = np.where(ipv4, u8(l3 + 9), u8(l3 + 6))
+    l4 = np.where(ipv4, l3 + (u8(l3) & 0xf) * 4, l3 + 40)
+    l4_valid = (ipv4 & (u16(l3 + 6) & 0x1fff == 0)) | ipv6
+
+    udp = l4_valid & (proto == IPPROTO_UDP) & (caplen >= l4 + 16)
+    dport = u16(l4 + 2)
+    vxlan = udp & ((dport == VXLAN_PORT) |
+                   ((u16(l4 + 8) == 0x0800) & (u16(l4 + 10) == 0)))
+    mplsoudp = udp & ~vxlan & np.in1d(dport, MPLS_UDP_PORTS)
+    gre = l4_valid & (proto == IPPROTO_GRE) & (caplen >= l4 + 4) & \
+        (u16(l4 + 2) == ETH_P_MPLS)
+    # checksum, key and sequence number flags add 4 bytes each
+    flags = u16(l4)
+    gre_len = 4 + 4 * ((flags >> 15 & 1) + (flags >> 13 & 1) +
+                       (flags >> 12 & 1))
+    mpls = np.where(mplsoudp, l4 + 8, np.where(gre, l4 + gre_len, l3))
+    has_mpls = (mplsoudp | gre | (ethertype == ETH_P_MPLS)) & \
+        (caplen >= mpls + 4)
+    mpls_exp = np.where(has_mpls, u8(mpls + 2) >> 1 & 0x7, missing)
+
+    encap = np.where(mplsoudp, ENCAPS.index('MPLSoUDP'),
+                     np.where(gre, ENCAPS.index('MPLSoGRE'),
+                              np.where(vxlan, ENCAPS.index('VxLAN'), 0)))
+    return {'pcp': pcp, 'dscp': dscp, 'mpls_exp': mpls_exp, 'encap': encap}
+
+
+class QosReport(object):
+
+    '''
+        Result of the verification of the qos markings of a capture
+        mismatches: {field: number of packets not marked as expected}
+        distributions: {field: {value: number of packets}}
+        offenders: {field: [index of the first max_offenders mismatches]}
+        A packet without the field, eg untagged for pcp, is a mismatch
+    '''
+
+    def __init__(self, total):
+        self.total = total
+        self.expected = dict()
+        self.mismatches = dict()
+        self.distributions = dict()
+        self.offenders = dict()
+
+    @property
+    def passed(self):
+        return not any(self.mismatches.values())
+
+    def __str__(self):
+        lines = ['%s packets verified' % self.total]
+        for field in QOS_FIELDS:
+            if field not in self.expected:
+                continue
+            lines.append('%s: expected %s, %s mismatches, distribution %s, '
+                         'first offending packets %s' % (
+                             field, self.expected[field],
+                             self.mismatches[field],
+                             self.distributions[field],
+                             self.offenders[field]))
+        return '\n'.join(lines)
+# end QosReport
+
+
+def _verify_arrays(report, columns, expected, max_offenders):
+    for field, value in expected.iteritems():
+        column = columns[field]
+        if field == 'encap':
+            value = ENCAPS.index(value)
+        mismatch = column != value
+        (values, counts) = np.unique(column, return_counts=True)
+        if field == 'encap':
+            values = [ENCAPS[v] for v in values]
+        else:
+            values = [None if v < 0 else int(v) for v in values]
+        report.mismatches[field] = int(np.count_nonzero(mismatch))
+        report.distributions[field] = dict(zip(values, counts.tolist()))
+        report.offenders[field] = \
+            np.flatnonzero(mismatch)[:max_offenders].tolist()
+
+
+def _verify_records(report, records, expected, max_offenders):
+    for field, value in expected.iteritems():
+        column = [getattr(record, field) for record in records]
+        mismatch = [i for i, v in enumerate(column) if v != value]
+        report.mismatches[field] = len(mismatch)
+        report.distributions[field] = dict(Counter(column))
+        report.offenders[field] = mismatch[:max_offenders]
+
+
+def verify_qos_markings(data, dot1p=None, dscp=None, mpls_exp=None,
+                        encap=None, max_offenders=MAX_OFFENDERS):
+    '''
+        Verify that all the packets of the raw pcap data have the expected
+        markings, fields whose expected value is None are not verified
+        Returns QosReport
+    '''
+    expected = dict((field, value) for field, value in (
+        ('pcp', dot1p), ('dscp', dscp), ('mpls_exp', mpls_exp),
+        ('encap', encap)) if value is not None)
+    if encap is not None and encap not in ENCAPS:
+        raise ValueError('Unknown encapsulation %s' % encap)
+    if np is not None:
+        columns = decode_qos_headers(data)
+        report = QosReport(len(columns['encap']))
+        _verify_arrays(report, columns, expected, max_offenders)
+    else:
+        index = PcapIndex()
+        index.feed(data)
+        report = QosReport(len(index))
+        _verify_records(report, index.records, expected, max_offenders)
+    report.expected = expected
+    return report
@@ -0,0 +1,210 @@
+""" Persistent pool of ssh connections used by fabric based remote commands.
+
+Fabric caches one ssh client per host string in fabric.state.connections,
+including the clients of the gateways (compute nodes) used to reach VMs.
+SSHConnectionPool manages that cache instead of clearing it before every
+command, so that the gateway hop and the target session are reused across
+commands and tests.
+
+    with ssh_pool.session(vm_host_string, gateway=compute_host_string):
+        run(cmd)
+
+The pool
+    * keys sessions by (host_string, gateway), a session opened through a
+      different gateway (overlapping VM IPs across VNs) is reopened
+    * evicts sessions idle for more than idle_timeout seconds
+    * health checks the cached transport before reuse
+    * limits the number of concurrent commands per host to max_per_host
+    * never closes or reroutes a session, or its gateway, while a command
+      is using it. A session evicted meanwhile is closed once the last
+      command using it is done
+"""
+import os
+import time
+import threading
+from contextlib import contextmanager
+
+from fabric.state import connections as fab_connections
+from fabric.network import normalize_to_string
+
+from common import log_orig as contrail_logging
+
+IDLE_TIMEOUT = int(os.environ.get('SSH_POOL_IDLE_TIMEOUT') or 300)
+MAX_PER_HOST = int(os.environ.get('SSH_POOL_MAX_PER_HOST') or 8)
+KEEPALIVE = 30
+
+
+class SSHConnectionPool(object):
+
+    def __init__(self, cache=None, idle_timeout=IDLE_TIMEOUT,
+                 max_per_host=MAX_PER_HOST, logger=None):
+        self.cache = fab_connections if cache is None else cache
+        self.idle_timeout = idle_timeout
+        self.max_per_host = max_per_host
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        self.lock = threading.RLock()
+        self.released = threading.Condition(self.lock)
+        self.routes = dict()
+        self.last_used = dict()
+        # key: number of commands using the session, directly or as gateway
+        self.in_use = dict()
+        # sessions to be closed once they are not in use
+        self.stale = set()
+        self.semaphores = dict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def _key(host_string):
+        return normalize_to_string(host_string) if host_string else None
+
+    def _get_semaphore(self, key):
+        with self.lock:
+            if key not in self.semaphores:
+                self.semaphores[key] = threading.BoundedSemaphore(
+                    self.max_per_host)
+            return self.semaphores[key]
+
+    def _in_use(self, key):
+        return self.in_use.get(key, 0) > 0
+
+    def _close(self, key):
+        if self._in_use(key):
+            self.stale.add(key)
+            return
+        self.stale.discard(key)
+        client = dict.get(self.cache, key)
+        if client is not None:
+            try:
+                client.close()
+            except Exception as e:
+                self.logger.debug('Error closing ssh session %s: %s' % (
+                    key, e))
+            dict.pop(self.cache, key, None)
+            self.stats['evictions'] += 1
+        self.routes.pop(key, None)
+        self.last_used.pop(key, None)
+        # sessions tunneled through key are unusable once it is closed
+        for route_key, gateway in self.routes.items():
+            if gateway == key:
+                self._close(route_key)
+
+    def _is_healthy(self, key):
+        client = dict.get(self.cache, key)
+        if client is None:
+            return False
+        transport = client.get_transport()
+        if not transport or not transport.is_active():
+            return False
+        try:
+            transport.send_ignore()
+        except Exception:
+            return False
+        return True
+
+    def evict_idle(self):
+        ''' Close all the sessions which are idle for more than idle_timeout
+        '''
+        now = time.time()
+        with self.lock:
+            for key, last_used in self.last_used.items():
+                if now - last_used > self.idle_timeout and \
+                        not self._in_use(key):
+                    self._close(key)
+
+    def evict(self, host_string=None, host_ip=None):
+        ''' Close cached session(s) of a host_string or of all the
+            host strings of an ip, the ones in use once they are released
+        '''
+        with self.lock:
+            keys = list()
+            if host_string:
+                keys.append(self._key(host_string))
+            if host_ip:
+                keys.extend([key for key in self.cache.keys()
+                             if key.split('@')[-1].split(':')[0] == host_ip])
+            for key in keys:
+                self._close(key)
+
+    def clear(self):
+        with self.lock:
+            for key in self.cache.keys():
+                self._close(key)
+
+    def _prepare(self, key, gateway):
+        with self.lock:
+            self.evict_idle()
+            # A host string has one session in the cache, so it can be
+            # reopened through another gateway only once no one uses it
+            while self._in_use(key) and self.routes.get(key) != gateway:
+                self.released.wait()
+            if key not in self.cache:
+                self.stats['misses'] += 1
+            elif self.routes.get(key, None) != gateway:
+                self.logger.debug('Reopening ssh session %s through %s' % (
+                    key, gateway))
+                self._close(key)
+                self.stats['misses'] += 1
+            elif gateway and not self._is_healthy(gateway):
+                self._close(gateway)
+                self.stats['misses'] += 1
+            elif not self._is_healthy(key):
+                self._close(key)
+                self.stats['misses'] += 1
+            else:
+                self.stats['hits'] += 1
+            self.routes[key] = gateway
+            self.last_used[key] = time.time()
+            self.in_use[key] = self.in_use.get(key, 0) + 1
+            if gateway:
+                self.routes.setdefault(gateway, None)
+                self.last_used[gateway] = time.time()
+                self.in_use[gateway] = self.in_use.get(gateway, 0) + 1
+
+    def _release(self, key, gateway, failed=False):
+        ''' Drop one use of the sessions of key and gateway. A session no
+            longer in use is closed if it was evicted meanwhile, or if the
+            command failed and the session is unhealthy
+        '''
+        with self.lock:
+            for k in (key, gateway):
+                if not k:
+                    continue
+                self.in_use[k] -= 1
+                if not self.in_use[k]:
+                    del self.in_use[k]
+                    if k in self.stale or (failed and k in self.cache and
+                                           not self._is_healthy(k)):
+                        self._close(k)
+                if k not in self.cache:
+                    if not self._in_use(k):
+                        self.routes.pop(k, None)
+                        self.last_used.pop(k, None)
+                    continue
+                self.last_used[k] = time.time()
+                transport = dict.get(self.cache, k).get_transport()
+                if transport:
+                    transport.set_keepalive(KEEPALIVE)
+            self.released.notify_all()
+
+    @contextmanager
+    def session(self, host_string, gateway=None):
+        ''' Context manager within which fabric operations against
+            host_string (through gateway) reuse a pooled ssh session
+        '''
+        key = self._key(host_string)
+        gateway = self._key(gateway)
+        self._prepare(key, gateway)
+        semaphore = self._get_semaphore(key)
+        semaphore.acquire()
+        failed = False
+        try:
+            yield
+        except Exception:
+            failed = True
+            raise
+        finally:
+            semaphore.release()
+            self._release(key, gateway, failed=failed)
+# end SSHConnectionPool
+
+ssh_pool = SSHConnectionPool()
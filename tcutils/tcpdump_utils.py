@@ -4,7 +4,9 @@ from common import log_orig as contrail_logging
 
 from util import retry
 from tcutils.commands import ssh, execute_cmd, execute_cmd_out
+from netaddr import valid_ipv4, valid_ipv6, valid_mac
 from tcutils.util import get_random_name
+from tcutils.pcap_index import get_pcap_index, forget_pcap_index
 
 def start_tcpdump_for_intf(ip, username, password, interface, filters='-v', logger=None):
     if not logger:
@@ -144,10 +146,19 @@ def verify_tcpdump_count(obj, session, pcap, exp_count=None, mac=None, raw_count
         cmd = 'sudo tcpdump -nnr %s ether host %s | %s' % (pcap, mac, new_grep_string)
     else:
         cmd = 'sudo tcpdump -nnr %s | %s' % (pcap, new_grep_string)
-    if not vm_fix_pcap_pid_files:
+    count = None
+    if not vm_fix_pcap_pid_files and (raw_count or grep_string == 'length'):
+        # Every packet is a line with its length in tcpdump -nn output,
+        # count from the index which on retries fetches just the new packets
+        try:
+            index = get_pcap_index(session, pcap, logger=obj.logger)
+            count = index.count(mac=mac) if mac else index.count()
+        except Exception as e:
+            obj.logger.debug('Unable to index %s: %s' % (pcap, e))
+    if count is None and not vm_fix_pcap_pid_files:
         out, err = execute_cmd_out(session, cmd, obj.logger)
         count = int(out.strip('\n'))
-    else:
+    elif count is None:
         output, count = stop_tcpdump_for_vm_intf(
             None, None, pcap, vm_fix_pcap_pid_files=vm_fix_pcap_pid_files, svm=svm)
     result = True
@@ -177,6 +188,16 @@ def verify_tcpdump_count(obj, session, pcap, exp_count=None, mac=None, raw_count
     return result
 
 def search_in_pcap(session, pcap, search_string):
+    ''' Returns True if search_string is found in the tcpdump -v output
+        A mac, ip or port is first looked up in the index of the pcap
+    '''
+    if valid_ipv4(search_string) or valid_ipv6(search_string) or \
+            valid_mac(search_string) or search_string.isdigit():
+        try:
+            if get_pcap_index(session, pcap).search(search_string):
+                return True
+        except Exception:
+            pass
     cmd = 'sudo tcpdump -v -nn -r %s | grep "%s"' % (pcap, search_string)
     out, err = execute_cmd_out(session, cmd)
     if search_string in out:
@@ -186,6 +207,7 @@ def search_in_pcap(session, pcap, search_string):
 # end search_in_pcap
 
 def delete_pcap(session, pcap):
+    forget_pcap_index(session, pcap)
     execute_cmd_out(session, 'rm -f %s' % (pcap))
 
 @retry(delay=2, tries=40)
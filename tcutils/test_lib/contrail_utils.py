@@ -4,6 +4,9 @@ Contrail feature specific utility methods
 
 import os
 import ast
+import time
+
+from tcutils.test_lib.xmpp_sampler import get_xmpp_sampler
 
 
 def get_ri_name(vn_fq_name):
@@ -49,11 +52,13 @@ def check_xmpp_is_stable(inputs, connections, orig_flap_dict=None):
                   ....
                 ]
     If orig_flap_dict is passed, compares it with flap_dict and returns
-        True if same
+        True if same, the flaps noticed since orig_flap_dict are logged
     If orig_flap_dict is not passed, returns (True, flap_dict)
+
+    The agents are polled by a background XmppSampler, orig_flap_dict is
+    its latest snapshot and flap_dict is a fresh one
     '''
     orig_flap_dict = orig_flap_dict or {}
-    flap_dict = {}
     logger = inputs.logger
 
     xmpp_check_env = os.getenv('DO_XMPP_CHECK', None)
@@ -66,21 +71,13 @@ def check_xmpp_is_stable(inputs, connections, orig_flap_dict=None):
         logger.debug('Skipping xmpp flap check')
         return (True, {})
 
+    sampler = get_xmpp_sampler(inputs, connections)
+    flap_dict = sampler.snapshot(max_age=0 if orig_flap_dict else None)
     result = True
-    for ip in inputs.compute_ips:
-        flap_dict[ip] = {}
-        agent_inspect = connections.agent_inspect[ip]
-        if not agent_inspect:
-            continue
-        xmpp_status = agent_inspect.get_vna_xmpp_connection_status()
-        for entry in xmpp_status:
-            if entry['state'] != 'Established':
-                logger.warn('XMPP flap count of %s is %s' %(
-                    ip, entry['cfg_controller']))
-                logger.debug(entry)
-                result = result and False
-            flap_dict[ip][entry['controller_ip']] = entry['flap_count']
-    # end for ip
+    for (ip, controller, state) in flap_dict.not_established:
+        logger.warn('XMPP connection of %s to %s is in state %s' % (
+            ip, controller, state))
+        result = result and False
     if orig_flap_dict:
         if orig_flap_dict != flap_dict:
             logger.error('XMPP status is %s, Expected: %s' %(
@@ -88,6 +85,13 @@ def check_xmpp_is_stable(inputs, connections, orig_flap_dict=None):
             result = result and False
         else:
             logger.debug('No XMPP flaps were noticed during the test')
+        for flap in sampler.get_flaps(getattr(orig_flap_dict, 'timestamp',
+                                              None), flap_dict.timestamp):
+            logger.error('XMPP connection of %s to %s flapped during the '
+                         'test at %s, noticed between %s and %s' % (
+                             flap.compute, flap.controller, flap.flap_time,
+                             time.ctime(flap.prev_timestamp),
+                             time.ctime(flap.timestamp)))
     else:
         logger.debug('Nothing to compare xmpp stats %s with' %(
             flap_dict))
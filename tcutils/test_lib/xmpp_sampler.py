@@ -0,0 +1,192 @@
+'''
+Background sampler of the XMPP connection state of the agents
+
+XmppSampler polls the agent introspect of all the computes concurrently,
+every interval secs in a background thread, and keeps a ring buffer of the
+state and flap count of each (compute, controller) connection. Flaps are
+recorded as they are noticed, with the flap time reported by the agent,
+so the flaps during a test are known and not just the difference of the
+counts before and after it.
+
+    sampler = get_xmpp_sampler(inputs, connections)
+    before = sampler.snapshot()
+    ...
+    after = sampler.snapshot(max_age=0)
+    sampler.get_flaps(before.timestamp, after.timestamp)
+'''
+
+import os
+import time
+import threading
+from collections import namedtuple, deque
+
+from common import log_orig as contrail_logging
+from tcutils.threadpool_lib import map_in_parallel
+
+XMPP_SAMPLE_INTERVAL = int(os.getenv('XMPP_SAMPLE_INTERVAL') or 30)
+XMPP_SAMPLE_HISTORY = int(os.getenv('XMPP_SAMPLE_HISTORY') or 120)
+
+XmppSample = namedtuple('XmppSample', ['timestamp', 'state', 'flap_count',
+                                       'flap_time'])
+# Flap noticed between the samples at prev_timestamp and timestamp
+XmppFlap = namedtuple('XmppFlap', ['compute', 'controller', 'prev_timestamp',
+                                   'timestamp', 'flap_time', 'flaps', 'state'])
+
+
+class XmppSnapshot(dict):
+
+    '''
+        {compute_ip: {controller_ip: flap_count}} at timestamp
+        not_established: list of (compute_ip, controller_ip, state)
+    '''
+
+    def __init__(self, timestamp, flap_dict=None, not_established=None):
+        super(XmppSnapshot, self).__init__(flap_dict or {})
+        self.timestamp = timestamp
+        self.not_established = not_established or []
+# end XmppSnapshot
+
+
+class XmppSampler(object):
+
+    def __init__(self, inputs, connections, interval=XMPP_SAMPLE_INTERVAL,
+                 history=XMPP_SAMPLE_HISTORY, max_workers=None, logger=None):
+        self.inputs = inputs
+        self.connections = connections
+        self.interval = interval
+        self.history = history
+        self.max_workers = max_workers
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        # (compute_ip, controller_ip): deque of XmppSample
+        self.samples = dict()
+        self.flaps = deque(maxlen=history)
+        self.last_sampled = None
+        self.lock = threading.Lock()
+        # Serializes the polls of the background thread and snapshot()
+        self.sample_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _poll(self, ip, agent_inspect):
+        try:
+            return agent_inspect.get_vna_xmpp_connection_status()
+        except Exception as e:
+            self.logger.debug('Unable to get xmpp status of %s: %s' % (ip, e))
+            return None
+
+    def sample(self):
+        ''' Poll all the agents concurrently and record the samples '''
+        with self.sample_lock:
+            return self._sample()
+
+    def _sample(self):
+        inspects = dict()
+        for ip in self.inputs.compute_ips:
+            agent_inspect = self.connections.agent_inspect[ip]
+            if agent_inspect:
+                inspects[ip] = agent_inspect
+        status = map_in_parallel(lambda ip: self._poll(ip, inspects[ip]),
+                                 inspects.keys(),
+                                 max_workers=self.max_workers,
+                                 raise_exception=False)
+        timestamp = time.time()
+        with self.lock:
+            for ip, entries in status.iteritems():
+                for entry in entries or []:
+                    self._record(ip, entry, timestamp)
+            self.last_sampled = timestamp
+        return timestamp
+
+    def _record(self, ip, entry, timestamp):
+        key = (ip, entry['controller_ip'])
+        try:
+            flap_count = int(entry['flap_count'])
+        except (TypeError, ValueError, KeyError):
+            flap_count = entry.get('flap_count')
+        sample = XmppSample(timestamp, entry.get('state'), flap_count,
+                            entry.get('flap_time'))
+        if key not in self.samples:
+            self.samples[key] = deque(maxlen=self.history)
+        elif self.samples[key]:
+            prev = self.samples[key][-1]
+            if prev.flap_count != sample.flap_count:
+                flaps = sample.flap_count - prev.flap_count \
+                    if isinstance(flap_count, int) and \
+                    isinstance(prev.flap_count, int) else None
+                flap = XmppFlap(ip, key[1], prev.timestamp, timestamp,
+                                sample.flap_time, flaps, sample.state)
+                self.flaps.append(flap)
+                self.logger.warn('XMPP connection of %s to %s flapped at %s,'
+                                 ' state %s' % (ip, key[1], flap.flap_time,
+                                                flap.state))
+        self.samples[key].append(sample)
+
+    def snapshot(self, max_age=None):
+        '''
+            Returns XmppSnapshot of the latest samples, sampled afresh if
+            the latest samples are older than max_age, interval by default
+        '''
+        max_age = self.interval if max_age is None else max_age
+        if self.last_sampled is None or \
+                time.time() - self.last_sampled > max_age:
+            self.sample()
+        with self.lock:
+            snapshot = XmppSnapshot(self.last_sampled)
+            for (ip, controller), samples in self.samples.iteritems():
+                if not samples or samples[-1].timestamp != self.last_sampled:
+                    # Agent did not respond to the latest poll
+                    continue
+                snapshot.setdefault(ip, {})[controller] = \
+                    samples[-1].flap_count
+                if samples[-1].state != 'Established':
+                    snapshot.not_established.append(
+                        (ip, controller, samples[-1].state))
+        for ip in self.inputs.compute_ips:
+            snapshot.setdefault(ip, {})
+        return snapshot
+
+    def get_flaps(self, start=None, end=None):
+        ''' Returns list of XmppFlap noticed between start and end '''
+        with self.lock:
+            return [flap for flap in self.flaps
+                    if (start is None or flap.timestamp > start) and
+                    (end is None or flap.timestamp <= end)]
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sample()
+            except Exception as e:
+                self.logger.debug('XMPP sampling failed: %s' % e)
+            self._stop.wait(self.interval)
+
+    def start(self):
+        ''' Start sampling in the background, every interval secs '''
+        if self._thread or not self.interval:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name='xmpp-sampler')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        if self._thread:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+# end XmppSampler
+
+_samplers = dict()
+_samplers_lock = threading.Lock()
+
+
+def get_xmpp_sampler(inputs, connections):
+    ''' Returns the XmppSampler of the computes of inputs, started '''
+    key = tuple(sorted(inputs.compute_ips))
+    with _samplers_lock:
+        if key not in _samplers:
+            _samplers[key] = XmppSampler(inputs, connections,
+                                         logger=inputs.logger)
+            _samplers[key].start()
+        return _samplers[key]
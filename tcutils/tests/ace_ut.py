@@ -0,0 +1,73 @@
+"""Unittests for common.policy.ace module.
+"""
+
+import copy
+import unittest
+
+from common.policy.ace import dedup_rules, find_rule, diff_rules, make_ace, \
+    RuleIndex
+
+ANY_PORT = {'max': '65535', 'min': '0'}
+
+
+def rule(proto, src_port, action='pass', ace_id='1', src='vn1', dst='vn2'):
+    return {'proto_l': {'max': proto, 'min': proto}, 'src': src, 'dst': dst,
+            'src_port_l': {'max': src_port, 'min': src_port},
+            'dst_port_l': ANY_PORT, 'action_l': [action],
+            'rule_type': 'Terminal', 'ace_id': ace_id}
+
+
+class TestAce(unittest.TestCase):
+
+    def test_dedup_ignores_ace_id(self):
+        rules = [rule('tcp', '1'), rule('tcp', '2'),
+                 rule('tcp', '1', ace_id='3'), rule('tcp', '1', 'deny')]
+        unique = dedup_rules(rules)
+        self.assertEqual(unique, [rules[0], rules[1], rules[3]])
+        self.assertTrue(unique[0] is rules[0])
+
+    def test_find_rule(self):
+        rules = [rule('tcp', '1'), rule('udp', '1'), rule('udp', '1', 'deny')]
+        self.assertEqual(find_rule(rule('udp', '1', 'deny'), rules), 1)
+        self.assertIsNone(find_rule(rule('icmp', '1'), rules))
+        self.assertIsNone(find_rule(rule('icmp', '1'), []))
+        index = RuleIndex(rules)
+        self.assertIn(rule('tcp', '1', ace_id='9'), index)
+        self.assertNotIn(rule('tcp', '2'), index)
+        self.assertEqual(index.find(rule('udp', '1', 'deny')), 1)
+        self.assertIsNone(index.find(rule('icmp', '1')))
+        index.add(rule('icmp', '1'))
+        self.assertEqual(index.find(rule('icmp', '1')), 3)
+
+    def test_canonical_ace(self):
+        self.assertEqual(make_ace(rule('tcp', '1')), make_ace(rule('6', '1')))
+        # icmp ports and ace_id are not compared
+        self.assertEqual(make_ace(rule('icmp', '1', ace_id='2')),
+                         make_ace(rule('1', '5')))
+        user_action = rule('tcp', '1')
+        user_action['action_l'] = [{'simple_action': 'pass'}]
+        self.assertEqual(make_ace(user_action), make_ace(rule('6', '1')))
+        self.assertNotEqual(make_ace(rule('tcp', '1')),
+                            make_ace(rule('tcp', '1', 'deny')))
+
+    def test_diff(self):
+        expected = [rule('tcp', str(i), ace_id=str(i)) for i in range(1, 7)]
+        actual = copy.deepcopy(expected)
+        self.assertEqual(diff_rules(expected, actual), ([], [], []))
+        # port 2 missing, an extra rule and port 5 moved ahead of port 4
+        actual = [actual[0], actual[2], actual[4], actual[3], actual[5],
+                  rule('udp', '1')]
+        (missing, extra, reordered) = diff_rules(expected, actual)
+        self.assertEqual(missing, [expected[1]])
+        self.assertEqual(extra, [rule('udp', '1')])
+        self.assertEqual([(idx, act) for (_, idx, act) in reordered],
+                         [(3, 3), (4, 2)])
+
+    def test_diff_duplicates(self):
+        expected = [rule('tcp', '1'), rule('tcp', '1'), rule('udp', '1')]
+        (missing, extra, reordered) = diff_rules(expected, expected[1:])
+        self.assertEqual(missing, [expected[1]])
+        self.assertEqual((extra, reordered), ([], []))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,158 @@
+"""Unittests for cleanup_scheduler module.
+"""
+
+import time
+import threading
+import unittest
+
+from tcutils.cleanup_scheduler import run_cleanups, build_cleanup_dag
+
+LOCK = threading.Lock()
+CONDITION = threading.Condition()
+STARTED = list()
+
+
+class FakeFixture(object):
+
+    def __init__(self, name, log, fail=False, verify_ok=True):
+        (self.name, self.log) = (name, log)
+        (self.fail, self.verify_ok) = (fail, verify_ok)
+        self.verify_is_run = True
+
+    def cleanUp(self):
+        time.sleep(0.02)
+        with LOCK:
+            self.log.append(self.name)
+        if self.fail:
+            raise RuntimeError('%s cleanup failed' % self.name)
+        if self.verify_is_run:
+            self.verify_cleared_from_setup()
+
+    def verify_cleared_from_setup(self):
+        with LOCK:
+            self.log.append('gone ' + self.name)
+        self.verify_cleared_from_nodes()
+
+    def verify_cleared_from_nodes(self):
+        with LOCK:
+            self.log.append('verify ' + self.name)
+        assert self.verify_ok, '%s still present' % self.name
+        return True
+
+
+class ConcurrentFixture(FakeFixture):
+
+    ''' cleanUp waits till count of them are being cleaned up '''
+
+    def __init__(self, name, log, count=1):
+        super(ConcurrentFixture, self).__init__(name, log)
+        self.count = count
+        self.concurrent = False
+
+    def cleanUp(self):
+        with CONDITION:
+            STARTED.append(self.name)
+            CONDITION.notify_all()
+            while len(STARTED) < self.count:
+                CONDITION.wait(5)
+                if len(STARTED) < self.count:
+                    break
+            self.concurrent = len(STARTED) >= self.count
+        super(ConcurrentFixture, self).cleanUp()
+
+
+class VMFixture(ConcurrentFixture):
+    pass
+
+
+class PortFixture(FakeFixture):
+    pass
+
+
+class VNFixture(FakeFixture):
+    pass
+
+
+class PolicyFixture(FakeFixture):
+    pass
+
+
+def gather_details(*args):
+    pass
+
+
+class TestCleanupScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.log = list()
+        del STARTED[:]
+
+    def cleanups(self, *fixture_list):
+        cleanups = list()
+        for fixture in fixture_list:
+            if callable(fixture):
+                cleanups.append((fixture, (), {}))
+                continue
+            cleanups.append((fixture.cleanUp, (), {}))
+            cleanups.append((gather_details, (), {}))
+        return cleanups
+
+    def barrier(self, name):
+        return lambda: self.log.append(name)
+
+    def test_dag(self):
+        # VN registered after the VM is still cleaned up after it
+        cleanups = self.cleanups(PolicyFixture('policy', self.log),
+                                 VMFixture('vm', self.log),
+                                 VNFixture('vn', self.log),
+                                 self.barrier('barrier'),
+                                 VMFixture('vm2', self.log))
+        deps = build_cleanup_dag(cleanups)
+        self.assertEqual(deps[0], set([2, 4, 6]))
+        self.assertEqual(deps[2], set([6]))
+        self.assertEqual(deps[4], set([2, 6]))
+        self.assertEqual(deps[6], set([7]))
+        self.assertEqual(deps[7], set())
+        self.assertEqual(deps[1], set())
+
+    def test_order_and_deferred_verification(self):
+        vms = [VMFixture('vm%s' % i, self.log, 4) for i in range(4)]
+        cleanups = self.cleanups(VNFixture('vn', self.log), *vms)
+        cleanups.insert(0, (self.barrier('barrier'), (), {}))
+        cleanups.append((self.barrier('last'), (), {}))
+        self.assertEqual(run_cleanups(cleanups, max_workers=4), [])
+        self.assertEqual(cleanups, [])
+        # The VMs are cleaned up all at once
+        self.assertTrue(all(vm.concurrent for vm in vms))
+        deletes = [entry for entry in self.log
+                   if not entry.startswith('verify')]
+        self.assertEqual(deletes[0], 'last')
+        self.assertEqual(sorted(deletes[1:9]),
+                         ['gone vm0', 'gone vm1', 'gone vm2', 'gone vm3',
+                          'vm0', 'vm1', 'vm2', 'vm3'])
+        # The VN is deleted once the VMs are gone from API server
+        self.assertEqual(deletes[9:], ['vn', 'gone vn', 'barrier'])
+        # Verifications in the nodes run once all the deletions are done
+        self.assertEqual(self.log[:12], deletes)
+        self.assertEqual(len(self.log), 17)
+
+    def test_failures_reported(self):
+        cleanups = self.cleanups(VNFixture('vn', self.log, verify_ok=False),
+                                 PortFixture('port', self.log, fail=True))
+        errors = run_cleanups(cleanups, max_workers=4)
+        self.assertEqual(len(errors), 2)
+        self.assertIsInstance(errors[0][0], RuntimeError)
+        self.assertIn('port cleanup failed', errors[0][1])
+        self.assertIn('vn still present', errors[1][1])
+        self.assertEqual(self.log, ['port', 'vn', 'gone vn', 'verify vn'])
+
+    def test_serial(self):
+        cleanups = self.cleanups(PortFixture('port', self.log, fail=True),
+                                 VNFixture('vn', self.log))
+        errors = run_cleanups(cleanups, max_workers=1)
+        self.assertEqual(self.log, ['vn', 'gone vn', 'verify vn', 'port'])
+        self.assertEqual(len(errors), 1)
+        self.assertIn('RuntimeError', errors[0][1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Unittests for cluster_discovery module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from common.cluster_discovery import ClusterDiscovery
+from tcutils.fabutils import BATCH_BEGIN, BATCH_END
+
+
+def batch_output(outputs):
+    return '\n'.join(['%s\n%s\n%s %s 1.0 1.5>>>' % (
+        BATCH_BEGIN % index, output, BATCH_END % index, rc)
+        for index, (output, rc) in enumerate(outputs)])
+
+
+class TestClusterDiscovery(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.topology = os.path.join(self.tmp_dir, 'instances.yaml')
+        with open(self.topology, 'w') as fd:
+            fd.write('instances: {}\n')
+        self.discovery = ClusterDiscovery(
+            self.topology, cache_dir=os.path.join(self.tmp_dir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_parse_facts(self):
+        cmds = self.discovery.get_cmds(nics=['vhost0'],
+                                       files=['/root/.kube/config'])
+        output = batch_output([
+            ('node1', 0), ('node1.local', 0),
+            ('vrouter_agent_1\nnodemgr_1', 0),
+            ('10.1.1.1/24\n192.168.1.1/24', 0), ('Linux node1 el7', 0),
+            ('192.168.1.1/24', 0), ('', 1)])
+        facts = self.discovery.parse_facts(cmds, output)
+        self.assertEqual(facts['hostname'], 'node1')
+        self.assertEqual(facts['fqname'], 'node1.local')
+        self.assertEqual(facts['containers'], 'vrouter_agent_1\nnodemgr_1')
+        self.assertEqual(facts['ips'], ['10.1.1.1', '192.168.1.1'])
+        self.assertEqual(facts['nic_ips'], {'vhost0': ['192.168.1.1']})
+        self.assertEqual(facts['files'], {'/root/.kube/config': False})
+
+    def test_cache(self):
+        hosts = {'10.1.1.1': {'username': 'root', 'password': 'pw'}}
+        facts = {'10.1.1.1': {'hostname': 'node1', 'ips': ['10.1.1.1']}}
+        self.discovery.save_cache(facts)
+        self.assertEqual(self.discovery.discover(hosts), facts)
+        self.assertIs(type(self.discovery.load_cache()['10.1.1.1'][
+            'hostname']), str)
+        self.discovery.ttl = -1
+        self.assertEqual(self.discovery.load_cache(), {})
+        self.discovery.ttl = 60
+        with open(self.topology, 'a') as fd:
+            fd.write('# changed\n')
+        self.assertEqual(self.discovery.load_cache(), {})
+
+    def test_partial_discovery_cached(self):
+        hosts = {'10.1.1.1': {'username': 'root', 'password': 'pw'},
+                 '10.1.1.2': {'username': 'root', 'password': 'pw'}}
+        probed = list()
+
+        def probe(host_ip, hosts):
+            probed.append(host_ip)
+            if host_ip == '10.1.1.2':
+                return None
+            return {'hostname': 'node1'}
+        self.discovery._probe = probe
+        self.assertEqual(self.discovery.discover(hosts),
+                         {'10.1.1.1': {'hostname': 'node1'}})
+        self.assertEqual(self.discovery.load_cache(),
+                         {'10.1.1.1': {'hostname': 'node1'}})
+        # only the host missing in the cache is probed again
+        probed[:] = []
+        self.discovery.discover(hosts)
+        self.assertEqual(probed, ['10.1.1.2'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+"""Unittests for contrail_status and contrail_status_check modules.
+"""
+
+import unittest
+import logging
+
+from tcutils import contrail_status as cs
+from tcutils import contrail_status_check as csc
+
+
+class FakeInputs(object):
+
+    deployer = 'ansible'
+    host_ips = ['10.1.1.1', '10.1.1.2']
+    logger = logging.getLogger(__name__)
+
+    def get_roles(self, node):
+        return ['vrouter']
+
+    def get_container_name(self, node, svc):
+        return svc
+
+
+class TestContrailStatus(unittest.TestCase):
+
+    def setUp(self):
+        self.probed = list()
+        self.orig = (cs.get_active_containers, cs.get_svc_uve_info,
+                     csc.contrail_status)
+        cs.get_active_containers = lambda node, inputs: ['agent']
+
+        def get_svc_uve_info(node, svc, *args):
+            self.probed.append((node, svc))
+            return ('active', None)
+        cs.get_svc_uve_info = get_svc_uve_info
+
+    def tearDown(self):
+        (cs.get_active_containers, cs.get_svc_uve_info,
+         csc.contrail_status) = self.orig
+
+    def test_contrail_status(self):
+        status = cs.contrail_status(FakeInputs(), keyfile='k',
+                                    certfile='c', cacert='ca')
+        self.assertEqual(status['10.1.1.2']['agent']['status'], 'active')
+        self.assertEqual(status['10.1.1.2']['vrouter-nodemgr']['status'], 'inactive')
+        self.assertEqual(sorted(self.probed), [('10.1.1.1', 'agent'),
+                                               ('10.1.1.2', 'agent')])
+        status = cs.contrail_status(FakeInputs(), keyfile='k', certfile='c',
+                                    cacert='ca',
+                                    probes={'10.1.1.1': ['vrouter-nodemgr']})
+        self.assertEqual(status, {'10.1.1.1': {'vrouter-nodemgr': {
+            'status': 'inactive', 'description': None}}})
+
+    def test_wait_probes_pending(self):
+        calls = list()
+        states = {'10.1.1.1': {'agent': ['initializing', 'active'],
+                               'nodemgr': ['active']},
+                  '10.1.1.2': {'agent': ['active']}}
+
+        def contrail_status(inputs, *args, **kwargs):
+            probes = kwargs.get('probes') or dict(
+                (node, svcs.keys()) for node, svcs in states.items())
+            calls.append(probes)
+            return dict((node, dict(
+                (svc, {'status': states[node][svc].pop(0)
+                       if len(states[node][svc]) > 1
+                       else states[node][svc][0], 'description': None})
+                for svc in svcs)) for node, svcs in probes.items())
+        csc.contrail_status = contrail_status
+        checker = csc.ContrailStatusChecker(FakeInputs())
+        (result, _) = checker.wait_till_contrail_cluster_stable(delay=0)
+        self.assertTrue(result)
+        # full sweep, pending service, confirmation full sweep
+        self.assertEqual(len(calls), 3)
+        self.assertEqual(calls[1], {'10.1.1.1': ['agent']})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+"""Unittests for the container actions of contrail_test_init module.
+"""
+
+import logging
+import threading
+import unittest
+
+from common import contrail_test_init
+from common.contrail_test_init import ContrailTestInit
+
+HOSTS = ['1.1.1.1', '1.1.1.2', '1.1.1.3']
+
+
+class Fake(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class TestContainerAction(unittest.TestCase):
+
+    def setUp(self):
+        logger = logging.getLogger(__name__)
+        logger.addHandler(logging.NullHandler())
+        host_data = dict((host, {'username': 'root', 'password': 'c0ntrail',
+                                 'name': 'node%s' % host[-1]})
+                         for host in HOSTS)
+        # ContrailTestInit looks up the missing attributes in its inputs
+        self.init = object.__new__(ContrailTestInit)
+        self.init.__dict__['inputs'] = Fake(host_data=host_data,
+                                            host_ips=HOSTS, logger=logger)
+        self.init.get_container_name = lambda host, container: container
+        self.init.get_container_for_service = lambda service: None
+        self.init.verify_service_state = self.verify
+        self.events = list()
+        self.lock = threading.Lock()
+        self.failing = set()
+        self.exec_cmd_on_server = contrail_test_init.exec_cmd_on_server
+        contrail_test_init.exec_cmd_on_server = self.exec_cmd
+
+    def tearDown(self):
+        contrail_test_init.exec_cmd_on_server = self.exec_cmd_on_server
+
+    def exec_cmd(self, issue_cmd, host, username, password, as_sudo=False):
+        with self.lock:
+            self.events.append(('action', host))
+        if host in self.failing:
+            return (1, 'Error response from daemon')
+        return (0, '')
+
+    def verify(self, hosts, container):
+        self.events.append(('verify', tuple(sorted(hosts))))
+        return (True, None)
+
+    def test_rolling_batches(self):
+        timings = self.init.restart_container(HOSTS, 'agent', batch_size=2)
+        # Each batch is verified once, after the actions on all its hosts
+        self.assertEqual(sorted(self.events[:2]),
+                         [('action', HOSTS[0]), ('action', HOSTS[1])])
+        self.assertEqual(self.events[2:], [('verify', tuple(HOSTS[:2])),
+                                           ('action', HOSTS[2]),
+                                           ('verify', (HOSTS[2],))])
+        self.assertEqual(sorted(timings), HOSTS)
+        self.assertEqual(timings[HOSTS[0]]['failed'], [])
+
+    def test_action_failed(self):
+        self.failing.add(HOSTS[1])
+        self.assertRaises(AssertionError, self.init.restart_container,
+                          HOSTS, 'agent', batch_size=2)
+        # The failed batch is not verified nor the next one started
+        self.assertEqual(len(self.events), 2)
+        self.assertNotIn('verify', [event for event, _ in self.events])
+
+    def test_action_failed_without_verify(self):
+        self.failing.add(HOSTS[2])
+        timings = self.init.restart_container(HOSTS, 'agent',
+                                              verify_service=False)
+        self.assertEqual(self.events, [('action', host) for host in HOSTS])
+        self.assertEqual(timings[HOSTS[2]]['failed'], ['agent'])
+        self.assertEqual(timings[HOSTS[0]]['failed'], [])
+
+if __name__ == '__main__':
+    unittest.main()
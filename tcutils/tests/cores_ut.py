@@ -1,2 +1,68 @@
 """Unittests for cores module.
 """
+
+import unittest
+import logging
+
+from tcutils.cores import parse_service_crashes, find_new, HealthSweep, \
+    SWEEP_MARKER
+
+
+class FakeInputs(object):
+    host_ips = ['1.1.1.1']
+    logger = logging.getLogger(__name__)
+    logger.addHandler(logging.NullHandler())
+
+
+class FakeSweep(HealthSweep):
+
+    def __init__(self, outputs):
+        super(FakeSweep, self).__init__(FakeInputs())
+        self.outputs = outputs
+        self.cmds = list()
+
+    def _exec(self, node_ip):
+        self.cmds.append(self._get_cmd(node_ip))
+        output = self.outputs.pop(0)
+        if isinstance(output, Exception):
+            raise output
+        return (True, output)
+
+
+class TestCores(unittest.TestCase):
+
+    def test_parse_service_crashes(self):
+        output = ("contrail-vrouter-agent: active\n"
+                  "contrail-vrouter-nodemgr: inactive\n"
+                  "contrail-control: failed\n"
+                  "Failed service list\n"
+                  "contrail-dns: failed\n")
+        self.assertEqual(parse_service_crashes(output),
+                         ['contrail-vrouter-nodemgr', 'contrail-control'])
+        self.assertEqual(parse_service_crashes('all good'), [])
+        self.assertEqual(parse_service_crashes(None), [])
+
+    def test_find_new(self):
+        initial = {'1.1.1.1': ['core.a']}
+        final = {'1.1.1.1': ['core.a', 'core.b'], '2.2.2.2': ['core.c']}
+        self.assertEqual(find_new(initial, final),
+                         {'1.1.1.1': ['core.b'], '2.2.2.2': ['core.c']})
+
+    def test_sweep_incremental(self):
+        status = '%s\ncontrail-control: failed\nFailed service list\n' % (
+            SWEEP_MARKER)
+        sweep = FakeSweep(['11:22\ncore.a\n' + status, '11:22\n' + status,
+                           '33:44\ncore.a\ncore.b\n' + status])
+        self.assertEqual(sweep.run(), ({'1.1.1.1': ['core.a']},
+                                       {'1.1.1.1': ['contrail-control']}))
+        # listing unchanged, cores not sent again
+        self.assertEqual(sweep.run()[0], {'1.1.1.1': ['core.a']})
+        self.assertIn('"11:22"', sweep.cmds[-1])
+        self.assertEqual(sweep.run()[0], {'1.1.1.1': ['core.a', 'core.b']})
+
+    def test_sweep_failure(self):
+        sweep = FakeSweep([IOError('unreachable')])
+        self.assertRaises(IOError, sweep.run)
+
+if __name__ == '__main__':
+    unittest.main()
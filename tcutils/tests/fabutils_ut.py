@@ -0,0 +1,79 @@
+"""Unittests for fabutils module.
+"""
+
+import unittest
+import subprocess
+
+from tcutils import fabutils
+from tcutils.fabutils import build_batch_script, parse_batch_output, \
+    remote_cmd_batch
+
+
+def local_cmd(host_string, cmd, **kwargs):
+    proc = subprocess.Popen(['/bin/sh', '-c', cmd], stdout=subprocess.PIPE)
+    return proc.communicate()[0]
+
+
+class TestBatchCmd(unittest.TestCase):
+
+    def test_batch_script(self):
+        cmds = ['echo hi; echo there', 'false', 'echo "$((1+1))"']
+        output = subprocess.check_output(['/bin/sh', '-c',
+                                          build_batch_script(cmds)])
+        results = parse_batch_output(cmds, output)
+        self.assertEqual([r['cmd'] for r in results], cmds)
+        self.assertEqual([r['output'] for r in results],
+                         ['hi\nthere', None, '2'])
+        self.assertEqual([r['exit_code'] for r in results], [0, 1, 0])
+        for result in results:
+            self.assertTrue(result['duration'] >= 0)
+
+    def test_incomplete_output(self):
+        cmds = ['echo a', 'sleep 100']
+        output = "<<<CT-BATCH-BEGIN 0>>>\r\na\r\n\r\n" \
+                 "<<<CT-BATCH-END 0 0 10.5 11.0>>>\r\n" \
+                 "<<<CT-BATCH-BEGIN 1>>>\r\npartial"
+        results = parse_batch_output(cmds, output)
+        self.assertEqual(results[0]['output'], 'a')
+        self.assertEqual(results[0]['duration'], 0.5)
+        self.assertEqual(results[1]['output'], 'partial')
+        self.assertEqual(results[1]['exit_code'], None)
+
+    def test_stop_on_error(self):
+        cmds = ['echo a', 'exit 3', 'echo b']
+        remote_cmd = fabutils.remote_cmd
+        fabutils.remote_cmd = local_cmd
+        try:
+            results = remote_cmd_batch('root@1.1.1.1', cmds)
+            self.assertEqual([r['exit_code'] for r in results], [0, 3, 0])
+            self.assertRaises(SystemExit, remote_cmd_batch, 'root@1.1.1.1',
+                              cmds, warn_only=False)
+        finally:
+            fabutils.remote_cmd = remote_cmd
+        output = local_cmd(None, build_batch_script(cmds, stop_on_error=True))
+        results = parse_batch_output(cmds, output)
+        self.assertEqual([r['exit_code'] for r in results], [0, 3, None])
+        self.assertEqual(results[2]['output'], None)
+
+    def test_sudo_on_tiny_image(self):
+        cmds = ['echo a', 'echo "b\'c"']
+        scripts = list()
+
+        def record_cmd(host_string, cmd, **kwargs):
+            scripts.append(cmd)
+            return local_cmd(host_string, cmd, **kwargs)
+        remote_cmd = fabutils.remote_cmd
+        fabutils.remote_cmd = record_cmd
+        try:
+            results = remote_cmd_batch('tc@1.1.1.1', cmds, with_sudo=True)
+            self.assertEqual([r['output'] for r in results], ['a', "b'c"])
+            self.assertTrue(scripts[0].startswith('sh -c '))
+            remote_cmd_batch('root@1.1.1.1', cmds, with_sudo=True)
+            remote_cmd_batch('tc@1.1.1.1', cmds)
+            self.assertEqual(scripts[1], scripts[2])
+            self.assertFalse(scripts[1].startswith('sh -c '))
+        finally:
+            fabutils.remote_cmd = remote_cmd
+
+if __name__ == '__main__':
+    unittest.main()
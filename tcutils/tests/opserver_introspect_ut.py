@@ -0,0 +1,134 @@
+"""Unittests for opserver_introspect_utils module.
+"""
+
+import json
+import unittest
+from StringIO import StringIO
+
+from tcutils.collector.opserver_introspect_utils import VerificationOpsSrv,\
+    UvePoller, QueryClient
+from tcutils.collector.opserver_util import iter_json_array
+from tcutils.collector.opserver_results import OpVNResult
+
+VN1 = 'default-domain:admin:vn1'
+VN2 = 'default-domain:admin:vn2'
+
+
+class FakeOpsInspect(VerificationOpsSrv):
+
+    def __init__(self, uves):
+        super(FakeOpsInspect, self).__init__('127.0.0.1')
+        self.uves = uves
+        self.requests = list()
+
+    def dict_get(self, path='', url='', raw_data=False):
+        self.requests.append(path)
+        keys = path.split('kfilt=')[1].split(',')
+        return {'value': [{'name': key, 'value': self.uves[key]}
+                          for key in keys if key in self.uves]}
+
+
+class TestUvePoller(unittest.TestCase):
+
+    def setUp(self):
+        self.uves = {VN1: {'UveVirtualNetworkAgent': {}},
+                     VN2: {'UveVirtualNetworkAgent': {},
+                           'UveVirtualNetworkConfig': {}}}
+        handle = FakeOpsInspect(self.uves)
+        self.ops_inspect = {'10.1.1.1': handle, '10.1.1.2': handle,
+                            '10.1.1.3': FakeOpsInspect(dict())}
+        self.poller = UvePoller(self.ops_inspect, ['10.1.1.1', '10.1.1.2',
+                                                   '10.1.1.3'], chunk_size=1)
+
+    def test_fetch(self):
+        snapshot = self.poller.fetch('virtual-network', [VN1, VN2])
+        self.assertIsInstance(snapshot.get(VN1, '10.1.1.2'), OpVNResult)
+        self.assertEqual(snapshot.missing(VN2), ['10.1.1.3'])
+        self.assertEqual(sorted(self.ops_inspect['10.1.1.1'].requests),
+                         ['analytics/uves/virtual-network/*?flat&kfilt=%s' % vn
+                          for vn in (VN1, VN2)])
+
+    def test_wait_for(self):
+        del self.ops_inspect['10.1.1.3']
+        self.poller.collectors.remove('10.1.1.3')
+        check = lambda uve: uve and 'UveVirtualNetworkConfig' in uve
+        result, snapshot = self.poller.wait_for(
+            'virtual-network', [VN1, VN2], check=check, tries=2, delay=0)
+        self.assertFalse(result)
+        self.assertEqual(self.ops_inspect['10.1.1.1'].requests[-1],
+                         'analytics/uves/virtual-network/*?flat&kfilt=%s' % VN1)
+        self.uves[VN1]['UveVirtualNetworkConfig'] = {}
+        result, snapshot = self.poller.wait_for(
+            'virtual-network', [VN1, VN2], check=check, tries=1)
+        self.assertTrue(result)
+
+
+class FakeQueryOpsInspect(VerificationOpsSrv):
+
+    def __init__(self, progress, chunks):
+        super(FakeQueryOpsInspect, self).__init__('127.0.0.1')
+        self.progress = list(progress)
+        self.chunks = chunks
+        self.streamed = list()
+
+    def post(self, payload, path='', url='', headers=None):
+        self.headers = headers
+        return {'href': 'http://127.0.0.1:8081/analytics/query/q1'}
+
+    def dict_get(self, path='', url='', raw_data=False):
+        progress = self.progress.pop(0) if len(self.progress) > 1 else \
+            self.progress[0]
+        return {'progress': progress,
+                'chunks': [{'href': '/analytics/query/q1/chunk-final/%s' % i}
+                           for i in range(len(self.chunks))]}
+
+    def stream_get(self, path):
+        self.streamed.append(path)
+        index = int(path.rsplit('/', 1)[1])
+        return StringIO(json.dumps({'value': self.chunks[index]}, indent=1))
+
+
+class TestQueryClient(unittest.TestCase):
+
+    def _client(self, progress, chunks, **kwargs):
+        ops_inspect = FakeQueryOpsInspect(progress, chunks)
+        client = QueryClient(ops_inspect, **kwargs)
+        self.sleeps = list()
+        client.sleep = self.sleeps.append
+        return client
+
+    def test_iter_json_array(self):
+        rows = [{'a': i, 's': 'x]y,' * i} for i in range(10)] + [5, 1.5]
+        doc = json.dumps({'value': rows}, indent=1)
+        for size in range(1, 20):
+            self.assertEqual(list(iter_json_array(
+                doc[i:i + size] for i in range(0, len(doc), size))), rows)
+        self.assertRaises(ValueError, list,
+                          iter_json_array([doc[:len(doc) / 2]]))
+
+    def test_run(self):
+        chunks = [[{'vn': i, 'chunk': c} for i in range(3)]
+                  for c in range(5)]
+        client = self._client([10, 50, 100], chunks, workers=2)
+        result = client.run({'table': 'FlowSeriesTable'})
+        self.assertEqual(client.ops_inspect.headers['Expect'],
+                         '202-accepted')
+        self.assertEqual(list(result), sum(chunks, []))
+        self.assertEqual(client.ops_inspect.streamed[0],
+                         'analytics/query/q1/chunk-final/0')
+        # Backoff is bounded by the time to completion at the current rate
+        self.assertEqual(len(self.sleeps), 2)
+        self.assertEqual(result.columns(['chunk'])['chunk'],
+                         [c for c in range(5) for i in range(3)])
+
+    def test_columns(self):
+        client = self._client([100], [[{'a': 1}, {'b': 2}]])
+        columns = client.run({}).columns()
+        self.assertEqual(columns, {'a': [1, None], 'b': [None, 2]})
+
+    def test_timeout(self):
+        client = self._client([0], [[]], timeout=0.001)
+        self.assertIsNone(client.run({}))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+"""Builders of pcap data shared by the pcap unittests.
+"""
+
+import socket
+import struct
+
+
+SRC_MAC = '\x02\xcd\x00\x00\x00\x01'
+DST_MAC = '\x02\xcd\x00\x00\x00\x02'
+
+
+def ipv4(src, dst, proto, payload, tos=0):
+    return struct.pack('!BBHHHBBH4s4s', 0x45, tos, 20 + len(payload), 0, 0,
+                       64, proto, 0, socket.inet_aton(src),
+                       socket.inet_aton(dst)) + payload
+
+
+def udp(sport, dport, payload):
+    return struct.pack('!HHHH', sport, dport, 8 + len(payload), 0) + payload
+
+
+def mpls(label, exp, payload):
+    return struct.pack('!I', label << 12 | exp << 9 | 1 << 8 | 64) + payload
+
+
+def ether(payload, ethertype=0x0800, vlan=None, pcp=0):
+    header = DST_MAC + SRC_MAC
+    if vlan is not None:
+        header += struct.pack('!HH', 0x8100, pcp << 13 | vlan)
+    return header + struct.pack('!H', ethertype) + payload
+
+
+def pcap(*packets):
+    data = struct.pack('<IHHiIII', 0xa1b2c3d4, 2, 4, 0, 0, 65535, 1)
+    for i, pkt in enumerate(packets):
+        data += struct.pack('<IIII', 100 + i, 0, len(pkt), len(pkt)) + pkt
+    return data
+
+
+INNER = ipv4('10.1.1.3', '10.1.1.4', 1, '\x08\x00' + '\x00' * 6)
+MPLSOUDP = ether(ipv4('192.168.1.1', '192.168.1.2', 17,
+                      udp(50000, 6635, mpls(20, 5, INNER)), tos=10 << 2),
+                 vlan=100, pcp=3)
+MPLSOGRE = ether(ipv4('192.168.1.1', '192.168.1.2', 47,
+                      struct.pack('!HH', 0, 0x8847) + mpls(21, 2, INNER)))
+VXLAN = ether(ipv4('192.168.1.1', '192.168.1.2', 17,
+                   udp(50001, 4789, struct.pack('!II', 0x08000000, 7 << 8) +
+                       ether(INNER))))
+ARP = ether(struct.pack('!HHBBH', 1, 0x0800, 6, 4, 1) + SRC_MAC +
+            socket.inet_aton('10.1.1.3') + '\x00' * 6 +
+            socket.inet_aton('10.1.1.254'), ethertype=0x0806)
@@ -0,0 +1,67 @@
+"""Unittests for pcap_index module.
+"""
+
+import unittest
+
+from tcutils.pcap_index import PcapIndex, parse_packet
+from tcutils.tests.pcap_builders import pcap, MPLSOUDP, MPLSOGRE, VXLAN, \
+    ARP, INNER, ether, ipv4, udp, mpls
+
+
+class TestPcapIndex(unittest.TestCase):
+
+    def test_parse_mplsoudp(self):
+        record = parse_packet(0, len(MPLSOUDP), MPLSOUDP)
+        self.assertEqual(record.encap, 'MPLSoUDP')
+        self.assertEqual((record.vlan, record.pcp, record.dscp), (100, 3, 10))
+        self.assertEqual((record.mpls_label, record.mpls_exp), (20, 5))
+        self.assertEqual((record.inner_src_ip, record.inner_dst_ip),
+                         ('10.1.1.3', '10.1.1.4'))
+        self.assertEqual(record.src_mac, '02:cd:00:00:00:01')
+
+    def test_parse_mplsoudp_on_other_port(self):
+        pkt = ether(ipv4('192.168.1.1', '192.168.1.2', 17,
+                         udp(50000, 9000, mpls(20, 5, INNER))))
+        record = parse_packet(0, len(pkt), pkt)
+        self.assertEqual((record.encap, record.mpls_label), ('MPLSoUDP', 20))
+        self.assertEqual(record.inner_dst_ip, '10.1.1.4')
+        # Plain udp, a dns query, is not taken as a tunnel
+        query = '\x12\x34\x01\x00\x00\x01' + '\x00' * 6 + \
+            '\x03www\x00\x00\x01\x00\x01'
+        pkt = ether(ipv4('10.1.1.3', '10.1.1.4', 17, udp(50000, 53, query)))
+        self.assertIsNone(parse_packet(0, len(pkt), pkt).encap)
+
+    def test_parse_mplsogre_and_vxlan(self):
+        record = parse_packet(0, len(MPLSOGRE), MPLSOGRE)
+        self.assertEqual((record.encap, record.mpls_exp), ('MPLSoGRE', 2))
+        record = parse_packet(0, len(VXLAN), VXLAN)
+        self.assertEqual((record.encap, record.vni), ('VxLAN', 7))
+        self.assertEqual(record.inner_dst_ip, '10.1.1.4')
+        self.assertIsNone(record.mpls_exp)
+
+    def test_incremental_feed(self):
+        data = pcap(MPLSOUDP, MPLSOGRE, VXLAN, ARP)
+        index = PcapIndex()
+        for i in range(0, len(data), 7):
+            index.feed(data[i:i + 7])
+        self.assertEqual(len(index), 4)
+        self.assertEqual([r.ts for r in index], [100, 101, 102, 103])
+        self.assertEqual(index.count(encap='MPLSoUDP'), 1)
+        self.assertEqual(index.values('mpls_exp'), set([5, 2, None]))
+
+    def test_filter_and_search(self):
+        index = PcapIndex()
+        index.feed(pcap(MPLSOUDP, ARP))
+        self.assertEqual(index.count(mac='02:CD:00:00:00:02'), 2)
+        self.assertEqual(index.count(ip='10.1.1.254'), 1)
+        self.assertEqual(index.count(port=6635), 1)
+        self.assertEqual(index.count(dscp=lambda dscp: dscp > 8), 1)
+        self.assertTrue(index.search('10.1.1.4'))
+        self.assertTrue(index.search(50000))
+        self.assertFalse(index.search('10.1.1.5'))
+
+    def test_not_a_pcap(self):
+        self.assertRaises(ValueError, PcapIndex().feed, 'x' * 24)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,62 @@
+"""Unittests for pcap_qos module.
+"""
+
+import unittest
+
+from tcutils import pcap_qos
+from tcutils.pcap_index import PcapIndex
+from tcutils.pcap_qos import verify_qos_markings, decode_qos_headers
+from tcutils.tests.pcap_builders import pcap, ether, ipv4, udp, mpls, INNER, MPLSOUDP, \
+    MPLSOGRE, VXLAN, ARP
+
+# MPLSoUDP with dscp 12, exp 1 and pcp 3
+REMARKED = ether(ipv4('192.168.1.1', '192.168.1.2', 17,
+                      udp(50000, 6635, mpls(20, 1, INNER)), tos=12 << 2),
+                 vlan=100, pcp=3)
+
+
+class TestPcapQos(unittest.TestCase):
+
+    def setUp(self):
+        self.data = pcap(MPLSOUDP, MPLSOGRE, VXLAN, ARP, REMARKED,
+                         MPLSOUDP[:30])
+
+    def test_decode_matches_index(self):
+        columns = decode_qos_headers(self.data)
+        index = PcapIndex()
+        index.feed(self.data)
+        for field in ('pcp', 'dscp', 'mpls_exp'):
+            self.assertEqual([None if v < 0 else v for v in columns[field]],
+                             [getattr(r, field) for r in index], field)
+        self.assertEqual([pcap_qos.ENCAPS[v] for v in columns['encap']],
+                         [r.encap for r in index])
+
+    def test_report(self):
+        report = verify_qos_markings(self.data, dscp=10, mpls_exp=5,
+                                     max_offenders=2)
+        self.assertEqual(report.total, 6)
+        self.assertFalse(report.passed)
+        self.assertEqual(report.mismatches, {'dscp': 5, 'mpls_exp': 5})
+        self.assertEqual(report.offenders['dscp'], [1, 2])
+        self.assertEqual(report.distributions['mpls_exp'],
+                         {5: 1, 2: 1, 1: 1, None: 3})
+        report = verify_qos_markings(pcap(MPLSOUDP, MPLSOUDP), dot1p=3,
+                                     dscp=10, mpls_exp=5, encap='MPLSoUDP')
+        self.assertTrue(report.passed)
+        self.assertEqual(report.distributions['encap'], {'MPLSoUDP': 2})
+
+    def test_report_without_numpy(self):
+        batched = verify_qos_markings(self.data, dot1p=3, dscp=10,
+                                      encap='MPLSoUDP')
+        (np, pcap_qos.np) = (pcap_qos.np, None)
+        try:
+            report = verify_qos_markings(self.data, dot1p=3, dscp=10,
+                                         encap='MPLSoUDP')
+        finally:
+            pcap_qos.np = np
+        self.assertEqual(report.mismatches, batched.mismatches)
+        self.assertEqual(report.offenders, batched.offenders)
+        self.assertEqual(report.distributions, batched.distributions)
+
+if __name__ == '__main__':
+    unittest.main()
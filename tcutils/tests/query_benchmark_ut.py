@@ -0,0 +1,80 @@
+"""Unittests for query_benchmark module.
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from tcutils.collector.query_benchmark import QueryBenchmark, QueryCase, \
+    percentile, compare_with_baseline, load_results
+
+CASE = QueryCase('flow_series.10m.w0', 'FlowSeriesTable', ['sourcevn'],
+                 '(sourcevn=*)', 600, None, None)
+
+
+class FakeOpsInspect(object):
+
+    def __init__(self, rows=3, fail_every=0):
+        self.rows = rows
+        self.fail_every = fail_every
+        self.queries = list()
+
+    def query(self, table, **kwargs):
+        self.queries.append((table, kwargs))
+        if self.fail_every and len(self.queries) % self.fail_every == 0:
+            return None
+        return iter([{'sourcevn': 'vn1'}] * self.rows)
+
+
+class TestQueryBenchmark(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def _run(self, ops_inspect):
+        benchmark = QueryBenchmark(ops_inspect, cases=[CASE],
+                                   concurrency_levels=(1, 2), iterations=4)
+        return benchmark.run()
+
+    def test_percentile(self):
+        values = range(1, 101)
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([3], 95), 3)
+        self.assertIsNone(percentile([], 50))
+
+    def test_run_and_save(self):
+        ops_inspect = FakeOpsInspect(fail_every=4)
+        results = self._run(ops_inspect)
+        self.assertEqual(len(ops_inspect.queries), 8)
+        self.assertEqual(ops_inspect.queries[0][1]['start_time'], 'now-600s')
+        summary = results['results']['flow_series.10m.w0@2']
+        self.assertEqual((summary['queries'], summary['errors'],
+                          summary['rows']), (4, 1, 9))
+        self.assertEqual(summary['error_rate'], 0.25)
+        path = os.path.join(self.tmp_dir, 'results.json')
+        QueryBenchmark.save(results, path)
+        self.assertEqual(load_results(path)['results'].keys(),
+                         results['results'].keys())
+        self.assertIsNone(load_results(os.path.join(self.tmp_dir, 'none')))
+
+    def test_compare_with_baseline(self):
+        baseline = self._run(FakeOpsInspect())
+        results = self._run(FakeOpsInspect())
+        summary = results['results']['flow_series.10m.w0@1']
+        summary['p95'] = baseline['results']['flow_series.10m.w0@1'][
+            'p95'] * 2 + 1
+        summary['error_rate'] = 0.5
+        summary['rows_per_sec'] = 0
+        regressions = compare_with_baseline(results, baseline)
+        self.assertEqual(len(regressions), 3)
+        self.assertTrue(all(r.startswith('flow_series.10m.w0@1:')
+                            for r in regressions))
+        self.assertEqual(compare_with_baseline(results, None), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,150 @@
+"""Unittests for ssh_pool module.
+"""
+
+import threading
+import unittest
+
+from tcutils.ssh_pool import SSHConnectionPool
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.active = True
+
+    def is_active(self):
+        return self.active
+
+    def send_ignore(self):
+        pass
+
+    def set_keepalive(self, interval):
+        pass
+
+
+class FakeClient(object):
+
+    def __init__(self):
+        self.transport = FakeTransport()
+        self.closed = False
+
+    def get_transport(self):
+        return self.transport
+
+    def close(self):
+        self.closed = True
+
+
+class TestSSHConnectionPool(unittest.TestCase):
+
+    vm = 'cirros@10.1.1.3:22'
+    gw = 'root@192.168.1.1:22'
+
+    def setUp(self):
+        self.cache = dict()
+        self.pool = SSHConnectionPool(cache=self.cache)
+
+    def _run(self, host_string, gateway=None):
+        with self.pool.session(host_string, gateway=gateway):
+            for key in (host_string, gateway):
+                if key and key not in self.cache:
+                    self.cache[key] = FakeClient()
+
+    def test_reuse(self):
+        self._run(self.vm, self.gw)
+        client = self.cache[self.vm]
+        self._run(self.vm, self.gw)
+        self.assertIs(self.cache[self.vm], client)
+        self.assertEqual(self.pool.stats['hits'], 1)
+
+    def test_gateway_change(self):
+        self._run(self.vm, self.gw)
+        client = self.cache[self.vm]
+        self._run(self.vm, 'root@192.168.1.2:22')
+        self.assertTrue(client.closed)
+        self.assertIsNot(self.cache[self.vm], client)
+
+    def test_unhealthy_gateway(self):
+        self._run(self.vm, self.gw)
+        client = self.cache[self.vm]
+        self.cache[self.gw].transport.active = False
+        self._run(self.vm, self.gw)
+        self.assertTrue(client.closed)
+        self.assertTrue(self.cache[self.gw].transport.active)
+
+    def test_idle_eviction(self):
+        self._run(self.vm, self.gw)
+        client = self.cache[self.vm]
+        self.pool.idle_timeout = -1
+        self.pool.evict_idle()
+        self.assertTrue(client.closed)
+        self.assertEqual(self.cache, {})
+
+    def test_evict_by_ip(self):
+        self._run(self.vm, self.gw)
+        self.pool.evict(host_ip='192.168.1.1')
+        self.assertEqual(self.cache, {})
+
+    def test_in_use_not_evicted(self):
+        self._run(self.vm, self.gw)
+        client = self.cache[self.vm]
+        with self.pool.session(self.vm, gateway=self.gw):
+            self.pool.idle_timeout = -1
+            self.pool.evict_idle()
+            self.pool.evict(host_ip='192.168.1.1')
+            self.assertFalse(client.closed)
+            self.assertFalse(self.cache[self.gw].closed)
+        # evicted sessions are closed once released
+        self.assertTrue(client.closed)
+        self.assertEqual(self.cache, {})
+
+    def test_error_keeps_shared_session(self):
+        self._run(self.vm, self.gw)
+        client = self.cache[self.vm]
+        with self.pool.session(self.vm, gateway=self.gw):
+            try:
+                with self.pool.session(self.vm, gateway=self.gw):
+                    raise IOError('command failed')
+            except IOError:
+                pass
+            self.assertFalse(client.closed)
+        self.assertFalse(client.closed)
+        # last user of a broken session closes it
+        client.transport.active = False
+        self.assertRaises(IOError, self._fail, self.vm, self.gw)
+        self.assertTrue(client.closed)
+        self.assertNotIn(self.vm, self.cache)
+
+    def _fail(self, host_string, gateway=None):
+        with self.pool.session(host_string, gateway=gateway):
+            raise IOError('command failed')
+
+    def test_gateway_change_waits(self):
+        self._run(self.vm, self.gw)
+        client = self.cache[self.vm]
+        events = list()
+        in_session = threading.Event()
+        done = threading.Event()
+
+        def other():
+            with self.pool.session(self.vm, gateway=self.gw):
+                in_session.set()
+                done.wait()
+                events.append('other done')
+
+        thread = threading.Thread(target=other)
+        thread.start()
+        in_session.wait()
+        rerouted = threading.Thread(
+            target=lambda: (self._run(self.vm, 'root@192.168.1.2:22'),
+                            events.append('rerouted')))
+        rerouted.start()
+        self.assertFalse(client.closed)
+        done.set()
+        thread.join()
+        rerouted.join()
+        self.assertEqual(events, ['other done', 'rerouted'])
+        self.assertTrue(client.closed)
+
+if __name__ == '__main__':
+    unittest.main()
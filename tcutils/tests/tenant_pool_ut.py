@@ -0,0 +1,213 @@
+"""Unittests for tenant_pool module.
+"""
+
+import os
+import copy
+import json
+import shutil
+import logging
+import tempfile
+import unittest
+
+from common.tenant_pool import TenantPool
+
+PROJECT_URL = 'http://127.0.0.1:8082/project/p1'
+SG_URL = 'http://127.0.0.1:8082/security-group/sg1'
+# Floating ip pool of another project, referred to by the project
+POOL_URL = 'http://127.0.0.1:8082/floating-ip-pool/pool1'
+
+
+class Fake(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeInputs(object):
+    auth_url = 'http://127.0.0.1:5000/v2.0'
+
+    def __init__(self):
+        self.address_family = 'v4'
+
+    def set_af(self, af):
+        self.address_family = af
+
+
+class FakeCleaner(object):
+
+    def __init__(self):
+        self.objects = {
+            PROJECT_URL: ('project', {
+                'uuid': 'p1', 'fq_name': ['default-domain', 'p1'],
+                'quota': {'virtual_network': 10},
+                'security_groups': [{'to': ['default-domain', 'p1', 'default'],
+                                     'href': SG_URL, 'uuid': 'sg1'}]}),
+            SG_URL: ('security-group', {
+                'uuid': 'sg1', 'parent_uuid': 'p1',
+                'fq_name': ['default-domain', 'p1', 'default'],
+                'security_group_entries': {'policy_rule': ['rule1']}}),
+            POOL_URL: ('floating-ip-pool', {
+                'uuid': 'pool1', 'parent_uuid': 'vn9',
+                'fq_name': ['default-domain', 'p9', 'vn9', 'pool1']})}
+        self.calls = list()
+        self.result = True
+
+    def get_project_url(self, tenant):
+        return PROJECT_URL
+
+    def get_contrail_objects(self, tenant):
+        return [SG_URL, POOL_URL]
+
+    def get_contrail_object(self, url):
+        return copy.deepcopy(self.objects.get(url))
+
+    def update_contrail_object(self, url, obj_type, fields):
+        self.calls.append(('update', url, fields))
+        self.objects[url][1].update(fields)
+        return True
+
+    def cleanup(self, tenants, keep=None, owned_only=False):
+        self.calls.append(('cleanup', tenants, owned_only))
+        return (self.result, [] if self.result else tenants)
+
+
+class FakeTenantPool(TenantPool):
+
+    def __init__(self, cleaner, pool_dir):
+        self.cleaner = cleaner
+        self.setups = list()
+        self.deleted = list()
+        logger = logging.getLogger(__name__)
+        logger.addHandler(logging.NullHandler())
+        super(FakeTenantPool, self).__init__(FakeInputs(), logger=logger,
+                                             size=2, prefix='ut-pool',
+                                             pool_dir=pool_dir)
+
+    def _setup(self, tenant):
+        self.setups.append(tenant.project_name)
+        tenant.project = Fake(already_present=True)
+        tenant.isolated_creds = Fake(username=tenant.project_name)
+        tenant.admin_isolated_creds = Fake(
+            delete_tenant=lambda project: self.deleted.append(
+                tenant.project_name),
+            delete_user=lambda username: None)
+        tenant.inputs = FakeInputs()
+        tenant.admin_inputs = FakeInputs()
+        tenant.connections = Fake(inputs=tenant.inputs)
+
+    def _get_cleaner(self, tenant):
+        return self.cleaner
+
+
+class TestTenantPool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool_dir = tempfile.mkdtemp()
+        self.cleaner = FakeCleaner()
+        self.pool = FakeTenantPool(self.cleaner, self.pool_dir)
+        self.pool.provision()
+
+    def tearDown(self):
+        shutil.rmtree(self.pool_dir)
+
+    def state(self, tenant):
+        with open(os.path.join(self.pool_dir,
+                               tenant.project_name + '.json')) as fd:
+            return json.load(fd)
+
+    def test_provision(self):
+        self.assertEqual(sorted(self.pool.setups), ['ut-pool-0', 'ut-pool-1'])
+        state = self.state(self.pool.tenants[0])
+        self.assertTrue(state['clean'])
+        self.assertEqual(state['baseline'], [SG_URL, POOL_URL])
+        # Objects of other projects are not snapshotted
+        self.assertEqual(sorted(state['snapshot']), [PROJECT_URL, SG_URL])
+        self.assertNotIn('security_groups', state['snapshot'][PROJECT_URL][1])
+        # Already provisioned tenants are not provisioned again
+        other = FakeTenantPool(self.cleaner, self.pool_dir)
+        other.provision()
+        self.assertEqual(other.setups, [])
+
+    def test_lease_and_release(self):
+        leases = [self.pool.lease(), self.pool.lease()]
+        self.assertEqual(sorted(lease.project_name for lease in leases),
+                         ['ut-pool-0', 'ut-pool-1'])
+        self.assertIsNone(self.pool.lease())
+        self.assertFalse(self.state(leases[0])['clean'])
+        self.pool.release(leases[0])
+        self.assertTrue(self.state(leases[0])['clean'])
+        self.assertEqual(self.cleaner.calls,
+                         [('cleanup', [leases[0].project_name], True)])
+        # Released tenant is leased again without setting it up again
+        self.assertIs(self.pool.lease(), leases[0])
+        self.assertEqual(len(self.pool.setups), 2)
+
+    def test_lease_held_by_other_process(self):
+        lease = self.pool.lease()
+        other = FakeTenantPool(self.cleaner, self.pool_dir)
+        other_lease = other.lease()
+        self.assertNotEqual(other_lease.project_name, lease.project_name)
+        self.assertIsNone(other.lease())
+        self.assertEqual(other.setups, [other_lease.project_name])
+
+    def test_stale_lease_scrubbed(self):
+        lease = self.pool.lease()
+        # Lease of a process which died is freed with its flock
+        self.pool._unlock(lease)
+        other = FakeTenantPool(self.cleaner, self.pool_dir)
+        leases = [other.lease(), other.lease()]
+        self.assertEqual([call[0] for call in self.cleaner.calls],
+                         ['cleanup'])
+        self.assertEqual(self.cleaner.calls[0][1], [lease.project_name])
+        self.assertIn(lease.project_name,
+                      [each.project_name for each in leases])
+
+    def test_failed_scrub_tears_down(self):
+        lease = self.pool.lease()
+        self.cleaner.result = False
+        self.pool.release(lease)
+        self.assertEqual(self.pool.deleted, [lease.project_name])
+        self.assertFalse(lease.warm)
+        self.assertFalse(os.path.exists(os.path.join(
+            self.pool_dir, lease.project_name + '.json')))
+        # Tenant is created afresh on a later lease
+        self.cleaner.result = True
+        leases = [self.pool.lease(), self.pool.lease()]
+        self.assertIn(lease, leases)
+        self.assertEqual(self.pool.setups.count(lease.project_name), 2)
+
+    def test_baseline_restored(self):
+        lease = self.pool.lease()
+        self.cleaner.objects[SG_URL][1]['security_group_entries'] = {
+            'policy_rule': ['rule1', 'rule2']}
+        self.cleaner.objects[PROJECT_URL][1]['floating_ip_pool_refs'] = [
+            {'to': ['default-domain', 'p9', 'vn9', 'pool1'],
+             'href': POOL_URL, 'uuid': 'pool1'}]
+        self.pool.release(lease)
+        calls = sorted(self.cleaner.calls[:2])
+        self.assertEqual(calls, [
+            ('update', PROJECT_URL, {'floating_ip_pool_refs': []}),
+            ('update', SG_URL, {'security_group_entries': {
+                'policy_rule': ['rule1']}})])
+        # Refs are cleared before the objects are deleted
+        self.assertEqual(self.cleaner.calls[2][0], 'cleanup')
+        self.assertTrue(self.state(lease)['clean'])
+
+    def test_deleted_baseline_tears_down(self):
+        lease = self.pool.lease()
+        del self.cleaner.objects[SG_URL]
+        self.pool.release(lease)
+        self.assertEqual(self.pool.deleted, [lease.project_name])
+
+    def test_inputs_restored(self):
+        lease = self.pool.lease()
+        inputs = lease.inputs
+        inputs.set_af('dual')
+        inputs.api_server_port = '9100'
+        self.pool.release(lease)
+        self.assertIs(lease.inputs, inputs)
+        self.assertEqual(inputs.address_family, 'v4')
+        self.assertFalse(hasattr(inputs, 'api_server_port'))
+
+if __name__ == '__main__':
+    unittest.main()
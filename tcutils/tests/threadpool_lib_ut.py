@@ -0,0 +1,101 @@
+"""Unittests for threadpool_lib module.
+"""
+
+import time
+import threading
+import unittest
+
+from tcutils.threadpool_lib import exec_dag, DependencyFailed, \
+    map_in_parallel
+
+
+class TestExecDag(unittest.TestCase):
+
+    def setUp(self):
+        self.lock = threading.Lock()
+        self.order = list()
+        (self.running, self.max_running) = (0, 0)
+
+    def record(self, item, fail=()):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.01)
+        with self.lock:
+            self.running -= 1
+            self.order.append(item)
+        if item in fail:
+            raise RuntimeError('%s failed' % item)
+        return item * 2
+
+    def test_dependencies_run_first(self):
+        deps = {1: [], 2: [1], 3: [1], 4: [2, 3], 5: [9]}
+        (results, failures) = exec_dag(self.record, deps, max_workers=2)
+        self.assertEqual(results, {1: 2, 2: 4, 3: 6, 4: 8, 5: 10})
+        self.assertFalse(failures)
+        for item, depends in deps.iteritems():
+            for dep in depends:
+                if dep in deps:
+                    self.assertLess(self.order.index(dep),
+                                    self.order.index(item))
+
+    def test_max_workers(self):
+        deps = dict((i, []) for i in range(20))
+        exec_dag(self.record, deps, max_workers=3)
+        self.assertEqual(len(self.order), 20)
+        self.assertLessEqual(self.max_running, 3)
+
+    def test_failed_dependency(self):
+        deps = {1: [], 2: [1], 3: [2], 4: []}
+        (results, failures) = exec_dag(self.record, deps, kwargs={'fail': [1]})
+        self.assertEqual(results, {4: 8})
+        self.assertIsInstance(failures[1], RuntimeError)
+        self.assertIsInstance(failures[2], DependencyFailed)
+        self.assertIsInstance(failures[3], DependencyFailed)
+        self.assertEqual(sorted(self.order), [1, 4])
+
+    def test_cycle(self):
+        (results, failures) = exec_dag(self.record,
+                                       {1: [], 2: [3], 3: [2], 4: [3]})
+        self.assertEqual(results, {1: 2})
+        self.assertEqual(sorted(failures), [2, 3, 4])
+        self.assertIsInstance(failures[2], ValueError)
+
+    def test_system_exit(self):
+        def fn(item):
+            if item == 'b':
+                raise SystemExit(1)
+            return item
+        self.assertRaises(SystemExit, exec_dag, fn,
+                          {'a': [], 'b': ['a'], 'c': ['b']})
+
+    def test_empty(self):
+        self.assertEqual(exec_dag(self.record, {}), ({}, {}))
+
+
+class TestMapInParallel(unittest.TestCase):
+
+    def square(self, item, fail=()):
+        if item in fail:
+            raise fail[item]
+        return item * item
+
+    def test_results(self):
+        self.assertEqual(map_in_parallel(self.square, [1, 2, 3]),
+                         {1: 1, 2: 4, 3: 9})
+        self.assertEqual(map_in_parallel(
+            self.square, [1, 2, 3], raise_exception=False,
+            kwargs={'fail': {2: RuntimeError('2 failed')}}),
+            {1: 1, 2: None, 3: 9})
+        self.assertRaises(RuntimeError, map_in_parallel, self.square,
+                          [1, 2, 3], kwargs={'fail': {2: RuntimeError()}})
+
+    def test_system_exit(self):
+        # SystemExit, as of fabric abort, is raised and not waited forever
+        for raise_exception in (True, False):
+            self.assertRaises(SystemExit, map_in_parallel, self.square,
+                              [1, 2, 3], raise_exception=raise_exception,
+                              kwargs={'fail': {2: SystemExit(1)}})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Unittests for topo_executor module.
+"""
+
+import time
+import threading
+import unittest
+
+from tcutils.topo.topo_executor import TopoExecutor
+
+
+class TestTopoExecutor(unittest.TestCase):
+
+    def setUp(self):
+        self.created = list()
+        self.lock = threading.Lock()
+
+    def create(self, name, delay=0):
+        time.sleep(delay)
+        with self.lock:
+            self.created.append(name)
+        return name
+
+    def fail(self, name):
+        raise AssertionError('%s verification failed' % name)
+
+    def test_dependency_order(self):
+        executor = TopoExecutor(max_workers=4)
+        executor.add(('ipam', 'ipam1'), self.create, args=['ipam1', 0.05])
+        for vn in ['vn1', 'vn2']:
+            executor.add(('vn', vn), self.create, args=[vn],
+                         deps=[('ipam', 'ipam1')])
+        executor.add(('policy', 'pol1'), self.create, args=['pol1'])
+        executor.add(('vn_policy', 'vn1'), self.create, args=['vn_policy1'],
+                     deps=[('vn', 'vn1'), ('policy', 'pol1'),
+                           ('policy', 'absent')])
+        results = executor.run()
+        self.assertEqual(results[('vn', 'vn2')], 'vn2')
+        self.assertEqual(self.created[0], 'pol1')
+        self.assertTrue(self.created.index('ipam1') <
+                        self.created.index('vn1') <
+                        self.created.index('vn_policy1'))
+        self.assertEqual(len(executor.timings), 5)
+        self.assertTrue(executor.timings[('vn', 'vn1')][0] >= 0.05)
+        summary = executor.summary()
+        self.assertIn('vn: 2 created', summary)
+        self.assertIn('5 objects created', summary)
+        self.assertIn('vn_policy vn1', executor.report())
+
+    def test_concurrency(self):
+        executor = TopoExecutor(max_workers=8)
+        for i in range(8):
+            executor.add(('vm', 'vm%s' % i), self.create,
+                         args=['vm%s' % i, 0.2])
+        start = time.time()
+        executor.run()
+        self.assertTrue(time.time() - start < 1)
+        self.assertEqual(len(self.created), 8)
+
+    def test_failure(self):
+        executor = TopoExecutor(max_workers=2)
+        executor.add(('vn', 'vn1'), self.fail, args=['vn1'])
+        executor.add(('vm', 'vm1'), self.create, args=['vm1'],
+                     deps=[('vn', 'vn1')])
+        executor.add(('vn', 'vn2'), self.create, args=['vn2'])
+        self.assertRaises(AssertionError, executor.run)
+        self.assertEqual(self.created, ['vn2'])
+        self.assertRaises(ValueError, executor.add, ('vn', 'vn2'),
+                          self.create)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,120 @@
+"""Unittests for verification_util module.
+"""
+
+import time
+import unittest
+import threading
+
+from tcutils.verification_util import HttpSessionPool, ResponseCache,\
+    VerificationUtilBase, XmlDrv, JsonDrv
+
+
+class TestHttpSessionPool(unittest.TestCase):
+
+    def test_session_per_endpoint(self):
+        pool = HttpSessionPool(pool_size=4, max_retries=2)
+        session = pool.get('http://10.1.1.1:8085/Snh_ItfReq?name=')
+        self.assertIs(pool.get('http://10.1.1.1:8085/Snh_VrfListReq?name='),
+                      session)
+        self.assertIsNot(pool.get('http://10.1.1.1:8083/Snh_BgpNeighborReq'),
+                         session)
+        self.assertIsNot(pool.get('https://10.1.1.1:8085/Snh_ItfReq?name='),
+                         session)
+        adapter = session.get_adapter('http://10.1.1.1:8085/')
+        self.assertEqual(adapter.max_retries.total, 2)
+        self.assertEqual(adapter._pool_maxsize, 4)
+        pool.close()
+        self.assertEqual(pool.sessions, {})
+
+    def test_no_retries_by_default(self):
+        session = HttpSessionPool().get('http://10.1.1.1:8085/')
+        retries = session.get_adapter('http://10.1.1.1:8085/').max_retries
+        self.assertEqual(retries.total, 0)
+
+class FakeSessions(object):
+
+    def __init__(self, status_code):
+        self.response = type('Response', (object,), {
+            'status_code': status_code, 'text': '{"tables": []}'})
+
+    def get(self, url):
+        return self
+
+    def post(self, url, **kwargs):
+        return self.response
+
+
+class TestJsonDrvPost(unittest.TestCase):
+
+    def post(self, status_code, headers=None):
+        drv = JsonDrv(None, sessions=FakeSessions(status_code))
+        return drv.post('http://10.1.1.1:8081/analytics/query', {},
+                        headers=headers)
+
+    def test_accepted_only_if_expected(self):
+        self.assertEqual(self.post(200), {'tables': []})
+        self.assertIsNone(self.post(202))
+        self.assertIsNone(self.post(202, headers={'X-Auth-Token': 'token'}))
+        self.assertEqual(self.post(202, headers={'Expect': '202-accepted'}),
+                         {'tables': []})
+
+
+class FakeDrv(XmlDrv):
+
+    def __init__(self, *args, **kwargs):
+        super(FakeDrv, self).__init__(*args, **kwargs)
+        self.urls = list()
+
+    def load(self, url, raw_data=False):
+        self.urls.append(url)
+        time.sleep(0.1)
+        return url
+
+
+class TestResponseCache(unittest.TestCase):
+
+    def test_ttl_and_coalescing(self):
+        cache = ResponseCache(ttl=60)
+        calls = list()
+
+        def loader():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'resp'
+        threads = [threading.Thread(target=cache.get_or_load,
+                                    args=('url', loader)) for i in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(cache.get_or_load('url', loader), 'resp')
+        stats = cache.get_stats()
+        self.assertEqual((stats['misses'], stats['coalesced'], stats['hits']),
+                         (1, 4, 1))
+        cache.invalidate('url')
+        cache.get_or_load('url', loader)
+        self.assertEqual(len(calls), 2)
+
+    def test_failed_load_not_cached(self):
+        cache = ResponseCache(ttl=60)
+        cache.get_or_load('url', lambda: None)
+        self.assertEqual(cache.get_or_load('url', lambda: 'resp'), 'resp')
+
+    def test_verification_util_cache(self):
+        vub = VerificationUtilBase('127.0.0.1', 8085, drv=FakeDrv,
+                                   cache_ttl=60)
+        vub.dict_get('Snh_VrfListReq?name=')
+        vub.dict_get('Snh_VrfListReq?name=')
+        self.assertEqual(len(vub._drv.urls), 1)
+        vub.set_force_refresh(True)
+        vub.dict_get('Snh_VrfListReq?name=')
+        vub.set_force_refresh(False)
+        vub.dict_get('Snh_VrfListReq?name=')
+        self.assertEqual(len(vub._drv.urls), 3)
+        self.assertEqual(vub.get_response_cache_stats()['hits'], 1)
+        self.assertEqual(VerificationUtilBase(
+            '127.0.0.1', 8085, drv=FakeDrv).get_response_cache_stats(), None)
+
+if __name__ == '__main__':
+    unittest.main()
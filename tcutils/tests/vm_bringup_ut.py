@@ -0,0 +1,145 @@
+"""Unittests for vm_bringup module.
+"""
+
+import logging
+import unittest
+
+from vm_bringup import VMBringup
+
+
+class Fake(object):
+
+    def __init__(self, **kwargs):
+        self.__dict__.update(kwargs)
+
+
+class FakeOrch(object):
+
+    ''' states: list of dict of vm id: nova status, one per poll '''
+
+    def __init__(self, states):
+        self.states = states
+        self.polls = 0
+
+    def get_vms_status(self, vm_ids):
+        self.polls += 1
+        return self.states.pop(0) if len(self.states) > 1 else self.states[0]
+
+
+class FakeVM(object):
+
+    def __init__(self, name, orch, vm_ids=None, boot_error=None, up=True):
+        self.vm_name = name
+        self.orch = orch
+        self.vm_objs = [Fake(id=vm_id) for vm_id in vm_ids or [name]]
+        self.boot_error = boot_error
+        self.up = up
+        self.vn_fq_names = ['default-domain:admin:vn1']
+        self.vnc_lib_fixture = Fake(
+            get_active_forwarding_mode=lambda vn_fq_name: 'l2_l3')
+        self.calls = list()
+
+    def setUp(self):
+        self.calls.append('setUp')
+        if self.boot_error:
+            raise self.boot_error
+
+    def cleanUp(self):
+        self.calls.append('cleanUp')
+
+    def verify_vm_launched(self):
+        return True
+
+    def _gather_details(self):
+        return True
+
+    def wait_for_ssh_on_vm(self):
+        self.calls.append('ssh')
+        return self.up
+
+    def wait_till_vm_is_up(self):
+        self.calls.append('wait_till_vm_is_up')
+        return self.up
+
+    def get_console_output(self):
+        return 'console of %s' % self.vm_name
+
+
+class TestVMBringup(unittest.TestCase):
+
+    def bringup(self, vm_fixtures, **kwargs):
+        logger = logging.getLogger(__name__)
+        logger.addHandler(logging.NullHandler())
+        bringup = VMBringup(vm_fixtures, max_workers=4, logger=logger,
+                            **kwargs)
+        bringup.sleep = lambda secs: None
+        return bringup
+
+    def test_get_status(self):
+        orch = FakeOrch([{'a1': 'ACTIVE', 'a2': 'BUILD', 'b1': 'ACTIVE',
+                          'b2': 'ERROR', 'c1': 'ACTIVE', 'c2': 'ACTIVE'}])
+        vms = [FakeVM('a', orch, ['a1', 'a2']), FakeVM('b', orch, ['b1', 'b2']),
+               FakeVM('c', orch, ['c1', 'c2']), FakeVM('d', orch, ['d1'])]
+        status = self.bringup(vms).get_status(vms)
+        self.assertEqual([status[vm] for vm in vms],
+                         ['BUILD', 'ERROR', 'ACTIVE', 'BUILD'])
+        self.assertEqual(orch.polls, 1)
+
+    def test_wait_till_up(self):
+        orch = FakeOrch([{'vm1': 'BUILD', 'vm2': 'BUILD'},
+                         {'vm1': 'ACTIVE', 'vm2': 'BUILD'},
+                         {'vm2': 'ERROR'}])
+        vms = [FakeVM('vm1', orch), FakeVM('vm2', orch)]
+        bringup = self.bringup(vms)
+        self.assertEqual(bringup.boot(), vms)
+        self.assertFalse(bringup.wait_till_up())
+        self.assertEqual(bringup.results, {vms[0]: True, vms[1]: False})
+        self.assertEqual(orch.polls, 3)
+        self.assertEqual(list(bringup.timings['vm1']),
+                         ['boot', 'active', 'agent', 'ssh'])
+        self.assertEqual(list(bringup.timings['vm2']), ['boot'])
+        self.assertNotIn('ssh', vms[1].calls)
+        self.assertIn("VMs not up: ['vm2']", bringup.summary())
+
+    def test_not_ready(self):
+        orch = FakeOrch([{'vm1': 'ACTIVE'}])
+        vms = [FakeVM('vm1', orch, up=False)]
+        bringup = self.bringup(vms)
+        bringup.boot()
+        self.assertFalse(bringup.wait_till_up())
+        self.assertEqual(list(bringup.timings['vm1']),
+                         ['boot', 'active', 'agent'])
+
+    def test_timeout(self):
+        orch = FakeOrch([{'vm1': 'BUILD', 'vm2': 'ACTIVE'}])
+        vms = [FakeVM('vm1', orch), FakeVM('vm2', orch)]
+        bringup = self.bringup(vms, active_timeout=0)
+        bringup.boot()
+        self.assertFalse(bringup.wait_till_up())
+        self.assertEqual(bringup.results, {vms[0]: False, vms[1]: True})
+
+    def test_failed_boot_cleaned_up(self):
+        orch = FakeOrch([{'vm1': 'ACTIVE'}])
+        vms = [FakeVM('vm1', orch), FakeVM('vm2', orch,
+                                           boot_error=RuntimeError('quota'))]
+        bringup = self.bringup(vms)
+        self.assertEqual(bringup.boot(), vms[:1])
+        self.assertEqual(vms[1].calls, ['setUp', 'cleanUp'])
+        self.assertEqual(vms[0].calls, ['setUp'])
+        self.assertFalse(bringup.boot_vm(FakeVM(
+            'vm3', orch, boot_error=RuntimeError('quota'))))
+        self.assertEqual(bringup.booted, vms[:1])
+        self.assertTrue(bringup.wait_till_up())
+
+    def test_orch_without_status(self):
+        orch = Fake()
+        vms = [FakeVM('vm1', orch), FakeVM('vm2', orch, up=False)]
+        bringup = self.bringup(vms)
+        bringup.boot()
+        self.assertFalse(bringup.wait_till_up())
+        self.assertEqual(bringup.results, {vms[0]: True, vms[1]: False})
+        self.assertEqual(vms[0].calls, ['setUp', 'wait_till_vm_is_up'])
+        self.assertFalse(self.bringup([]).wait_till_up())
+
+if __name__ == '__main__':
+    unittest.main()
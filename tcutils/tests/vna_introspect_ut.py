@@ -0,0 +1,299 @@
+"""Unittests for vna_introspect_utils module.
+"""
+
+import unittest
+from StringIO import StringIO
+
+from lxml import etree
+
+from tcutils.agent.vna_introspect_utils import AgentInspect, KFlowTuple,\
+    KFlowRecord, VrouterRouteTable
+
+FLOW = '<KFlowInfo><index>%s</index><sip>%s</sip><dip>1.1.1.2</dip>' \
+       '<proto>%s</proto><flags>%s</flags><action>FORWARD</action>' \
+       '</KFlowInfo>'
+
+
+ROUTE = '<KRouteInfo><vrf_id>4</vrf_id><family>AF_INET</family>' \
+        '<prefix>%s</prefix><prefix_len>%s</prefix_len><rid>0</rid>' \
+        '<label_flags>MPLS </label_flags><label>%s</label>' \
+        '<nh_id>%s</nh_id></KRouteInfo>'
+
+NH = '<KNHInfo><id>%s</id><type>TUNNEL</type><tun_dip>%s</tun_dip></KNHInfo>'
+
+
+VRF = '<VrfSandeshData><name>%s</name><ucindex>%s</ucindex>' \
+      '<mcindex>%s</mcindex></VrfSandeshData>'
+
+
+VN = '<VnSandeshData><name>%s</name><uuid>%s</uuid><acl_uuid>%s</acl_uuid>' \
+     '</VnSandeshData>'
+
+ACL = '<AclSandeshData><uuid>%s</uuid><name>%s</name><entries><list>%s' \
+      '</list></entries></AclSandeshData>'
+
+ACE = '<AclEntrySandeshData><ace_id>%s</ace_id><src>%s</src><dst>%s</dst>' \
+      '<proto_l><list><SandeshRange><min>6</min><max>6</max></SandeshRange>' \
+      '</list></proto_l><src_port_l><list/></src_port_l>' \
+      '<action_l><list><ActionStr><action>pass</action></ActionStr></list>' \
+      '</action_l></AclEntrySandeshData>'
+
+
+def vn_page(vns):
+    return '<__VnListResp_list><VnListResp><vn_list><list>%s</list>' \
+           '</vn_list></VnListResp></__VnListResp_list>' % (
+               ''.join(VN % vn for vn in vns))
+
+
+def acl_page(acls):
+    return '<AclResp><acl_list><list>%s</list></acl_list></AclResp>' % (
+        ''.join(ACL % (uuid, name, ''.join(ACE % ace for ace in aces))
+                for uuid, name, aces in acls))
+
+
+def vrf_page(vrfs):
+    return '<__VrfListResp_list><VrfListResp><vrf_list><list>%s</list>' \
+           '</vrf_list></VrfListResp></__VrfListResp_list>' % (
+               ''.join(VRF % (name, idx, idx) for name, idx in vrfs))
+
+
+def route_page(routes):
+    return '<__KRouteResp_list><KRouteResp><rt_list><list>%s</list>' \
+           '</rt_list></KRouteResp></__KRouteResp_list>' % (
+               ''.join(ROUTE % route for route in routes))
+
+
+def nh_page(nhs):
+    return '<KNHResp><nh_list><list>%s</list></nh_list></KNHResp>' % (
+        ''.join(NH % nh for nh in nhs))
+
+
+def kflow_page(flows, next_index):
+    return '<KFlowResp type="sandesh"><flow_list type="list">' \
+           '<list type="struct">%s</list></flow_list>' \
+           '<flow_handle type="string">%s</flow_handle></KFlowResp>' % (
+               ''.join(FLOW % flow for flow in flows), next_index)
+
+
+class BrokenStream(object):
+
+    ''' Response which fails to be read after size bytes '''
+
+    def __init__(self, data, size):
+        self.stream = StringIO(data[:size])
+        self.closed = False
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if not data:
+            raise IOError('Connection reset by peer')
+        return data
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAgentInspect(AgentInspect):
+
+    def __init__(self, pages):
+        super(FakeAgentInspect, self).__init__('127.0.0.1')
+        self.pages = pages
+        self.requests = list()
+        self.streams = list()
+
+    def stream_get(self, path):
+        self.requests.append(path)
+        page = self.pages[path]
+        stream = page if isinstance(page, BrokenStream) else StringIO(page)
+        self.streams.append(stream)
+        return stream
+
+    def dict_get(self, path):
+        self.requests.append(path)
+        return etree.fromstring(self.pages[path])
+
+
+class TestKFlowIterator(unittest.TestCase):
+
+    def setUp(self):
+        self.inspect = FakeAgentInspect({
+            'Snh_KFlowReq?flow_idx=': kflow_page(
+                [('1', '10.1.1.1', '6', 'ACTIVE'),
+                 ('2', '10.1.1.2', '17', 'ACTIVE | EVICTED')], '2'),
+            'Snh_NextKFlowReq?x=2': kflow_page(
+                [('3', '10.1.1.3', '6', 'ACTIVE | SNAT')], '0')})
+
+    def test_get_vna_kflowresp(self):
+        flows = self.inspect.get_vna_kflowresp()
+        self.assertEqual([f['index'] for f in flows], ['1', '3'])
+        self.assertEqual(flows[0]['sip'], '10.1.1.1')
+        flows = self.inspect.get_vna_kflowresp(show_evicted=True)
+        self.assertEqual([f['index'] for f in flows], ['1', '2', '3'])
+
+    def test_filters(self):
+        flows = list(self.inspect.iter_vna_kflows(proto=6, flags=['SNAT']))
+        self.assertEqual([f['index'] for f in flows], ['3'])
+        flows = list(self.inspect.iter_vna_kflows(sip='10.1.1.2',
+                                                  show_evicted=True))
+        self.assertEqual([f['index'] for f in flows], ['2'])
+
+    def test_records(self):
+        flow = next(self.inspect.iter_vna_kflows(record='tuple'))
+        self.assertTrue(isinstance(flow, KFlowTuple))
+        self.assertEqual((flow.index, flow.proto, flow.nhid), ('1', '6', None))
+        flow = next(self.inspect.iter_vna_kflows(record='slots'))
+        self.assertTrue(isinstance(flow, KFlowRecord))
+        self.assertEqual(flow['sip'], '10.1.1.1')
+
+    def test_invalid_output(self):
+        self.inspect.pages['Snh_KFlowReq?flow_idx='] = '<Error>x</Error>'
+        self.assertEqual(self.inspect.get_vna_kflowresp(), None)
+
+    def test_stream_closed(self):
+        flows = self.inspect.iter_vna_kflows()
+        next(flows)
+        flows.close()
+        self.assertTrue(all(s.closed for s in self.inspect.streams))
+
+    def test_read_error(self):
+        page = self.inspect.pages['Snh_NextKFlowReq?x=2']
+        self.inspect.pages['Snh_NextKFlowReq?x=2'] = BrokenStream(page, 60)
+        self.assertEqual(self.inspect.get_vna_kflowresp(), None)
+        flows = list(self.inspect.iter_vna_kflows())
+        self.assertEqual([f['index'] for f in flows], ['1'])
+        self.assertTrue(all(s.closed for s in self.inspect.streams))
+
+class TestVrouterRouteTable(unittest.TestCase):
+
+    def setUp(self):
+        routes = [('10.1.1.0', '24', '16', '10'),
+                  ('10.1.1.3', '32', '17', '11'),
+                  ('10.1.1.4', '32', '18', '12'),
+                  ('0.0.0.0', '0', '0', '1')]
+        pages = {'Snh_KRouteReq?x=4': route_page(routes),
+                 'Snh_KNHReq?x=': nh_page([('10', '1.1.1.1'),
+                                           ('11', '1.1.1.2')]),
+                 'Snh_KNHReq?x=10': nh_page([('10', '1.1.1.1')]),
+                 'Snh_KNHReq?x=11': nh_page([('11', '1.1.1.2')]),
+                 'Snh_KNHReq?x=12': nh_page([('12', '1.1.1.3')]),
+                 'Snh_KNHReq?x=1': nh_page([('1', '1.1.1.4')])}
+        self.inspect = FakeAgentInspect(pages)
+
+    def test_lookups(self):
+        table = self.inspect.get_vrouter_route_table_snapshot('4')
+        self.assertTrue(isinstance(table, VrouterRouteTable))
+        self.assertEqual(len(table), 4)
+        self.assertEqual(table.get_route('10.1.1.3', 32)['label'], '17')
+        self.assertEqual(table.get_routes(nh_id=12)[0]['prefix'], '10.1.1.4')
+        self.assertEqual(table.get_routes(label='16')[0]['prefix'],
+                         '10.1.1.0')
+        self.assertEqual(table.longest_prefix_match('10.1.1.3')['nh_id'],
+                         '11')
+        self.assertEqual(table.longest_prefix_match('10.1.1.9')['nh_id'],
+                         '10')
+        self.assertEqual(table.longest_prefix_match('20.1.1.1')['nh_id'],
+                         '1')
+        self.assertEqual(self.inspect.requests, ['Snh_KRouteReq?x=4'])
+
+    def test_nh_details(self):
+        table = self.inspect.get_vrouter_route_table_snapshot(
+            '4', get_nh_details=True)
+        self.assertEqual(table.get_route('10.1.1.0', '24')['nh']['tun_dip'],
+                         '1.1.1.1')
+        self.assertEqual(self.inspect.get_nh_for_route_in_vrouter(
+            '10.1.1.4/32', route_table=table)['tun_dip'], '1.1.1.3')
+        routes = self.inspect.get_vrouter_route_table(
+            '4', prefix='10.1.1.3', prefix_len='32', get_nh_details=True)
+        self.assertEqual(len(routes), 1)
+        self.assertEqual(routes[0]['nh']['tun_dip'], '1.1.1.2')
+
+    def test_add_nhs(self):
+        table = self.inspect.get_vrouter_route_table_snapshot('4')
+        table.add_nhs(self.inspect.get_vrouter_nhs(
+            [r['nh_id'] for r in table.get_routes(prefix='10.1.1.3',
+                                                  prefix_len='32')]))
+        self.assertEqual(table.get_route('10.1.1.3', '32')['nh']['tun_dip'],
+                         '1.1.1.2')
+        self.assertNotIn('nh', table.get_route('10.1.1.4', '32'))
+        self.assertEqual(self.inspect.requests,
+                         ['Snh_KRouteReq?x=4', 'Snh_KNHReq?x=11'])
+
+    def test_bulk_nh_fetch(self):
+        self.inspect.requests = list()
+        nhs = self.inspect.get_vrouter_nhs(['10', '11', '12'],
+                                           bulk_threshold=2)
+        self.assertEqual(sorted(nhs.keys()), ['10', '11', '12'])
+        self.assertEqual(self.inspect.requests,
+                         ['Snh_KNHReq?x=', 'Snh_KNHReq?x=12'])
+
+
+VRF_TABLE = 'Snh_PageReq?x=begin:-1,end:-1,table:db.vrf.0,'
+
+
+class TestVrfIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.inspect = FakeAgentInspect({VRF_TABLE: vrf_page(
+            [('default-domain:default-project:ip-fabric:__default__', '0'),
+             ('default-domain:admin:vn1:vn1', '1'),
+             ('default-domain:admin:vn1:service-vrf', '2'),
+             ('default-domain:admin:vn2:vn2', '3')])})
+
+    def test_lookups(self):
+        self.assertEqual(self.inspect.get_vna_vrf_id(
+            'default-domain:admin:vn2'), '3')
+        self.assertEqual(self.inspect.get_vna_vrf_by_id('1')['name'],
+                         'default-domain:admin:vn1:vn1')
+        vrfs = self.inspect.get_vna_vrf_objs(vn_name='vn1')['vrf_list']
+        self.assertEqual([v['ucindex'] for v in vrfs], ['1'])
+        self.assertEqual(len(self.inspect.get_vna_vrf_list()['VRFs']), 4)
+        self.assertEqual(self.inspect.requests.count(VRF_TABLE), 2)
+
+    def test_miss_refreshes(self):
+        self.inspect.get_vna_vrf_index()
+        self.inspect._vrf_index.timestamp -= 1
+        self.inspect.pages[VRF_TABLE] = vrf_page(
+            [('default-domain:admin:vn3:vn3', '5')])
+        self.assertEqual(self.inspect.get_vna_vrf_id(
+            'default-domain:admin:vn3'), '5')
+        # index was just rebuilt, a miss does not refetch it
+        self.assertEqual(self.inspect.get_vna_vrf_by_id('9'), {})
+        self.assertEqual(self.inspect.requests.count(VRF_TABLE), 2)
+
+
+VN_TABLE = 'Snh_PageReq?x=begin:-1,end:-1,table:db.vn.0,'
+
+
+class TestAclSnapshot(unittest.TestCase):
+
+    def setUp(self):
+        self.inspect = FakeAgentInspect({
+            VN_TABLE: vn_page(
+                [('default-domain:admin:vn1', 'vn1-id', 'acl1'),
+                 ('default-domain:admin:vn2', 'vn2-id', 'acl2'),
+                 ('default-domain:admin:vn3', 'vn3-id', '')]),
+            'Snh_AclReq?name=': acl_page(
+                [('acl1', 'vn1-acl', [('1', 'vn1', 'vn2')])]),
+            'Snh_AclReq?x=acl2': acl_page(
+                [('acl2', 'vn2-acl', [('1', 'vn2', 'vn1'),
+                                      ('2', 'vn2', 'vn2')])])})
+
+    def test_get_vna_acls_by_vn(self):
+        acls = self.inspect.get_vna_acls_by_vn()
+        self.assertEqual(sorted(acls), ['default-domain:admin:vn1',
+                                        'default-domain:admin:vn2',
+                                        'default-domain:admin:vn3'])
+        self.assertIsNone(acls['default-domain:admin:vn3'])
+        entries = acls['default-domain:admin:vn1']['entries']
+        self.assertEqual(entries, [{'ace_id': '1', 'src': 'vn1', 'dst': 'vn2',
+                                    'proto_l': {'min': '6', 'max': '6'},
+                                    'src_port_l': 'NA',
+                                    'action_l': ['pass']}])
+        # acl2 is missing in the bulk response and is fetched by itself
+        self.assertEqual(len(acls['default-domain:admin:vn2']['entries']), 2)
+        self.assertEqual(self.inspect.requests,
+                         [VN_TABLE, 'Snh_AclReq?name=',
+                          'Snh_AclReq?x=acl2'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,104 @@
+"""Unittests for xmpp_sampler module.
+"""
+
+import os
+import time
+import logging
+import unittest
+
+from tcutils.test_lib.xmpp_sampler import XmppSampler
+from tcutils.test_lib import contrail_utils
+
+
+class FakeAgentInspect(object):
+
+    def __init__(self, controllers):
+        self.status = dict((ip, ['Established', 0, '']) for ip in controllers)
+        self.polls = 0
+
+    def flap(self, controller, state='Established'):
+        self.status[controller][0] = state
+        self.status[controller][1] += 1
+        self.status[controller][2] = time.ctime()
+
+    def get_vna_xmpp_connection_status(self):
+        self.polls += 1
+        return [{'controller_ip': ip, 'state': state,
+                 'flap_count': str(count), 'flap_time': flap_time}
+                for ip, (state, count, flap_time) in self.status.iteritems()]
+
+
+class FakeInputs(object):
+
+    def __init__(self, compute_ips):
+        self.compute_ips = compute_ips
+        self.logger = logging.getLogger(__name__)
+
+
+class FakeConnections(object):
+
+    def __init__(self, agent_inspect):
+        self.agent_inspect = agent_inspect
+
+
+class TestXmppSampler(unittest.TestCase):
+
+    def setUp(self):
+        self.agents = dict((ip, FakeAgentInspect(['10.0.0.1', '10.0.0.2']))
+                           for ip in ['10.0.1.1', '10.0.1.2', '10.0.1.3'])
+        self.inputs = FakeInputs(sorted(self.agents))
+        self.connections = FakeConnections(self.agents)
+        self.sampler = XmppSampler(self.inputs, self.connections, interval=60)
+
+    def test_snapshot_and_flaps(self):
+        before = self.sampler.snapshot()
+        self.assertEqual(before['10.0.1.1'], {'10.0.0.1': 0, '10.0.0.2': 0})
+        # Cached snapshot is reused within the interval
+        self.assertEqual(self.sampler.snapshot(), before)
+        self.assertEqual(self.agents['10.0.1.1'].polls, 1)
+        self.agents['10.0.1.2'].flap('10.0.0.2', state='Active')
+        self.sampler.sample()
+        self.agents['10.0.1.2'].flap('10.0.0.2')
+        after = self.sampler.snapshot(max_age=0)
+        self.assertEqual(after['10.0.1.2']['10.0.0.2'], 2)
+        self.assertEqual(after.not_established, [])
+        flaps = self.sampler.get_flaps(before.timestamp, after.timestamp)
+        self.assertEqual(len(flaps), 2)
+        self.assertEqual([(f.compute, f.controller, f.flaps, f.state)
+                          for f in flaps],
+                         [('10.0.1.2', '10.0.0.2', 1, 'Active'),
+                          ('10.0.1.2', '10.0.0.2', 1, 'Established')])
+        self.assertEqual(self.sampler.get_flaps(after.timestamp), [])
+
+    def test_not_established_and_unreachable(self):
+        self.agents['10.0.1.3'].flap('10.0.0.1', state='Active')
+
+        def unreachable():
+            raise IOError('Connection refused')
+        self.agents['10.0.1.1'].get_vna_xmpp_connection_status = unreachable
+        snapshot = self.sampler.snapshot()
+        self.assertEqual(snapshot['10.0.1.1'], {})
+        self.assertEqual(snapshot.not_established,
+                         [('10.0.1.3', '10.0.0.1', 'Active')])
+
+    def test_check_xmpp_is_stable(self):
+        os.environ['DO_XMPP_CHECK'] = 'True'
+        get_sampler = contrail_utils.get_xmpp_sampler
+        contrail_utils.get_xmpp_sampler = lambda *args: self.sampler
+        try:
+            (result, before) = contrail_utils.check_xmpp_is_stable(
+                self.inputs, self.connections)
+            self.assertTrue(result)
+            (result, after) = contrail_utils.check_xmpp_is_stable(
+                self.inputs, self.connections, before)
+            self.assertTrue(result)
+            self.agents['10.0.1.1'].flap('10.0.0.1')
+            (result, after) = contrail_utils.check_xmpp_is_stable(
+                self.inputs, self.connections, after)
+            self.assertFalse(result)
+        finally:
+            contrail_utils.get_xmpp_sampler = get_sampler
+            del os.environ['DO_XMPP_CHECK']
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,186 @@
+""" Bounded worker pool helpers.
+
+Same calling convention as tcutils.gevent_lib, but backed by a thread pool
+so that importing it does not monkey patch the interpreter.
+"""
+import sys
+import Queue
+from collections import defaultdict
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
+
+from tcutils.util import SafeList, get_os_env
+
+MAX_WORKERS = int(get_os_env('TEST_MAX_WORKERS') or 16)
+# Results are waited for in steps of these secs, an untimed wait can not be
+# interrupted with Ctrl-C
+POLL_INTERVAL = 1
+
+
+class WorkerExit(Exception):
+
+    ''' Carries a BaseException which is not an Exception, eg. SystemExit
+        of fabric abort, raised in a pool worker. A ThreadPool worker does
+        not catch them and dies without setting the result
+    '''
+
+    def __init__(self, exc_info):
+        super(WorkerExit, self).__init__(repr(exc_info[1]))
+        self.exc_info = exc_info
+
+    def reraise(self):
+        raise self.exc_info[0], self.exc_info[1], self.exc_info[2]
+
+
+def _call(fn, args, kwargs):
+    try:
+        return fn(*args, **kwargs)
+    except Exception:
+        raise
+    except BaseException:
+        raise WorkerExit(sys.exc_info())
+
+
+def wait_for(result):
+    ''' Returns result of AsyncResult result once it is ready '''
+    while True:
+        try:
+            return result.get(POLL_INTERVAL)
+        except TimeoutError:
+            continue
+
+
+def exec_in_parallel(functions_and_args, max_workers=None):
+    # Pass in Functions, args and kwargs in the below format
+    # exec_in_parallel([(self.test, (val1, val2), {key3: val3})])
+    # Atmost max_workers functions are run at any point of time
+    functions_and_args = list(functions_and_args)
+    if not functions_and_args:
+        return list()
+    max_workers = max_workers or MAX_WORKERS
+    pool = ThreadPool(min(max_workers, len(functions_and_args)))
+    results = list()
+    for fn_and_arg in functions_and_args:
+        instance = SafeList(fn_and_arg)
+        fn = instance[0]
+        args = instance.get(1, tuple())
+        kwargs = instance.get(2, dict())
+        results.append(pool.apply_async(_call, (fn, tuple(args), kwargs)))
+    pool.close()
+    return results
+
+
+def get_results(results, raise_exception=True):
+    ''' Returns list of the outputs of results, None of the ones which
+        raised unless raise_exception is set. A BaseException which is not
+        an Exception, eg. SystemExit, is raised regardless
+    '''
+    outputs = list()
+    for result in results:
+        try:
+            outputs.append(wait_for(result))
+        except WorkerExit as e:
+            e.reraise()
+        except:
+            if raise_exception:
+                raise
+            outputs.append(None)
+    return outputs
+
+
+def map_in_parallel(fn, items, max_workers=None, raise_exception=True,
+                    args=None, kwargs=None):
+    ''' Run fn(item, *args, **kwargs) for each item concurrently
+        Returns dict of item: result
+    '''
+    items = list(items)
+    args = tuple(args or ())
+    kwargs = kwargs or dict()
+    results = exec_in_parallel([(fn, (item,) + args, kwargs)
+                                for item in items], max_workers=max_workers)
+    return dict(zip(items, get_results(results,
+                                       raise_exception=raise_exception)))
+
+
+class DependencyFailed(Exception):
+    ''' An item was not run since one of its dependencies failed '''
+    pass
+
+
+def exec_dag(fn, deps, max_workers=None, args=None, kwargs=None):
+    ''' Run fn(item, *args, **kwargs) for each item of deps, dict of
+        item: items it depends on, concurrently such that an item is run
+        only after all its dependencies completed. Dependencies which are
+        not items of deps are ignored. Atmost max_workers run at a time.
+        Items depending, directly or not, on a failed item are not run and
+        fail with DependencyFailed, items in a cycle with ValueError
+        Returns (dict of item: result, dict of item: exception)
+        A BaseException which is not an Exception, eg. SystemExit, of an
+        item is raised once it is done, no more items are started
+    '''
+    args = tuple(args or ())
+    kwargs = kwargs or dict()
+    deps = dict((item, set(depends) & set(deps))
+                for item, depends in deps.iteritems())
+    dependants = defaultdict(set)
+    for item, depends in deps.iteritems():
+        for dep in depends:
+            dependants[dep].add(item)
+    waiting = dict((item, len(depends)) for item, depends in deps.iteritems())
+    ready = [item for item, count in waiting.iteritems() if not count]
+    (results, failures) = (dict(), dict())
+    if not deps:
+        return (results, failures)
+    done = Queue.Queue()
+
+    def run(item):
+        try:
+            done.put((item, True, fn(item, *args, **kwargs)))
+        except Exception as e:
+            done.put((item, False, e))
+        except BaseException:
+            done.put((item, False, WorkerExit(sys.exc_info())))
+
+    pool = ThreadPool(min(max_workers or MAX_WORKERS, len(deps)))
+    (pending, inflight) = (len(deps), 0)
+    try:
+        while pending:
+            for item in ready:
+                pool.apply_async(run, (item,))
+            inflight += len(ready)
+            ready = list()
+            if not inflight:
+                for item in deps:
+                    if item not in results and item not in failures:
+                        failures[item] = ValueError(
+                            'Circular dependency of %s' % (item,))
+                break
+            while True:
+                try:
+                    (item, ok, result) = done.get(timeout=POLL_INTERVAL)
+                    break
+                except Queue.Empty:
+                    continue
+            (pending, inflight) = (pending - 1, inflight - 1)
+            if ok:
+                results[item] = result
+                for dependant in dependants[item]:
+                    waiting[dependant] -= 1
+                    if not waiting[dependant]:
+                        ready.append(dependant)
+                continue
+            failures[item] = result
+            if isinstance(result, WorkerExit):
+                result.reraise()
+            skipped = list(dependants[item])
+            while skipped:
+                dependant = skipped.pop()
+                if dependant in failures:
+                    continue
+                failures[dependant] = DependencyFailed(
+                    '%s failed: %s' % (item, result))
+                pending -= 1
+                skipped.extend(dependants[dependant])
+    finally:
+        pool.close()
+    return (results, failures)
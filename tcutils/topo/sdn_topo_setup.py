@@ -16,6 +16,7 @@ from policy_test import *
 from contrail_fixtures import *
 from tcutils.agent.vna_introspect_utils import *
 from topo_helper import *
+from topo_executor import TOPO_SETUP_WORKERS
 from vnc_api import vnc_api
 from vnc_api.gen.resource_test import *
 try:
@@ -45,7 +46,7 @@ class sdnTopoSetupFixture(fixtures.Fixture):
         super(sdnTopoSetupFixture, self).setUp()
     # end setUp
 
-    def topo_setup(self, config_option='openstack', skip_verify='no', flavor='contrail_flavor_small', vms_on_single_compute=False, VmToNodeMapping=None):
+    def topo_setup(self, config_option='openstack', skip_verify='no', flavor='contrail_flavor_small', vms_on_single_compute=False, VmToNodeMapping=None, max_workers=None):
         '''Take topology to be configured as input and return received & configured topology -collection
         of dictionaries. we return received topology as some data is updated and is required for
         reference.
@@ -63,6 +64,9 @@ class sdnTopoSetupFixture(fixtures.Fixture):
            c. IPAM:    Contrail API
            d. VN:      Contrail API
            e. VM:      Nova
+        The objects are created concurrently in dependency order, atmost
+        max_workers(default TOPO_SETUP_WORKERS) at a time, refer
+        topo_steps.createTopology, and one after the other if it is 1
         '''
         config_option = 'contrail' if self.inputs.orchestrator == 'vcenter' else config_option
         self.result = True
@@ -84,19 +88,25 @@ class sdnTopoSetupFixture(fixtures.Fixture):
         topo_helper_obj.update_policy_rules_for_v6_test(self.inputs.get_af())
         topo_steps.createUser(self)
         topo_steps.createProject(self)
-        topo_steps.createSec_group(self, option=config_option)
-        topo_steps.createServiceTemplate(self)
-        topo_steps.createServiceInstance(self)
-        topo_steps.createIPAM(self, option=config_option)
-        topo_steps.createVN(self, option=config_option)
-        topo_steps.createPolicy(self, option=config_option)
-        topo_steps.attachPolicytoVN(self, option=config_option)
-        # If vm to node pinning is defined then pass it on to create VM method.
-        if VmToNodeMapping is not None:
-            topo_steps.createVMNova(
-                self, config_option, vms_on_single_compute, VmToNodeMapping)
+        max_workers = max_workers or TOPO_SETUP_WORKERS
+        if max_workers > 1:
+            topo_steps.createTopology(
+                self, config_option, vms_on_single_compute, VmToNodeMapping,
+                max_workers=max_workers)
         else:
-            topo_steps.createVMNova(self, config_option, vms_on_single_compute)
+            topo_steps.createSec_group(self, option=config_option)
+            topo_steps.createServiceTemplate(self)
+            topo_steps.createServiceInstance(self)
+            topo_steps.createIPAM(self, option=config_option)
+            topo_steps.createVN(self, option=config_option)
+            topo_steps.createPolicy(self, option=config_option)
+            topo_steps.attachPolicytoVN(self, option=config_option)
+            # If vm to node pinning is defined then pass it on to create VM method.
+            if VmToNodeMapping is not None:
+                topo_steps.createVMNova(
+                    self, config_option, vms_on_single_compute, VmToNodeMapping)
+            else:
+                topo_steps.createVMNova(self, config_option, vms_on_single_compute)
         topo_steps.createPublicVN(self)
         topo_steps.verifySystemPolicy(self)
         # prepare return data
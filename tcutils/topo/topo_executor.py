@@ -0,0 +1,111 @@
+'''
+Concurrent creation of the objects of a topology in dependency order
+
+Objects are added with the objects they depend on, eg. a VN on its IPAM,
+and are created through tcutils.threadpool_lib.exec_dag, atmost
+max_workers at a time, each as soon as all its dependencies are created.
+The time taken by each object is recorded and summarised per kind.
+
+    executor = TopoExecutor(max_workers=8, logger=logger)
+    executor.add(('ipam', 'ipam1'), create_ipam, ['ipam1'])
+    executor.add(('vn', 'vn1'), create_vn, ['vn1'], deps=[('ipam', 'ipam1')])
+    executor.run()
+    logger.info(executor.summary())
+'''
+import os
+import time
+import threading
+from collections import OrderedDict
+
+from common import log_orig as contrail_logging
+from tcutils.threadpool_lib import exec_dag, DependencyFailed
+
+TOPO_SETUP_WORKERS = int(os.getenv('TOPO_SETUP_WORKERS') or 16)
+
+
+class TopoExecutor(object):
+
+    '''
+        Objects are keyed by (kind, name)
+        timings: OrderedDict of key: (secs since run started when the
+                 object creation started, secs taken)
+    '''
+
+    def __init__(self, max_workers=None, logger=None):
+        self.max_workers = max_workers or TOPO_SETUP_WORKERS
+        self.logger = logger or contrail_logging.getLogger(__name__)
+        # key: (fn, args, kwargs)
+        self.nodes = OrderedDict()
+        # key: keys it depends on
+        self.deps = OrderedDict()
+        self.timings = OrderedDict()
+        self.lock = threading.Lock()
+        self.started = None
+        self.elapsed = None
+
+    def add(self, key, fn, args=None, kwargs=None, deps=None):
+        ''' Add fn(*args, **kwargs) which creates object key, to be run
+            after the objects of deps are created. deps which are not
+            added are ignored
+        '''
+        if key in self.nodes:
+            raise ValueError('%s is already added' % (key,))
+        self.nodes[key] = (fn, tuple(args or ()), kwargs or dict())
+        self.deps[key] = list(deps or [])
+        return key
+
+    def _create(self, key):
+        (fn, args, kwargs) = self.nodes[key]
+        start = time.time()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self.lock:
+                self.timings[key] = (start - self.started,
+                                     time.time() - start)
+
+    def run(self):
+        ''' Create all the objects
+            Returns dict of key: result of its fn
+            Raises the exception of the first object, in the order added,
+            which failed. The objects depending on it are not created
+        '''
+        self.started = time.time()
+        (results, failures) = exec_dag(self._create, self.deps,
+                                       max_workers=self.max_workers)
+        self.elapsed = time.time() - self.started
+        errors = [(key, failures[key]) for key in self.nodes
+                  if key in failures]
+        for key, error in errors:
+            self.logger.error('Creation of %s %s failed: %s' % (
+                key[0], key[1], error))
+        for key, error in errors:
+            if not isinstance(error, DependencyFailed):
+                raise error
+        return results
+
+    def summary(self):
+        ''' Returns count/total/max secs taken by the objects of each kind
+            and the wall clock time taken to create them all
+        '''
+        kinds = OrderedDict()
+        for key, (offset, secs) in self.timings.iteritems():
+            kinds.setdefault(key[0], []).append((secs, key[1]))
+        lines = list()
+        for kind, timings in kinds.iteritems():
+            (max_secs, slowest) = max(timings)
+            lines.append('%s: %s created, total %.1f max %.1f secs (%s)' % (
+                kind, len(timings), sum(secs for secs, name in timings),
+                max_secs, slowest))
+        if self.elapsed is not None:
+            lines.append('%s objects created in %.1f secs with %s workers' % (
+                len(self.timings), self.elapsed, self.max_workers))
+        return 'Topology setup timings\n' + '\n'.join(lines)
+
+    def report(self):
+        ''' Returns the per object timings, in the order they were started '''
+        lines = ['%8.1f %8.1f  %s %s' % (offset, secs, key[0], key[1])
+                 for key, (offset, secs) in sorted(
+                     self.timings.iteritems(), key=lambda item: item[1][0])]
+        return '   start     secs  object\n' + '\n'.join(lines)
+# end TopoExecutor
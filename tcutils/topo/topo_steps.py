@@ -36,6 +36,8 @@ from rbac_test import RbacFixture
 from tor_fixture import ToRFixture
 from vcpe_router_fixture import VpeRouterFixture
 from interface_route_table_fixture import InterfaceRouteTableFixture
+from vm_bringup import VMBringup
+from topo_executor import TopoExecutor
 try:
     from webui_test import *
 except ImportError:
@@ -100,20 +102,7 @@ def create_sg_quantum(self):
         self.sg_uuid = {}
         self.secgrp_fixture = {}
         for sg_name in self.topo.sg_list:
-            result = True
-            msg = []
-            self.secgrp_fixture[sg_name] = self.useFixture(
-                SecurityGroupFixture(
-		    connections=self.project_connections,
-                    domain_name=self.topo.domain,
-                    project_name=self.topo.project,
-                    secgrp_name=sg_name,
-                    secgrp_entries=self.topo.sg_rules[sg_name],option='neutron'))
-            self.sg_uuid[sg_name] = self.secgrp_fixture[sg_name].secgrp_id
-            if self.skip_verify == 'no':
-                ret, msg = self.secgrp_fixture[sg_name].verify_on_setup()
-                assert ret, "Verifications for security group is :%s failed and its error message: %s" % (
-                    sg_name, msg)
+            create_sg(self, sg_name, option='neutron')
     return self
 # end of create_sg_quantum
 
@@ -122,23 +111,26 @@ def create_sg_contrail(self):
         self.sg_uuid = {}
         self.secgrp_fixture = {}
         for sg_name in self.topo.sg_list:
-            result = True
-            msg = []
-            self.secgrp_fixture[sg_name] = self.useFixture(
-                SecurityGroupFixture(
-                    connections=self.project_connections,
-                    domain_name=self.topo.domain,
-                    project_name=self.topo.project,
-                    secgrp_name=sg_name,
-                    secgrp_entries=self.topo.sg_rules[sg_name],option='contrail'))
-            self.sg_uuid[sg_name] = self.secgrp_fixture[sg_name].secgrp_id
-            if self.skip_verify == 'no':
-                ret, msg = self.secgrp_fixture[sg_name].verify_on_setup()
-                assert ret, "Verifications for security group is :%s failed and its error message: %s" % (
-                    sg_name, msg)
+            create_sg(self, sg_name, option='contrail')
     return self
 # end of create_sg_contrail
 
+def create_sg(self, sg_name, option='contrail'):
+    self.secgrp_fixture[sg_name] = self.useFixture(
+        SecurityGroupFixture(
+            connections=self.project_connections,
+            domain_name=self.topo.domain,
+            project_name=self.topo.project,
+            secgrp_name=sg_name,
+            secgrp_entries=self.topo.sg_rules[sg_name], option=option))
+    self.sg_uuid[sg_name] = self.secgrp_fixture[sg_name].secgrp_id
+    if self.skip_verify == 'no':
+        ret, msg = self.secgrp_fixture[sg_name].verify_on_setup()
+        assert ret, "Verifications for security group is :%s failed and its error message: %s" % (
+            sg_name, msg)
+    return self
+# end of create_sg
+
 
 def createPolicy(self, option='openstack'):
     if option == 'openstack' or self.inputs.orchestrator == 'vcenter':
@@ -157,17 +149,7 @@ def createPolicyFixtures(self, option='openstack'):
     d = [p for p in self.topo.policy_list]
     to_be_created_pol = (p for p in d if d)
     for policy_name in to_be_created_pol:
-        self.policy_fixt[policy_name] = self.useFixture(
-            PolicyFixture(policy_name=policy_name,
-                          rules_list=self.topo.rules[policy_name],
-                          inputs=self.project_inputs,
-                          connections=self.project_connections))
-        if self.skip_verify == 'no':
-            ret = self.policy_fixt[policy_name].verify_on_setup()
-            if ret['result'] == False:
-                self.logger.error(
-                    "Policy %s verification failed after setup" % policy_name)
-                assert ret['result'], ret['msg']
+        create_policy_fixture(self, policy_name)
     for vn in self.topo.vnet_list:
         self.conf_policy_objs[vn] = []
         for policy_name in self.topo.vn_policy[vn]:
@@ -177,25 +159,29 @@ def createPolicyFixtures(self, option='openstack'):
 # end createPolicyOpenstack
 
 
+def create_policy_fixture(self, policy_name):
+    self.policy_fixt[policy_name] = self.useFixture(
+        PolicyFixture(policy_name=policy_name,
+                      rules_list=self.topo.rules[policy_name],
+                      inputs=self.project_inputs,
+                      connections=self.project_connections))
+    if self.skip_verify == 'no':
+        ret = self.policy_fixt[policy_name].verify_on_setup()
+        if ret['result'] == False:
+            self.logger.error(
+                "Policy %s verification failed after setup" % policy_name)
+            assert ret['result'], ret['msg']
+    return self
+# end create_policy_fixture
+
+
 def createPolicyContrail(self):
     self.policy_fixt = {}
     self.conf_policy_objs = {}
     d = [p for p in self.topo.policy_list]
     to_be_created_pol = (p for p in d if d)
     for policy_name in to_be_created_pol:
-        self.policy_fixt[policy_name] = self.useFixture(
-            NetworkPolicyTestFixtureGen(
-                self.vnc_lib,
-                network_policy_name=policy_name,
-                parent_fixt=self.project_parent_fixt,
-                network_policy_entries=PolicyEntriesType(
-                    self.topo.rules[policy_name])))
-        policy_read = self.vnc_lib.network_policy_read(
-            id=str(self.policy_fixt[policy_name]._obj.uuid))
-        if not policy_read:
-            self.logger.error("Policy:%s read on API server failed" %
-                              policy_name)
-            assert False, "Policy %s read failed on API server" % policy_name
+        create_policy_contrail(self, policy_name)
     for vn in self.topo.vnet_list:
         self.conf_policy_objs[vn] = []
         for policy_name in self.topo.vn_policy[vn]:
@@ -205,58 +191,76 @@ def createPolicyContrail(self):
 # end createPolicyContrail
 
 
+def create_policy_contrail(self, policy_name):
+    self.policy_fixt[policy_name] = self.useFixture(
+        NetworkPolicyTestFixtureGen(
+            self.vnc_lib,
+            network_policy_name=policy_name,
+            parent_fixt=self.project_parent_fixt,
+            network_policy_entries=PolicyEntriesType(
+                self.topo.rules[policy_name])))
+    policy_read = self.vnc_lib.network_policy_read(
+        id=str(self.policy_fixt[policy_name]._obj.uuid))
+    if not policy_read:
+        self.logger.error("Policy:%s read on API server failed" %
+                          policy_name)
+        assert False, "Policy %s read failed on API server" % policy_name
+    return self
+# end create_policy_contrail
+
+
 def createIPAM(self, option='openstack'):
-    track_created_ipam = []
     self.ipam_fixture = {}
     self.conf_ipam_objs = {}
+    (ipams, ipam_of_vn) = get_topo_ipams(self)
+    for ipam_name in ipams:
+        create_ipam(self, ipam_name)
+    for vn in self.topo.vnet_list:
+        self.conf_ipam_objs[vn] = get_conf_ipam_obj(
+            self, ipam_of_vn[vn], option)
+    return self
+# end createIPAM
+
+
+def get_topo_ipams(self):
+    ''' Returns (list of ipams to be created, dict of vn: its ipam),
+        VNs without an IPAM in the topology get the project default IPAM
+    '''
     default_ipam_name = self.topo.project + "-default-ipam"
     if 'vn_ipams' in dir(self.topo):
-        print "topology has IPAM specified, need to create for each VN"
+        ipam_of_vn = dict((vn, self.topo.vn_ipams.get(vn, default_ipam_name))
+                          for vn in self.topo.vnet_list)
+        ipams = []
         for vn in self.topo.vnet_list:
-            self.conf_ipam_objs[vn] = []
-            if vn in self.topo.vn_ipams:
-                ipam_name = self.topo.vn_ipams[vn]
-            else:
-                ipam_name = default_ipam_name
-            if ipam_name in track_created_ipam:
-                if option == 'contrail':
-                    self.conf_ipam_objs[vn] = self.ipam_fixture[ipam_name].obj
-                else:
-                    self.conf_ipam_objs[vn] = self.ipam_fixture[
-                        ipam_name].fq_name
-                continue
-            print "creating IPAM %s" % ipam_name
-            self.ipam_fixture[ipam_name] = self.useFixture(
-                IPAMFixture(
-                    connections=self.project_fixture[
-                        self.topo.project].connections,
-                    name=ipam_name))
-            if self.skip_verify == 'no':
-                assert self.ipam_fixture[
-                    ipam_name].verify_on_setup(), "verification of IPAM:%s failed" % ipam_name
-            track_created_ipam.append(ipam_name)
-            if option == 'contrail':
-                self.conf_ipam_objs[vn] = self.ipam_fixture[ipam_name].obj
-            else:
-                self.conf_ipam_objs[vn] = self.ipam_fixture[ipam_name].fq_name
+            if ipam_of_vn[vn] not in ipams:
+                ipams.append(ipam_of_vn[vn])
     else:
-        ipam_name = default_ipam_name
-        print "creating project default IPAM %s" % ipam_name
-        self.ipam_fixture[ipam_name] = self.useFixture(
-            IPAMFixture(
-                connections=self.project_fixture[
-                    self.topo.project].connections,
-                name=ipam_name))
-        if self.skip_verify == 'no':
-            assert self.ipam_fixture[
-                ipam_name].verify_on_setup(), "verification of IPAM:%s failed" % ipam_name
-        for vn in self.topo.vnet_list:
-            if option == 'contrail':
-                self.conf_ipam_objs[vn] = self.ipam_fixture[ipam_name].obj
-            else:
-                self.conf_ipam_objs[vn] = self.ipam_fixture[ipam_name].fq_name
+        ipam_of_vn = dict((vn, default_ipam_name)
+                          for vn in self.topo.vnet_list)
+        ipams = [default_ipam_name]
+    return (ipams, ipam_of_vn)
+# end get_topo_ipams
+
+
+def create_ipam(self, ipam_name):
+    self.logger.debug("creating IPAM %s" % ipam_name)
+    self.ipam_fixture[ipam_name] = self.useFixture(
+        IPAMFixture(
+            connections=self.project_fixture[
+                self.topo.project].connections,
+            name=ipam_name))
+    if self.skip_verify == 'no':
+        assert self.ipam_fixture[
+            ipam_name].verify_on_setup(), "verification of IPAM:%s failed" % ipam_name
     return self
-# end createIPAM
+# end create_ipam
+
+
+def get_conf_ipam_obj(self, ipam_name, option='openstack'):
+    if option == 'contrail':
+        return self.ipam_fixture[ipam_name].obj
+    return self.ipam_fixture[ipam_name].fq_name
+# end get_conf_ipam_obj
 
 
 def createVN_Policy(self, option='openstack'):
@@ -285,24 +289,7 @@ def createVNOrch(self):
     self.vn_fixture = {}
     self.vn_of_cn = {}
     for vn in self.topo.vnet_list:
-	router_asn = None
-	rt_number = None
-	if hasattr(self.topo, 'vn_params'):	
-	   if self.topo.vn_params.has_key(vn):
-  	       if self.topo.vn_params[vn].has_key('router_asn'):
-		    router_asn = self.topo.vn_params[vn]['router_asn']
-               if self.topo.vn_params[vn].has_key('rt_number'):
-                    rt_number = self.topo.vn_params[vn]['rt_number']
-
-        self.vn_fixture[vn] = self.useFixture(
-            VNFixture(project_name=self.topo.project,
-                      connections=self.project_connections, vn_name=vn,
-		      inputs=self.project_inputs, subnets=self.topo.vn_nets[vn],
-                      ipam_fq_name=self.conf_ipam_objs[vn], router_asn=router_asn,
-		      rt_number=rt_number))
-        if self.skip_verify == 'no':
-            ret = self.vn_fixture[vn].verify_on_setup()
-            assert ret, "One or more verifications for VN:%s failed" % vn
+        create_vn_orch(self, vn)
     # Initialize compute's VN list
     for cn in self.inputs.compute_names:
         self.vn_of_cn[self.inputs.compute_info[cn]] = []
@@ -310,6 +297,29 @@ def createVNOrch(self):
 # end create_VN_only_OpenStack
 
 
+def create_vn_orch(self, vn):
+    router_asn = None
+    rt_number = None
+    if hasattr(self.topo, 'vn_params'):
+        if self.topo.vn_params.has_key(vn):
+            if self.topo.vn_params[vn].has_key('router_asn'):
+                router_asn = self.topo.vn_params[vn]['router_asn']
+            if self.topo.vn_params[vn].has_key('rt_number'):
+                rt_number = self.topo.vn_params[vn]['rt_number']
+
+    self.vn_fixture[vn] = self.useFixture(
+        VNFixture(project_name=self.topo.project,
+                  connections=self.project_connections, vn_name=vn,
+                  inputs=self.project_inputs, subnets=self.topo.vn_nets[vn],
+                  ipam_fq_name=self.conf_ipam_objs[vn], router_asn=router_asn,
+                  rt_number=rt_number))
+    if self.skip_verify == 'no':
+        ret = self.vn_fixture[vn].verify_on_setup()
+        assert ret, "One or more verifications for VN:%s failed" % vn
+    return self
+# end create_vn_orch
+
+
 def attachPolicytoVN(self, option='openstack'):
     self.vn_policy_fixture = {}
     for vn in self.topo.vnet_list:
@@ -339,57 +349,31 @@ def attachPolicytoVN(self, option='openstack'):
 def attachPolicytoVN(self, option='contrail'):
     self.vn_policy_fixture = {}
     for vn in self.topo.vnet_list:
-        self.vn_policy_fixture[vn] = self.useFixture(
-            VN_Policy_Fixture(
-                connections=self.project_connections,
-                vn_name=vn,
-                options=option,
-                policy_obj=self.conf_policy_objs,
-                vn_obj=self.vn_fixture,
-                vn_policys=self.topo.vn_policy[vn],
-                project_name=self.topo.project))
+        attach_policy_to_vn(self, vn, option)
     return self
 # end attachPolicytoVN
 
 
+def attach_policy_to_vn(self, vn, option='contrail'):
+    self.vn_policy_fixture[vn] = self.useFixture(
+        VN_Policy_Fixture(
+            connections=self.project_connections,
+            vn_name=vn,
+            options=option,
+            policy_obj=self.conf_policy_objs,
+            vn_obj=self.vn_fixture,
+            vn_policys=self.topo.vn_policy[vn],
+            project_name=self.topo.project))
+    return self
+# end attach_policy_to_vn
+
+
 def createVNContrail(self):
     self.vn_fixture = {}
     self.vn_of_cn = {}
     
     for vn in self.topo.vnet_list:
-        router_asn = None
-        rt_number = None
-        rt_obj = None
-        if hasattr(self.topo, 'vn_params'):
-           if self.topo.vn_params.has_key(vn):
-               if self.topo.vn_params[vn].has_key('router_asn'):
-                    router_asn = self.topo.vn_params[vn]['router_asn']
-               if self.topo.vn_params[vn].has_key('rt_number'):
-                    rt_number = self.topo.vn_params[vn]['rt_number']
-
-               rt_val = "target:%s:%s" % (router_asn, rt_number)
-               rt_obj = RouteTargetList([rt_val])
-
-        for ipam_info in self.topo.vn_nets[vn]:
-            ipam_info = list(ipam_info)
-            ipam_info[0] = self.conf_ipam_objs[vn]
-            ipam_info = tuple(ipam_info)
-        self.vn_fixture[vn] = self.useFixture(
-            VirtualNetworkTestFixtureGen(
-                self.vnc_lib,
-                virtual_network_name=vn,
-                parent_fixt=self.project_parent_fixt,
-                id_perms=IdPermsType(
-                    enable=True),
-                network_ipam_ref_infos=[ipam_info],
-                route_target_list=rt_obj))
-        vn_read = self.vnc_lib.virtual_network_read(
-            id=str(self.vn_fixture[vn]._obj.uuid))
-        if vn_read:
-            self.logger.info("VN created successfully %s " % (vn))
-        if not vn_read:
-            self.logger.error("VN %s read on API server failed" % vn)
-            assert False, "VN:%s read failed on API server" % vn
+        create_vn_contrail(self, vn)
     # Initialize compute's VN list
     for cn in self.inputs.compute_names:
         self.vn_of_cn[self.inputs.compute_info[cn]] = []
@@ -397,6 +381,44 @@ def createVNContrail(self):
 # end createVNContrail
 
 
+def create_vn_contrail(self, vn):
+    router_asn = None
+    rt_number = None
+    rt_obj = None
+    if hasattr(self.topo, 'vn_params'):
+       if self.topo.vn_params.has_key(vn):
+           if self.topo.vn_params[vn].has_key('router_asn'):
+                router_asn = self.topo.vn_params[vn]['router_asn']
+           if self.topo.vn_params[vn].has_key('rt_number'):
+                rt_number = self.topo.vn_params[vn]['rt_number']
+
+           rt_val = "target:%s:%s" % (router_asn, rt_number)
+           rt_obj = RouteTargetList([rt_val])
+
+    for ipam_info in self.topo.vn_nets[vn]:
+        ipam_info = list(ipam_info)
+        ipam_info[0] = self.conf_ipam_objs[vn]
+        ipam_info = tuple(ipam_info)
+    self.vn_fixture[vn] = self.useFixture(
+        VirtualNetworkTestFixtureGen(
+            self.vnc_lib,
+            virtual_network_name=vn,
+            parent_fixt=self.project_parent_fixt,
+            id_perms=IdPermsType(
+                enable=True),
+            network_ipam_ref_infos=[ipam_info],
+            route_target_list=rt_obj))
+    vn_read = self.vnc_lib.virtual_network_read(
+        id=str(self.vn_fixture[vn]._obj.uuid))
+    if vn_read:
+        self.logger.info("VN created successfully %s " % (vn))
+    if not vn_read:
+        self.logger.error("VN %s read on API server failed" % vn)
+        assert False, "VN:%s read failed on API server" % vn
+    return self
+# end create_vn_contrail
+
+
 def createVN_Policy_OpenStack(self):
     self.vn_fixture = {}
     self.vn_of_cn = {}
@@ -464,62 +486,12 @@ def createVMNova(
         VmToNodeMapping=None):
     self.vm_fixture = {}
     host_list = self.connections.orch.get_hosts()
-    vm_image_name = self.inputs.get_ci_image() or 'ubuntu-traffic'
 
     for vm in self.topo.vmc_list:
-        sec_gp = []
-        if option == 'contrail':
-            vn_read = self.vnc_lib.virtual_network_read(
-                id=str(self.vn_fixture[self.topo.vn_of_vm[vm]].getObj().uuid))
-            vn_obj = self.orch.get_vn_obj_if_present(
-                vn_read.name,
-                project_id=self.project_fixture[
-                    self.topo.project].uuid)
-        else:
-            vn_obj = self.vn_fixture[self.topo.vn_of_vm[vm]].obj
-        if hasattr(self.topo, 'sg_of_vm'):
-            if self.topo.sg_of_vm.has_key(vm):
-                for sg in self.topo.sg_of_vm[vm]:
-                    sec_gp.append(self.sg_uuid[sg])
-        else:
-            pass
-        if vms_on_single_compute:
-            self.vm_fixture[vm] = self.useFixture(
-                VMFixture(
-                    project_name=self.topo.project,
-                    connections=self.project_connections,
-                    vn_obj=vn_obj,
-                    flavor=self.flavor,
-                    image_name=vm_image_name,
-                    vm_name=vm,
-                    sg_ids=sec_gp,
-                    node_name=host_list[0]))
-        else:
-            # If vm is pinned to a node get the node name from node IP and pass
-            # it on to VM creation method.
-            if VmToNodeMapping is not None and len(VmToNodeMapping) != 0:
-                IpToNodeName = self.inputs.host_data[
-                    VmToNodeMapping[vm]]['name']
-                self.vm_fixture[vm] = self.useFixture(
-                    VMFixture(
-                        project_name=self.topo.project,
-                        connections=self.project_connections,
-                        vn_obj=vn_obj,
-                        flavor=self.flavor,
-                        image_name=vm_image_name,
-                        vm_name=vm,
-                        sg_ids=sec_gp,
-                        node_name=IpToNodeName))
-            else:
-                self.vm_fixture[vm] = self.useFixture(
-                    VMFixture(
-                        project_name=self.topo.project,
-                        connections=self.project_connections,
-                        vn_obj=vn_obj,
-                        flavor=self.flavor,
-                        image_name=vm_image_name,
-                        sg_ids=sec_gp,
-                        vm_name=vm))
+        node_name = get_vm_node_name(self, vm, host_list,
+                                     vms_on_single_compute, VmToNodeMapping)
+        self.vm_fixture[vm] = self.useFixture(
+            get_vm_fixture(self, vm, option, node_name))
 
     # We need to retry following section and scale it up if required (for slower VM environment)
     # TODO: Use @retry annotation instead
@@ -534,11 +506,7 @@ def createVMNova(
     for vm in self.topo.vmc_list:
         assert self.vm_fixture[vm].wait_till_vm_is_up(),(
             'VM Failed to come up')
-        #Even though VM verification is not run, we need to set verify_is_run
-        #to make sure cleanup is verified in VM fixture
-        self.vm_fixture[vm].verify_is_run = True
-        vm_node_ip = self.vm_fixture[vm].vm_node_ip
-        self.vn_of_cn[vm_node_ip].append(self.topo.vn_of_vm[vm])
+        record_vm_up(self, vm)
 
     # Add compute's VN list to topology object based on VM creation
     self.topo.__dict__['vn_of_cn'] = self.vn_of_cn
@@ -550,6 +518,190 @@ def createVMNova(
 # end createVMNova
 
 
+def get_vm_node_name(self, vm, host_list, vms_on_single_compute=False,
+                     VmToNodeMapping=None):
+    ''' Returns name of the node vm is to be launched on, None if any '''
+    if vms_on_single_compute:
+        return host_list[0]
+    # If vm is pinned to a node get the node name from node IP and pass
+    # it on to VM creation method.
+    if VmToNodeMapping is not None and len(VmToNodeMapping) != 0:
+        return self.inputs.host_data[VmToNodeMapping[vm]]['name']
+    return None
+# end get_vm_node_name
+
+
+def get_vm_fixture(self, vm, option='openstack', node_name=None):
+    ''' Returns VMFixture of vm, yet to be setUp '''
+    vm_image_name = self.inputs.get_ci_image() or 'ubuntu-traffic'
+    sec_gp = []
+    if option == 'contrail':
+        vn_read = self.vnc_lib.virtual_network_read(
+            id=str(self.vn_fixture[self.topo.vn_of_vm[vm]].getObj().uuid))
+        vn_obj = self.orch.get_vn_obj_if_present(
+            vn_read.name,
+            project_id=self.project_fixture[
+                self.topo.project].uuid)
+    else:
+        vn_obj = self.vn_fixture[self.topo.vn_of_vm[vm]].obj
+    if hasattr(self.topo, 'sg_of_vm'):
+        if self.topo.sg_of_vm.has_key(vm):
+            for sg in self.topo.sg_of_vm[vm]:
+                sec_gp.append(self.sg_uuid[sg])
+    return VMFixture(
+        project_name=self.topo.project,
+        connections=self.project_connections,
+        vn_obj=vn_obj,
+        flavor=self.flavor,
+        image_name=vm_image_name,
+        vm_name=vm,
+        sg_ids=sec_gp,
+        node_name=node_name)
+# end get_vm_fixture
+
+
+def record_vm_up(self, vm):
+    #Even though VM verification is not run, we need to set verify_is_run
+    #to make sure cleanup is verified in VM fixture
+    self.vm_fixture[vm].verify_is_run = True
+    vm_node_ip = self.vm_fixture[vm].vm_node_ip
+    self.vn_of_cn[vm_node_ip].append(self.topo.vn_of_vm[vm])
+    return self
+# end record_vm_up
+
+
+def createTopology(
+        self,
+        option='openstack',
+        vms_on_single_compute=False,
+        VmToNodeMapping=None,
+        max_workers=None):
+    ''' Same as createSec_group, createServiceTemplate,
+        createServiceInstance, createIPAM, createVN, createPolicy,
+        attachPolicytoVN and createVMNova one after the other, but each
+        object is created as soon as the objects it depends on are, with
+        atmost max_workers objects created at a time, refer TopoExecutor.
+        VMs are booted as soon as their VN and security groups are created
+        and are then waited for all together
+    '''
+    executor = TopoExecutor(max_workers=max_workers, logger=self.logger)
+    use_orch = option == 'openstack' or self.inputs.orchestrator == 'vcenter'
+
+    if hasattr(self.topo, 'sg_list'):
+        self.sg_uuid = {}
+        self.secgrp_fixture = {}
+        sg_option = 'neutron' if option == 'openstack' else 'contrail'
+        for sg_name in self.topo.sg_list:
+            executor.add(('sg', sg_name), create_sg,
+                         args=[self, sg_name, sg_option])
+
+    self.st_fixture = {}
+    for st_name in getattr(self.topo, 'st_list', []):
+        executor.add(('st', st_name), create_st, args=[self, st_name])
+    self.si_fixture = {}
+    if hasattr(self.topo, 'si_list'):
+        # For SVC case to work in non-admin tenant, link "admin" user
+        checkNAddAdminRole(self)
+
+    def create_and_verify_si(si_name):
+        create_si(self, si_name)
+        return verify_si(self, si_name)
+    for si_name in getattr(self.topo, 'si_list', []):
+        st_name = self.topo.si_params[si_name]['svc_template']
+        executor.add(('si', si_name), create_and_verify_si, args=[si_name],
+                     deps=[('st', st_name)])
+
+    self.ipam_fixture = {}
+    self.conf_ipam_objs = {}
+    (ipams, ipam_of_vn) = get_topo_ipams(self)
+    for ipam_name in ipams:
+        executor.add(('ipam', ipam_name), create_ipam, args=[self, ipam_name])
+
+    self.vn_fixture = {}
+    self.vn_of_cn = {}
+    for cn in self.inputs.compute_names:
+        self.vn_of_cn[self.inputs.compute_info[cn]] = []
+
+    def create_vn(vn):
+        self.conf_ipam_objs[vn] = get_conf_ipam_obj(
+            self, ipam_of_vn[vn], option)
+        if use_orch:
+            return create_vn_orch(self, vn)
+        return create_vn_contrail(self, vn)
+    for vn in self.topo.vnet_list:
+        executor.add(('vn', vn), create_vn, args=[vn],
+                     deps=[('ipam', ipam_of_vn[vn])])
+
+    self.policy_fixt = {}
+    self.conf_policy_objs = {}
+    # Policies with service rules, eg. mirror_to an analyzer, after their si
+    pol_si = getattr(self.topo, 'pol_si', {})
+    for policy_name in self.topo.policy_list:
+        executor.add(('policy', policy_name),
+                     create_policy_fixture if use_orch else
+                     create_policy_contrail, args=[self, policy_name],
+                     deps=[('si', pol_si[policy_name])]
+                     if policy_name in pol_si else None)
+
+    self.vn_policy_fixture = {}
+
+    def attach_policies(vn):
+        if use_orch:
+            self.conf_policy_objs[vn] = [
+                self.policy_fixt[policy_name].policy_obj
+                for policy_name in self.topo.vn_policy[vn]]
+        else:
+            self.conf_policy_objs[vn] = [
+                self.policy_fixt[policy_name]._obj
+                for policy_name in self.topo.vn_policy[vn]]
+        return attach_policy_to_vn(self, vn, option)
+    for vn in self.topo.vnet_list:
+        executor.add(('vn_policy', vn), attach_policies, args=[vn],
+                     deps=[('vn', vn)] + [('policy', policy_name)
+                           for policy_name in self.topo.vn_policy[vn]])
+
+    self.vm_fixture = {}
+    host_list = self.connections.orch.get_hosts()
+    bringup = VMBringup([], max_workers=max_workers, logger=self.logger)
+
+    def boot_vm(vm):
+        node_name = get_vm_node_name(self, vm, host_list,
+                                     vms_on_single_compute, VmToNodeMapping)
+        vm_fixture = get_vm_fixture(self, vm, option, node_name)
+        assert bringup.boot_vm(vm_fixture), 'VM %s failed to boot' % vm
+        self.addCleanup(vm_fixture.cleanUp)
+        self.vm_fixture[vm] = vm_fixture
+        return self
+    sg_of_vm = getattr(self.topo, 'sg_of_vm', {})
+    for vm in self.topo.vmc_list:
+        executor.add(('vm', vm), boot_vm, args=[vm],
+                     deps=[('vn', self.topo.vn_of_vm[vm])] +
+                     [('sg', sg) for sg in sg_of_vm.get(vm, [])])
+
+    try:
+        executor.run()
+    finally:
+        self.logger.info(executor.summary())
+        self.logger.debug(executor.report())
+
+    self.logger.debug(
+        "Setup step: Verify VM status and install Traffic package... ")
+    if bringup.booted:
+        assert bringup.wait_till_up(), (
+            'VM Failed to come up, %s' % bringup.summary())
+    for vm in self.topo.vmc_list:
+        record_vm_up(self, vm)
+
+    # Add compute's VN list to topology object based on VM creation
+    self.topo.__dict__['vn_of_cn'] = self.vn_of_cn
+
+    # Provision static route if defined in topology
+    createStaticRouteBehindVM(self)
+
+    return self
+# end createTopology
+
+
 def createPublicVN(self):
     if 'public_vn' in dir(self.topo):
         fip_pool_name = self.inputs.fip_pool_name
@@ -690,22 +842,27 @@ def createServiceTemplate(self):
         return self
 
     for st_name in self.topo.st_list:
-        self.st_fixture[st_name] = self.useFixture(
-            SvcTemplateFixture(
-                connections=self.project_connections,
-                st_name=st_name,
-                svc_img_name=self.topo.st_params[st_name]['svc_img_name'],
-                service_type=self.topo.st_params[st_name]['service_type'],
-                service_mode=self.topo.st_params[st_name]['service_mode'],
-                svc_scaling=self.topo.st_params[st_name]['svc_scaling'],
-                flavor=self.topo.st_params[st_name]['flavor'],
-                if_details=self.topo.st_params[st_name]['if_details'],
-                version=self.topo.st_params[st_name]['version']))
-        if self.skip_verify == 'no':
-            assert self.st_fixture[st_name].verify_on_setup()
+        create_st(self, st_name)
     return self
 # end createServiceTemplate
 
+def create_st(self, st_name):
+    self.st_fixture[st_name] = self.useFixture(
+        SvcTemplateFixture(
+            connections=self.project_connections,
+            st_name=st_name,
+            svc_img_name=self.topo.st_params[st_name]['svc_img_name'],
+            service_type=self.topo.st_params[st_name]['service_type'],
+            service_mode=self.topo.st_params[st_name]['service_mode'],
+            svc_scaling=self.topo.st_params[st_name]['svc_scaling'],
+            flavor=self.topo.st_params[st_name]['flavor'],
+            if_details=self.topo.st_params[st_name]['if_details'],
+            version=self.topo.st_params[st_name]['version']))
+    if self.skip_verify == 'no':
+        assert self.st_fixture[st_name].verify_on_setup()
+    return self
+# end create_st
+
 def checkNAddAdminRole(self):
     if not ((self.topo.username == 'admin' or self.topo.username == None) and (self.topo.project == 'admin')):
         self.logger.info("Adding user 'admin' to non-default tenant %s with admin role" %self.topo.project)
@@ -736,40 +893,50 @@ def createServiceInstance(self):
     # For SVC case to work in non-admin tenant, link "admin" user
     checkNAddAdminRole(self)
     for si_name in self.topo.si_list:
-        self.si_fixture[si_name] = self.useFixture(
-            SvcInstanceFixture(
-                connections=self.project_connections,
-                si_name=si_name,
-                svc_template=self.st_fixture[
-                    self.topo.si_params[si_name]['svc_template']].st_obj,
-                if_details=self.topo.si_params[si_name]['if_details']))
+        create_si(self, si_name)
 
     self.logger.debug("Setup step: Verify Service Instances")
     for si_name in self.topo.si_list:
-        # Irrespective of verify flag, run minimum verification to make sure SI is up..
-        # Include retry to handle time taken by less powerful computes ..
-        retry = 0
-        while True:
-            ret, msg = self.si_fixture[si_name].verify_si()
-            retry += 1
-            if ret or retry > 2:
-                break
-        # In case of failure, set verify flag to get more data, even if global
-        # verify flag is diabled
-        if not ret:
-            self.skip_verify = 'no'
+        verify_si(self, si_name)
 
-        if self.skip_verify == 'no':
-            ret, msg = self.si_fixture[si_name].verify_on_setup(report=False)
+    return self
+# end createServiceInstance
 
-        if not ret:
-            m = "service instance %s verify failed after setup with error %s" % (
-                si_name, msg)
-            self.err_msg.append(m)
-            assert ret, self.err_msg
+def create_si(self, si_name):
+    self.si_fixture[si_name] = self.useFixture(
+        SvcInstanceFixture(
+            connections=self.project_connections,
+            si_name=si_name,
+            svc_template=self.st_fixture[
+                self.topo.si_params[si_name]['svc_template']].st_obj,
+            if_details=self.topo.si_params[si_name]['if_details']))
+    return self
+# end create_si
+
+def verify_si(self, si_name):
+    # Irrespective of verify flag, run minimum verification to make sure SI is up..
+    # Include retry to handle time taken by less powerful computes ..
+    retry = 0
+    while True:
+        ret, msg = self.si_fixture[si_name].verify_si()
+        retry += 1
+        if ret or retry > 2:
+            break
+    # In case of failure, set verify flag to get more data, even if global
+    # verify flag is diabled
+    if not ret:
+        self.skip_verify = 'no'
+
+    if self.skip_verify == 'no':
+        ret, msg = self.si_fixture[si_name].verify_on_setup(report=False)
 
+    if not ret:
+        m = "service instance %s verify failed after setup with error %s" % (
+            si_name, msg)
+        self.err_msg.append(m)
+        assert ret, self.err_msg
     return self
-# end createServiceInstance
+# end verify_si
 
 def createServiceHealthCheck(self):
     self.shc_fixture = {}
@@ -1,9 +1,10 @@
 
 import logging
 import fixtures
-import dpkt
 
 from tcutils.tcpdump_utils import *
+from tcutils.pcap_index import get_pcap_index, fetch_pcap, PcapIndex
+from tcutils.pcap_qos import verify_qos_markings
 from tcutils.util import retry
 from time import sleep
 from tcutils.commands import ssh, execute_cmd, execute_cmd_out
@@ -163,7 +164,7 @@ class TrafficAnalyzer:
     
     def verify_packets(self, packet_type, pcap_path_with_file_name,
                        expected_count =None, dot1p = None, dscp = None, 
-                       mpls_exp = None):
+                       mpls_exp = None, batched = False):
         '''
         This function parses tcpdump file.
         It verifies that field in packet in pcap file are same as expected by user or not.
@@ -175,6 +176,8 @@ class TrafficAnalyzer:
             3. MPLS EXP bits
         This function can also be used to parse any .pcap present on any node
         even if the start capture was not done by 'TestQosTraffic' object.
+        If batched is True, all the packets are verified at once by
+        verify_batched, suited for captures of many thousands of packets.
         '''
         if self.session == None:
             if not self.username and not self.node_ip and not self.password:
@@ -192,132 +195,137 @@ class TrafficAnalyzer:
             elif err:
                 self.logger.error("%s" % err)
                 return False
+        if batched:
+            report = self.verify_batched(packet_type, expected_count,
+                                         dot1p, dscp, mpls_exp)
+            return bool(report and report.passed)
         if expected_count:
             result = verify_tcpdump_count(self, self.session, self.pcap,
                                           expected_count, raw_count=True, 
                                           exact_match=False)
             if not result:
                 return result
-        file_transfer = self.compute_node_fixture.file_transfer(
-                            "get", self.pcap, self.pcap.split('/')[-1])
-        if not file_transfer:
-            self.logger.error("Unable to transfer file to local system")
+        # The capture is pulled once and indexed, already done if counted
+        try:
+            index = get_pcap_index(self.session, self.pcap,
+                                   logger=self.logger)
+        except Exception as e:
+            self.logger.error("Unable to read %s: %s" % (self.pcap, e))
             return False
-        file_name = self.pcap.split('/')[-1]
         if self.encap_type and self.encap_type != "MPLS_any":
-            if not self.verify_encap_type(self.encap_type, file_name):
+            if not self.verify_encap_type(self.encap_type, index):
+                return False
+        if "dot1p" in packet_type and\
+        self._check_underlay_interface_is_tagged():
+            if not isinstance(dot1p,int):
+                self.logger.error("dot1p to be compared not mentioned")
+                return False
+            if not self._verify_field(index, 'pcp', dot1p, 'PCP'):
+                return False
+        if "dscp" in packet_type:
+            if not isinstance(dscp,int):
+                self.logger.error("dscp to be compared not mentioned")
+                return False
+            if not self._verify_field(index, 'dscp', dscp, 'DSCP'):
+                return False
+        if "exp" in packet_type:
+            if not isinstance(mpls_exp,int):
+                self.logger.error("Mpls exp to be compared not mentioned")
+                return False
+            if self.encap_type == "VxLAN":
+                self.logger.error("VxLAN encapslation does "
+                                  "not have exp")
+                self.logger.error("Correct the 'packet_type' "
+                                  "or 'encap_type'")
+                return False
+            if not self._verify_field(index, 'mpls_exp', mpls_exp, 'EXP'):
                 return False
-        f = open(file_name, 'r')
-        pcap = dpkt.pcap.Reader(f)
-        count = 0
-        for ts,buff in pcap:
-            ether = dpkt.ethernet.Ethernet(buff)
-            self.logger.debug("Verifying for packet number %d" % count)
-            count = count+1
-            if "dot1p" in packet_type and\
-            self._check_underlay_interface_is_tagged():
-                if isinstance(dot1p,int):
-                    string = ''
-                    try:
-                        priority = ether.vlan_tags[0].pri
-                    except AttributeError, e:
-                        self.logger.error(e)
-                        return False
-                    if priority == dot1p:
-                        self.logger.debug("Validated dot1p marking of %s" 
-                                          % (dot1p))
-                    else:
-                        self.logger.error("Mismatch between actual and"
-                                          " expected PCP")
-                        self.logger.error("Expected PCP : %s, Actual PCP :%s"\
-                                          % (dot1p,priority))
-                        return False
-                else:
-                    self.logger.error("dot1p to be compared not mentioned")
-                    return False
-            if "dscp" in packet_type:
-                if isinstance(dscp,int):
-                    ip = ether.data
-                    try:
-                        actual_dscp = int(bin(ip.tos >> 2), 2)
-                    except AttributeError, e:
-                        self.logger.error(e)
-                        return False
-                    if dscp == actual_dscp:
-                        self.logger.debug("Validated DSCP marking of %s" % 
-                                          (dscp))
-                    else:
-                        self.logger.error("Mismatch between actual and"
-                                          " expected DSCP")
-                        self.logger.error("Expected DSCP: %s, Actual DSCP:%s"\
-                                          % (dscp,actual_dscp))
-                        return False
-                else:
-                    self.logger.error("dscp to be compared not mentioned")
-                    return False
-            if "exp" in packet_type:
-                if isinstance(mpls_exp,int):
-                    try:
-                        if self.encap_type == "MPLSoUDP" or not self.encap_type:
-                            actual_mpls_exp = int((ether.ip.data.data)\
-                                                  .encode("hex")[5:6], 16) >> 1
-                        elif self.encap_type == "MPLSoGRE":
-                            actual_mpls_exp = int(ether.ip.data.\
-                                                  encode("hex")[13:14],16) >> 1
-                        elif self.encap_type == "MPLS_any":
-                            try:
-                                actual_mpls_exp = int((ether.ip.data.data)\
-                                                  .encode("hex")[5:6], 16) >> 1
-                            except:
-                                actual_mpls_exp = int(ether.ip.data.\
-                                                   encode("hex")[13:14],16) >> 1
-                        elif self.encap_type == "VxLAN":
-                            self.logger.error("VxLAN encapslation does "
-                                              "not have exp")
-                            self.logger.error("Correct the 'packet_type' "
-                                              "or 'encap_type'")
-                            return False
-                    except AttributeError, e:
-                        self.logger.error(e)
-                        return False
-                    if mpls_exp == actual_mpls_exp:
-                        self.logger.debug("Validated EXP marking of %s" 
-                                          % (mpls_exp))
-                    else:
-                        self.logger.error("Mismatch between actual and"
-                                          " expected EXP")
-                        self.logger.error("Expected EXP : %s ,Actual EXP :%s"\
-                                          % (mpls_exp,actual_mpls_exp))
-                        return False
-                else:
-                    self.logger.error("Mpls exp to be compared not mentioned")
-                    return False
         self.logger.info('Packet QoS marking validation passed')
         return True
     # end verify_packets
 
-    def verify_encap_type(self, expected_encap, file_name):
-        f = open(file_name, 'r')
-        pcap = dpkt.pcap.Reader(f)
-        for ts,buff in pcap:
-            ether = dpkt.ethernet.Ethernet(buff)
-            try:
-                if ether.ip.data.encode("hex")[0:8] == '00008847':
-                    actual_encap = 'MPLSoGRE'
-                    break
-            except AttributeError, e:
-                self.logger.debug(e)
-                self.logger.debug("Packet different from GRE encap")  
-            if ether.ip.data.data.encode("hex")[0:8] == '08000000':
-                actual_encap = 'VxLAN'
-            elif ether.ip.data.data.encode("hex")[0:8] != '08000000'\
-                and ether.ip.data.sport:
-                actual_encap = 'MPLSoUDP'
-            else:
-                actual_encap = None
-                self.logger.error("Unable to find the encapsulation type")
-                return False
-            break
+    def verify_batched(self, packet_type, expected_count=None, dot1p=None,
+                       dscp=None, mpls_exp=None):
+        '''
+        Verify the markings of all the packets of self.pcap in one pass
+        Returns QosReport of the capture with the mismatches, if any, or
+        None if the capture could not be verified
+        '''
+        checks = {'dot1p': dot1p, 'dscp': dscp, 'exp': mpls_exp}
+        for marking, value in checks.items():
+            if marking not in packet_type or (marking == 'dot1p' and
+                    not self._check_underlay_interface_is_tagged()):
+                checks[marking] = None
+            elif not isinstance(value, int):
+                self.logger.error("%s to be compared not mentioned" % marking)
+                return None
+        if checks['exp'] is not None and self.encap_type == "VxLAN":
+            self.logger.error("VxLAN encapslation does not have exp")
+            return None
+        encap = self.encap_type if self.encap_type != "MPLS_any" else None
+        try:
+            (result, report) = self._get_qos_report(
+                expected_count, dot1p=checks['dot1p'], dscp=checks['dscp'],
+                mpls_exp=checks['exp'], encap=encap)
+        except Exception as e:
+            self.logger.error("Unable to verify %s: %s" % (self.pcap, e))
+            return None
+        if not result:
+            return None
+        if expected_count:
+            stop_tcpdump_for_vm_intf(self, self.session, self.pcap)
+        if not report.passed:
+            self.logger.error("Packet QoS marking validation failed\n%s" % (
+                report))
+            return report
+        self.logger.info("Packet QoS marking validation passed\n%s" % report)
+        return report
+    # end verify_batched
+
+    @retry(delay=2, tries=6)
+    def _get_qos_report(self, expected_count=None, **kwargs):
+        '''
+        Returns (True, QosReport) of self.pcap, waiting, same as
+        verify_tcpdump_count, till the capture has atleast expected_count
+        packets
+        '''
+        report = verify_qos_markings(fetch_pcap(self.session, self.pcap),
+                                     **kwargs)
+        if expected_count and report.total < expected_count:
+            self.logger.warn("%s packets are found in %s but expected "
+                             "atleast %s" % (report.total, self.pcap,
+                                             expected_count))
+            return (False, report)
+        return (True, report)
+    # end _get_qos_report
+
+    def _verify_field(self, index, field, expected, name):
+        ''' Verify that field of all the packets in index is expected '''
+        values = index.values(field)
+        if not values - set([expected]):
+            self.logger.debug("Validated %s marking of %s in %s packets" % (
+                name, expected, len(index)))
+            return True
+        if None in values:
+            self.logger.error("%s packets without %s field" % (
+                index.count(**{field: None}), name))
+        self.logger.error("Mismatch between actual and"
+                          " expected %s" % name)
+        self.logger.error("Expected %s : %s, Actual %s :%s"\
+                          % (name, expected, name,
+                             sorted(values - set([expected]))))
+        return False
+
+    def verify_encap_type(self, expected_encap, index):
+        '''
+        index : PcapIndex of the capture, or name of a local pcap file
+        '''
+        if isinstance(index, basestring):
+            index = PcapIndex.from_file(index)
+        actual_encap = index.records[0].encap if len(index) else None
+        if not actual_encap:
+            self.logger.error("Unable to find the encapsulation type")
+            return False
         if actual_encap == expected_encap:
             self.logger.debug("Encapsulation same as expected")
             return True
@@ -326,4 +334,3 @@ class TrafficAnalyzer:
             self.logger.error("Expected encapsulation: %s" % expected_encap)
             self.logger.error("Actual encapsulation: %s" % actual_encap)
             return False
-        
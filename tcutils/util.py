@@ -23,6 +23,8 @@ from fabric.exceptions import CommandTimeout, NetworkError
 from fabric.contrib.files import exists
 from fabric.context_managers import settings, hide, cd, lcd
 from fabric.state import connections as fab_connections
+import paramiko
+import pipes
 from paramiko.ssh_exception import ChannelException
 #from tcutils.util import retry
 import ConfigParser
@@ -31,6 +33,7 @@ import functools
 import testtools
 from fabfile import *
 from fabutils import *
+from tcutils.ssh_pool import ssh_pool
 import ast
 
 sku_dict = {'2014.1': 'icehouse', '2014.2': 'juno', '2015.1': 'kilo', '12': 'liberty', '13': 'mitaka',
@@ -180,7 +183,6 @@ def run_cmd_through_node(host_string, cmd, password=None, gateway=None,
         raw: If raw is True, will return the fab _AttributeString object itself without removing any unwanted output
     """
     logger = logger or contrail_logging.getLogger(__name__)
-    fab_connections.clear()
     kwargs = {}
     if as_daemon:
         cmd = 'nohup ' + cmd + ' &'
@@ -202,12 +204,13 @@ def run_cmd_through_node(host_string, cmd, password=None, gateway=None,
     _run = safe_sudo if with_sudo else safe_run
 
     #with hide('everything'), settings(host_string=host_string,
-    with settings(host_string=host_string,
-                                      gateway=gateway,
-                                      warn_only=warn_only,
-                                      shell=shell,
-                                      disable_known_hosts=True,
-                                      abort_on_prompts=False):
+    with ssh_pool.session(host_string, gateway=gateway), settings(
+            host_string=host_string,
+            gateway=gateway,
+            warn_only=warn_only,
+            shell=shell,
+            disable_known_hosts=True,
+            abort_on_prompts=False):
         env.forward_agent = True
         gateway_hoststring = gateway if re.match(r'\w+@[\d\.]+:\d+', gateway) else gateway + ':22'
         node_hoststring = host_string if re.match(r'\w+@[\d\.]+:\d+', host_string) else host_string + ':22'
@@ -818,6 +821,33 @@ def run_cmd_on_server(issue_cmd, server_ip, username,
             return output
 # end run_cmd_on_server
 
+def exec_cmd_on_server(issue_cmd, server_ip, username, password,
+                       as_sudo=False, timeout=60):
+    '''
+    Run issue_cmd on server_ip over a dedicated paramiko session.
+    Unlike run_cmd_on_server it doesnt touch the fabric env and hence
+    is safe to be called from multiple threads concurrently
+    Returns (exit status, stdout)
+    '''
+    cmd = '/bin/bash -c %s' % pipes.quote(issue_cmd)
+    sudo_pass = as_sudo and username != 'root'
+    if sudo_pass:
+        cmd = "sudo -S -p '' " + cmd
+    session = paramiko.SSHClient()
+    session.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+    try:
+        session.connect(server_ip, username=username, password=password,
+                        timeout=timeout)
+        (stdin, stdout, stderr) = session.exec_command(cmd, timeout=timeout)
+        if sudo_pass:
+            stdin.write('%s\n' % password)
+            stdin.flush()
+        output = stdout.read()
+        return (stdout.channel.recv_exit_status(), output)
+    finally:
+        session.close()
+# end exec_cmd_on_server
+
 class Lock:
 
     def __init__(self, filename):
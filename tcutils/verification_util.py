@@ -4,9 +4,17 @@ import json
 import pprint
 import urllib2
 import requests
+import time
 import threading
+import cookielib
+import urlparse
 import logging as LOG
 from lxml import etree
+from requests.adapters import HTTPAdapter
+try:
+    from requests.packages.urllib3.util.retry import Retry
+except ImportError:
+    from urllib3.util.retry import Retry
 from tcutils.util import *
 from common import log_orig as contrail_logging
 from cfgm_common.exceptions import PermissionDenied
@@ -14,15 +22,81 @@ from cfgm_common.exceptions import PermissionDenied
 LOG.basicConfig(format='%(levelname)s: %(message)s', level=LOG.INFO)
 
 
+class _NoCookiePolicy(cookielib.DefaultCookiePolicy):
+    # Sessions are shared by handles of different users, dont keep cookies
+    def set_ok(self, cookie, request):
+        return False
+
+
+class HttpSessionPool(object):
+    ''' Keep-alive requests.Session per endpoint (scheme://host:port)
+        shared by all the drivers, and hence by all the introspect handles
+
+    :param pool_size : Max connections kept open per endpoint
+    :param max_retries : Retries on connection errors and on 502/503/504,
+                         none by default(INTROSPECT_MAX_RETRIES) as a
+                         service being down is polled for with retries
+    :param backoff_factor : Backoff between the retries
+    '''
+
+    def __init__(self, pool_size=None, max_retries=None, backoff_factor=0.5):
+        self.pool_size = int(pool_size or
+                             os.getenv('INTROSPECT_POOL_SIZE', '10'))
+        self.max_retries = int(max_retries if max_retries is not None else
+                               os.getenv('INTROSPECT_MAX_RETRIES', '0'))
+        self.backoff_factor = backoff_factor
+        self.sessions = dict()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _key(url):
+        parsed = urlparse.urlparse(url)
+        return '%s://%s' % (parsed.scheme, parsed.netloc)
+
+    def _create(self):
+        session = requests.Session()
+        session.cookies.set_policy(_NoCookiePolicy())
+        # method_whitelist is renamed to allowed_methods in urllib3 1.26
+        methods = 'allowed_methods' if hasattr(Retry, 'DEFAULT_ALLOWED_METHODS') \
+            else 'method_whitelist'
+        retries = Retry(total=self.max_retries, connect=self.max_retries,
+                        read=0, backoff_factor=self.backoff_factor,
+                        status_forcelist=[502, 503, 504],
+                        raise_on_status=False, **{methods: ['GET']})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size,
+                              max_retries=retries)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        return session
+
+    def get(self, url):
+        ''' Returns the Session to be used for url '''
+        key = self._key(url)
+        with self.lock:
+            if key not in self.sessions:
+                self.sessions[key] = self._create()
+            return self.sessions[key]
+
+    def close(self):
+        with self.lock:
+            for session in self.sessions.values():
+                session.close()
+            self.sessions = dict()
+
+http_sessions = HttpSessionPool()
+
+
 class JsonDrv (object):
     _DEFAULT_HEADERS = {
         'Content-type': 'application/json; charset="UTF-8"',
     }
     _DEFAULT_AUTHN_URL = "/v2.0/tokens"
 
-    def __init__(self, vub, logger=LOG, args=None, insecure=False, timeout=None):
+    def __init__(self, vub, logger=LOG, args=None, insecure=False, timeout=None,
+                 sessions=None):
         self.log = logger
         self._vub = vub
+        self._sessions = sessions or http_sessions
         self._headers = dict()
         self._args = args
         self._timeout = timeout
@@ -76,7 +150,7 @@ class JsonDrv (object):
                         self._args.stack_user,
                         self._args.stack_password,
                         self._args.project_name)
-            response = requests.post(url, data=self._authn_body,
+            response = self._sessions.get(url).post(url, data=self._authn_body,
                                      headers=self._DEFAULT_HEADERS,
                                      verify=verify)
             if response.status_code == 200:
@@ -94,7 +168,8 @@ class JsonDrv (object):
 
     def load(self, url, retry=True):
         self.common_log("Requesting: %s" %(url))
-        resp = requests.get(url, headers=self._headers, verify=self.verify, timeout=self._timeout)
+        resp = self._sessions.get(url).get(url, headers=self._headers,
+            verify=self.verify, timeout=self._timeout)
         if resp.status_code in [401, 403]:
             if retry:
                 self._auth()
@@ -114,7 +189,8 @@ class JsonDrv (object):
         self.common_log("Posting: %s, payload %s"%(url, payload))
         self._headers.update({'Content-type': 'application/json; charset="UTF-8"'})
         data = json.dumps(payload)
-        resp = requests.put(url, headers=self._headers, verify=self.verify, data=data, timeout=self._timeout)
+        resp = self._sessions.get(url).put(url, headers=self._headers,
+            verify=self.verify, data=data, timeout=self._timeout)
         if resp.status_code == 401:
             if retry:
                 self._auth()
@@ -123,19 +199,46 @@ class JsonDrv (object):
             return json.loads(resp.text)
         return None
 
-    def post(self, url, payload, retry=True):
+    def post(self, url, payload, retry=True, headers=None):
+        ''' headers : additional headers. With Expect: 202-accepted, for the
+                      asynchronous apis, a 202 response is returned too
+        '''
         self.common_log("Posting: %s, payload %s"%(url, payload))
         self._headers.update({'Content-type': 'application/json; charset="UTF-8"'})
         data = json.dumps(payload)
-        resp = requests.post(url, headers=self._headers, verify=self.verify, data=data, timeout=self._timeout)
+        resp = self._sessions.get(url).post(url,
+            headers=dict(self._headers, **(headers or {})),
+            verify=self.verify, data=data, timeout=self._timeout)
         if resp.status_code == 401:
             if retry:
                 self._auth()
-                return self.post(url, payload, retry=False)
-        if resp.status_code == 200:
+                return self.post(url, payload, retry=False, headers=headers)
+        accept_async = (headers or {}).get('Expect') == '202-accepted'
+        if resp.status_code == 200 or (resp.status_code == 202 and
+                                       accept_async):
             return json.loads(resp.text)
         return None
 
+    def load_stream(self, url, retry=True):
+        ''' Returns a file like object to read the response body of url
+            incrementally or None on failure. The body is not logged.
+        '''
+        self.common_log("Requesting stream: %s" %(url))
+        resp = self._sessions.get(url).get(url, headers=self._headers,
+            stream=True, verify=self.verify, timeout=self._timeout)
+        if resp.status_code in [401, 403]:
+            resp.close()
+            if retry:
+                self._auth()
+                return self.load_stream(url, False)
+            raise PermissionDenied('Permission Denied')
+        if resp.status_code != 200:
+            self.common_log("Response Code: %d" % resp.status_code)
+            resp.close()
+            return None
+        resp.raw.decode_content = True
+        return resp.raw
+
     def common_log(self, line, mode=LOG.DEBUG):
         self.log.log(mode, line)
         with self.lock:
@@ -143,9 +246,11 @@ class JsonDrv (object):
 
 class XmlDrv (object):
 
-    def __init__(self, vub, logger=LOG, args=None, timeout=None, **kwargs):
+    def __init__(self, vub, logger=LOG, args=None, timeout=None, sessions=None,
+                 **kwargs):
         self.log = logger
         self._vub = vub
+        self._sessions = sessions or http_sessions
         self.more_logger = contrail_logging.getLogger('introspect',
                                                       log_to_console=False)
         # Since introspect log is a single file, need locks
@@ -163,7 +268,7 @@ class XmlDrv (object):
     def load(self, url, raw_data=False):
         self.common_log("Requesting: %s" %(url))
         try:
-            resp = requests.get(url, cert=self.client_cert,
+            resp = self._sessions.get(url).get(url, cert=self.client_cert,
                 verify=self.verify, timeout=self._timeout)
             output = etree.fromstring(resp.text) if not raw_data else resp.text
             self.log_xml(self.more_logger, output)
@@ -179,6 +284,25 @@ class XmlDrv (object):
                 url, str(e)))
             return None
 
+    def load_stream(self, url):
+        ''' Returns a file like object to read the response body of url
+            incrementally or None on failure. The body is not logged.
+        '''
+        self.common_log("Requesting stream: %s" %(url))
+        try:
+            resp = self._sessions.get(url).get(url, cert=self.client_cert,
+                stream=True, verify=self.verify, timeout=self._timeout)
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            return resp.raw
+        except requests.exceptions.SSLError, e:
+            self.log.error("SSL error: %s" % (e))
+            return None
+        except requests.RequestException, e:
+            self.log.error("Error while getting the url: %s, error: %s" % (
+                url, str(e)))
+            return None
+
     def common_log(self, line, mode=LOG.DEBUG):
         self.log.log(mode, line)
         with self.lock:
@@ -192,10 +316,71 @@ class XmlDrv (object):
             logger.log(mode, logline)
 
 
+class ResponseCache(object):
+    ''' Cache of responses keyed by url, each entry is valid for ttl secs
+        Concurrent loads of the same url are coalesced into one request
+        The cached objects are shared by the callers, dont modify them
+    '''
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.entries = dict()
+        self.inflight = dict()
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'coalesced': 0}
+
+    def get_or_load(self, key, loader):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and time.time() - entry[0] < self.ttl:
+                self.stats['hits'] += 1
+                return entry[1]
+            event = self.inflight.get(key)
+            if event:
+                self.stats['coalesced'] += 1
+            else:
+                self.stats['misses'] += 1
+                self.inflight[key] = threading.Event()
+        if event:
+            event.wait()
+            with self.lock:
+                entry = self.entries.get(key)
+            # Load by self if the in-flight request had failed
+            return entry[1] if entry else loader()
+        try:
+            value = loader()
+            if value is not None:
+                with self.lock:
+                    self.entries[key] = (time.time(), value)
+        finally:
+            with self.lock:
+                self.inflight.pop(key).set()
+        return value
+
+    def invalidate(self, key=None):
+        with self.lock:
+            if key is None:
+                self.entries = dict()
+            else:
+                self.entries.pop(key, None)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        total = stats['hits'] + stats['misses'] + stats['coalesced']
+        stats['hit_ratio'] = float(stats['hits'] + stats['coalesced']) / total \
+            if total else 0.0
+        return stats
+
+
 class VerificationUtilBase (object):
 
     def __init__(self, ip, port, drv=JsonDrv, logger=LOG, args=None,
-                    protocol='http', base_url='/', insecure=False):
+                    protocol='http', base_url='/', insecure=False,
+                    cache_ttl=None):
+        ''' cache_ttl : If set, GET responses are cached for cache_ttl secs
+                        Defaults to env INTROSPECT_CACHE_TTL, disabled if 0
+        '''
         self.log = logger
         self._ip = ip
         self._port = port
@@ -203,14 +388,47 @@ class VerificationUtilBase (object):
         self._force_refresh = False
         self._protocol = protocol
         self.base_url = base_url
+        self._response_cache = None
+        if cache_ttl is None:
+            cache_ttl = float(os.getenv('INTROSPECT_CACHE_TTL', '0'))
+        if cache_ttl:
+            self.enable_response_cache(cache_ttl)
+
+    def enable_response_cache(self, ttl=1):
+        self._response_cache = ResponseCache(ttl)
+
+    def disable_response_cache(self):
+        self._response_cache = None
+
+    def invalidate_response_cache(self, path=None):
+        if self._response_cache:
+            key = (self._mk_url_str(path), False) if path else None
+            self._response_cache.invalidate(key)
+
+    def get_response_cache_stats(self):
+        ''' Returns dict of hits, misses, coalesced and hit_ratio
+            or None if the cache is disabled
+        '''
+        if self._response_cache:
+            return self._response_cache.get_stats()
 
     def get_force_refresh(self):
         return self._force_refresh
 
     def set_force_refresh(self, force=False):
         self._force_refresh = force
+        self.invalidate_response_cache()
         return self.get_force_refresh()
 
+    def _load(self, url, raw_data=False):
+        if raw_data:
+            load = lambda: self._drv.load(url, raw_data=raw_data)
+        else:
+            load = lambda: self._drv.load(url)
+        if not self._response_cache or self._force_refresh:
+            return load()
+        return self._response_cache.get_or_load((url, raw_data), load)
+
     def _mk_url_str(self, path=''):
         if path.startswith('http' or 'https'):
             if self.base_url not in path:
@@ -230,14 +448,22 @@ class VerificationUtilBase (object):
     def dict_get(self, path='',url='', raw_data=False):
         try:
             if path:
-                return self._drv.load(self._mk_url_str(path))
+                return self._load(self._mk_url_str(path))
             if url:
-                return self._drv.load(url, raw_data=raw_data)
+                return self._load(url, raw_data=raw_data)
         except urllib2.HTTPError:
             return None
     # end dict_get
 
+    def stream_get(self, path):
+        ''' Returns a file like object over the response of path,
+            supported only by drivers which implement load_stream
+        '''
+        return self._drv.load_stream(self._mk_url_str(path))
+    # end stream_get
+
     def put(self, payload, path='', url=''):
+        self.invalidate_response_cache()
         try:
             if path:
                 return self._drv.put(self._mk_url_str(path), payload)
@@ -246,12 +472,15 @@ class VerificationUtilBase (object):
         except urllib2.HTTPError:
             return None
 
-    def post(self, payload, path='', url=''):
+    def post(self, payload, path='', url='', headers=None):
+        self.invalidate_response_cache()
+        kwargs = {'headers': headers} if headers else {}
         try:
             if path:
-                return self._drv.post(self._mk_url_str(path), payload)
+                return self._drv.post(self._mk_url_str(path), payload,
+                                      **kwargs)
             if url:
-                return self._drv.post(url, payload)
+                return self._drv.post(url, payload, **kwargs)
         except urllib2.HTTPError:
             return None
 
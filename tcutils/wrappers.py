@@ -8,6 +8,7 @@ import cStringIO
 from datetime import datetime
 from tcutils.util import v4OnlyTestException
 from tcutils.test_lib.contrail_utils import check_xmpp_is_stable
+from tcutils.cleanup_scheduler import run_cleanups
 
 from cores import *
 
@@ -23,9 +24,10 @@ def preposttest_wrapper(function):
     when a test is wrraped with this decorator
     1. Logs the test start with test doc string
     2. Checks connection states
-    3. Collects cores/crashes before test
+    3. Collects cores/crashes before test, from all the nodes in parallel
     4. Executes the test
-    5. Collects cores/crashes after test
+    5. Collects cores/crashes after test, re-listing cores only on the
+       nodes whose core listing has changed
     6. Compares pre-cores/crashes with post-cores/crashes to decide test result.
     7. Logs the test result.
     """
@@ -44,11 +46,11 @@ def preposttest_wrapper(function):
         if doc:
             log.info('TEST DESCRIPTION : %s', doc)
         errmsg = []
-        initial_cores = get_cores(self.inputs)
+        health_sweep = HealthSweep(self.inputs)
+        (initial_cores, initial_crashes) = health_sweep.run()
         if initial_cores:
             log.warn("Test is running with cores: %s", initial_cores)
 
-        initial_crashes = get_service_crashes(self.inputs)
         if initial_crashes:
             log.warn("Test is running with crashes: %s", initial_crashes)
 
@@ -96,25 +98,14 @@ def preposttest_wrapper(function):
             cleanup_trace = ''
             if getattr(self, 'parallel_cleanup',None):
                 parallel_cleanup_list = self.parallel_cleanup()
-            while self._cleanups:
-                cleanup, args, kwargs = self._cleanups.pop(-1)
-                try:
-                    cleanup(*args, **kwargs)
-                except KeyboardInterrupt:
-                    raise
-                except Exception, cleanupfail:
-                    #result.addError(self, sys.exc_info())
-                    cet, cei, ctb = sys.exc_info()
-                    formatted_traceback = ''.join(traceback.format_tb(ctb))
-                    cleanup_trace += '\n{0}\n{1}:\n{2}'.format(
-                                                        formatted_traceback,
-                                                        cet.__name__,
-                                                        cei.message)
+            # Fixtures are cleaned up concurrently in dependency order,
+            # CLEANUP_WORKERS=1 cleans them up one at a time in LIFO order
+            for (cleanupfail, trace) in run_cleanups(self._cleanups,
+                                                     logger=log):
+                cleanup_trace += trace
 
-            final_cores = get_cores(self.inputs)
+            (final_cores, final_crashes) = health_sweep.run()
             cores = find_new(initial_cores, final_cores)
-
-            final_crashes = get_service_crashes(self.inputs)
             crashes = find_new(initial_crashes, final_crashes)
 
             if testfail:
@@ -1,4 +1,5 @@
 from common.isolated_creds import *
+from common.tenant_pool import get_tenant_pool
 from test import BaseTestCase
 import time
 
@@ -10,6 +11,8 @@ class BaseTestCase_v1(BaseTestCase):
         cls.admin_connections = None
         cls.domain_name = None        
         cls.domain_obj = None
+        cls.tenant_pool = None
+        cls.tenant_lease = None
         super(BaseTestCase_v1, cls).setUpClass()
         if 'v3' in cls.inputs.auth_url:
             if cls.inputs.domain_isolation:
@@ -18,6 +21,13 @@ class BaseTestCase_v1(BaseTestCase):
             else:
                 cls.domain_name = cls.inputs.stack_domain
             
+        cls.tenant_pool = get_tenant_pool(cls.inputs, cls.input_file,
+                                          cls.logger)
+        if cls.tenant_pool:
+            cls.tenant_lease = cls.tenant_pool.lease()
+        if cls.tenant_lease:
+            cls.use_tenant_lease(cls.tenant_lease)
+            return
         if not cls.inputs.tenant_isolation:
             project_name = cls.inputs.stack_tenant
         else:
@@ -58,8 +68,24 @@ class BaseTestCase_v1(BaseTestCase):
         cls.create_flood_vmi_if_vcenter_gw_setup()
     # end setUpClass
 
+    @classmethod
+    def use_tenant_lease(cls, lease):
+        ''' Use the tenant leased from the tenant pool '''
+        cls.isolated_creds = lease.isolated_creds
+        cls.admin_isolated_creds = lease.admin_isolated_creds
+        cls.project = lease.project
+        cls.admin_inputs = lease.admin_inputs
+        cls.admin_connections = lease.admin_connections
+        cls.inputs = lease.inputs
+        cls.connections = lease.connections
+    # end use_tenant_lease
+
     @classmethod
     def tearDownClass(cls):
+        if cls.tenant_lease:
+            cls.tenant_pool.release(cls.tenant_lease)
+            super(BaseTestCase_v1, cls).tearDownClass()
+            return
         if cls.inputs.tenant_isolation:
             cls.admin_isolated_creds.delete_tenant(cls.project)
             cls.admin_isolated_creds.delete_user(cls.isolated_creds.username)
@@ -43,13 +43,17 @@ class Tenant(object):
 
         self.headers = {'X-Auth-Token': self._token}
 
-    def cleanup(self, tenants):
+    def cleanup(self, tenants, keep=None, owned_only=False):
+        ''' keep: list of urls of contrail objects not to be deleted
+            owned_only: delete only the objects of the project, not the ones
+                        of other projects it refers to or is referred to by
+        '''
         nova_objects_deleted = self.cleanup_nova_objects(tenants)
         return_value = True
         failed_tenants = []
         for tenant in tenants:
             if self.verify_nova_vms_deleted(tenant):
-                is_deleted, contrail_objects_deleted = self.cleanup_contrail_objects(tenant)
+                is_deleted, contrail_objects_deleted = self.cleanup_contrail_objects(tenant, keep, owned_only)
                 if is_deleted:
                     if not nova_objects_deleted[tenant] and not contrail_objects_deleted:
                         log.info("No objects found in tenant %s" % tenant)
@@ -79,7 +83,14 @@ class Tenant(object):
         ks=self._get_keystone_client()
         return ks.auth_ref['token']['id']
 
-    def _delete_ref_object(self, url, fresh_delete=True):
+    def _is_owned(self, url, owner):
+        ''' Returns True if the contrail object at url is in the fq name
+            owner, eg. of a project
+        '''
+        obj = self.get_contrail_object(url)
+        return bool(obj) and obj[1].get('fq_name', [])[:len(owner)] == owner
+
+    def _delete_ref_object(self, url, fresh_delete=True, owner=None):
         ret = requests.delete(url, headers=self.headers)
         if ret.status_code == 200:
             log.info("Deleted: %s" %(url))
@@ -94,11 +105,15 @@ class Tenant(object):
                 'http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+',
                 ret.content
             )
+            if owner:
+                child_urls = [child_url for child_url in child_urls
+                              if child_url != url and
+                              self._is_owned(child_url, owner)]
             if child_urls:
                 log.debug("Deleting children %s" % child_urls)
                 for child_url in child_urls:
-                    self._delete_ref_object(child_url)
-                self._delete_ref_object(url, False)
+                    self._delete_ref_object(child_url, owner=owner)
+                return self._delete_ref_object(url, False, owner)
 
     @retry(delay=5, tries=10)
     def verify_nova_vms_deleted(self, tenant):
@@ -136,30 +151,82 @@ class Tenant(object):
 
         return self.available_tenants
 
-    def cleanup_contrail_objects(self, tenant):
+    def get_project_url(self, tenant):
+        ''' Returns url of the project tenant, None if it is not found '''
+        for available_tenant in self._get_available_tenants():
+            if tenant in available_tenant['fq_name']:
+                return available_tenant['href']
+        return None
+
+    def get_contrail_objects(self, tenant, owned_only=False):
+        ''' Returns urls of the contrail objects of the project tenant,
+            None if the project is not found
+            owned_only: only the ones whose parent is the project
+        '''
+        project_url = self.get_project_url(tenant)
+        if project_url:
+            ret = requests.get(project_url, headers = self.headers)
+            if ret.status_code == 200 and owned_only:
+                project = json.loads(ret.content)['project']
+                return [child['href'] for key, children in project.iteritems()
+                        if isinstance(children, list) and
+                        not key.endswith('_refs')
+                        for child in children
+                        if isinstance(child, dict) and 'href' in child]
+            if ret.status_code == 200:
+                child_urls = re.findall('http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', ret.content)
+                return [child_url for child_url in child_urls
+                        if not re.match(r'.*/(project|domain)/.*',child_url)]
+        return None
+
+    def get_contrail_object(self, url):
+        ''' Returns (type, dict of fields) of the contrail object at url,
+            None if it is not found
+        '''
+        ret = requests.get(url, headers=self.headers)
+        if ret.status_code != 200:
+            return None
+        return json.loads(ret.content).items()[0]
+
+    def update_contrail_object(self, url, obj_type, fields):
+        ''' Update fields of the contrail object at url, returns True if
+            updated
+        '''
+        headers = dict(self.headers)
+        headers['Content-Type'] = 'application/json'
+        ret = requests.put(url, data=json.dumps({obj_type: fields}),
+                           headers=headers)
+        if ret.status_code != 200:
+            log.error("Update of %s failed: %s" % (url, ret.content))
+            return False
+        log.info("Updated: %s" % url)
+        return True
+
+    def cleanup_contrail_objects(self, tenant, keep=None, owned_only=False):
         if isinstance(tenant,list):
             objects_deleted = {}
             is_deleted = {}
             for t in tenant:
-                is_deleted[t], objects_deleted[t] = self.cleanup_contrail_objects(t)
+                is_deleted[t], objects_deleted[t] = self.cleanup_contrail_objects(t, keep, owned_only)
 
             return (is_deleted, objects_deleted)
         elif isinstance(tenant, str):
-            tenants_available = self._get_available_tenants()
-            for available_tenant in tenants_available:
-                sucessfully_deleted = True
-                if tenant in available_tenant['fq_name']:
-                    ret = requests.get(available_tenant['href'], headers = self.headers)
-                    if ret.status_code == 200:
-                        child_urls = re.findall('http[s]?://(?:[a-zA-Z]|[0-9]|[$-_@.&+]|[!*\(\),]|(?:%[0-9a-fA-F][0-9a-fA-F]))+', ret.content)
-                        if child_urls:
-                            objects_deleted = []
-                            for child_url in child_urls:
-                                if not re.match(r'.*/(project|domain)/.*',child_url):
-                                    if not self._delete_ref_object(child_url):
-                                        sucessfully_deleted = False
-                                    objects_deleted.append(child_url)
-                            return (sucessfully_deleted, objects_deleted)
+            child_urls = self.get_contrail_objects(tenant, owned_only)
+            if child_urls is None:
+                return None
+            owner = None
+            if owned_only:
+                owner = self.get_contrail_object(
+                    self.get_project_url(tenant))[1]['fq_name']
+            sucessfully_deleted = True
+            objects_deleted = []
+            for child_url in child_urls:
+                if keep and child_url in keep:
+                    continue
+                if not self._delete_ref_object(child_url, owner=owner):
+                    sucessfully_deleted = False
+                objects_deleted.append(child_url)
+            return (sucessfully_deleted, objects_deleted)
 
 
 def main(argv=sys.argv[1:]):